@@ -2,10 +2,11 @@
 # See LICENSE for details.
 
 """
-Benchmarks comparing the write performance of a "normal" Protocol instance
-and an instance of a Protocol class which has had L{twisted.conch.mixin}'s
+Benchmarks comparing the write performance of a "normal" Protocol instance,
+an instance of a Protocol class which has had L{twisted.conch.mixin}'s
 L{BufferingMixin<twisted.conch.mixin.BufferingMixin>} mixed in to perform
-Nagle-like write coalescing.
+Nagle-like write coalescing, and a "normal" Protocol instance wrapped by
+L{CoalescingFactory<twisted.protocols.policies.CoalescingFactory>}.
 """
 
 from sys import stdout
@@ -15,9 +16,12 @@ from time import time
 from twisted.python.usage import Options
 from twisted.python.log import startLogging
 
-from twisted.internet.protocol import ServerFactory, Protocol, ClientCreator
+from twisted.internet.protocol import (
+    Factory, ServerFactory, Protocol, ClientCreator)
 from twisted.internet.defer import Deferred
+from twisted.internet.endpoints import TCP4ClientEndpoint
 from twisted.internet import reactor
+from twisted.protocols.policies import CoalescingFactory
 
 from twisted.conch.mixin import BufferingMixin
 
@@ -88,7 +92,7 @@ def _write(proto, byteCount):
 
 
 
-def _benchmark(byteCount, clientProtocol):
+def _benchmark(byteCount, clientProtocol, coalesce=False):
     result = {}
     finished = Deferred()
     def cbFinished(ignored):
@@ -101,8 +105,16 @@ def _benchmark(byteCount, clientProtocol):
     f.protocol = lambda: ServerProtocol(byteCount, finished)
     server = reactor.listenTCP(0, f)
 
-    f2 = ClientCreator(reactor, clientProtocol)
-    proto = f2.connectTCP('127.0.0.1', server.getHost().port)
+    if coalesce:
+        # The endpoint gives us the wrapper, whose write and flush methods
+        # are the ones being measured.
+        endpoint = TCP4ClientEndpoint(
+            reactor, '127.0.0.1', server.getHost().port)
+        proto = endpoint.connect(
+            CoalescingFactory(Factory.forProtocol(clientProtocol)))
+    else:
+        f2 = ClientCreator(reactor, clientProtocol)
+        proto = f2.connectTCP('127.0.0.1', server.getHost().port)
     def connected(proto):
         result[u'connected'] = time()
         return proto
@@ -122,17 +134,23 @@ def _benchmarkUnbuffered(byteCount):
 
 
 
+def _benchmarkCoalesced(byteCount):
+    return _benchmark(byteCount, Protocol, coalesce=True)
+
+
+
 def benchmark(scale=1):
     """
     Benchmark and return information regarding the relative performance of a
-    protocol which does not use the buffering mixin and a protocol which
-    does.
+    protocol which does not use the buffering mixin, a protocol which does,
+    and a protocol wrapped by L{CoalescingFactory}.
 
     @type scale: C{int}
     @param scale: A multiplier to the amount of work to perform
 
     @return: A Deferred which will fire with a dictionary mapping each of
-    the two unicode strings C{u'buffered'} and C{u'unbuffered'} to
+    the unicode strings C{u'buffered'}, C{u'unbuffered'} and
+    C{u'coalesced'} to
     dictionaries describing the performance of a protocol of each type. 
     These value dictionaries will map the unicode strings C{u'connected'}
     and C{u'disconnected'} to the times at which each of those events
@@ -148,7 +166,12 @@ def benchmark(scale=1):
         unbufferedDeferred =  _benchmarkUnbuffered(byteCount * scale)
         def didUnbuffered(unbufferedResult):
             overallResult[u'unbuffered'] = unbufferedResult
-            return overallResult
+            coalescedDeferred = _benchmarkCoalesced(byteCount * scale)
+            def didCoalesced(coalescedResult):
+                overallResult[u'coalesced'] = coalescedResult
+                return overallResult
+            coalescedDeferred.addCallback(didCoalesced)
+            return coalescedDeferred
         unbufferedDeferred.addCallback(didUnbuffered)
         return unbufferedDeferred
     bufferedDeferred.addCallback(didBuffered)
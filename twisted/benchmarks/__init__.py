@@ -0,0 +1,14 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Twisted Benchmarks: performance measurements for Twisted itself.
+
+Each module in this package defines a C{benchmarks} list of
+L{twisted.benchmarks.runner.Benchmark} instances.  Run them all with::
+
+    python -m twisted.benchmarks
+
+or see C{python -m twisted.benchmarks --help} for selecting benchmarks,
+writing the results as JSON and comparing them against a saved baseline.
+"""
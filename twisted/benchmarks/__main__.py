@@ -0,0 +1,15 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Run the Twisted benchmarks: C{python -m twisted.benchmarks}.
+"""
+
+from __future__ import absolute_import
+
+import sys
+
+from twisted.benchmarks.runner import main
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,18 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmarks for L{twisted.spread.banana}.
+"""
+
+from __future__ import division, absolute_import
+
+from twisted.spread.banana import b1282int
+from twisted.benchmarks.runner import FunctionBenchmark
+
+
+
+benchmarks = [
+    FunctionBenchmark(b1282int, 100000, (b"\xff" * length,),
+                      name="b1282int(%d)" % (length,))
+    for length in (1, 5, 10, 50, 100)]
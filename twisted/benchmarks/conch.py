@@ -0,0 +1,145 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmarks for the rate at which L{SSHTransportBase
+<twisted.conch.ssh.transport.SSHTransportBase>} can encrypt, authenticate and
+frame outgoing packets, and decrypt, verify and parse incoming ones, for
+several ciphers.
+
+No connection or key exchange is involved: one transport's packets are
+collected in memory and delivered to another transport in chunks the size of
+a typical TCP read, so the numbers measure only the CPU cost of the SSH
+packet layer.  Each operation is one packet of 32KiB of payload.
+
+PyCrypto is required; without it there are no benchmarks in this module.
+"""
+
+from __future__ import division, absolute_import
+
+from twisted.test.proto_helpers import StringTransport
+from twisted.benchmarks.runner import Benchmark
+
+try:
+    from twisted.conch.ssh.transport import SSHTransportBase, SSHCiphers
+except ImportError:
+    SSHTransportBase = None
+
+_PAYLOAD = b'x' * 32768
+_CHUNK = 65536
+
+
+
+if SSHTransportBase is not None:
+    class _CountingTransport(SSHTransportBase):
+        """
+        An L{SSHTransportBase} which counts the payload bytes it receives
+        instead of dispatching them.
+        """
+        received = 0
+
+        def dispatchMessage(self, messageNum, payload):
+            self.received += len(payload)
+
+
+
+def _transports(cipher, mac):
+    """
+    Make a transport to send packets and one to receive them, using the same
+    keys.
+    """
+    key = b'\x11' * 64
+    sender = _CountingTransport()
+    sender.transport = StringTransport()
+    sender.currentEncryptions = SSHCiphers(cipher, 'none', mac, 'none')
+    sender.currentEncryptions.setKeys(key, key, b'', b'', key, b'')
+
+    receiver = _CountingTransport()
+    receiver.gotVersion = True
+    receiver.currentEncryptions = SSHCiphers('none', cipher, 'none', mac)
+    receiver.currentEncryptions.setKeys(b'', b'', key, key, b'', key)
+    return sender, receiver
+
+
+
+class SendBenchmark(Benchmark):
+    """
+    Send packets with L{SSHTransportBase.sendPacket}.
+
+    @ivar cipher: The name of the cipher.
+    @ivar mac: The name of the MAC.
+    """
+
+    def __init__(self, cipher, mac, iterations):
+        Benchmark.__init__(self, "send(%s, %s)" % (cipher, mac), iterations)
+        self.cipher = cipher
+        self.mac = mac
+
+
+    def setUp(self):
+        self.sender, receiver = _transports(self.cipher, self.mac)
+
+
+    def run(self, iterations):
+        sender = self.sender
+        sender.transport.clear()
+        for i in range(iterations):
+            sender.sendPacket(94, _PAYLOAD)
+
+
+
+class ReceiveBenchmark(SendBenchmark):
+    """
+    Receive packets with L{SSHTransportBase.dataReceived}, as a new
+    transport each run.
+
+    @ivar _chunks: A L{dict} mapping numbers of packets to the chunks of data
+        a transport sent them as.
+    """
+
+    def __init__(self, cipher, mac, iterations):
+        SendBenchmark.__init__(self, cipher, mac, iterations)
+        self.name = "receive(%s, %s)" % (cipher, mac)
+        self._chunks = {}
+
+
+    def setUp(self):
+        self._data(self.iterations)
+
+
+    def _data(self, packets):
+        """
+        Get the chunks of data in which a new transport sends some packets,
+        making them if they have not been made yet.
+        """
+        chunks = self._chunks.get(packets)
+        if chunks is None:
+            sender, receiver = _transports(self.cipher, self.mac)
+            for i in range(packets):
+                sender.sendPacket(94, _PAYLOAD)
+            data = sender.transport.value()
+            chunks = self._chunks[packets] = [
+                data[i:i + _CHUNK] for i in range(0, len(data), _CHUNK)]
+        return chunks
+
+
+    def run(self, iterations):
+        chunks = self._data(iterations)
+        sender, receiver = _transports(self.cipher, self.mac)
+        for chunk in chunks:
+            receiver.dataReceived(chunk)
+        if receiver.received != iterations * len(_PAYLOAD):
+            raise RuntimeError("Received %d bytes, expected %d" % (
+                    receiver.received, iterations * len(_PAYLOAD)))
+
+
+    def tearDown(self):
+        self._chunks.clear()
+
+
+
+benchmarks = []
+if SSHTransportBase is not None:
+    for cipher in ['aes128-ctr', 'aes256-ctr', 'aes128-cbc', '3des-ctr']:
+        benchmarks.append(SendBenchmark(cipher, 'hmac-sha1', 128))
+        benchmarks.append(ReceiveBenchmark(cipher, 'hmac-sha1', 128))
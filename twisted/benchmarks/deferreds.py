@@ -0,0 +1,130 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmarks for L{twisted.internet.defer.Deferred}.
+"""
+
+from __future__ import division, absolute_import
+
+from twisted.internet import defer
+from twisted.benchmarks.runner import FunctionBenchmark
+
+
+
+def instantiate():
+    """
+    Only create a deferred.
+    """
+    defer.Deferred()
+
+
+
+def instantiateShootCallback():
+    """
+    Create a deferred and give it a normal result.
+    """
+    d = defer.Deferred()
+    d.callback(1)
+
+
+
+def instantiateShootErrback():
+    """
+    Create a deferred and give it an exception result.  To avoid Unhandled
+    Errors, also register an errback that eats the error.
+    """
+    d = defer.Deferred()
+    try:
+        1 / 0
+    except:
+        d.errback()
+    d.addErrback(lambda x: None)
+
+
+
+def _passthrough(result):
+    return result
+
+
+
+def instantiateAddCallbacksNoResult(n):
+    """
+    Create a deferred and add a trivial callback/errback/both to it the given
+    number of times.
+    """
+    d = defer.Deferred()
+    f = _passthrough
+    for i in range(n):
+        d.addCallback(f)
+        d.addErrback(f)
+        d.addBoth(f)
+        d.addCallbacks(f, f)
+
+
+
+def instantiateAddCallbacksBeforeResult(n):
+    """
+    Create a deferred and add a trivial callback/errback/both to it the given
+    number of times, and then shoot a result through all of the callbacks.
+    """
+    d = defer.Deferred()
+    f = _passthrough
+    for i in range(n):
+        d.addCallback(f)
+        d.addErrback(f)
+        d.addBoth(f)
+        d.addCallbacks(f)
+    d.callback(1)
+
+
+
+def instantiateAddCallbacksAfterResult(n):
+    """
+    Create a deferred, shoot it and then add a trivial callback/errback/both
+    to it the given number of times.  The result is processed through the
+    callbacks as they are added.
+    """
+    d = defer.Deferred()
+    f = _passthrough
+    d.callback(1)
+    for i in range(n):
+        d.addCallback(f)
+        d.addErrback(f)
+        d.addBoth(f)
+        d.addCallbacks(f)
+
+
+
+def pauseUnpause(n):
+    """
+    Add the given number of callbacks/errbacks/both to a deferred while it is
+    paused, and unpause it, triggering the processing of the value through the
+    callbacks.
+    """
+    d = defer.Deferred()
+    f = _passthrough
+    d.callback(1)
+    d.pause()
+    for i in range(n):
+        d.addCallback(f)
+        d.addErrback(f)
+        d.addBoth(f)
+        d.addCallbacks(f)
+    d.unpause()
+
+
+
+benchmarks = [
+    FunctionBenchmark(instantiate, 100000),
+    FunctionBenchmark(instantiateShootCallback, 100000),
+    FunctionBenchmark(instantiateShootErrback, 200),
+    ]
+
+for _n in (10, 1000, 10000):
+    for _function in (instantiateAddCallbacksNoResult,
+                      instantiateAddCallbacksBeforeResult,
+                      instantiateAddCallbacksAfterResult,
+                      pauseUnpause):
+        benchmarks.append(FunctionBenchmark(_function, 20, (_n,)))
+del _n, _function
@@ -0,0 +1,136 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmarks for L{twisted.python.failure.Failure}: see how slow failure
+creation is.
+"""
+
+from __future__ import division, absolute_import
+
+import random
+
+from twisted.python import failure
+from twisted.internet import defer
+from twisted.benchmarks.runner import FunctionBenchmark
+
+DEPTH = 30
+LOCALS = (0, 20, 50)
+
+
+
+def _makeDeepFailures(nLocals, depth, choice):
+    """
+    Define a chain of functions which call each other and then divide by
+    zero.
+
+    @param nLocals: The number of local variables each function defines.
+
+    @param depth: The number of functions in the chain.
+
+    @param choice: A function choosing an element of a sequence, used to pick
+        the values of the local variables.
+
+    @return: The first function of the chain.
+    """
+    namespace = {}
+    values = [None, 1, 'Hello', [], {1: 1}, (1, 2, 3)]
+    for i in range(depth):
+        assignments = ';'.join([
+            'x%d = %r' % (j, choice(values)) for j in range(nLocals)])
+        exec("""
+def deepFailure%d():
+    %s
+    deepFailure%d()
+""" % (i, assignments or 'pass', i + 1), namespace)
+    exec("""
+def deepFailure%d():
+    1 / 0
+""" % (depth,), namespace)
+    return namespace['deepFailure0']
+
+
+
+_random = random.Random(10050)
+_deepFailures = dict(
+    (nLocals, _makeDeepFailures(nLocals, DEPTH, _random.choice))
+    for nLocals in LOCALS)
+
+
+
+def fail(nLocals):
+    """
+    Create a failure from an exception raised deep in the stack.
+    """
+    try:
+        _deepFailures[nLocals]()
+    except:
+        failure.Failure()
+
+
+
+def failTrap(nLocals):
+    """
+    Create a failure from an exception raised deep in the stack, and trap it.
+    """
+    try:
+        _deepFailures[nLocals]()
+    except:
+        failure.Failure().trap(ArithmeticError)
+
+
+
+def failErrbackTrap(nLocals):
+    """
+    Call a function which raises an exception deep in the stack as the
+    callback of a L{defer.Deferred}, and trap the failure in an errback.
+    """
+    d = defer.succeed(None)
+    d.addCallback(lambda ignored: _deepFailures[nLocals]())
+    d.addErrback(lambda f: f.trap(ArithmeticError))
+
+
+
+def failCaptureVars(nLocals):
+    """
+    Create a failure from an exception raised deep in the stack, capturing
+    the local and global variables of every frame.
+    """
+    try:
+        _deepFailures[nLocals]()
+    except:
+        failure.Failure(captureVars=True)
+
+
+
+def failStr(nLocals):
+    """
+    Create a failure from an exception raised deep in the stack, and format
+    it.
+    """
+    try:
+        _deepFailures[nLocals]()
+    except:
+        str(failure.Failure())
+
+
+
+class PythonException(Exception):
+    pass
+
+
+
+def failEasy():
+    """
+    Create a failure from an exception which was never raised.
+    """
+    failure.Failure(PythonException())
+
+
+
+benchmarks = [FunctionBenchmark(failEasy, 5000)]
+for _function in (fail, failTrap, failErrbackTrap, failCaptureVars,
+                  failStr):
+    for _nLocals in LOCALS:
+        benchmarks.append(FunctionBenchmark(_function, 1000, (_nLocals,)))
+del _function, _nLocals
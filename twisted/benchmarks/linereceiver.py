@@ -0,0 +1,82 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmarks for L{twisted.protocols.basic.LineReceiver}.
+"""
+
+from __future__ import division, absolute_import
+
+from twisted.protocols import basic
+from twisted.benchmarks.runner import Benchmark
+
+
+
+class CollectingLineReceiver(basic.LineReceiver):
+    """
+    A L{basic.LineReceiver} which keeps every line it receives.
+    """
+
+    def __init__(self):
+        self.lines = []
+        self.lineReceived = self.lines.append
+
+
+
+class LineReceiverBenchmark(Benchmark):
+    """
+    Deliver a number of lines to a L{basic.LineReceiver}, split into chunks
+    of a fixed size.
+
+    @ivar chunkSize: The number of bytes delivered by each call to
+        C{dataReceived}.
+    @ivar lineLength: The length of each line, excluding the delimiter.
+    @ivar numLines: The number of lines delivered.
+    """
+
+    def __init__(self, chunkSize, lineLength, numLines, iterations=1):
+        Benchmark.__init__(
+            self, "chunk%d-line%d-lines%d" % (chunkSize, lineLength, numLines),
+            iterations)
+        self.chunkSize = chunkSize
+        self.lineLength = lineLength
+        self.numLines = numLines
+
+
+    def setUp(self):
+        """
+        Split the lines into chunks.
+        """
+        data = (b'x' * self.lineLength + b'\r\n') * self.numLines
+        self.chunks = [data[n:n + self.chunkSize]
+                       for n in range(0, len(data), self.chunkSize)]
+
+
+    def run(self, iterations):
+        """
+        Deliver all of the chunks to a new protocol C{iterations} times.
+        """
+        for i in range(iterations):
+            proto = CollectingLineReceiver()
+            dataReceived = proto.dataReceived
+            for chunk in self.chunks:
+                dataReceived(chunk)
+            if len(proto.lines) != self.numLines:
+                raise RuntimeError("Received %d lines, expected %d" % (
+                        len(proto.lines), self.numLines))
+
+
+    def tearDown(self):
+        del self.chunks
+
+
+
+benchmarks = []
+for _lineLength in (10, 100, 1000):
+    for _chunkSize in (1, 500, 5000):
+        benchmarks.append(LineReceiverBenchmark(_chunkSize, _lineLength, 100))
+for _chunkSize in (51, 500, 5000):
+    benchmarks.append(LineReceiverBenchmark(_chunkSize, 1000, 10000))
+# Many short lines per read, as from a busy IRC or memcache connection.
+benchmarks.append(LineReceiverBenchmark(2 ** 16, 30, 2000))
+del _lineLength, _chunkSize
@@ -0,0 +1,388 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmarks of complete protocol exchanges over real loopback sockets, which
+exercise the reactor along with the protocol implementations.
+"""
+
+from __future__ import division, absolute_import
+
+from twisted.internet import defer, protocol
+from twisted.internet.endpoints import TCP4ClientEndpoint
+from twisted.names import client, common, dns, error, server
+from twisted.protocols import amp
+from twisted.web.client import Agent, HTTPConnectionPool, readBody
+from twisted.web.server import Site
+from twisted.web.static import Data
+from twisted.benchmarks.runner import Benchmark
+
+
+
+class _EchoClient(protocol.Protocol):
+    """
+    Send data to an echo server and notice when it has all come back.
+
+    @ivar _expected: The number of bytes still to be echoed back.
+    @ivar _done: A L{Deferred} to fire when they have, or C{None}.
+    @ivar lost: A L{Deferred} which fires when the connection is lost.
+    """
+    _expected = 0
+    _done = None
+
+    def __init__(self):
+        self.lost = defer.Deferred()
+
+
+    def send(self, data):
+        """
+        Send some data.
+
+        @return: A L{Deferred} which fires when it has been echoed back.
+        """
+        self._expected += len(data)
+        self._done = defer.Deferred()
+        self.transport.write(data)
+        return self._done
+
+
+    def dataReceived(self, data):
+        self._expected -= len(data)
+        if self._expected <= 0:
+            done, self._done = self._done, None
+            done.callback(None)
+
+
+    def connectionLost(self, reason):
+        self.lost.callback(None)
+
+
+
+class _Echo(protocol.Protocol):
+    """
+    Send back everything received.
+    """
+
+    def dataReceived(self, data):
+        self.transport.write(data)
+
+
+
+class _LoopbackBenchmark(Benchmark):
+    """
+    A benchmark which listens on a loopback port and connects a client to it.
+
+    @ivar port: The listening port.
+    """
+
+    def listen(self, factory):
+        """
+        Listen for TCP connections on the loopback interface.
+
+        @param factory: The L{protocol.ServerFactory} to use.
+
+        @return: The port number listened on.
+        """
+        from twisted.internet import reactor
+        self.port = reactor.listenTCP(0, factory, interface="127.0.0.1")
+        return self.port.getHost().port
+
+
+    def connect(self, factory):
+        """
+        Connect to the listening port.
+
+        @param factory: The L{protocol.ClientFactory} to use.
+
+        @return: A L{Deferred} which fires with the connected protocol.
+        """
+        from twisted.internet import reactor
+        endpoint = TCP4ClientEndpoint(
+            reactor, "127.0.0.1", self.port.getHost().port)
+        return endpoint.connect(factory)
+
+
+    def tearDown(self):
+        """
+        Stop listening.
+        """
+        return self.port.stopListening()
+
+
+
+class TCPEchoBenchmark(_LoopbackBenchmark):
+    """
+    Send messages over a TCP connection to an echo server, one at a time,
+    waiting for each to come back before sending the next.
+
+    @ivar messageSize: The length of each message.
+    """
+
+    def __init__(self, name, messageSize, iterations):
+        _LoopbackBenchmark.__init__(self, name, iterations)
+        self.messageSize = messageSize
+
+
+    @defer.inlineCallbacks
+    def setUp(self):
+        self.listen(protocol.Factory.forProtocol(_Echo))
+        self.client = yield self.connect(
+            protocol.Factory.forProtocol(_EchoClient))
+
+
+    @defer.inlineCallbacks
+    def run(self, iterations):
+        message = b"x" * self.messageSize
+        for i in range(iterations):
+            yield self.client.send(message)
+
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        self.client.transport.loseConnection()
+        yield self.client.lost
+        yield _LoopbackBenchmark.tearDown(self)
+
+
+
+class _Sum(amp.Command):
+    """
+    Add two integers.
+    """
+    arguments = [(b'a', amp.Integer()), (b'b', amp.Integer())]
+    response = [(b'total', amp.Integer())]
+
+
+
+class _Adder(amp.AMP):
+    """
+    Respond to L{_Sum}.
+    """
+
+    @_Sum.responder
+    def sum(self, a, b):
+        return {'total': a + b}
+
+
+
+class AMPCallBenchmark(_LoopbackBenchmark):
+    """
+    Make AMP calls over a TCP connection.
+
+    @ivar concurrent: If C{True}, issue every call at once and wait for all of
+        the responses; otherwise wait for each response before making the
+        next call.
+    """
+
+    def __init__(self, name, concurrent, iterations):
+        _LoopbackBenchmark.__init__(self, name, iterations)
+        self.concurrent = concurrent
+
+
+    @defer.inlineCallbacks
+    def setUp(self):
+        self.listen(protocol.Factory.forProtocol(_Adder))
+        self.client = yield self.connect(protocol.Factory.forProtocol(amp.AMP))
+
+
+    @defer.inlineCallbacks
+    def run(self, iterations):
+        callRemote = self.client.callRemote
+        if self.concurrent:
+            yield defer.gatherResults([
+                    callRemote(_Sum, a=i, b=i)
+                    for i in range(iterations)])
+        else:
+            for i in range(iterations):
+                yield callRemote(_Sum, a=i, b=i)
+
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        self.client.transport.loseConnection()
+        yield _LoopbackBenchmark.tearDown(self)
+
+
+
+class HTTPGetBenchmark(_LoopbackBenchmark):
+    """
+    Issue HTTP GET requests for a small static resource, one after another,
+    over a persistent connection.
+    """
+
+    def setUp(self):
+        from twisted.internet import reactor
+        site = Site(Data(b"Hello, world!", "text/plain"))
+        port = self.listen(site)
+        self.url = ("http://127.0.0.1:%d/" % (port,)).encode("ascii")
+        self.pool = HTTPConnectionPool(reactor)
+        self.agent = Agent(reactor, pool=self.pool)
+
+
+    @defer.inlineCallbacks
+    def run(self, iterations):
+        for i in range(iterations):
+            response = yield self.agent.request(b"GET", self.url)
+            yield readBody(response)
+
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        yield self.pool.closeCachedConnections()
+        yield _LoopbackBenchmark.tearDown(self)
+
+
+
+class _UDPEcho(protocol.DatagramProtocol):
+    """
+    Send back every datagram received, one at a time.
+    """
+
+    def datagramReceived(self, data, addr):
+        self.transport.write(data, addr)
+
+
+
+class _BatchUDPEcho(protocol.DatagramProtocol):
+    """
+    Send back the datagrams received together, together.
+    """
+
+    def datagramsReceived(self, datagrams):
+        self.transport.writeDatagrams(datagrams)
+
+
+
+class _UDPEchoClient(protocol.DatagramProtocol):
+    """
+    Send bursts of datagrams to an echo server and notice when they have all
+    come back.
+
+    @ivar _expected: The number of datagrams still to be echoed back.
+    @ivar _done: A L{Deferred} to fire when they have, or C{None}.
+    """
+    _expected = 0
+    _done = None
+
+    def send(self, datagrams, batched):
+        """
+        Send some datagrams.
+
+        @param datagrams: C{(data, addr)} pairs.
+        @param batched: Whether to send them with one call to
+            C{writeDatagrams}, or with a call to C{write} for each.
+
+        @return: A L{Deferred} which fires when they have been echoed back.
+        """
+        self._expected += len(datagrams)
+        self._done = defer.Deferred()
+        if batched:
+            self.transport.writeDatagrams(datagrams)
+        else:
+            for data, addr in datagrams:
+                self.transport.write(data, addr)
+        return self._done
+
+
+    def datagramReceived(self, data, addr):
+        self._expected -= 1
+        if self._expected <= 0:
+            done, self._done = self._done, None
+            done.callback(None)
+
+
+
+class UDPEchoBenchmark(Benchmark):
+    """
+    Send bursts of datagrams to a UDP echo server, waiting for each burst to
+    come back before sending the next.
+
+    @ivar burst: The number of datagrams in each burst.
+    @ivar batched: Whether the datagrams are sent and echoed with
+        C{writeDatagrams} and C{datagramsReceived}, or one at a time.
+    """
+
+    def __init__(self, name, burst, batched, iterations):
+        Benchmark.__init__(self, name, iterations)
+        self.burst = burst
+        self.batched = batched
+
+
+    def setUp(self):
+        from twisted.internet import reactor
+        if self.batched:
+            server = _BatchUDPEcho()
+        else:
+            server = _UDPEcho()
+        self.serverPort = reactor.listenUDP(0, server, interface="127.0.0.1")
+        self.client = _UDPEchoClient()
+        self.clientPort = reactor.listenUDP(
+            0, self.client, interface="127.0.0.1")
+        address = ("127.0.0.1", self.serverPort.getHost().port)
+        self.datagrams = [(b"x" * 64, address)] * self.burst
+
+
+    @defer.inlineCallbacks
+    def run(self, iterations):
+        for i in range(iterations):
+            yield self.client.send(self.datagrams, self.batched)
+
+
+    def tearDown(self):
+        return defer.gatherResults([self.serverPort.stopListening(),
+                                    self.clientPort.stopListening()])
+
+
+class _StaticResolver(common.ResolverBase):
+    """
+    Resolve every name to the loopback address.
+    """
+
+    def _lookup(self, name, cls, type, timeout):
+        if type != dns.A:
+            return defer.fail(error.DomainError(name))
+        record = dns.Record_A(b"127.0.0.1", 60)
+        return defer.succeed((
+                [dns.RRHeader(name, dns.A, cls, 60, record, auth=True)],
+                [], []))
+
+
+
+class DNSQueryBenchmark(Benchmark):
+    """
+    Look up an address, one query at a time, using a
+    L{twisted.names.client.Resolver} talking over UDP to a
+    L{twisted.names.server.DNSServerFactory}.
+    """
+
+    def setUp(self):
+        from twisted.internet import reactor
+        factory = server.DNSServerFactory(authorities=[_StaticResolver()])
+        self.port = reactor.listenUDP(
+            0, dns.DNSDatagramProtocol(factory), interface="127.0.0.1")
+        self.resolver = client.Resolver(
+            servers=[("127.0.0.1", self.port.getHost().port)])
+
+
+    @defer.inlineCallbacks
+    def run(self, iterations):
+        lookupAddress = self.resolver.lookupAddress
+        for i in range(iterations):
+            yield lookupAddress(b"example.com")
+
+
+    def tearDown(self):
+        return self.port.stopListening()
+
+
+
+benchmarks = [
+    TCPEchoBenchmark("tcp-echo", 64, 1000),
+    TCPEchoBenchmark("tcp-echo-64k", 2 ** 16, 200),
+    AMPCallBenchmark("amp-call", False, 1000),
+    AMPCallBenchmark("amp-call-concurrent", True, 1000),
+    HTTPGetBenchmark("http-get", 200),
+    DNSQueryBenchmark("dns-query", 500),
+    UDPEchoBenchmark("udp-echo-burst", 32, False, 200),
+    UDPEchoBenchmark("udp-echo-burst-batched", 32, True, 200),
+    ]
@@ -0,0 +1,326 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmarks for the encoding and decoding of L{twisted.names.dns.Message},
+over mixes of the queries and responses an authoritative server handles, for
+an authoritative server answering such queries, for a client querying such a
+server over TCP, and for looking names up in a hosts file.
+"""
+
+from __future__ import division, absolute_import
+
+import os
+import tempfile
+
+from twisted.internet import defer
+from twisted.names import authority, client, dns, hosts, server
+from twisted.benchmarks.runner import Benchmark
+
+
+
+def _record(name, payload, type=None):
+    """
+    Make an authoritative resource record with a TTL of an hour.
+    """
+    payload.ttl = 3600
+    return dns.RRHeader(name, type or payload.TYPE, dns.IN, 3600, payload,
+                        auth=True)
+
+
+
+def _queries():
+    """
+    Make a mix of queries: plain and EDNS, for several record types.
+    """
+    queries = []
+    for (name, type) in [(b'www.example.com', dns.A),
+                         (b'www.example.com', dns.AAAA),
+                         (b'example.com', dns.MX),
+                         (b'missing.example.com', dns.A)]:
+        m = dns.Message(id=1234, recDes=1)
+        m.addQuery(name, type)
+        queries.append(m)
+        queries.append(dns._EDNSMessage(
+                id=1234, recDes=1, queries=[dns.Query(name, type)],
+                maxSize=4096))
+    return queries
+
+
+
+def _responses():
+    """
+    Make a mix of responses: answers with their authority and glue records,
+    a referral, an alias and a name error.
+    """
+    nameservers = [
+        _record(b'example.com', dns.Record_NS(b'ns1.example.com')),
+        _record(b'example.com', dns.Record_NS(b'ns2.example.com'))]
+    glue = [
+        _record(b'ns1.example.com', dns.Record_A('192.0.2.53')),
+        _record(b'ns2.example.com', dns.Record_A('198.51.100.53'))]
+
+    address = dns.Message(id=1234, answer=1, auth=1)
+    address.addQuery(b'www.example.com', dns.A)
+    address.answers = [
+        _record(b'www.example.com', dns.Record_A('192.0.2.%d' % (i,)))
+        for i in range(1, 4)]
+    address.authority = nameservers
+    address.additional = glue
+
+    ipv6 = dns.Message(id=1234, answer=1, auth=1)
+    ipv6.addQuery(b'www.example.com', dns.AAAA)
+    ipv6.answers = [
+        _record(b'www.example.com', dns.Record_AAAA('2001:db8::%d' % (i,)))
+        for i in range(1, 3)]
+    ipv6.authority = nameservers
+
+    mail = dns.Message(id=1234, answer=1, auth=1)
+    mail.addQuery(b'example.com', dns.MX)
+    mail.answers = [
+        _record(b'example.com', dns.Record_MX(10, b'mx1.example.com')),
+        _record(b'example.com', dns.Record_MX(20, b'mx2.example.com'))]
+    mail.additional = [
+        _record(b'mx1.example.com', dns.Record_A('192.0.2.25')),
+        _record(b'mx2.example.com', dns.Record_A('198.51.100.25'))]
+
+    alias = dns.Message(id=1234, answer=1, auth=1)
+    alias.addQuery(b'ftp.example.com', dns.A)
+    alias.answers = [
+        _record(b'ftp.example.com', dns.Record_CNAME(b'files.example.com')),
+        _record(b'files.example.com', dns.Record_A('192.0.2.21'))]
+
+    referral = dns.Message(id=1234, answer=1)
+    referral.addQuery(b'www.sub.example.com', dns.A)
+    referral.authority = [
+        _record(b'sub.example.com', dns.Record_NS(b'ns1.sub.example.com')),
+        _record(b'sub.example.com', dns.Record_NS(b'ns2.sub.example.com'))]
+    referral.additional = [
+        _record(b'ns1.sub.example.com', dns.Record_A('192.0.2.54')),
+        _record(b'ns2.sub.example.com', dns.Record_A('198.51.100.54'))]
+
+    missing = dns.Message(id=1234, answer=1, auth=1, rCode=dns.ENAME)
+    missing.addQuery(b'missing.example.com', dns.A)
+    missing.authority = [
+        _record(b'example.com', dns.Record_SOA(
+                b'ns1.example.com', b'hostmaster.example.com', 2015060101,
+                7200, 3600, 1209600, 300))]
+
+    return [address, ipv6, mail, alias, referral, missing]
+
+
+
+class EncodeBenchmark(Benchmark):
+    """
+    Encode each message of a mix.
+
+    @ivar messages: The messages.
+    """
+
+    def __init__(self, name, messages, iterations):
+        Benchmark.__init__(self, name, iterations)
+        self.messages = messages
+
+
+    def run(self, iterations):
+        messages = self.messages
+        for i in range(iterations):
+            for m in messages:
+                m.toStr()
+
+
+
+class DecodeBenchmark(Benchmark):
+    """
+    Decode each message of a mix, optionally using the payload of every
+    record.
+
+    @ivar encoded: The encoded messages.
+    @ivar inspect: Whether to use the payloads.
+    """
+
+    def __init__(self, name, messages, iterations, inspect=False):
+        Benchmark.__init__(self, name, iterations)
+        self.encoded = [m.toStr() for m in messages]
+        self.inspect = inspect
+
+
+    def run(self, iterations):
+        encoded = self.encoded
+        inspect = self.inspect
+        for i in range(iterations):
+            for data in encoded:
+                m = dns.Message()
+                m.fromStr(data)
+                if inspect:
+                    for section in (m.answers, m.authority, m.additional):
+                        for record in section:
+                            record.payload
+
+
+
+class _ZoneAuthority(authority.FileAuthority):
+    """
+    An authority for a zone given as its SOA record and a L{dict} of records,
+    rather than loaded from a file.
+    """
+
+    def loadFile(self, zone):
+        self.soa, self.records = zone
+
+
+
+class _Protocol(object):
+    """
+    A protocol which encodes the messages written to it, and discards them.
+    """
+
+    def writeMessage(self, message, address):
+        message.toStr()
+
+
+
+def _authority():
+    """
+    Make an authority for C{example.com}, with the records the queries of
+    L{_queries} ask for and a large set of C{TXT} records for
+    C{txt.example.com}.
+    """
+    soa = dns.Record_SOA(b'ns1.example.com', b'hostmaster.example.com',
+                         2015060101, 7200, 3600, 1209600, 300, ttl=3600)
+    zone = {
+        b'example.com': [
+            soa,
+            dns.Record_NS(b'ns1.example.com'),
+            dns.Record_NS(b'ns2.example.com'),
+            dns.Record_MX(10, b'mx1.example.com'),
+            dns.Record_MX(20, b'mx2.example.com')],
+        b'www.example.com': [
+            dns.Record_A('192.0.2.%d' % (i,)) for i in range(1, 4)] + [
+            dns.Record_AAAA('2001:db8::%d' % (i,)) for i in range(1, 3)],
+        b'txt.example.com': [
+            dns.Record_TXT(("v=spf1 %s -all" % (" ".join(
+                            "ip4:198.51.%d.%d" % (i, j) for j in range(12)),)
+                            ).encode("ascii")) for i in range(16)],
+        b'ns1.example.com': [dns.Record_A('192.0.2.53')],
+        b'ns2.example.com': [dns.Record_A('198.51.100.53')],
+        b'mx1.example.com': [dns.Record_A('192.0.2.25')],
+        b'mx2.example.com': [dns.Record_A('198.51.100.25')]}
+    return _ZoneAuthority(((b'example.com', soa), zone))
+
+
+
+class ServeBenchmark(Benchmark):
+    """
+    Handle each query of a mix with an authoritative L{server.DNSServerFactory},
+    from decoding the query to encoding the response.
+
+    @ivar encoded: The encoded queries.
+    """
+
+    def __init__(self, name, messages, iterations):
+        Benchmark.__init__(self, name, iterations)
+        self.encoded = [m.toStr() for m in messages]
+        self.factory = server.DNSServerFactory(authorities=[_authority()])
+
+
+    def run(self, iterations):
+        encoded = self.encoded
+        messageReceived = self.factory.messageReceived
+        protocol = _Protocol()
+        address = ('192.0.2.1', 53)
+        for i in range(iterations):
+            for data in encoded:
+                m = dns.Message()
+                m.fromStr(data)
+                messageReceived(m, protocol, address)
+
+
+
+class TCPQueryBenchmark(Benchmark):
+    """
+    Make queries for large answers over TCP with L{client.Resolver.queryTCP},
+    all at once from a new resolver, as when a burst of UDP responses are
+    truncated, to a L{server.DNSServerFactory} listening on the loopback
+    interface.
+    """
+
+    def setUp(self):
+        from twisted.internet import reactor
+        self.port = reactor.listenTCP(
+            0, server.DNSServerFactory(authorities=[_authority()]),
+            interface='127.0.0.1')
+
+
+    def run(self, iterations):
+        resolver = client.Resolver(
+            servers=[('127.0.0.1', self.port.getHost().port)])
+        query = dns.Query(b'txt.example.com', dns.TXT)
+        d = defer.gatherResults(
+            [resolver.queryTCP([query]) for i in range(iterations)])
+        def cbQueried(result):
+            for protocol in resolver.connections:
+                protocol.transport.loseConnection()
+        return d.addCallback(cbQueried)
+
+
+    def tearDown(self):
+        return self.port.stopListening()
+
+
+
+class HostsBenchmark(Benchmark):
+    """
+    Look up names in a large generated hosts file, with
+    L{hosts.Resolver.lookupAddress} and L{hosts.Resolver.lookupIPV6Address}.
+
+    @ivar lines: The number of lines in the file.
+    """
+
+    def __init__(self, name, lines, iterations):
+        Benchmark.__init__(self, name, iterations)
+        self.lines = lines
+
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        entries = [b"127.0.0.1 localhost", b"::1 localhost ip6-localhost"]
+        for i in range(self.lines):
+            entries.append(
+                ("10.%d.%d.%d host%d.cluster.local host%d # generated" % (
+                        i // 65536, i // 256 % 256, i % 256, i, i)
+                 ).encode("ascii"))
+        os.write(fd, b"\n".join(entries) + b"\n")
+        os.close(fd)
+        self.resolver = hosts.Resolver(self.path)
+        last = self.lines - 1
+        self.names = [b"localhost", b"host%d" % (last // 2,),
+                      b"HOST%d.cluster.local" % (last,)]
+
+
+    def run(self, iterations):
+        resolver = self.resolver
+        names = self.names
+        for i in range(iterations):
+            for name in names:
+                resolver.lookupAddress(name)
+            resolver.lookupIPV6Address(b"localhost")
+            resolver.lookupAddress(b"missing").addErrback(lambda f: None)
+
+
+    def tearDown(self):
+        os.remove(self.path)
+
+
+
+benchmarks = [
+    EncodeBenchmark("encode-queries", _queries(), 500),
+    DecodeBenchmark("decode-queries", _queries(), 500),
+    EncodeBenchmark("encode-responses", _responses(), 200),
+    DecodeBenchmark("decode-responses", _responses(), 200),
+    DecodeBenchmark("decode-responses-inspect", _responses(), 200,
+                    inspect=True),
+    ServeBenchmark("serve-authoritative", _queries(), 200),
+    TCPQueryBenchmark("query-tcp", 200),
+    HostsBenchmark("hosts-lookup", 1000, 20),
+    ]
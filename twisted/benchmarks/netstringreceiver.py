@@ -0,0 +1,161 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmarks for L{twisted.protocols.basic.NetstringReceiver} and the framing
+it shares with L{twisted.protocols.basic.IntNStringReceiver}.
+"""
+
+from __future__ import division, absolute_import
+
+from twisted.protocols import basic
+from twisted.test.proto_helpers import StringTransport
+from twisted.benchmarks.runner import Benchmark
+
+
+
+class CollectingNetstringReceiver(basic.NetstringReceiver):
+    """
+    A L{basic.NetstringReceiver} which keeps every string it receives.
+    """
+
+    def __init__(self):
+        self.strings = []
+        self.stringReceived = self.strings.append
+
+
+
+class LargeNetstringBenchmark(Benchmark):
+    """
+    Deliver one large netstring to a L{basic.NetstringReceiver}, split into
+    chunks of a fixed size.
+
+    @ivar chunkSize: The number of bytes delivered by each call to
+        C{dataReceived}.
+    @ivar numberOfChunks: The number of chunks making up the netstring's
+        data.
+    """
+
+    def __init__(self, chunkSize, numberOfChunks, iterations=1):
+        Benchmark.__init__(
+            self, "large-chunk%d-chunks%d" % (chunkSize, numberOfChunks),
+            iterations)
+        self.chunkSize = chunkSize
+        self.numberOfChunks = numberOfChunks
+
+
+    def run(self, iterations):
+        """
+        Deliver the netstring to a new protocol C{iterations} times.
+        """
+        chunk = b"a" * self.chunkSize
+        dataSize = self.chunkSize * self.numberOfChunks
+        prefix = ("%d:" % (dataSize,)).encode("ascii")
+        for i in range(iterations):
+            proto = CollectingNetstringReceiver()
+            proto.MAX_LENGTH = dataSize
+            proto.makeConnection(None)
+            dataReceived = proto.dataReceived
+            dataReceived(prefix)
+            for j in range(self.numberOfChunks):
+                dataReceived(chunk)
+            dataReceived(b",")
+            if len(proto.strings) != 1:
+                raise RuntimeError("Didn't receive string!")
+
+
+
+class SmallStringsBenchmark(Benchmark):
+    """
+    Deliver many short strings to a string receiving protocol, split into
+    chunks of a fixed size so that most chunks contain several complete
+    strings.
+
+    @ivar protocolClass: The L{basic.NetstringReceiver} or
+        L{basic.IntNStringReceiver} subclass to deliver the strings to.
+    @ivar mode: C{"each"} to receive each string with C{stringReceived},
+        C{"batch"} to receive them with C{stringsReceived} or C{"views"} to
+        receive each one as a C{memoryview}.
+    @ivar chunkSize: The number of bytes delivered by each call to
+        C{dataReceived}.
+    @ivar stringLength: The length of each string.
+    @ivar numberOfStrings: The number of strings delivered.
+    """
+
+    def __init__(self, protocolClass, mode, chunkSize, stringLength,
+                 numberOfStrings, iterations=1):
+        Benchmark.__init__(
+            self, "small-%s-%s-chunk%d-string%d-strings%d" % (
+                protocolClass.__name__, mode, chunkSize, stringLength,
+                numberOfStrings),
+            iterations)
+        self.protocolClass = protocolClass
+        self.mode = mode
+        self.chunkSize = chunkSize
+        self.stringLength = stringLength
+        self.numberOfStrings = numberOfStrings
+
+
+    def setUp(self):
+        """
+        Frame the strings and split them into chunks.
+        """
+        sender = self.protocolClass()
+        transport = StringTransport()
+        sender.makeConnection(transport)
+        string = b"x" * self.stringLength
+        for i in range(self.numberOfStrings):
+            sender.sendString(string)
+        data = transport.value()
+        self.chunks = [data[n:n + self.chunkSize]
+                       for n in range(0, len(data), self.chunkSize)]
+
+
+    def _makeProtocol(self):
+        """
+        Make a protocol which collects what it receives in a list.
+
+        @return: A 2-tuple of the protocol and the list.
+        """
+        proto = self.protocolClass()
+        received = []
+        if self.mode == "batch":
+            proto.stringsReceived = received.extend
+        else:
+            proto.stringReceived = received.append
+            proto.deliverMemoryViews = (self.mode == "views")
+        proto.makeConnection(StringTransport())
+        return proto, received
+
+
+    def run(self, iterations):
+        """
+        Deliver all of the chunks to a new protocol C{iterations} times.
+        """
+        for i in range(iterations):
+            proto, received = self._makeProtocol()
+            dataReceived = proto.dataReceived
+            for chunk in self.chunks:
+                dataReceived(chunk)
+            if len(received) != self.numberOfStrings:
+                raise RuntimeError("Received %d strings, expected %d" % (
+                        len(received), self.numberOfStrings))
+
+
+    def tearDown(self):
+        del self.chunks
+
+
+
+benchmarks = [
+    LargeNetstringBenchmark(1, 4096),
+    LargeNetstringBenchmark(64, 4096),
+    LargeNetstringBenchmark(4096, 256),
+    LargeNetstringBenchmark(65536, 16),
+    ]
+for _protocolClass in (basic.NetstringReceiver, basic.Int32StringReceiver):
+    for _mode in ("each", "batch", "views"):
+        for _chunkSize in (1500, 65536):
+            benchmarks.append(SmallStringsBenchmark(
+                    _protocolClass, _mode, _chunkSize, 20, 5000))
+del _protocolClass, _mode, _chunkSize
@@ -0,0 +1,68 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmarks for resolving names with the reactor's resolver, as clients do
+when they connect to the same few hosts over and over.
+"""
+
+from __future__ import division, absolute_import
+
+from twisted.internet import defer
+from twisted.internet.endpoints import HostnameEndpoint
+from twisted.benchmarks.runner import Benchmark
+
+
+
+class ResolveBenchmark(Benchmark):
+    """
+    Resolve the same name with C{reactor.resolve}, one lookup after another.
+
+    @ivar hostname: The name to resolve.
+    """
+
+    def __init__(self, name, hostname, iterations):
+        Benchmark.__init__(self, name, iterations)
+        self.hostname = hostname
+
+
+    @defer.inlineCallbacks
+    def run(self, iterations):
+        from twisted.internet import reactor
+        for i in range(iterations):
+            yield reactor.resolve(self.hostname)
+
+
+
+class ConcurrentResolveBenchmark(ResolveBenchmark):
+    """
+    Resolve the same name with C{reactor.resolve}, all lookups at once.
+    """
+
+    def run(self, iterations):
+        from twisted.internet import reactor
+        return defer.gatherResults(
+            [reactor.resolve(self.hostname) for i in range(iterations)])
+
+
+
+class AddressInfoBenchmark(ResolveBenchmark):
+    """
+    Resolve the same name as L{HostnameEndpoint} does before connecting, one
+    lookup after another.
+    """
+
+    @defer.inlineCallbacks
+    def run(self, iterations):
+        from twisted.internet import reactor
+        endpoint = HostnameEndpoint(reactor, self.hostname, 80)
+        for i in range(iterations):
+            yield endpoint._nameResolution(self.hostname, 80)
+
+
+
+benchmarks = [
+    ResolveBenchmark("resolve", "localhost", 200),
+    ConcurrentResolveBenchmark("resolve-concurrent", "localhost", 200),
+    AddressInfoBenchmark("getaddrinfo", b"localhost", 200),
+    ]
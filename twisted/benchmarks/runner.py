@@ -0,0 +1,520 @@
+# -*- test-case-name: twisted.benchmarks.test.test_runner -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Find, run and report on the benchmarks in L{twisted.benchmarks}.
+
+A benchmark is run a number of times without being timed, to warm up caches
+and connection pools, and then a number of times while being timed.  The
+median and 99th percentile of the timed runs are reported, optionally written
+out as JSON, and optionally compared against the JSON written by an earlier
+run so that a slowdown can be noticed (and can fail a build).
+"""
+
+from __future__ import division, absolute_import
+
+import fnmatch
+import gc
+import json
+import platform
+import sys
+from timeit import default_timer
+
+from twisted import __version__ as twistedVersion
+from twisted.internet import defer, task
+from twisted.python import usage
+from twisted.python.modules import getModule
+from twisted.python.reflect import qual
+
+__all__ = [
+    "Benchmark", "FunctionBenchmark", "BenchmarkResult", "median",
+    "percentile", "compare", "findBenchmarks", "runBenchmark", "Options",
+    "run", "main",
+    ]
+
+
+
+class Benchmark(object):
+    """
+    A single performance measurement.
+
+    Subclasses implement L{run} to perform some number of operations;
+    L{setUp} and L{tearDown} may be overridden to create and destroy anything
+    the operations need that should not itself be timed, such as a listening
+    port.  Any of the three may return a L{Deferred}.
+
+    @ivar name: The name of this benchmark, unique within its module.
+    @type name: L{str}
+
+    @ivar iterations: The number of operations performed by each call to
+        L{run}.
+    @type iterations: L{int}
+    """
+
+    def __init__(self, name, iterations):
+        self.name = name
+        self.iterations = iterations
+
+
+    def setUp(self):
+        """
+        Prepare to be run.
+        """
+
+
+    def run(self, iterations):
+        """
+        Perform the operation being measured.
+
+        @param iterations: The number of times to perform it.
+        @type iterations: L{int}
+
+        @return: C{None}, or a L{Deferred} which fires when the operations
+            have completed.
+        """
+        raise NotImplementedError("%s did not implement run" % (qual(
+                    self.__class__),))
+
+
+    def tearDown(self):
+        """
+        Clean up after being run.
+        """
+
+
+
+class FunctionBenchmark(Benchmark):
+    """
+    A benchmark which calls a function repeatedly.
+
+    @ivar function: The function to call.
+    @ivar args: The positional arguments to call it with.
+    """
+
+    def __init__(self, function, iterations, args=(), name=None):
+        """
+        @param function: The function to call once per operation.
+
+        @param iterations: The number of operations per run.
+        @type iterations: L{int}
+
+        @param args: The positional arguments to pass to C{function}.
+        @type args: L{tuple}
+
+        @param name: The name of this benchmark.  If not given, the name of
+            C{function}, followed by C{args} if there are any.
+        @type name: L{str}
+        """
+        if name is None:
+            name = function.__name__
+            if args:
+                name += "(%s)" % (", ".join(map(repr, args)),)
+        Benchmark.__init__(self, name, iterations)
+        self.function = function
+        self.args = args
+
+
+    def run(self, iterations):
+        """
+        Call the function C{iterations} times.
+        """
+        function = self.function
+        args = self.args
+        for i in range(iterations):
+            function(*args)
+
+
+
+def median(samples):
+    """
+    Compute the median of some samples.
+
+    @param samples: A non-empty sequence of numbers.
+
+    @return: The middle value of C{samples} once sorted, or the mean of the
+        two middle values if there are an even number of them.
+    """
+    ordered = sorted(samples)
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[middle]
+    return (ordered[middle - 1] + ordered[middle]) / 2
+
+
+
+def percentile(samples, percent):
+    """
+    Compute a percentile of some samples using the nearest-rank method.
+
+    @param samples: A non-empty sequence of numbers.
+
+    @param percent: The percentile to compute, between 0 and 100.
+
+    @return: The smallest value in C{samples} which is at least as large as
+        C{percent} percent of the values in C{samples}.
+    """
+    ordered = sorted(samples)
+    rank = int(-(-percent * len(ordered) // 100))
+    return ordered[max(rank, 1) - 1]
+
+
+
+class BenchmarkResult(object):
+    """
+    The timings collected by running a benchmark.
+
+    @ivar name: The fully qualified name of the benchmark.
+    @type name: L{str}
+
+    @ivar iterations: The number of operations performed by each timed run.
+    @type iterations: L{int}
+
+    @ivar samples: The duration of each timed run, in seconds.
+    @type samples: L{list} of L{float}
+    """
+
+    def __init__(self, name, iterations, samples):
+        self.name = name
+        self.iterations = iterations
+        self.samples = samples
+
+
+    @property
+    def median(self):
+        """
+        The median duration of a timed run, in seconds.
+        """
+        return median(self.samples)
+
+
+    @property
+    def p99(self):
+        """
+        The 99th percentile duration of a timed run, in seconds.
+        """
+        return percentile(self.samples, 99)
+
+
+    @property
+    def operationsPerSecond(self):
+        """
+        The number of operations per second performed by a run of median
+        duration.
+        """
+        if not self.median:
+            return float("inf")
+        return self.iterations / self.median
+
+
+    def asDict(self):
+        """
+        Convert this result to a L{dict} which can be serialized as JSON.
+        """
+        return {
+            "iterations": self.iterations,
+            "samples": self.samples,
+            "median": self.median,
+            "p99": self.p99,
+            "operationsPerSecond": self.operationsPerSecond,
+            }
+
+
+
+def compare(results, baseline):
+    """
+    Compare the median durations of some results to those of a baseline.
+
+    @param results: The results to compare.
+    @type results: iterable of L{BenchmarkResult}
+
+    @param baseline: Results previously written by L{run}, as loaded from
+        JSON.
+    @type baseline: L{dict}
+
+    @return: A mapping from the name of each benchmark present in both
+        C{results} and C{baseline} to the ratio of its median in C{results}
+        to its median in C{baseline}, each adjusted for the number of
+        iterations; a ratio greater than one is a slowdown.
+    @rtype: L{dict}
+    """
+    previous = baseline.get("benchmarks", {})
+    ratios = {}
+    for result in results:
+        if result.name not in previous:
+            continue
+        old = previous[result.name]
+        oldPerOperation = old["median"] / old["iterations"]
+        if not oldPerOperation:
+            continue
+        ratios[result.name] = (
+            (result.median / result.iterations) / oldPerOperation)
+    return ratios
+
+
+
+def findBenchmarks(package="twisted.benchmarks"):
+    """
+    Load every benchmark defined by the modules of a package.
+
+    @param package: The fully qualified name of the package to search.  Each
+        of its modules which has a C{benchmarks} attribute is loaded.
+
+    @return: A L{list} of C{(name, benchmark)} pairs, where C{name} is the
+        name of the module within C{package} joined to the name of the
+        L{Benchmark}.
+    """
+    found = []
+    for module in getModule(package).iterModules():
+        shortName = module.name.rsplit(".", 1)[-1]
+        if module.isPackage() or shortName in ("runner", "__main__"):
+            continue
+        for benchmark in getattr(module.load(), "benchmarks", ()):
+            found.append(("%s.%s" % (shortName, benchmark.name), benchmark))
+    return found
+
+
+
+def _matches(name, patterns):
+    """
+    Determine whether a benchmark was selected on the command line.
+
+    @param name: The fully qualified name of the benchmark.
+
+    @param patterns: C{fnmatch}-style patterns.  A pattern without wildcards
+        also selects every benchmark in the module of that name.
+
+    @return: C{True} if C{patterns} is empty or C{name} matches any of them.
+    """
+    if not patterns:
+        return True
+    for pattern in patterns:
+        if (fnmatch.fnmatchcase(name, pattern) or
+                fnmatch.fnmatchcase(name, pattern + ".*")):
+            return True
+    return False
+
+
+
+@defer.inlineCallbacks
+def runBenchmark(name, benchmark, warmup=1, repeats=10, iterations=None,
+                 collectGarbage=False, timer=default_timer):
+    """
+    Run a benchmark, timing it.
+
+    @param name: The name to give the result.
+    @type name: L{str}
+
+    @param benchmark: The benchmark to run.
+    @type benchmark: L{Benchmark}
+
+    @param warmup: The number of runs to do before timing any.
+    @type warmup: L{int}
+
+    @param repeats: The number of timed runs.
+    @type repeats: L{int}
+
+    @param iterations: The number of operations per run, or C{None} to use
+        the number the benchmark specifies.
+
+    @param collectGarbage: If C{False}, the garbage collector is run before
+        each timed run and disabled during it, to make timings steadier.
+
+    @param timer: A function returning the current time in seconds.
+
+    @return: A L{Deferred} which fires with a L{BenchmarkResult}.
+    """
+    if iterations is None:
+        iterations = benchmark.iterations
+    samples = []
+    yield defer.maybeDeferred(benchmark.setUp)
+    try:
+        for i in range(warmup):
+            yield defer.maybeDeferred(benchmark.run, iterations)
+        for i in range(repeats):
+            gcWasEnabled = gc.isenabled()
+            if not collectGarbage:
+                gc.collect()
+                gc.disable()
+            try:
+                start = timer()
+                yield defer.maybeDeferred(benchmark.run, iterations)
+                samples.append(timer() - start)
+            finally:
+                if gcWasEnabled:
+                    gc.enable()
+    finally:
+        yield defer.maybeDeferred(benchmark.tearDown)
+    defer.returnValue(BenchmarkResult(name, iterations, samples))
+
+
+
+class Options(usage.Options):
+    """
+    Command line options for running benchmarks.
+    """
+    synopsis = "python -m twisted.benchmarks [options] [pattern ...]"
+
+    longdesc = (
+        "Run the benchmarks whose names match any of the given patterns, or "
+        "all of them.  A pattern is either a glob matched against "
+        "module.benchmark names or the name of a module.")
+
+    optParameters = [
+        ["warmup", "w", 1, "Number of untimed runs of each benchmark.", int],
+        ["repeats", "r", 10, "Number of timed runs of each benchmark.", int],
+        ["iterations", "i", None,
+         "Operations per run, overriding each benchmark's own number.", int],
+        ["json", "j", None,
+         "Write the results as JSON to this file ('-' for standard out)."],
+        ["baseline", "b", None,
+         "Compare to results previously written with --json."],
+        ["tolerance", "t", 0.1,
+         "Fraction by which a median may slow down relative to the "
+         "baseline before it is reported as a regression.", float],
+        ]
+
+    optFlags = [
+        ["list", "l", "List the selected benchmarks without running them."],
+        ["gc", None, "Leave the garbage collector enabled while timing."],
+        ]
+
+
+    def parseArgs(self, *patterns):
+        self["patterns"] = patterns
+
+
+    def postOptions(self):
+        if self["repeats"] < 1:
+            raise usage.UsageError("--repeats must be at least 1")
+        if self["warmup"] < 0:
+            raise usage.UsageError("--warmup must not be negative")
+
+
+
+def _environment():
+    """
+    Describe what the benchmarks are being run with.
+
+    @return: A L{dict} which can be serialized as JSON.
+    """
+    from twisted.internet import reactor
+    return {
+        "twisted": twistedVersion,
+        "python": "%s %s" % (platform.python_implementation(),
+                             platform.python_version()),
+        "platform": platform.platform(),
+        "reactor": qual(reactor.__class__),
+        }
+
+
+
+@defer.inlineCallbacks
+def run(options, out, benchmarks=None, err=None):
+    """
+    Run benchmarks and report on them as directed by command line options.
+
+    @param options: The parsed command line.
+    @type options: L{Options}
+
+    @param out: The file to write the report to.
+
+    @param benchmarks: C{(name, benchmark)} pairs to select from, or C{None}
+        for all of those returned by L{findBenchmarks}.
+
+    @param err: The file to write the table of results to instead of
+        C{out} when the JSON document is written to C{out}, so that C{out}
+        holds nothing else, or C{None} for L{sys.stderr}.
+
+    @return: A L{Deferred} which fires with a L{list} of the names of the
+        benchmarks that regressed relative to the baseline, after the
+        results have been reported.
+    """
+    if benchmarks is None:
+        benchmarks = findBenchmarks()
+    selected = [(name, benchmark) for (name, benchmark) in benchmarks
+                if _matches(name, options["patterns"])]
+
+    if options["list"]:
+        for name, benchmark in selected:
+            out.write("%s\n" % (name,))
+        defer.returnValue([])
+
+    baseline = None
+    if options["baseline"] is not None:
+        with open(options["baseline"]) as baselineFile:
+            baseline = json.load(baselineFile)
+
+    table = out
+    if options["json"] == "-":
+        table = err
+        if table is None:
+            table = sys.stderr
+
+    table.write("%-56s %12s %12s %14s\n" % (
+            "benchmark", "median (s)", "p99 (s)", "ops/s"))
+    results = []
+    regressions = []
+    for name, benchmark in selected:
+        result = yield runBenchmark(
+            name, benchmark, warmup=options["warmup"],
+            repeats=options["repeats"], iterations=options["iterations"],
+            collectGarbage=options["gc"])
+        results.append(result)
+        line = "%-56s %12.6f %12.6f %14.1f" % (
+            name, result.median, result.p99, result.operationsPerSecond)
+        if baseline is not None:
+            ratio = compare([result], baseline).get(name)
+            if ratio is not None:
+                line += " %+7.1f%%" % ((ratio - 1) * 100,)
+                if ratio > 1 + options["tolerance"]:
+                    line += " REGRESSION"
+                    regressions.append(name)
+        table.write(line + "\n")
+
+    if options["json"] is not None:
+        document = {
+            "environment": _environment(),
+            "benchmarks": dict(
+                (result.name, result.asDict()) for result in results),
+            }
+        serialized = json.dumps(document, indent=2, sort_keys=True)
+        if options["json"] == "-":
+            out.write(serialized + "\n")
+        else:
+            with open(options["json"], "w") as jsonFile:
+                jsonFile.write(serialized + "\n")
+
+    if regressions:
+        table.write("%d benchmark(s) regressed by more than %d%%: %s\n" % (
+                len(regressions), options["tolerance"] * 100,
+                ", ".join(regressions)))
+    defer.returnValue(regressions)
+
+
+
+def main(argv, out=sys.stdout):
+    """
+    Parse a command line and run the selected benchmarks, exiting with
+    status 1 if any of them regressed relative to the baseline.
+
+    @param argv: The command line arguments, excluding the program name.
+    @type argv: L{list} of L{str}
+
+    @param out: The file to write the report to.
+    """
+    options = Options()
+    try:
+        options.parseOptions(argv)
+    except usage.UsageError as e:
+        sys.stderr.write("%s\n%s\n" % (options, e))
+        raise SystemExit(2)
+
+    def benchmark(reactor):
+        d = run(options, out)
+        def exit(regressions):
+            if regressions:
+                raise SystemExit(1)
+        return d.addCallback(exit)
+
+    task.react(benchmark)
@@ -1,13 +1,18 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
 
 """
 Benchmarks for L{twisted.internet.task}.
 """
 
-from timer import timeit
+from __future__ import division, absolute_import
 
 from twisted.internet import task
+from twisted.benchmarks.runner import FunctionBenchmark
 
-def test_performance():
+
+
+def loopingCallLargeAdvance():
     """
     L{LoopingCall} should not take long to skip a lot of iterations.
     """
@@ -19,8 +24,7 @@ def test_performance():
     clock.advance(1000000)
 
 
-def main():
-    print "LoopingCall large advance takes", timeit(test_performance, iter=1)
 
-if __name__ == '__main__':
-    main()
+benchmarks = [
+    FunctionBenchmark(loopingCallLargeAdvance, 1),
+    ]
@@ -0,0 +1,480 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Tests for L{twisted.benchmarks.runner}.
+"""
+
+from __future__ import division, absolute_import
+
+import gc
+import json
+
+from twisted.internet import defer
+from twisted.python.compat import NativeStringIO
+from twisted.python.usage import UsageError
+from twisted.trial.unittest import SynchronousTestCase, TestCase
+
+from twisted.benchmarks import runner
+
+
+
+class RecordingBenchmark(runner.Benchmark):
+    """
+    A benchmark which records what is done with it.
+
+    @ivar events: A L{list} of C{"setUp"}, C{("run", iterations)} and
+        C{"tearDown"}.
+    """
+
+    def __init__(self, name="recording", iterations=3, failRun=False):
+        runner.Benchmark.__init__(self, name, iterations)
+        self.events = []
+        self.failRun = failRun
+
+
+    def setUp(self):
+        self.events.append("setUp")
+
+
+    def run(self, iterations):
+        self.events.append(("run", iterations))
+        if self.failRun:
+            raise ZeroDivisionError()
+
+
+    def tearDown(self):
+        self.events.append("tearDown")
+
+
+
+class FakeTimer(object):
+    """
+    A timer which advances by a different amount each time it is read.
+
+    @ivar steps: The amounts to advance by, used cyclically.
+    """
+
+    def __init__(self, steps):
+        self.steps = steps
+        self.now = 0.0
+        self.reads = 0
+
+
+    def __call__(self):
+        self.now += self.steps[self.reads % len(self.steps)]
+        self.reads += 1
+        return self.now
+
+
+
+class StatisticsTests(SynchronousTestCase):
+    """
+    Tests for L{runner.median} and L{runner.percentile}.
+    """
+
+    def test_medianOdd(self):
+        """
+        The median of an odd number of samples is the middle one.
+        """
+        self.assertEqual(runner.median([5, 1, 3]), 3)
+
+
+    def test_medianEven(self):
+        """
+        The median of an even number of samples is the mean of the middle
+        two.
+        """
+        self.assertEqual(runner.median([4, 1, 3, 2]), 2.5)
+
+
+    def test_percentile(self):
+        """
+        L{runner.percentile} uses the nearest-rank method.
+        """
+        samples = list(range(1, 101))
+        self.assertEqual(runner.percentile(samples, 99), 99)
+        self.assertEqual(runner.percentile(samples, 50), 50)
+        self.assertEqual(runner.percentile(samples, 100), 100)
+        self.assertEqual(runner.percentile(samples, 0), 1)
+
+
+    def test_percentileFewSamples(self):
+        """
+        With fewer than 100 samples, the 99th percentile is the largest.
+        """
+        self.assertEqual(runner.percentile([3, 1, 2], 99), 3)
+
+
+
+class BenchmarkTests(SynchronousTestCase):
+    """
+    Tests for L{runner.Benchmark} and L{runner.FunctionBenchmark}.
+    """
+
+    def test_runNotImplemented(self):
+        """
+        L{runner.Benchmark.run} must be overridden.
+        """
+        self.assertRaises(
+            NotImplementedError, runner.Benchmark("x", 1).run, 1)
+
+
+    def test_functionName(self):
+        """
+        A L{runner.FunctionBenchmark} is named after its function and
+        arguments unless given a name.
+        """
+        def f(*args):
+            pass
+        self.assertEqual(runner.FunctionBenchmark(f, 1).name, "f")
+        self.assertEqual(
+            runner.FunctionBenchmark(f, 1, (10, "a")).name, "f(10, 'a')")
+        self.assertEqual(
+            runner.FunctionBenchmark(f, 1, (10,), name="g").name, "g")
+
+
+    def test_functionRun(self):
+        """
+        L{runner.FunctionBenchmark.run} calls the function with its arguments
+        the given number of times.
+        """
+        calls = []
+        benchmark = runner.FunctionBenchmark(calls.append, 100, ("x",))
+        benchmark.run(3)
+        self.assertEqual(calls, ["x", "x", "x"])
+
+
+
+class BenchmarkResultTests(SynchronousTestCase):
+    """
+    Tests for L{runner.BenchmarkResult}.
+    """
+
+    def test_statistics(self):
+        """
+        A L{runner.BenchmarkResult} summarizes its samples.
+        """
+        result = runner.BenchmarkResult("x", 10, [2.0, 1.0, 4.0])
+        self.assertEqual(result.median, 2.0)
+        self.assertEqual(result.p99, 4.0)
+        self.assertEqual(result.operationsPerSecond, 5.0)
+
+
+    def test_asDict(self):
+        """
+        L{runner.BenchmarkResult.asDict} includes the samples and the
+        statistics computed from them.
+        """
+        result = runner.BenchmarkResult("x", 10, [2.0, 1.0, 4.0])
+        self.assertEqual(result.asDict(), {
+                "iterations": 10,
+                "samples": [2.0, 1.0, 4.0],
+                "median": 2.0,
+                "p99": 4.0,
+                "operationsPerSecond": 5.0,
+                })
+
+
+    def test_compare(self):
+        """
+        L{runner.compare} computes the ratio of the time per operation of each
+        result to that of the baseline, ignoring benchmarks missing from
+        either.
+        """
+        baseline = {"benchmarks": {
+                "a": {"median": 1.0, "iterations": 10},
+                "b": {"median": 4.0, "iterations": 10},
+                "c": {"median": 1.0, "iterations": 10},
+                }}
+        results = [
+            runner.BenchmarkResult("a", 10, [2.0]),
+            runner.BenchmarkResult("b", 20, [4.0]),
+            runner.BenchmarkResult("d", 10, [1.0]),
+            ]
+        self.assertEqual(
+            runner.compare(results, baseline), {"a": 2.0, "b": 0.5})
+
+
+
+class FindBenchmarksTests(SynchronousTestCase):
+    """
+    Tests for L{runner.findBenchmarks}.
+    """
+
+    def test_find(self):
+        """
+        L{runner.findBenchmarks} returns the benchmarks of every module in the
+        package, named after the module.
+        """
+        names = [name for (name, benchmark) in runner.findBenchmarks()]
+        self.assertIn("deferreds.instantiate", names)
+        self.assertIn("loopback.tcp-echo", names)
+        self.assertEqual(len(names), len(set(names)))
+        self.assertFalse([name for name in names
+                          if name.startswith(("runner.", "test."))])
+
+
+    def test_matches(self):
+        """
+        A benchmark is selected if no patterns are given, if its name matches
+        a glob, or if a pattern names its module.
+        """
+        self.assertTrue(runner._matches("a.b", ()))
+        self.assertTrue(runner._matches("a.b", ("a",)))
+        self.assertTrue(runner._matches("a.bc", ("*.b*",)))
+        self.assertTrue(runner._matches("a.b", ("c", "a.b")))
+        self.assertFalse(runner._matches("a.b", ("b",)))
+        self.assertFalse(runner._matches("ab.c", ("a",)))
+
+
+
+class RunBenchmarkTests(SynchronousTestCase):
+    """
+    Tests for L{runner.runBenchmark}.
+    """
+
+    def test_warmupAndRepeats(self):
+        """
+        L{runner.runBenchmark} sets the benchmark up, runs it the given number
+        of warm-up and timed times, and tears it down.
+        """
+        benchmark = RecordingBenchmark()
+        self.successResultOf(runner.runBenchmark(
+                "x", benchmark, warmup=2, repeats=3))
+        self.assertEqual(
+            benchmark.events,
+            ["setUp"] + [("run", 3)] * 5 + ["tearDown"])
+
+
+    def test_samples(self):
+        """
+        The result of L{runner.runBenchmark} has the duration of each timed
+        run.
+        """
+        timer = FakeTimer([1.0, 2.0, 1.0, 5.0])
+        result = self.successResultOf(runner.runBenchmark(
+                "x", RecordingBenchmark(), warmup=1, repeats=2, timer=timer))
+        self.assertEqual(result.name, "x")
+        self.assertEqual(result.iterations, 3)
+        self.assertEqual(result.samples, [2.0, 5.0])
+
+
+    def test_iterations(self):
+        """
+        The number of iterations a benchmark specifies may be overridden.
+        """
+        benchmark = RecordingBenchmark()
+        result = self.successResultOf(runner.runBenchmark(
+                "x", benchmark, warmup=0, repeats=1, iterations=7))
+        self.assertEqual(benchmark.events[1], ("run", 7))
+        self.assertEqual(result.iterations, 7)
+
+
+    def test_asynchronous(self):
+        """
+        If the benchmark returns a L{Deferred} from C{run}, the run is timed
+        until it fires.
+        """
+        timer = FakeTimer([1.0])
+        pending = []
+        benchmark = RecordingBenchmark()
+        def run(iterations):
+            pending.append(defer.Deferred())
+            return pending[-1]
+        benchmark.run = run
+        d = runner.runBenchmark("x", benchmark, warmup=0, repeats=1,
+                                timer=timer)
+        self.assertNoResult(d)
+        timer()
+        pending[0].callback(None)
+        self.assertEqual(self.successResultOf(d).samples, [2.0])
+
+
+    def test_tearDownAfterFailure(self):
+        """
+        If the benchmark fails, it is still torn down and the failure is
+        reported.
+        """
+        benchmark = RecordingBenchmark(failRun=True)
+        self.failureResultOf(
+            runner.runBenchmark("x", benchmark), ZeroDivisionError)
+        self.assertEqual(benchmark.events[-1], "tearDown")
+
+
+    def test_garbageCollectorDisabled(self):
+        """
+        The garbage collector is disabled during timed runs unless
+        C{collectGarbage} is C{True}, and is left as it was afterwards.
+        """
+        enabled = []
+        benchmark = RecordingBenchmark()
+        benchmark.run = lambda iterations: enabled.append(gc.isenabled())
+        self.assertTrue(gc.isenabled())
+        self.successResultOf(runner.runBenchmark(
+                "x", benchmark, warmup=0, repeats=1))
+        self.successResultOf(runner.runBenchmark(
+                "x", benchmark, warmup=0, repeats=1, collectGarbage=True))
+        self.assertEqual(enabled, [False, True])
+        self.assertTrue(gc.isenabled())
+
+
+
+class OptionsTests(SynchronousTestCase):
+    """
+    Tests for L{runner.Options}.
+    """
+
+    def test_defaults(self):
+        """
+        With no arguments, every benchmark is run once to warm up and ten
+        times timed.
+        """
+        options = runner.Options()
+        options.parseOptions([])
+        self.assertEqual(options["patterns"], ())
+        self.assertEqual(options["warmup"], 1)
+        self.assertEqual(options["repeats"], 10)
+        self.assertEqual(options["iterations"], None)
+        self.assertEqual(options["tolerance"], 0.1)
+
+
+    def test_arguments(self):
+        """
+        Numeric options are converted, and positional arguments are patterns.
+        """
+        options = runner.Options()
+        options.parseOptions(
+            ["--repeats", "3", "-i", "5", "-t", "0.5", "deferreds", "a.*"])
+        self.assertEqual(options["repeats"], 3)
+        self.assertEqual(options["iterations"], 5)
+        self.assertEqual(options["tolerance"], 0.5)
+        self.assertEqual(options["patterns"], ("deferreds", "a.*"))
+
+
+    def test_noRepeats(self):
+        """
+        At least one timed run is required.
+        """
+        self.assertRaises(
+            UsageError, runner.Options().parseOptions, ["--repeats", "0"])
+
+
+
+class RunTests(SynchronousTestCase):
+    """
+    Tests for L{runner.run}.
+    """
+
+    def setUp(self):
+        self.benchmarks = [
+            ("mod.first", RecordingBenchmark("first")),
+            ("mod.second", RecordingBenchmark("second")),
+            ("other.third", RecordingBenchmark("third")),
+            ]
+        self.out = NativeStringIO()
+
+
+    def runWith(self, *argv):
+        """
+        Parse the given arguments and run the benchmarks.
+
+        @return: The result of L{runner.run}.
+        """
+        options = runner.Options()
+        options.parseOptions(argv)
+        return self.successResultOf(
+            runner.run(options, self.out, self.benchmarks))
+
+
+    def test_list(self):
+        """
+        With C{--list}, the names of the selected benchmarks are written and
+        none are run.
+        """
+        self.runWith("--list", "mod")
+        self.assertEqual(self.out.getvalue(), "mod.first\nmod.second\n")
+        self.assertEqual(self.benchmarks[0][1].events, [])
+
+
+    def test_report(self):
+        """
+        A line is written for each selected benchmark.
+        """
+        self.assertEqual(self.runWith("-r", "2", "*.third"), [])
+        lines = self.out.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith("other.third "))
+        self.assertEqual(self.benchmarks[0][1].events, [])
+        self.assertEqual(len(self.benchmarks[2][1].events), 5)
+
+
+    def test_json(self):
+        """
+        With C{--json}, the results are written as JSON, along with a
+        description of the environment they were collected in.
+        """
+        path = self.mktemp()
+        self.runWith("--json", path, "-r", "3")
+        with open(path) as f:
+            document = json.load(f)
+        self.assertEqual(
+            sorted(document["benchmarks"]),
+            ["mod.first", "mod.second", "other.third"])
+        self.assertEqual(
+            len(document["benchmarks"]["mod.first"]["samples"]), 3)
+        self.assertIn("reactor", document["environment"])
+
+
+    def test_jsonStandardOutput(self):
+        """
+        With C{--json -}, the JSON document is all that is written to the
+        output, and the table of results is written to the error file
+        instead.
+        """
+        options = runner.Options()
+        options.parseOptions(["--json", "-", "-r", "3"])
+        err = NativeStringIO()
+        self.successResultOf(
+            runner.run(options, self.out, self.benchmarks, err))
+        document = json.loads(self.out.getvalue())
+        self.assertEqual(
+            sorted(document["benchmarks"]),
+            ["mod.first", "mod.second", "other.third"])
+        self.assertEqual(len(err.getvalue().splitlines()), 4)
+
+
+    def test_baseline(self):
+        """
+        With C{--baseline}, each result is compared to the baseline, and the
+        names of those which slowed down by more than the tolerance are
+        returned and reported.
+        """
+        path = self.mktemp()
+        with open(path, "w") as f:
+            json.dump({"benchmarks": {
+                        "mod.first": {"median": 1e-9, "iterations": 3},
+                        "mod.second": {"median": 1000.0, "iterations": 3},
+                        }}, f)
+        self.assertEqual(self.runWith("--baseline", path), ["mod.first"])
+        output = self.out.getvalue()
+        self.assertIn("REGRESSION", output)
+        self.assertIn("regressed", output)
+        self.assertEqual(output.count("REGRESSION"), 1)
+
+
+
+class BenchmarksTests(TestCase):
+    """
+    Every benchmark in L{twisted.benchmarks} can be run.
+    """
+
+    @defer.inlineCallbacks
+    def test_runAll(self):
+        """
+        Each benchmark runs to completion when run once, with one iteration.
+        """
+        for name, benchmark in runner.findBenchmarks():
+            result = yield runner.runBenchmark(
+                name, benchmark, warmup=0, repeats=1, iterations=1)
+            self.assertEqual(len(result.samples), 1)
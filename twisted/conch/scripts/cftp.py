@@ -28,7 +28,7 @@ class ClientOptions(options.ConchOptions):
     optParameters = [
                     ['buffersize', 'B', 32768, 'Size of the buffer to use for sending/receiving.'],
                     ['batchfile', 'b', None, 'File to read commands from, or \'-\' for stdin.'],
-                    ['requests', 'R', 5, 'Number of requests to make before waiting for a reply.'],
+                    ['requests', 'R', 5, 'Number of requests to make before waiting for a reply, at first; adjusted to the round trip time.'],
                     ['subsystem', 's', 'sftp', 'Subsystem/server program to connect to.']]
 
     compData = usage.Completions(
@@ -124,6 +124,18 @@ class FileWrapper:
     def __getattr__(self, attr):
         return getattr(self.f, attr)
 
+class _TransformingWriter:
+    """
+    Write to a file, passing the data through a function first.
+    """
+
+    def __init__(self, f, transform):
+        self.f = f
+        self.transform = transform
+
+    def write(self, data):
+        self.f.write(self.transform(data))
+
 class StdioClient(basic.LineReceiver):
 
     _pwd = pwd
@@ -334,64 +346,31 @@ class StdioClient(basic.LineReceiver):
             lf.close()
             return "Can't get non-regular file: %s" % rf.name
         rf.size = attrs['size']
-        bufferSize = self.client.transport.conn.options['buffersize']
-        numRequests = self.client.transport.conn.options['requests']
         rf.total = 0.0
-        dList = []
-        chunks = []
         startTime = self.reactor.seconds()
-        for i in range(numRequests):
-            d = self._cbGetRead('', rf, lf, chunks, 0, bufferSize, startTime)
-            dList.append(d)
-        dl = defer.DeferredList(dList, fireOnOneErrback=1)
-        dl.addCallback(self._cbGetDone, rf, lf)
-        return dl
-
-    def _getNextChunk(self, chunks):
-        end = 0
-        for chunk in chunks:
-            if end == 'eof':
-                return # nothing more to get
-            if end != chunk[0]:
-                i = chunks.index(chunk)
-                chunks.insert(i, (end, chunk[0]))
-                return (end, chunk[0] - end)
-            end = chunk[1]
-        bufSize = int(self.client.transport.conn.options['buffersize'])
-        chunks.append((end, end + bufSize))
-        return (end, bufSize)
-
-    def _cbGetRead(self, data, rf, lf, chunks, start, size, startTime):
-        if data and isinstance(data, failure.Failure):
-            log.msg('get read err: %s' % data)
-            reason = data
-            reason.trap(EOFError)
-            i = chunks.index((start, start + size))
-            del chunks[i]
-            chunks.insert(i, (start, 'eof'))
-        elif data:
-            log.msg('get read data: %i' % len(data))
-            lf.seek(start)
-            lf.write(data)
-            if len(data) != size:
-                log.msg('got less than we asked for: %i < %i' %
-                        (len(data), size))
-                i = chunks.index((start, start + size))
-                del chunks[i]
-                chunks.insert(i, (start, start + len(data)))
+        def progress(data):
             rf.total += len(data)
-        if self.useProgressBar:
-            self._printProgressBar(rf, startTime)
-        chunk = self._getNextChunk(chunks)
-        if not chunk:
-            return
-        else:
-            start, length = chunk
-        log.msg('asking for %i -> %i' % (start, start+length))
-        d = rf.readChunk(start, length)
-        d.addBoth(self._cbGetRead, rf, lf, chunks, start, length, startTime)
+            if self.useProgressBar:
+                self._printProgressBar(rf, startTime)
+            return data
+        chunkSize, window = self._transferParameters()
+        download = filetransfer._PipelinedDownload(
+            rf, _TransformingWriter(lf, progress), chunkSize, window)
+        d = download.start()
+        d.addCallback(self._cbGetDone, rf, lf)
         return d
 
+    def _transferParameters(self):
+        """
+        Get the chunk size and request window for a pipelined transfer from
+        the buffer size and number of requests given on the command line.
+        """
+        options = self.client.transport.conn.options
+        requests = int(options['requests'])
+        window = filetransfer._RequestWindow(
+            self.reactor, initial=requests, maximum=max(requests, 64))
+        return int(options['buffersize']), window
+
     def _cbGetDone(self, ignored, rf, lf):
         log.msg('get done')
         rf.close()
@@ -460,34 +439,23 @@ class StdioClient(basic.LineReceiver):
         return d
 
     def _cbPutOpenFile(self, rf, lf):
-        numRequests = self.client.transport.conn.options['requests']
+        transform = None
         if self.useProgressBar:
             lf = FileWrapper(lf)
-        dList = []
-        chunks = []
-        startTime = self.reactor.seconds()
-        for i in range(numRequests):
-            d = self._cbPutWrite(None, rf, lf, chunks, startTime)
-            if d:
-                dList.append(d)
-        dl = defer.DeferredList(dList, fireOnOneErrback=1)
-        dl.addCallback(self._cbPutDone, rf, lf)
-        return dl
-
-    def _cbPutWrite(self, ignored, rf, lf, chunks, startTime):
-        chunk = self._getNextChunk(chunks)
-        start, size = chunk
-        lf.seek(start)
-        data = lf.read(size)
-        if self.useProgressBar:
-            lf.total += len(data)
-            self._printProgressBar(lf, startTime)
-        if data:
-            d = rf.writeChunk(start, data)
-            d.addCallback(self._cbPutWrite, rf, lf, chunks, startTime)
-            return d
-        else:
-            return
+            lf.seek(0)
+            startTime = self.reactor.seconds()
+            def transform(data):
+                lf.total += len(data)
+                self._printProgressBar(lf, startTime)
+                return data
+        chunkSize, window = self._transferParameters()
+        upload = filetransfer._PipelinedUpload(rf, chunkSize, window)
+        sender = basic.FileSender()
+        sender.CHUNK_SIZE = chunkSize
+        sender.beginFileTransfer(lf, upload, transform).addErrback(_ignore)
+        d = upload.deferred
+        d.addCallback(self._cbPutDone, rf, lf)
+        return d
 
     def _cbPutDone(self, ignored, rf, lf):
         lf.close()
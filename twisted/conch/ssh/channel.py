@@ -48,9 +48,28 @@ class SSHChannel(log.Logger):
     @type localClosed: C{bool}
     @ivar remoteClosed: True if the other size isn't accepting more data.
     @type remoteClosed: C{bool}
+    @ivar coalesceWrites: if true, writes smaller than C{remoteMaxPacket} are
+        held until the end of the current reactor iteration (or until they
+        fill a packet) and sent together, in as few packets as possible.
+    @type coalesceWrites: C{bool}
+    @ivar maxLocalWindowSize: if not C{None}, the local window is grown, up
+        to this many bytes, when the other side has to wait for window
+        adjustments (see L{SSHConnection.ssh_CHANNEL_DATA}).
+    @type maxLocalWindowSize: C{int}
+    @ivar clock: the L{IReactorTime} provider used to schedule coalesced
+        writes and to time the local window, or C{None} for the global
+        reactor.
     """
 
     name = None # only needed for client channels
+    coalesceWrites = False
+    maxLocalWindowSize = None
+    clock = None
+
+    _pendingWrites = None
+    _pendingSize = 0
+    _flushCall = None
+    _windowSample = None
 
     def __init__(self, localWindow = 0, localMaxPacket = 0,
                        remoteWindow = 0, remoteMaxPacket = 0,
@@ -113,7 +132,7 @@ class SSHChannel(log.Logger):
         if self.buf:
             b = self.buf
             self.buf = ''
-            self.write(b)
+            self._writeNow(b)
         if self.extBuf:
             b = self.extBuf
             self.extBuf = []
@@ -175,6 +194,15 @@ class SSHChannel(log.Logger):
         """
         log.msg('closed')
 
+    def _getClock(self):
+        """
+        Get the L{IReactorTime} provider for this channel.
+        """
+        if self.clock is None:
+            from twisted.internet import reactor
+            return reactor
+        return self.clock
+
     # transport stuff
     def write(self, data):
         """
@@ -182,11 +210,68 @@ class SSHChannel(log.Logger):
         available, buffer until it is.  Otherwise, split the data into
         packets of length remoteMaxPacket and send them.
 
+        If L{coalesceWrites} is true, small writes are sent together later
+        in the same reactor iteration.
+
         @type data: C{str}
         """
         if self.buf:
             self.buf += data
             return
+        if self.coalesceWrites and len(data) < self.remoteMaxPacket:
+            if self._pendingWrites is None:
+                self._pendingWrites = []
+            self._pendingWrites.append(data)
+            self._pendingSize += len(data)
+            if self._pendingSize >= self.remoteMaxPacket:
+                self._flushWrites()
+            elif self._flushCall is None:
+                self._flushCall = self._getClock().callLater(
+                    0, self._flushWrites)
+            return
+        if self._pendingWrites:
+            self._pendingWrites.append(data)
+            self._flushWrites()
+        else:
+            self._writeNow(data)
+
+    def _flushWrites(self):
+        """
+        Send the writes held by L{write}, if there are any.  This is called
+        before anything else is sent on the channel, so that it is not sent
+        ahead of them.
+        """
+        if self._flushCall is not None:
+            if self._flushCall.active():
+                self._flushCall.cancel()
+            self._flushCall = None
+        if self._pendingWrites:
+            data = ''.join(self._pendingWrites)
+            self._pendingWrites = []
+            self._pendingSize = 0
+            if self.buf:
+                self.buf += data
+            else:
+                self._writeNow(data)
+
+    def _discardWrites(self):
+        """
+        Drop the writes held by L{write}, because the channel has closed.
+        """
+        if self._flushCall is not None:
+            if self._flushCall.active():
+                self._flushCall.cancel()
+            self._flushCall = None
+        self._pendingWrites = None
+        self._pendingSize = 0
+
+    def _writeNow(self, data):
+        """
+        Send as much data as the remote window allows, in packets of at most
+        C{remoteMaxPacket} bytes, and buffer the rest.
+
+        @type data: C{str}
+        """
         top = len(data)
         if top > self.remoteWindowLeft:
             data, self.buf = (data[:self.remoteWindowLeft],
@@ -212,6 +297,7 @@ class SSHChannel(log.Logger):
         @type dataType: C{int}
         @type data:     C{str}
         """
+        self._flushWrites()
         if self.extBuf:
             if self.extBuf[-1][0] == dataType:
                 self.extBuf[-1][1] += data
@@ -249,6 +335,7 @@ class SSHChannel(log.Logger):
         request and return.
         """
         self.closing = 1
+        self._flushWrites()
         if not self.buf and not self.extBuf:
             self.conn.sendClose(self)
 
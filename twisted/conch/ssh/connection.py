@@ -38,6 +38,11 @@ class SSHConnection(service.SSHService):
     """
     name = 'ssh-connection'
 
+    # The shortest time, in seconds, over which a sending rate is measured
+    # when tuning a channel's window, so that data which arrives all at once
+    # does not give an infinite rate.
+    minimumWindowSampleTime = 0.001
+
     def __init__(self):
         self.localChannelID = 0 # this is the current # to use for channel ID
         self.localToRemoteChannel = {} # local channel ID -> remote channel ID
@@ -233,12 +238,7 @@ class SSHConnection(service.SSHService):
             return
             #packet = packet[:channel.localWindowLeft+4]
         data = common.getNS(packet[4:])[0]
-        channel.localWindowLeft -= dataLength
-        if channel.localWindowLeft < channel.localWindowSize // 2:
-            self.adjustWindow(channel, channel.localWindowSize - \
-                                       channel.localWindowLeft)
-            #log.msg('local window left: %s/%s' % (channel.localWindowLeft,
-            #                                    channel.localWindowSize))
+        self._consumeLocalWindow(channel, dataLength)
         log.callWithLogger(channel, channel.dataReceived, data)
 
     def ssh_CHANNEL_EXTENDED_DATA(self, packet):
@@ -262,11 +262,68 @@ class SSHConnection(service.SSHService):
             self.sendClose(channel)
             return
         data = common.getNS(packet[8:])[0]
+        self._consumeLocalWindow(channel, dataLength)
+        log.callWithLogger(channel, channel.extReceived, typeCode, data)
+
+    def _consumeLocalWindow(self, channel, dataLength):
+        """
+        Take data received on a channel out of its local window, and adjust
+        the window once less than half of it is left, rather than after every
+        packet.
+
+        If the channel has a C{maxLocalWindowSize}, the window is also tuned
+        to the bandwidth-delay product of the connection.  After each
+        adjustment, the time taken to receive what the other side was still
+        allowed to send gives the rate it can send at, and the time until
+        data sent under the new window arrives gives the round trip time.
+        If a window of twice their product is bigger than the current one,
+        the other side must have stopped to wait for the adjustment, so the
+        window is doubled, up to C{maxLocalWindowSize}.
+
+        @type channel:      subclass of L{SSHChannel}
+        @type dataLength:   C{int}
+        """
+        tune = channel.maxLocalWindowSize is not None
+        if tune and channel._windowSample is not None:
+            self._sampleLocalWindow(channel, dataLength)
         channel.localWindowLeft -= dataLength
         if channel.localWindowLeft < channel.localWindowSize // 2:
+            allowance = channel.localWindowLeft
             self.adjustWindow(channel, channel.localWindowSize -
                                        channel.localWindowLeft)
-        log.callWithLogger(channel, channel.extReceived, typeCode, data)
+            if tune:
+                now = channel._getClock().seconds()
+                channel._windowSample = [now, allowance, allowance, None]
+
+    def _sampleLocalWindow(self, channel, dataLength):
+        """
+        Measure the other side's sending rate and the round trip time after
+        a window adjustment, and grow the window if it is too small for
+        them.  See L{_consumeLocalWindow}.
+
+        @type channel:      subclass of L{SSHChannel}
+        @type dataLength:   C{int}
+        """
+        sample = channel._windowSample
+        sentAt, allowance, remaining, usedAt = sample
+        now = channel._getClock().seconds()
+        if dataLength <= remaining:
+            sample[2] = remaining = remaining - dataLength
+            if not remaining:
+                sample[3] = now
+            return
+        channel._windowSample = None
+        if usedAt is None:
+            usedAt = now
+        rate = allowance / max(usedAt - sentAt, self.minimumWindowSampleTime)
+        wanted = 2 * rate * (now - sentAt)
+        if wanted > channel.localWindowSize:
+            newSize = min(channel.localWindowSize * 2,
+                          channel.maxLocalWindowSize)
+            if newSize > channel.localWindowSize:
+                log.msg('growing window of channel %i to %i' % (
+                        channel.id, newSize))
+                channel.localWindowSize = newSize
 
     def ssh_CHANNEL_EOF(self, packet):
         """
@@ -416,6 +473,16 @@ class SSHConnection(service.SSHService):
         self.channels[self.localChannelID] = channel
         self.localChannelID += 1
 
+    def _flushWrites(self, channel):
+        """
+        Send the writes a channel is holding back, so that they are not sent
+        after whatever is about to be sent for it.  Only L{SSHChannel}
+        instances hold writes back; other channels are left alone.
+        """
+        flushWrites = getattr(channel, '_flushWrites', None)
+        if flushWrites is not None:
+            flushWrites()
+
     def sendRequest(self, channel, requestType, data, wantReply=0):
         """
         Send a request to a channel.
@@ -426,6 +493,7 @@ class SSHConnection(service.SSHService):
         @type wantReply:    C{bool}
         @rtype              C{Deferred}/C{None}
         """
+        self._flushWrites(channel)
         if channel.localClosed:
             return
         log.msg('sending request %s' % requestType)
@@ -491,6 +559,7 @@ class SSHConnection(service.SSHService):
 
         @type channel:  subclass of L{SSHChannel}
         """
+        self._flushWrites(channel)
         if channel.localClosed:
             return # we're already closed
         log.msg('sending eof')
@@ -503,6 +572,7 @@ class SSHConnection(service.SSHService):
 
         @type channel:  subclass of L{SSHChannel}
         """
+        self._flushWrites(channel)
         if channel.localClosed:
             return # we're already closed
         log.msg('sending close %i' % channel.id)
@@ -594,6 +664,9 @@ class SSHConnection(service.SSHService):
         """
         if channel in self.channelsToRemoteChannel: # actually open
             channel.localClosed = channel.remoteClosed = True
+            discardWrites = getattr(channel, '_discardWrites', None)
+            if discardWrites is not None:
+                discardWrites()
             del self.localToRemoteChannel[channel.id]
             del self.channels[channel.id]
             del self.channelsToRemoteChannel[channel]
@@ -5,12 +5,15 @@
 
 import errno
 import struct
+from collections import deque
 
 from zope.interface import implementer
 
 from twisted.conch.interfaces import ISFTPServer, ISFTPFile
 from twisted.conch.ssh.common import NS, getNS
 from twisted.internet import defer, protocol
+from twisted.internet.interfaces import IConsumer, IPushProducer
+from twisted.protocols.basic import FileSender
 from twisted.python import failure, log
 
 
@@ -293,8 +296,11 @@ class FileTransferServer(FileTransferBase):
                     raise EOFError
                 return f
             if isinstance(info, defer.Deferred):
-                info.addCallback(self._cbScanDirectory, dirIter, f)
-                return
+                info.addCallbacks(self._cbScanDirectory,
+                                  self._ebScanDirectory,
+                                  callbackArgs=(dirIter, f),
+                                  errbackArgs=(f,))
+                return info
             else:
                 f.append(info)
         return f
@@ -303,6 +309,12 @@ class FileTransferServer(FileTransferBase):
         f.append(result)
         return self._scanDirectory(dirIter, f)
 
+    def _ebScanDirectory(self, reason, f):
+        reason.trap(StopIteration)
+        if not f:
+            raise EOFError
+        return f
+
     def _cbSendDirectory(self, result, requestId):
         data = ''
         for (filename, longname, attrs) in result:
@@ -692,6 +704,99 @@ class FileTransferClient(FileTransferBase):
         """
         return self._sendRequest(FXP_EXTENDED, NS(request) + data)
 
+    def download(self, filename, consumer, chunkSize=32768, maxRequests=64,
+                 clock=None):
+        """
+        Copy the contents of a remote file to a consumer.
+
+        Up to C{maxRequests} read requests are kept outstanding at once, the
+        actual number being adapted to the round trip times measured during
+        the transfer, so that the copy is limited by the bandwidth of the
+        link rather than by its latency.  Responses may arrive in any order;
+        the consumer is given the data in order.
+
+        @param filename: The name of the remote file.
+        @type filename: L{bytes}
+
+        @param consumer: The object to write the contents to.  If it provides
+            L{IConsumer}, the transfer registers itself with it as a streaming
+            producer, so that the consumer can pause it.  Otherwise it need
+            only have a C{write} method, like a file.
+
+        @param chunkSize: The number of bytes to ask for in each request.
+        @type chunkSize: L{int}
+
+        @param maxRequests: The largest number of requests to keep
+            outstanding.
+        @type maxRequests: L{int}
+
+        @param clock: The L{IReactorTime} provider to measure round trip times
+            with, or C{None} to use the global reactor.
+
+        @return: A L{Deferred} which fires with the number of bytes copied
+            once the whole file has been written to the consumer and the
+            remote file has been closed.
+
+        @since: 15.3
+        """
+        def opened(remoteFile):
+            window = _RequestWindow(clock, maximum=maxRequests)
+            transfer = _PipelinedDownload(remoteFile, consumer, chunkSize,
+                                          window)
+            return _closeAfter(remoteFile, transfer.start())
+        d = self.openFile(filename, FXF_READ, {})
+        d.addCallback(opened)
+        return d
+
+
+    def upload(self, source, filename, chunkSize=32768, maxRequests=64,
+               clock=None):
+        """
+        Copy the contents of a local file-like object to a remote file,
+        creating it or replacing its contents.
+
+        Up to C{maxRequests} write requests are kept outstanding at once, the
+        actual number being adapted to the round trip times measured during
+        the transfer.  Each request carries the offset it is to be written at,
+        so the server may complete them in any order.
+
+        @param source: The file-like object to read from.  It is read to its
+            end, from its current position, by a
+            L{FileSender<twisted.protocols.basic.FileSender>}.
+
+        @param filename: The name of the remote file.
+        @type filename: L{bytes}
+
+        @param chunkSize: The number of bytes to send in each request.
+        @type chunkSize: L{int}
+
+        @param maxRequests: The largest number of requests to keep
+            outstanding.
+        @type maxRequests: L{int}
+
+        @param clock: The L{IReactorTime} provider to measure round trip times
+            with, or C{None} to use the global reactor.
+
+        @return: A L{Deferred} which fires with the number of bytes copied
+            once every write has been acknowledged and the remote file has
+            been closed.
+
+        @since: 15.3
+        """
+        def opened(remoteFile):
+            window = _RequestWindow(clock, maximum=maxRequests)
+            transfer = _PipelinedUpload(remoteFile, chunkSize, window)
+            sender = FileSender()
+            sender.CHUNK_SIZE = chunkSize
+            # Failures are reported by the transfer itself.
+            sender.beginFileTransfer(source, transfer).addErrback(
+                lambda ignored: None)
+            return _closeAfter(remoteFile, transfer.deferred)
+        d = self.openFile(filename, FXF_WRITE | FXF_CREAT | FXF_TRUNC, {})
+        d.addCallback(opened)
+        return d
+
+
     def packet_VERSION(self, data):
         version, = struct.unpack('!L', data[:4])
         data = data[4:]
@@ -832,6 +937,399 @@ class ClientDirectory:
         return reason
 
 
+def _closeAfter(remoteFile, d):
+    """
+    Close a remote file once a transfer to or from it has finished.
+
+    @param remoteFile: The L{ISFTPFile} to close.
+
+    @param d: A L{Deferred} which fires when the transfer is done.
+
+    @return: A L{Deferred} which fires with the result of C{d} once the file
+        is closed, or with the failure to close it if C{d} succeeded.
+    """
+    def close(result):
+        closed = remoteFile.close()
+        if isinstance(result, failure.Failure):
+            closed.addErrback(log.err, "Failed to close %r" % (remoteFile,))
+        closed.addCallback(lambda ignored: result)
+        return closed
+    return d.addBoth(close)
+
+
+
+class _RequestWindow(object):
+    """
+    The number of requests a pipelined transfer keeps outstanding, adapted to
+    the round trip times it measures.
+
+    While requests complete within twice the shortest round trip time seen so
+    far (plus L{tolerance}), the window grows by one request for each of
+    them, doubling every round trip.  A slower response means requests are
+    queueing somewhere rather than making the transfer any faster, so the
+    window shrinks by one request, at most once per round trip, and from
+    then on grows by only one request per round trip.
+
+    @ivar size: The number of requests to keep outstanding.
+    @type size: L{int}
+
+    @ivar minimum: The smallest L{size}.
+    @ivar maximum: The largest L{size}.
+
+    @ivar minimumRTT: The shortest round trip time seen so far, in seconds,
+        or C{None} if no request has completed yet.
+
+    @ivar tolerance: Seconds added to the round trip time a response must
+        exceed to count as slow, so that the window is not shrunk by the
+        jitter of a local connection.
+    """
+
+    tolerance = 0.01
+
+    def __init__(self, clock=None, initial=4, minimum=1, maximum=64):
+        """
+        @param clock: The L{IReactorTime} provider to measure round trip
+            times with, or C{None} to use the global reactor.
+
+        @param initial: The initial L{size}, which is brought within
+            C{minimum} and C{maximum}.
+        """
+        if clock is None:
+            from twisted.internet import reactor as clock
+        self._clock = clock
+        self.minimum = minimum
+        self.maximum = maximum
+        self.size = max(minimum, min(initial, maximum))
+        self.minimumRTT = None
+        self._congested = False
+        self._credit = 0
+        self._lastDecrease = None
+
+
+    def sent(self):
+        """
+        Note that a request is being sent.
+
+        @return: A value to pass to L{completed} when it completes.
+        """
+        return self._clock.seconds()
+
+
+    def completed(self, sentAt):
+        """
+        Note that a request has completed and adjust L{size}.
+
+        @param sentAt: The value L{sent} returned for it.
+        """
+        now = self._clock.seconds()
+        rtt = now - sentAt
+        if self.minimumRTT is None or rtt < self.minimumRTT:
+            self.minimumRTT = rtt
+        if rtt <= 2 * self.minimumRTT + self.tolerance:
+            if self._congested:
+                self._credit += 1
+                if self._credit < self.size:
+                    return
+                self._credit = 0
+            self.size = min(self.size + 1, self.maximum)
+        elif self._lastDecrease is None or sentAt >= self._lastDecrease:
+            self._congested = True
+            self._credit = 0
+            self._lastDecrease = now
+            self.size = max(self.size - 1, self.minimum)
+
+
+
+@implementer(IPushProducer)
+class _PipelinedDownload(object):
+    """
+    Read a remote file into a consumer, keeping a window of read requests
+    outstanding.
+
+    Data which arrives ahead of a missing earlier chunk is kept, keyed by its
+    offset, until the gap is filled.  A response shorter than the request
+    (which servers may send before the end of the file) causes the rest of
+    the range to be requested again.
+
+    @ivar deferred: A L{Deferred} which fires with the number of bytes
+        written to the consumer when the transfer is finished.
+    """
+
+    def __init__(self, remoteFile, consumer, chunkSize, window):
+        """
+        @param remoteFile: The L{ISFTPFile} to read.
+        @param consumer: The object to write its contents to.
+        @param chunkSize: The number of bytes to ask for in each request.
+        @param window: The L{_RequestWindow} limiting outstanding requests.
+        """
+        self._file = remoteFile
+        self._consumer = consumer
+        self._chunkSize = chunkSize
+        self._window = window
+        self._nextOffset = 0
+        self._delivered = 0
+        self._eofOffset = None
+        self._retries = deque()
+        self._received = {}
+        self._outstanding = 0
+        self._paused = False
+        self._stopped = False
+        self._filling = False
+        self._failure = None
+        self.deferred = defer.Deferred()
+
+
+    def start(self):
+        """
+        Start the transfer.
+
+        @return: L{deferred}
+        """
+        if IConsumer.providedBy(self._consumer):
+            self._consumer.registerProducer(self, True)
+        self._fill()
+        return self.deferred
+
+
+    def pauseProducing(self):
+        self._paused = True
+
+
+    def resumeProducing(self):
+        self._paused = False
+        self._fill()
+
+
+    def stopProducing(self):
+        self._stopped = True
+        self._fill()
+
+
+    def _nextRange(self):
+        """
+        Decide which range of the file to ask for next.
+
+        @return: An offset and a length, or C{None} if there is nothing left
+            to ask for.
+        """
+        while self._retries:
+            offset, length = self._retries.popleft()
+            if self._eofOffset is None or offset < self._eofOffset:
+                return offset, length
+        if self._eofOffset is not None:
+            return None
+        offset = self._nextOffset
+        self._nextOffset += self._chunkSize
+        return offset, self._chunkSize
+
+
+    def _fill(self):
+        """
+        Send requests until the window is full, or finish the transfer if
+        there is nothing left to do.
+        """
+        if self._filling or self.deferred is None:
+            return
+        self._filling = True
+        try:
+            while (not self._paused and not self._stopped
+                   and self._failure is None
+                   and self._outstanding < self._window.size):
+                nextRange = self._nextRange()
+                if nextRange is None:
+                    break
+                self._read(*nextRange)
+        except:
+            self._fail(failure.Failure())
+        finally:
+            self._filling = False
+        if self._outstanding == 0 and (
+                self._stopped or self._failure is not None or (
+                    self._eofOffset is not None and not self._retries)):
+            self._finish()
+
+
+    def _read(self, offset, length):
+        self._outstanding += 1
+        sentAt = self._window.sent()
+        d = self._file.readChunk(offset, length)
+        d.addCallbacks(
+            self._cbRead, self._ebRead,
+            callbackArgs=(offset, length, sentAt), errbackArgs=(offset,))
+        d.addErrback(self._fail)
+        d.addCallback(lambda ignored: self._fill())
+
+
+    def _cbRead(self, data, offset, length, sentAt):
+        self._outstanding -= 1
+        self._window.completed(sentAt)
+        if not data:
+            self._reachedEOF(offset)
+            return
+        if len(data) < length:
+            self._retries.append((offset + len(data), length - len(data)))
+        self._received[offset] = data
+        while self._delivered in self._received:
+            data = self._received.pop(self._delivered)
+            self._delivered += len(data)
+            if not self._stopped:
+                self._consumer.write(data)
+
+
+    def _ebRead(self, reason, offset):
+        self._outstanding -= 1
+        reason.trap(EOFError)
+        self._reachedEOF(offset)
+
+
+    def _reachedEOF(self, offset):
+        if self._eofOffset is None or offset < self._eofOffset:
+            self._eofOffset = offset
+
+
+    def _fail(self, reason):
+        if self._failure is None:
+            self._failure = reason
+
+
+    def _finish(self):
+        d, self.deferred = self.deferred, None
+        if IConsumer.providedBy(self._consumer):
+            self._consumer.unregisterProducer()
+        if self._failure is not None:
+            d.errback(self._failure)
+        elif self._stopped:
+            d.errback(defer.CancelledError())
+        elif self._received:
+            d.errback(SFTPError(
+                FX_FAILURE, "File changed size during transfer"))
+        else:
+            d.callback(self._delivered)
+
+
+
+@implementer(IConsumer)
+class _PipelinedUpload(object):
+    """
+    A consumer which writes what it is given to a remote file, keeping a
+    window of write requests outstanding.
+
+    A streaming producer is paused while the window is full; a non-streaming
+    one is asked for more data whenever there is room in it.  The transfer is
+    finished when the producer is unregistered and every write has been
+    acknowledged.
+
+    @ivar deferred: A L{Deferred} which fires with the number of bytes
+        written when the transfer is finished.
+    """
+
+    def __init__(self, remoteFile, chunkSize, window):
+        """
+        @param remoteFile: The L{ISFTPFile} to write.
+        @param chunkSize: The largest number of bytes to send in a request.
+        @param window: The L{_RequestWindow} limiting outstanding requests.
+        """
+        self._file = remoteFile
+        self._chunkSize = chunkSize
+        self._window = window
+        self._offset = 0
+        self._outstanding = 0
+        self._producer = None
+        self._streaming = False
+        self._producerDone = False
+        self._paused = False
+        self._pulling = False
+        self._failure = None
+        self.deferred = defer.Deferred()
+
+
+    def registerProducer(self, producer, streaming):
+        self._producer = producer
+        self._streaming = streaming
+        self._pull()
+
+
+    def unregisterProducer(self):
+        self._producer = None
+        self._producerDone = True
+        self._maybeFinish()
+
+
+    def write(self, data):
+        for start in range(0, len(data), self._chunkSize):
+            self._write(data[start:start + self._chunkSize])
+        if (self._streaming and not self._paused
+                and self._outstanding >= self._window.size):
+            self._paused = True
+            self._producer.pauseProducing()
+
+
+    def _write(self, chunk):
+        self._outstanding += 1
+        sentAt = self._window.sent()
+        d = self._file.writeChunk(self._offset, chunk)
+        self._offset += len(chunk)
+        d.addCallbacks(self._cbWrite, self._ebWrite, callbackArgs=(sentAt,))
+
+
+    def _cbWrite(self, ignored, sentAt):
+        self._outstanding -= 1
+        self._window.completed(sentAt)
+        self._pull()
+
+
+    def _ebWrite(self, reason):
+        self._outstanding -= 1
+        self._fail(reason)
+
+
+    def _fail(self, reason):
+        if self._failure is None:
+            self._failure = reason
+            if self._producer is not None:
+                self._producer.stopProducing()
+        self._maybeFinish()
+
+
+    def _pull(self):
+        """
+        Get more data from the producer if there is room in the window.
+        """
+        if self._pulling:
+            return
+        self._pulling = True
+        try:
+            while (self._producer is not None and self._failure is None
+                   and self._outstanding < self._window.size):
+                if self._streaming:
+                    if self._paused:
+                        self._paused = False
+                        self._producer.resumeProducing()
+                    break
+                offset = self._offset
+                self._producer.resumeProducing()
+                if self._offset == offset:
+                    break
+        except:
+            self._pulling = False
+            self._fail(failure.Failure())
+        else:
+            self._pulling = False
+            self._maybeFinish()
+
+
+    def _maybeFinish(self):
+        if self.deferred is None or self._outstanding:
+            return
+        if self._failure is not None:
+            d, self.deferred = self.deferred, None
+            d.errback(self._failure)
+        elif self._producerDone:
+            d, self.deferred = self.deferred, None
+            d.callback(self._offset)
+
+
+
 class SFTPError(Exception):
 
     def __init__(self, errorCode, errorMessage, lang = ''):
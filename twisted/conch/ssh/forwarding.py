@@ -33,6 +33,9 @@ class SSHListenForwardingFactory(protocol.Factory):
 
 class SSHListenForwardingChannel(channel.SSHChannel):
 
+    coalesceWrites = True
+    maxLocalWindowSize = 2 ** 24
+
     def channelOpen(self, specificData):
         log.msg('opened forwarding channel %s' % self.id)
         if len(self.client.buf)>1:
@@ -89,6 +92,8 @@ class SSHConnectForwardingChannel(channel.SSHChannel):
     @type _channelOpenDeferred: L{twisted.internet.defer.Deferred}
     """
     _reactor = reactor
+    coalesceWrites = True
+    maxLocalWindowSize = 2 ** 24
 
     def __init__(self, hostport, *args, **kw):
         channel.SSHChannel.__init__(self, *args, **kw)
@@ -0,0 +1,339 @@
+# -*- test-case-name: twisted.conch.test.test_threadedsftp -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+An SFTP backend which reads and writes the files another backend opens in a
+thread pool, so that a slow disk or network filesystem does not stall every
+other connection served by the reactor.
+
+L{ThreadedSFTPServer} wraps a synchronous L{ISFTPServer} provider, such as
+L{twisted.conch.unix.SFTPServerForUnixConchUser}.  Every operation which
+names a path, such as opening a file or listing a directory, is still called
+in the reactor thread, where the backend may switch the process to the
+user's identity (which belongs to the whole process, not one thread) to
+check their access.  Only the operations on files it has opened - reading,
+writing, getting their attributes and closing them - are called in threads,
+and these must not depend on the identity of the process or on any other
+process-wide state; those of L{twisted.conch.unix.UnixSFTPFile} use only the
+file's descriptor.  To use it, adapt avatars to L{ISFTPServer} with a
+function which wraps the usual backend::
+
+    def threadedSFTPServer(avatar):
+        return ThreadedSFTPServer(SFTPServerForUnixConchUser(avatar))
+
+@since: 15.3
+"""
+
+from zope.interface import implementer
+
+from twisted.conch.interfaces import ISFTPServer, ISFTPFile
+from twisted.internet import defer
+from twisted.internet.threads import deferToThreadPool
+
+__all__ = ["ConcurrencyLimits", "ThreadedSFTPServer", "ThreadedSFTPFile"]
+
+
+
+class ConcurrencyLimits(object):
+    """
+    Limits on the number of file operations each user may have running in
+    threads at once.
+
+    Operations beyond a user's limit wait for that user's earlier operations
+    to finish, so that one user's requests to a stalled filesystem cannot
+    occupy every thread in the pool.  The limits apply across all of a
+    user's sessions which share this object.
+
+    @ivar default: The limit for users not in L{perUser}.
+    @type default: L{int}
+
+    @ivar perUser: A mapping from user names to their limits.
+    @type perUser: L{dict}
+    """
+
+    def __init__(self, default=4, perUser=None):
+        """
+        @param default: See L{default}.
+        @param perUser: See L{perUser}.
+        """
+        self.default = default
+        self.perUser = dict(perUser or {})
+        self._semaphores = {}
+
+
+    def semaphoreFor(self, username):
+        """
+        Get the semaphore limiting a user's operations.
+
+        @param username: The name of the user.
+
+        @return: The L{DeferredSemaphore} shared by all of the user's
+            operations.
+        """
+        semaphore = self._semaphores.get(username)
+        if semaphore is None:
+            limit = self.perUser.get(username, self.default)
+            semaphore = defer.DeferredSemaphore(limit)
+            self._semaphores[username] = semaphore
+        return semaphore
+
+
+
+_defaultLimits = ConcurrencyLimits()
+
+
+
+@implementer(ISFTPServer)
+class ThreadedSFTPServer(object):
+    """
+    An L{ISFTPServer} which calls another one, and wraps the files it opens
+    in L{ThreadedSFTPFile}s, whose operations are called in a thread pool.
+
+    @ivar server: The wrapped L{ISFTPServer}.
+    @ivar avatar: The avatar of the wrapped server.
+
+    @ivar readAhead: The number of bytes to read from a file at once.
+        Later reads of data within that range are answered from memory.
+    @type readAhead: L{int}
+
+    @ivar maxCoalescedWrite: The largest number of bytes that consecutive
+        writes to a file may be combined into.
+    @type maxCoalescedWrite: L{int}
+    """
+
+    def __init__(self, server, threadpool=None, limits=None,
+                 readAhead=2 ** 18, maxCoalescedWrite=2 ** 18, reactor=None):
+        """
+        @param server: See L{server}.
+
+        @param threadpool: The thread pool to run operations in, or C{None}
+            for the reactor's thread pool.
+        @type threadpool: L{twisted.python.threadpool.ThreadPool}
+
+        @param limits: The L{ConcurrencyLimits} to apply to the avatar's
+            user, or C{None} for limits shared by every server created
+            without one.
+
+        @param readAhead: See L{readAhead}.
+        @param maxCoalescedWrite: See L{maxCoalescedWrite}.
+
+        @param reactor: The reactor to deliver results in, or C{None} for the
+            global reactor.
+        """
+        if reactor is None:
+            from twisted.internet import reactor
+        if threadpool is None:
+            threadpool = reactor.getThreadPool()
+        if limits is None:
+            limits = _defaultLimits
+        self.server = server
+        self.avatar = server.avatar
+        self.readAhead = readAhead
+        self.maxCoalescedWrite = maxCoalescedWrite
+        self._reactor = reactor
+        self._threadpool = threadpool
+        self._semaphore = limits.semaphoreFor(
+            getattr(self.avatar, 'username', None))
+
+
+    def _run(self, f, *args, **kw):
+        """
+        Call a function in the thread pool, once the user is within their
+        limit.
+
+        @return: A L{Deferred} which fires with the result of the call.
+        """
+        return self._semaphore.run(
+            deferToThreadPool, self._reactor, self._threadpool, f,
+            *args, **kw)
+
+
+    def gotVersion(self, otherVersion, extData):
+        return self.server.gotVersion(otherVersion, extData)
+
+
+    def openFile(self, filename, flags, attrs):
+        d = defer.maybeDeferred(self.server.openFile, filename, flags, attrs)
+        d.addCallback(ThreadedSFTPFile, self)
+        return d
+
+
+    def removeFile(self, filename):
+        return self.server.removeFile(filename)
+
+
+    def renameFile(self, oldpath, newpath):
+        return self.server.renameFile(oldpath, newpath)
+
+
+    def makeDirectory(self, path, attrs):
+        return self.server.makeDirectory(path, attrs)
+
+
+    def removeDirectory(self, path):
+        return self.server.removeDirectory(path)
+
+
+    def openDirectory(self, path):
+        return self.server.openDirectory(path)
+
+
+    def getAttrs(self, path, followLinks):
+        return self.server.getAttrs(path, followLinks)
+
+
+    def setAttrs(self, path, attrs):
+        return self.server.setAttrs(path, attrs)
+
+
+    def readLink(self, path):
+        return self.server.readLink(path)
+
+
+    def makeLink(self, linkPath, targetPath):
+        return self.server.makeLink(linkPath, targetPath)
+
+
+    def realPath(self, path):
+        return self.server.realPath(path)
+
+
+    def extendedRequest(self, extName, extData):
+        return self.server.extendedRequest(extName, extData)
+
+
+
+class _WriteRun(object):
+    """
+    Consecutive writes to be made to a file with a single call.
+
+    @ivar offset: The offset of the first write.
+    @ivar size: The total number of bytes.
+    @ivar chunks: The data of each write.
+    @ivar waiters: A L{Deferred} for each write, fired when the run is done.
+    """
+
+    def __init__(self, offset):
+        self.offset = offset
+        self.size = 0
+        self.chunks = []
+        self.waiters = []
+
+
+    def add(self, data):
+        """
+        Add a write to the run.
+
+        @return: A L{Deferred} which fires when the run is done.
+        """
+        self.chunks.append(data)
+        self.size += len(data)
+        d = defer.Deferred()
+        self.waiters.append(d)
+        return d
+
+
+    def done(self, result):
+        """
+        Fire the L{Deferred} of each write with the result of the run.
+        """
+        for d in self.waiters:
+            d.callback(result)
+        self.waiters = None
+
+
+
+@implementer(ISFTPFile)
+class ThreadedSFTPFile(object):
+    """
+    An L{ISFTPFile} which calls another one in a thread pool, except for
+    L{setAttrs}, which is called in the reactor thread.
+
+    Operations on the file are run one at a time, in the order they are
+    requested.  Reads fetch L{ThreadedSFTPServer.readAhead} bytes at once
+    and answer later reads from them.  Writes which arrive while the file
+    is busy, each starting where the previous one ended, are combined into a
+    single write of up to L{ThreadedSFTPServer.maxCoalescedWrite} bytes.
+
+    @ivar file: The wrapped L{ISFTPFile}.
+    """
+
+    def __init__(self, f, server):
+        """
+        @param f: See L{file}.
+        @param server: The L{ThreadedSFTPServer} which opened the file.
+        """
+        self.file = f
+        self._server = server
+        self._lock = defer.DeferredLock()
+        self._readOffset = 0
+        self._readData = ''
+        self._readShort = False
+        self._writeRun = None
+
+
+    def _serialize(self, f, *args):
+        """
+        Call a function once every operation requested earlier is done.
+        """
+        self._writeRun = None
+        return self._lock.run(f, *args)
+
+
+    def readChunk(self, offset, length):
+        return self._serialize(self._read, offset, length)
+
+
+    def _read(self, offset, length):
+        start = offset - self._readOffset
+        available = len(self._readData) - start
+        if start >= 0 and (available >= length or
+                           (self._readShort and available >= 0)):
+            return self._readData[start:start + length]
+        size = max(length, self._server.readAhead)
+        d = self._server._run(self.file.readChunk, offset, size)
+        d.addCallback(self._cbRead, offset, length, size)
+        return d
+
+
+    def _cbRead(self, data, offset, length, size):
+        self._readOffset = offset
+        self._readData = data
+        self._readShort = len(data) < size
+        return data[:length]
+
+
+    def writeChunk(self, offset, data):
+        run = self._writeRun
+        if (run is not None and run.offset + run.size == offset
+                and run.size + len(data) <= self._server.maxCoalescedWrite):
+            return run.add(data)
+        run = _WriteRun(offset)
+        d = run.add(data)
+        self._writeRun = run
+        self._lock.run(self._write, run)
+        return d
+
+
+    def _write(self, run):
+        if self._writeRun is run:
+            self._writeRun = None
+        self._readData = ''
+        d = self._server._run(self.file.writeChunk, run.offset,
+                              ''.join(run.chunks))
+        d.addBoth(run.done)
+        return d
+
+
+    def getAttrs(self):
+        return self._serialize(self._server._run, self.file.getAttrs)
+
+
+    def setAttrs(self, attrs):
+        return self._serialize(self.file.setAttrs, attrs)
+
+
+    def close(self):
+        self._readData = ''
+        return self._serialize(self._server._run, self.file.close)
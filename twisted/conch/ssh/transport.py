@@ -20,6 +20,11 @@ import hmac
 
 # external library imports
 from Crypto import Util
+try:
+    from Crypto.Util import Counter
+except ImportError:
+    # PyCrypto before 2.1
+    Counter = None
 
 # twisted imports
 from twisted.internet import protocol, defer
@@ -227,6 +232,7 @@ class SSHTransportBase(protocol.Protocol):
     isClient = False
     gotVersion = False
     buf = ''
+    _bufOffset = 0
     outgoingPacketSequence = 0
     incomingPacketSequence = 0
     outgoingCompression = None
@@ -353,9 +359,8 @@ class SSHTransportBase(protocol.Protocol):
         lenPad = bs - (totalSize % bs)
         if lenPad < 4:
             lenPad = lenPad + bs
-        packet = (struct.pack('!LB',
-                              totalSize + lenPad - 4, lenPad) +
-                  payload + randbytes.secureRandom(lenPad))
+        packet = ''.join([struct.pack('!LB', totalSize + lenPad - 4, lenPad),
+                          payload, randbytes.secureRandom(lenPad)])
         encPacket = (
             self.currentEncryptions.encrypt(packet) +
             self.currentEncryptions.makeMAC(
@@ -371,11 +376,36 @@ class SSHTransportBase(protocol.Protocol):
 
         @rtype: C{str}/C{None}
         """
+        packet = self._getPacket()
+        self._compactBuffer()
+        return packet
+
+
+    def _compactBuffer(self):
+        """
+        Discard the packets L{_getPacket} has consumed from the front of the
+        buffer.
+        """
+        if self._bufOffset:
+            self.buf = self.buf[self._bufOffset:]
+            self._bufOffset = 0
+
+
+    def _getPacket(self):
+        """
+        Like L{getPacket}, but rather than removing the packet from the front
+        of C{self.buf}, advance C{self._bufOffset} past it, so that a buffer
+        holding many packets is not copied once for each of them.
+
+        @rtype: C{str}/C{None}
+        """
+        buf = self.buf
+        offset = self._bufOffset
         bs = self.currentEncryptions.decBlockSize
         ms = self.currentEncryptions.verifyDigestSize
-        if len(self.buf) < bs: return # not enough data
+        if len(buf) - offset < bs: return # not enough data
         if not hasattr(self, 'first'):
-            first = self.currentEncryptions.decrypt(self.buf[:bs])
+            first = self.currentEncryptions.decrypt(buf[offset:offset + bs])
         else:
             first = self.first
             del self.first
@@ -384,7 +414,8 @@ class SSHTransportBase(protocol.Protocol):
             self.sendDisconnect(DISCONNECT_PROTOCOL_ERROR,
                                 'bad packet length %s' % packetLen)
             return
-        if len(self.buf) < packetLen + 4 + ms:
+        end = offset + 4 + packetLen
+        if len(buf) < end + ms:
             self.first = first
             return # not enough packet
         if(packetLen + 4) % bs != 0:
@@ -393,16 +424,16 @@ class SSHTransportBase(protocol.Protocol):
                 'bad packet mod (%i%%%i == %i)' % (packetLen + 4, bs,
                                                    (packetLen + 4) % bs))
             return
-        encData, self.buf = self.buf[:4 + packetLen], self.buf[4 + packetLen:]
-        packet = first + self.currentEncryptions.decrypt(encData[bs:])
+        packet = first + self.currentEncryptions.decrypt(buf[offset + bs:end])
+        self._bufOffset = end
         if len(packet) != 4 + packetLen:
             self.sendDisconnect(DISCONNECT_PROTOCOL_ERROR,
                                 'bad decryption')
             return
         if ms:
-            macData, self.buf = self.buf[:ms], self.buf[ms:]
+            self._bufOffset = end + ms
             if not self.currentEncryptions.verify(self.incomingPacketSequence,
-                                                  packet, macData):
+                                                  packet, buf[end:end + ms]):
                 self.sendDisconnect(DISCONNECT_MAC_ERROR, 'bad MAC')
                 return
         payload = packet[5:-paddingLen]
@@ -455,11 +486,16 @@ class SSHTransportBase(protocol.Protocol):
                         return
                     i = lines.index(p)
                     self.buf = '\n'.join(lines[i + 1:])
-        packet = self.getPacket()
-        while packet:
-            messageNum = ord(packet[0])
-            self.dispatchMessage(messageNum, packet[1:])
-            packet = self.getPacket()
+        # Packets are parsed at an offset into the buffer, which is only
+        # compacted once all of the complete ones have been dispatched.
+        try:
+            packet = self._getPacket()
+            while packet:
+                messageNum = ord(packet[0])
+                self.dispatchMessage(messageNum, packet[1:])
+                packet = self._getPacket()
+        finally:
+            self._compactBuffer()
 
 
     def dispatchMessage(self, messageNum, payload):
@@ -1452,8 +1488,18 @@ class SSHCiphers:
             return _DummyCipher()
         mod = __import__('Crypto.Cipher.%s'%modName, {}, {}, 'x')
         if counterMode:
+            if Counter is None:
+                counter = _Counter(iv, mod.block_size)
+            else:
+                # PyCrypto's own counter lets the cipher generate the key
+                # stream for a whole packet in C.
+                counter = Counter.new(
+                    mod.block_size * 8,
+                    initial_value=Util.number.bytes_to_long(
+                        iv[:mod.block_size]),
+                    allow_wraparound=True)
             return mod.new(key[:keySize], mod.MODE_CTR, iv[:mod.block_size],
-                           counter=_Counter(iv, mod.block_size))
+                           counter=counter)
         else:
             return mod.new(key[:keySize], mod.MODE_CBC, iv[:mod.block_size])
 
@@ -1517,8 +1563,10 @@ class SSHCiphers:
         """
         if not self.outMAC[0]:
             return ''
-        data = struct.pack('>L', seqid) + data
-        return hmac.HMAC(self.outMAC.key, data, self.outMAC[0]).digest()
+        mac = hmac.HMAC(self.outMAC.key, struct.pack('>L', seqid),
+                        self.outMAC[0])
+        mac.update(data)
+        return mac.digest()
 
 
     def verify(self, seqid, data, mac):
@@ -1536,9 +1584,10 @@ class SSHCiphers:
         """
         if not self.inMAC[0]:
             return mac == ''
-        data = struct.pack('>L', seqid) + data
-        outer = hmac.HMAC(self.inMAC.key, data, self.inMAC[0]).digest()
-        return mac == outer
+        outer = hmac.HMAC(self.inMAC.key, struct.pack('>L', seqid),
+                          self.inMAC[0])
+        outer.update(data)
+        return mac == outer.digest()
 
 
 class _Counter:
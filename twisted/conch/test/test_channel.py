@@ -5,6 +5,7 @@
 Test ssh/channel.py.
 """
 from twisted.conch.ssh import channel
+from twisted.internet.task import Clock
 from twisted.trial import unittest
 
 
@@ -266,6 +267,79 @@ class ChannelTests(unittest.TestCase):
         self.channel.addWindowBytes(8) # send extended data
         self.assertTrue(self.conn.closes.get(self.channel))
 
+    def test_coalesceWrites(self):
+        """
+        If coalesceWrites is true, writes smaller than remoteMaxPacket are
+        held until the next reactor iteration and sent as one packet.
+        """
+        clock = Clock()
+        self.channel.clock = clock
+        self.channel.coalesceWrites = True
+        self.channel.addWindowBytes(20)
+        self.channel.write('da')
+        self.channel.write('ta')
+        self.assertEqual(self.conn.data.get(self.channel), None)
+        clock.advance(0)
+        self.assertEqual(self.conn.data[self.channel], ['data'])
+        self.assertEqual(self.channel.remoteWindowLeft, 16)
+        self.assertEqual(clock.getDelayedCalls(), [])
+
+    def test_coalesceWritesFullPacket(self):
+        """
+        Held writes are sent as soon as they fill a packet, and a write of
+        at least remoteMaxPacket bytes is sent immediately, after any held
+        writes.
+        """
+        clock = Clock()
+        self.channel.clock = clock
+        self.channel.coalesceWrites = True
+        self.channel.addWindowBytes(40)
+        self.channel.write('123456')
+        self.channel.write('789012')
+        self.assertEqual(self.conn.data[self.channel], ['1234567890', '12'])
+        self.channel.write('a')
+        self.channel.write('bcdefghijk')
+        self.assertEqual(self.conn.data[self.channel],
+                         ['1234567890', '12', 'abcdefghij', 'k'])
+        self.assertEqual(clock.getDelayedCalls(), [])
+
+    def test_coalesceWritesOrdering(self):
+        """
+        Held writes are sent before extended data, and before the channel is
+        closed.
+        """
+        clock = Clock()
+        self.channel.clock = clock
+        self.channel.coalesceWrites = True
+        self.channel.addWindowBytes(20)
+        self.channel.write('data')
+        self.channel.writeExtended(1, 'ext')
+        self.assertEqual(self.conn.data[self.channel], ['data'])
+        self.assertEqual(self.conn.extData[self.channel], [(1, 'ext')])
+        self.channel.write('more')
+        self.channel.loseConnection()
+        self.assertEqual(self.conn.data[self.channel], ['data', 'more'])
+        self.assertTrue(self.conn.closes.get(self.channel))
+        self.assertEqual(clock.getDelayedCalls(), [])
+
+    def test_coalesceWritesWithoutWindow(self):
+        """
+        Held writes which do not fit in the remote window are buffered
+        until it is adjusted.
+        """
+        clock = Clock()
+        self.channel.clock = clock
+        self.channel.coalesceWrites = True
+        self.channel.addWindowBytes(3)
+        self.channel.write('da')
+        self.channel.write('ta')
+        clock.advance(0)
+        self.assertEqual(self.conn.data[self.channel], ['dat'])
+        self.assertEqual(self.channel.buf, 'a')
+        self.channel.write('!')
+        self.channel.addWindowBytes(5)
+        self.assertEqual(self.conn.data[self.channel], ['dat', 'a!'])
+
     def test_getPeer(self):
         """
         Test that getPeer() returns ('SSH', <connection transport peer>).
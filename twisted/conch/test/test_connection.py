@@ -9,6 +9,7 @@ import struct
 
 from twisted.conch import error
 from twisted.conch.ssh import channel, common, connection
+from twisted.internet.task import Clock
 from twisted.trial import unittest
 from twisted.conch.test import test_userauth
 
@@ -660,6 +661,145 @@ class ConnectionTests(unittest.TestCase):
         self.conn.sendClose(channel2)
         self.assertTrue(channel2.gotClosed)
 
+    def test_sendFlushesCoalescedWrites(self):
+        """
+        Writes held by a channel which coalesces writes are sent before
+        requests, EOF and close messages for the channel.
+        """
+        channel = TestChannel()
+        channel.clock = Clock()
+        channel.coalesceWrites = True
+        self._openChannel(channel)
+        channel.write('a')
+        self.conn.sendRequest(channel, 'test', 'data')
+        channel.write('b')
+        self.conn.sendEOF(channel)
+        channel.write('c')
+        self.conn.sendClose(channel)
+        self.assertEqual(self.transport.packets,
+                [(connection.MSG_CHANNEL_DATA, '\x00\x00\x00\xff' +
+                    common.NS('a')),
+                 (connection.MSG_CHANNEL_REQUEST, '\x00\x00\x00\xff' +
+                    common.NS('test') + '\x00' + 'data'),
+                 (connection.MSG_CHANNEL_DATA, '\x00\x00\x00\xff' +
+                    common.NS('b')),
+                 (connection.MSG_CHANNEL_EOF, '\x00\x00\x00\xff'),
+                 (connection.MSG_CHANNEL_DATA, '\x00\x00\x00\xff' +
+                    common.NS('c')),
+                 (connection.MSG_CHANNEL_CLOSE, '\x00\x00\x00\xff')])
+        self.assertEqual(channel.clock.getDelayedCalls(), [])
+
+    def test_channelClosedDiscardsCoalescedWrites(self):
+        """
+        Writes still held by a channel when it is closed are dropped.
+        """
+        channel = TestChannel()
+        channel.clock = Clock()
+        channel.coalesceWrites = True
+        self._openChannel(channel)
+        channel.write('data')
+        self.conn.channelClosed(channel)
+        self.assertEqual(channel.clock.getDelayedCalls(), [])
+        self.assertEqual(self.transport.packets, [])
+
+    def test_channelNotSSHChannel(self):
+        """
+        Requests, EOF and close messages can be sent for a channel which is
+        not an L{channel.SSHChannel}, and it can be closed.
+        """
+        class DuckChannel(object):
+            id = 0
+            localClosed = remoteClosed = False
+            gotClosed = False
+            def logPrefix(self):
+                return 'DuckChannel'
+            def closed(self):
+                self.gotClosed = True
+        channel = DuckChannel()
+        self.conn.channels[0] = channel
+        self.conn.localToRemoteChannel[0] = 255
+        self.conn.channelsToRemoteChannel[channel] = 255
+        self.conn.sendRequest(channel, 'test', 'data')
+        self.conn.sendEOF(channel)
+        self.conn.sendClose(channel)
+        self.assertEqual(
+            [packet[0] for packet in self.transport.packets],
+            [connection.MSG_CHANNEL_REQUEST, connection.MSG_CHANNEL_EOF,
+             connection.MSG_CHANNEL_CLOSE])
+        channel.remoteClosed = True
+        self.conn.channelClosed(channel)
+        self.assertTrue(channel.gotClosed)
+
+    def test_localWindowGrows(self):
+        """
+        If the other side of a channel with a maxLocalWindowSize sends what
+        the window allows faster than a window adjustment reaches it, the
+        local window is doubled.
+        """
+        channel = TestChannel(localWindow=100, localMaxPacket=100)
+        channel.clock = Clock()
+        channel.maxLocalWindowSize = 400
+        self._openChannel(channel)
+        self.conn.ssh_CHANNEL_DATA('\x00\x00\x00\x00' + common.NS('a' * 60))
+        # The other side may send 40 more bytes before the adjustment
+        # arrives; they take 0.1 seconds, but the next data takes 0.5.
+        channel.clock.advance(0.1)
+        self.conn.ssh_CHANNEL_DATA('\x00\x00\x00\x00' + common.NS('b' * 40))
+        channel.clock.advance(0.4)
+        self.conn.ssh_CHANNEL_DATA('\x00\x00\x00\x00' + common.NS('c' * 20))
+        self.assertEqual(channel.localWindowSize, 200)
+        self.assertEqual(channel.localWindowLeft, 200)
+        self.assertEqual(self.transport.packets,
+                [(connection.MSG_CHANNEL_WINDOW_ADJUST, '\x00\x00\x00\xff'
+                    '\x00\x00\x00\x3c'),
+                 (connection.MSG_CHANNEL_WINDOW_ADJUST, '\x00\x00\x00\xff'
+                    '\x00\x00\x00\xa0')])
+
+    def test_localWindowLimit(self):
+        """
+        The local window does not grow beyond maxLocalWindowSize.
+        """
+        channel = TestChannel(localWindow=100, localMaxPacket=100)
+        channel.clock = Clock()
+        channel.maxLocalWindowSize = 150
+        self._openChannel(channel)
+        self.conn.ssh_CHANNEL_DATA('\x00\x00\x00\x00' + common.NS('a' * 60))
+        self.conn.ssh_CHANNEL_DATA('\x00\x00\x00\x00' + common.NS('b' * 40))
+        channel.clock.advance(1)
+        self.conn.ssh_CHANNEL_DATA('\x00\x00\x00\x00' + common.NS('c' * 20))
+        self.assertEqual(channel.localWindowSize, 150)
+
+    def test_localWindowLargeEnough(self):
+        """
+        The local window does not grow if window adjustments reach the other
+        side before it has sent what the window allows.
+        """
+        channel = TestChannel(localWindow=100, localMaxPacket=100)
+        channel.clock = Clock()
+        channel.maxLocalWindowSize = 400
+        self._openChannel(channel)
+        self.conn.ssh_CHANNEL_DATA('\x00\x00\x00\x00' + common.NS('a' * 60))
+        channel.clock.advance(0.01)
+        self.conn.ssh_CHANNEL_DATA('\x00\x00\x00\x00' + common.NS('b' * 40))
+        channel.clock.advance(0.001)
+        self.conn.ssh_CHANNEL_DATA('\x00\x00\x00\x00' + common.NS('c' * 20))
+        self.assertEqual(channel.localWindowSize, 100)
+
+    def test_localWindowNotTuned(self):
+        """
+        The local window of a channel without a maxLocalWindowSize does not
+        change size.
+        """
+        channel = TestChannel(localWindow=100, localMaxPacket=100)
+        channel.clock = Clock()
+        self._openChannel(channel)
+        self.conn.ssh_CHANNEL_DATA('\x00\x00\x00\x00' + common.NS('a' * 60))
+        self.conn.ssh_CHANNEL_DATA('\x00\x00\x00\x00' + common.NS('b' * 40))
+        channel.clock.advance(1)
+        self.conn.ssh_CHANNEL_DATA('\x00\x00\x00\x00' + common.NS('c' * 20))
+        self.assertEqual(channel.localWindowSize, 100)
+        self.assertEqual(channel._windowSample, None)
+
     def test_getChannelWithAvatar(self):
         """
         Test that getChannel dispatches to the avatar when an avatar is
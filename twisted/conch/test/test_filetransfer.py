@@ -9,6 +9,7 @@ Tests for L{twisted.conch.ssh.filetransfer}.
 import os
 import re
 import struct
+from StringIO import StringIO
 
 from twisted.trial import unittest
 try:
@@ -20,8 +21,10 @@ except ImportError:
 from twisted.conch import avatar
 from twisted.conch.ssh import common, connection, filetransfer, session
 from twisted.internet import defer
-from twisted.protocols import loopback
+from twisted.internet.task import Clock
+from twisted.protocols import basic, loopback
 from twisted.python import components
+from twisted.test.proto_helpers import StringTransport
 
 
 class TestAvatar(avatar.ConchUser):
@@ -471,6 +474,93 @@ class OurServerOurClientTests(SFTPTestBase):
         return self.assertFailure(d, NotImplementedError)
 
 
+    def _runUntilFired(self, d):
+        """
+        Shuttle data between the client and the server until a L{Deferred}
+        fires.
+        """
+        result = []
+        d.addBoth(result.append)
+        while not result:
+            self._emptyBuffers()
+        return result[0]
+
+
+    def test_download(self):
+        """
+        L{filetransfer.FileTransferClient.download} writes the whole of a
+        remote file to a consumer, in order, and fires with its length.
+        """
+        consumer = StringTransport()
+        d = self.client.download("testfile1", consumer, chunkSize=1000,
+                                 maxRequests=8, clock=Clock())
+        length = self._runUntilFired(d)
+        expected = file(os.path.join(self.testDir, 'testfile1')).read()
+        self.assertEqual(length, len(expected))
+        self.assertEqual(consumer.value(), expected)
+        self.assertIdentical(consumer.producer, None)
+        self.assertEqual(self.server.openFiles, {})
+
+
+    def test_downloadMissing(self):
+        """
+        L{filetransfer.FileTransferClient.download} fails with L{SFTPError}
+        if the remote file cannot be opened.
+        """
+        d = self.client.download("missing", StringIO(), clock=Clock())
+        self.assertIsInstance(
+            self._runUntilFired(d).value, filetransfer.SFTPError)
+
+
+    def test_upload(self):
+        """
+        L{filetransfer.FileTransferClient.upload} replaces the contents of a
+        remote file with those of a local file and fires with their length.
+        """
+        data = ''.join(chr(i % 251) for i in range(70000))
+        d = self.client.upload(StringIO(data), "testfile1", chunkSize=1000,
+                               maxRequests=8, clock=Clock())
+        self.assertEqual(self._runUntilFired(d), len(data))
+        self.assertEqual(
+            file(os.path.join(self.testDir, 'testfile1')).read(), data)
+        self.assertEqual(self.server.openFiles, {})
+
+
+
+class ScanDirectoryTests(unittest.TestCase):
+    """
+    Tests for L{filetransfer.FileTransferServer._scanDirectory}.
+    """
+
+    if not unix:
+        skip = "can't run on non-posix computers"
+
+    def test_deferredEntries(self):
+        """
+        Entries given by a directory iterator as L{Deferred}s are waited
+        for, and a L{Deferred} which fails with L{StopIteration} ends the
+        listing.
+        """
+        server = filetransfer.FileTransferServer(avatar=TestAvatar())
+        entries = [('a', 'a', {}), defer.succeed(('b', 'b', {})),
+                   defer.fail(StopIteration())]
+        d = defer.maybeDeferred(server._scanDirectory, iter(entries), [])
+        self.assertEqual(self.successResultOf(d),
+                         [('a', 'a', {}), ('b', 'b', {})])
+
+
+    def test_deferredEnd(self):
+        """
+        If the first entry is a L{Deferred} which fails with
+        L{StopIteration}, the listing fails with L{EOFError}.
+        """
+        server = filetransfer.FileTransferServer(avatar=TestAvatar())
+        d = defer.maybeDeferred(server._scanDirectory,
+                                iter([defer.fail(StopIteration())]), [])
+        self.failureResultOf(d, EOFError)
+
+
+
 class FakeConn:
     def sendClose(self, channel):
         pass
@@ -768,3 +858,321 @@ class RawPacketDataTests(unittest.TestCase):
         """
         self.assertEqual(result[0], 'msg')
         self.assertEqual(result[1], '')
+
+
+
+class RequestWindowTests(unittest.TestCase):
+    """
+    Tests for L{filetransfer._RequestWindow}.
+    """
+
+    def setUp(self):
+        self.clock = Clock()
+        self.window = filetransfer._RequestWindow(
+            self.clock, initial=4, maximum=10)
+
+
+    def roundTrip(self, rtt):
+        """
+        Complete a request which takes C{rtt} seconds.
+        """
+        sentAt = self.window.sent()
+        self.clock.advance(rtt)
+        self.window.completed(sentAt)
+
+
+    def test_initialLimits(self):
+        """
+        The initial size is brought within the minimum and maximum.
+        """
+        self.assertEqual(
+            filetransfer._RequestWindow(Clock(), initial=100,
+                                        maximum=10).size, 10)
+        self.assertEqual(
+            filetransfer._RequestWindow(Clock(), initial=0).size, 1)
+
+
+    def test_growsWhileFast(self):
+        """
+        Each request completing within twice the shortest round trip time
+        grows the window by one, up to the maximum.
+        """
+        self.roundTrip(0.1)
+        self.assertEqual(self.window.size, 5)
+        self.assertEqual(self.window.minimumRTT, 0.1)
+        self.roundTrip(0.2)
+        self.assertEqual(self.window.size, 6)
+        for i in range(10):
+            self.roundTrip(0.1)
+        self.assertEqual(self.window.size, 10)
+
+
+    def test_shrinksOncePerRoundTrip(self):
+        """
+        Slow responses shrink the window by one, but not again for responses
+        to requests sent before the previous reduction.
+        """
+        self.roundTrip(0.1)
+        sentAt = [self.window.sent() for i in range(3)]
+        self.clock.advance(1)
+        for when in sentAt:
+            self.window.completed(when)
+        self.assertEqual(self.window.size, 4)
+        self.roundTrip(1)
+        self.assertEqual(self.window.size, 3)
+
+
+    def test_additiveGrowthAfterCongestion(self):
+        """
+        Once the window has been shrunk, fast responses grow it by one only
+        after a whole window of them.
+        """
+        self.roundTrip(0.1)
+        self.roundTrip(1)
+        self.assertEqual(self.window.size, 4)
+        for i in range(3):
+            self.roundTrip(0.1)
+        self.assertEqual(self.window.size, 4)
+        self.roundTrip(0.1)
+        self.assertEqual(self.window.size, 5)
+
+
+
+class FakeRemoteFile(object):
+    """
+    An L{ISFTPFile} whose reads and writes are answered by the test.
+
+    @ivar reads: A list of C{(offset, length, Deferred)} for each read.
+    @ivar writes: A list of C{(offset, data, Deferred)} for each write.
+    """
+
+    def __init__(self):
+        self.reads = []
+        self.writes = []
+
+
+    def readChunk(self, offset, length):
+        d = defer.Deferred()
+        self.reads.append((offset, length, d))
+        return d
+
+
+    def writeChunk(self, offset, data):
+        d = defer.Deferred()
+        self.writes.append((offset, data, d))
+        return d
+
+
+
+class PipelinedDownloadTests(unittest.TestCase):
+    """
+    Tests for L{filetransfer._PipelinedDownload}.
+    """
+
+    def setUp(self):
+        self.remoteFile = FakeRemoteFile()
+        self.consumer = StringTransport()
+        self.window = filetransfer._RequestWindow(
+            Clock(), initial=3, maximum=3)
+        self.download = filetransfer._PipelinedDownload(
+            self.remoteFile, self.consumer, 10, self.window)
+        self.result = []
+        self.download.start().addBoth(self.result.append)
+
+
+    def answer(self, index, data):
+        """
+        Answer one of the reads made so far.
+        """
+        self.remoteFile.reads[index][2].callback(data)
+
+
+    def eof(self, index):
+        """
+        Answer one of the reads made so far with end of file.
+        """
+        self.remoteFile.reads[index][2].errback(EOFError())
+
+
+    def test_window(self):
+        """
+        As many reads as the window allows are made at consecutive offsets,
+        and another is made as each is answered.
+        """
+        self.assertEqual(self.consumer.producer, self.download)
+        self.assertTrue(self.consumer.streaming)
+        self.assertEqual([(offset, length) for (offset, length, d)
+                          in self.remoteFile.reads],
+                         [(0, 10), (10, 10), (20, 10)])
+        self.answer(0, 'a' * 10)
+        self.assertEqual(self.remoteFile.reads[-1][:2], (30, 10))
+
+
+    def test_outOfOrder(self):
+        """
+        Data is written to the consumer in order, whatever order the reads
+        are answered in.
+        """
+        self.answer(2, 'c' * 10)
+        self.answer(1, 'b' * 10)
+        self.assertEqual(self.consumer.value(), '')
+        self.answer(0, 'a' * 10)
+        self.assertEqual(self.consumer.value(),
+                         'a' * 10 + 'b' * 10 + 'c' * 10)
+
+
+    def test_shortRead(self):
+        """
+        When fewer bytes are returned than were asked for, the rest are asked
+        for again before the end of the file is sought.
+        """
+        self.answer(0, 'a' * 4)
+        self.assertEqual(self.remoteFile.reads[-1][:2], (4, 6))
+        self.answer(1, 'b' * 10)
+        self.answer(3, 'a' * 6)
+        self.assertEqual(self.consumer.value(), 'a' * 10 + 'b' * 10)
+
+
+    def test_eof(self):
+        """
+        No more reads are made past the end of the file, and once every read
+        has been answered the consumer is unregistered and the transfer
+        fires with the number of bytes written.
+        """
+        self.answer(0, 'a' * 10)
+        self.answer(1, 'b' * 5)
+        self.eof(2)
+        self.eof(3)
+        self.assertEqual(len(self.remoteFile.reads), 5)
+        self.assertEqual(self.remoteFile.reads[4][:2], (15, 5))
+        self.assertEqual(self.result, [])
+        self.eof(4)
+        self.assertEqual(self.result, [15])
+        self.assertEqual(self.consumer.value(), 'a' * 10 + 'b' * 5)
+        self.assertIdentical(self.consumer.producer, None)
+
+
+    def test_pause(self):
+        """
+        While the consumer has paused the transfer no more reads are made.
+        """
+        self.download.pauseProducing()
+        self.answer(0, 'a' * 10)
+        self.assertEqual(len(self.remoteFile.reads), 3)
+        self.download.resumeProducing()
+        self.assertEqual(len(self.remoteFile.reads), 4)
+
+
+    def test_error(self):
+        """
+        An error other than end of file fails the transfer once the
+        outstanding reads have been answered.
+        """
+        self.remoteFile.reads[0][2].errback(
+            filetransfer.SFTPError(filetransfer.FX_FAILURE, 'oops'))
+        self.answer(1, 'b' * 10)
+        self.assertEqual(self.result, [])
+        self.answer(2, 'c' * 10)
+        self.assertEqual(len(self.remoteFile.reads), 3)
+        self.result[0].trap(filetransfer.SFTPError)
+
+
+    def test_stopProducing(self):
+        """
+        If the consumer stops the transfer, no more data is written to it and
+        the transfer fails with L{defer.CancelledError}.
+        """
+        self.download.stopProducing()
+        for i in range(3):
+            self.answer(i, 'a' * 10)
+        self.assertEqual(self.consumer.value(), '')
+        self.result[0].trap(defer.CancelledError)
+
+
+    def test_fileWithoutConsumerInterface(self):
+        """
+        Any object with a C{write} method can be downloaded to.
+        """
+        remoteFile = FakeRemoteFile()
+        local = StringIO()
+        download = filetransfer._PipelinedDownload(
+            remoteFile, local, 10, self.window)
+        result = []
+        download.start().addCallback(result.append)
+        remoteFile.reads[0][2].callback('abc')
+        for offset, length, d in remoteFile.reads[1:]:
+            d.errback(EOFError())
+        self.assertEqual(local.getvalue(), 'abc')
+        self.assertEqual(result, [3])
+
+
+
+class PipelinedUploadTests(unittest.TestCase):
+    """
+    Tests for L{filetransfer._PipelinedUpload}.
+    """
+
+    def setUp(self):
+        self.remoteFile = FakeRemoteFile()
+        self.window = filetransfer._RequestWindow(
+            Clock(), initial=2, maximum=2)
+        self.upload = filetransfer._PipelinedUpload(
+            self.remoteFile, 4, self.window)
+        self.result = []
+        self.upload.deferred.addBoth(self.result.append)
+
+
+    def test_pullProducer(self):
+        """
+        A non-streaming producer is asked for data while there is room in the
+        window, and each chunk is written at the next offset.
+        """
+        source = StringIO('abcdefghij')
+        sender = basic.FileSender()
+        sender.CHUNK_SIZE = 4
+        sender.beginFileTransfer(source, self.upload)
+        self.assertEqual([(offset, data) for (offset, data, d)
+                          in self.remoteFile.writes],
+                         [(0, 'abcd'), (4, 'efgh')])
+        self.remoteFile.writes[1][2].callback(None)
+        self.remoteFile.writes[0][2].callback(None)
+        self.assertEqual(self.remoteFile.writes[2][:2], (8, 'ij'))
+        self.assertEqual(self.result, [])
+        self.remoteFile.writes[2][2].callback(None)
+        self.assertEqual(self.result, [10])
+
+
+    def test_streamingProducer(self):
+        """
+        A streaming producer is paused while the window is full, and resumed
+        when there is room in it.  Writes larger than a chunk are split.
+        """
+        producer = StringTransport()
+        self.upload.registerProducer(producer, True)
+        self.upload.write('abcdef')
+        self.assertEqual(producer.producerState, 'paused')
+        self.assertEqual([(offset, data) for (offset, data, d)
+                          in self.remoteFile.writes],
+                         [(0, 'abcd'), (4, 'ef')])
+        self.remoteFile.writes[0][2].callback(None)
+        self.assertEqual(producer.producerState, 'producing')
+        self.upload.unregisterProducer()
+        self.assertEqual(self.result, [])
+        self.remoteFile.writes[1][2].callback(None)
+        self.assertEqual(self.result, [6])
+
+
+    def test_error(self):
+        """
+        A failed write stops the producer and fails the upload once the
+        other writes have been answered.
+        """
+        producer = StringTransport()
+        self.upload.registerProducer(producer, True)
+        self.upload.write('abcdef')
+        self.remoteFile.writes[0][2].errback(
+            filetransfer.SFTPError(filetransfer.FX_FAILURE, 'oops'))
+        self.assertEqual(producer.producerState, 'stopped')
+        self.assertEqual(self.result, [])
+        self.remoteFile.writes[1][2].callback(None)
+        self.result[0].trap(filetransfer.SFTPError)
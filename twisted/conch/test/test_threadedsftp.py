@@ -0,0 +1,458 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Tests for L{twisted.conch.ssh.threadedsftp}.
+"""
+
+from zope.interface import implementer
+from zope.interface.verify import verifyObject
+
+from twisted.conch.interfaces import ISFTPServer, ISFTPFile
+from twisted.conch.ssh import threadedsftp
+from twisted.python.failure import Failure
+from twisted.trial import unittest
+
+
+
+class QueueingThreadPool(object):
+    """
+    A thread pool which runs calls only when the test tells it to.
+
+    @ivar calls: The calls waiting to be run.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+
+    def callInThreadWithCallback(self, onResult, f, *args, **kwargs):
+        self.calls.append((onResult, f, args, kwargs))
+
+
+    def runOne(self):
+        """
+        Run the oldest waiting call.
+        """
+        onResult, f, args, kwargs = self.calls.pop(0)
+        try:
+            result = f(*args, **kwargs)
+        except:
+            onResult(False, Failure())
+        else:
+            onResult(True, result)
+
+
+    def runAll(self):
+        """
+        Run calls until there are none waiting.
+        """
+        while self.calls:
+            self.runOne()
+
+
+
+class ImmediateReactor(object):
+    """
+    A reactor which runs calls from threads at once.
+    """
+
+    def callFromThread(self, f, *args, **kwargs):
+        f(*args, **kwargs)
+
+
+
+class Avatar(object):
+    def __init__(self, username):
+        self.username = username
+
+
+
+@implementer(ISFTPFile)
+class MemoryFile(object):
+    """
+    An L{ISFTPFile} holding its contents in memory and recording the calls
+    made to it.
+    """
+
+    def __init__(self, data=''):
+        self.data = data
+        self.calls = []
+
+
+    def readChunk(self, offset, length):
+        self.calls.append(('read', offset, length))
+        return self.data[offset:offset + length]
+
+
+    def writeChunk(self, offset, data):
+        self.calls.append(('write', offset, data))
+        if offset > len(self.data):
+            self.data += '\0' * (offset - len(self.data))
+        self.data = (self.data[:offset] + data +
+                     self.data[offset + len(data):])
+
+
+    def getAttrs(self):
+        return {'size': len(self.data)}
+
+
+    def setAttrs(self, attrs):
+        raise NotImplementedError()
+
+
+    def close(self):
+        self.calls.append(('close',))
+
+
+
+class MemoryDirectory(object):
+    """
+    A directory listing, closed or not.
+    """
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.closed = False
+
+
+    def __iter__(self):
+        return iter(self.entries)
+
+
+    def close(self):
+        self.closed = True
+
+
+
+@implementer(ISFTPServer)
+class MemorySFTPServer(object):
+    """
+    An L{ISFTPServer} with files and directories in memory.
+    """
+
+    def __init__(self, username='alice'):
+        self.avatar = Avatar(username)
+        self.files = {}
+        self.directories = {}
+
+
+    def gotVersion(self, otherVersion, extData):
+        return {}
+
+
+    def openFile(self, filename, flags, attrs):
+        return self.files.setdefault(filename, MemoryFile())
+
+
+    def removeFile(self, filename):
+        del self.files[filename]
+
+
+    def openDirectory(self, path):
+        return self.directories[path]
+
+
+    def getAttrs(self, path, followLinks):
+        return self.files[path].getAttrs()
+
+
+    def realPath(self, path):
+        return '/' + path
+
+
+
+class ThreadedSFTPTestCase(unittest.TestCase):
+    """
+    Base class for tests which run a L{threadedsftp.ThreadedSFTPServer} in a
+    L{QueueingThreadPool}.
+    """
+
+    def setUp(self):
+        self.pool = QueueingThreadPool()
+        self.backend = MemorySFTPServer()
+        self.server = self.makeServer(self.backend)
+
+
+    def makeServer(self, backend, limits=None, **kwargs):
+        if limits is None:
+            limits = threadedsftp.ConcurrencyLimits()
+        return threadedsftp.ThreadedSFTPServer(
+            backend, threadpool=self.pool, limits=limits,
+            reactor=ImmediateReactor(), **kwargs)
+
+
+    def runPool(self, d):
+        """
+        Run the waiting calls and get the result of a L{Deferred}.
+        """
+        self.pool.runAll()
+        return self.successResultOf(d)
+
+
+
+class ConcurrencyLimitsTests(unittest.TestCase):
+    """
+    Tests for L{threadedsftp.ConcurrencyLimits}.
+    """
+
+    def test_semaphorePerUser(self):
+        """
+        Each user has one semaphore, with the default limit unless they have
+        their own.
+        """
+        limits = threadedsftp.ConcurrencyLimits(default=3, perUser={'bob': 1})
+        alice = limits.semaphoreFor('alice')
+        self.assertIdentical(limits.semaphoreFor('alice'), alice)
+        self.assertEqual(alice.limit, 3)
+        self.assertEqual(limits.semaphoreFor('bob').limit, 1)
+
+
+
+class ThreadedSFTPServerTests(ThreadedSFTPTestCase):
+    """
+    Tests for L{threadedsftp.ThreadedSFTPServer}.
+    """
+
+    def test_interface(self):
+        """
+        L{threadedsftp.ThreadedSFTPServer} provides L{ISFTPServer}, with the
+        avatar of the server it wraps.
+        """
+        self.assertTrue(verifyObject(ISFTPServer, self.server))
+        self.assertIdentical(self.server.avatar, self.backend.avatar)
+
+
+    def test_pathOperationsInReactorThread(self):
+        """
+        Operations which name a path are called in the reactor thread, where
+        the wrapped server may switch the process to the user's identity.
+        """
+        self.backend.files['a'] = MemoryFile()
+        self.server.removeFile('a')
+        self.assertNotIn('a', self.backend.files)
+        self.assertEqual(self.server.realPath('b'), '/b')
+        self.assertEqual(self.pool.calls, [])
+
+
+    def test_openFile(self):
+        """
+        Files are opened in the reactor thread and wrapped in
+        L{threadedsftp.ThreadedSFTPFile}.
+        """
+        f = self.successResultOf(self.server.openFile('a', 0, {}))
+        self.assertEqual(self.pool.calls, [])
+        self.assertIsInstance(f, threadedsftp.ThreadedSFTPFile)
+        self.assertTrue(verifyObject(ISFTPFile, f))
+        self.assertIdentical(f.file, self.backend.files['a'])
+
+
+    def test_openFileFailure(self):
+        """
+        An exception raised by the wrapped server when opening a file fails
+        the L{Deferred}.
+        """
+        def openFile(filename, flags, attrs):
+            raise OSError("permission denied")
+        self.backend.openFile = openFile
+        self.failureResultOf(self.server.openFile('a', 0, {}), OSError)
+
+
+    def test_openDirectory(self):
+        """
+        Directories are opened, and listed, by the wrapped server in the
+        reactor thread.
+        """
+        directory = MemoryDirectory([])
+        self.backend.directories['d'] = directory
+        self.assertIdentical(self.server.openDirectory('d'), directory)
+        self.assertEqual(self.pool.calls, [])
+
+
+
+class ThreadedSFTPFileTests(ThreadedSFTPTestCase):
+    """
+    Tests for L{threadedsftp.ThreadedSFTPFile}.
+    """
+
+    def setUp(self):
+        ThreadedSFTPTestCase.setUp(self)
+        self.server.readAhead = 100
+        self.server.maxCoalescedWrite = 10
+        self.memoryFile = self.backend.files['a'] = MemoryFile('x' * 250)
+        self.file = self.runPool(self.server.openFile('a', 0, {}))
+
+
+    def test_readAhead(self):
+        """
+        A read fetches L{threadedsftp.ThreadedSFTPServer.readAhead} bytes, and
+        later reads within them are answered without calling the wrapped
+        file.
+        """
+        self.assertEqual(self.runPool(self.file.readChunk(0, 10)), 'x' * 10)
+        self.assertEqual(self.runPool(self.file.readChunk(10, 90)), 'x' * 90)
+        self.assertEqual(self.memoryFile.calls, [('read', 0, 100)])
+        self.assertEqual(self.runPool(self.file.readChunk(90, 20)), 'x' * 20)
+        self.assertEqual(self.memoryFile.calls,
+                         [('read', 0, 100), ('read', 90, 100)])
+
+
+    def test_readAheadEOF(self):
+        """
+        Reads past the end of data which was cut short by the end of the file
+        are answered from memory.
+        """
+        self.runPool(self.file.readChunk(200, 10))
+        self.assertEqual(self.runPool(self.file.readChunk(240, 20)), 'x' * 10)
+        self.assertEqual(self.runPool(self.file.readChunk(250, 10)), '')
+        self.assertEqual(self.memoryFile.calls, [('read', 200, 100)])
+
+
+    def test_writesCoalesced(self):
+        """
+        Consecutive writes made while the file is busy are made with one call
+        to the wrapped file, and each one's L{Deferred} fires when it is
+        done.
+        """
+        first = self.file.writeChunk(0, 'abc')
+        second = self.file.writeChunk(3, 'def')
+        third = self.file.writeChunk(6, 'ghi')
+        self.assertNoResult(second)
+        self.pool.runOne()
+        self.assertNoResult(second)
+        self.pool.runAll()
+        for d in first, second, third:
+            self.assertIdentical(self.successResultOf(d), None)
+        self.assertEqual(self.memoryFile.calls,
+                         [('write', 0, 'abc'), ('write', 3, 'defghi')])
+
+
+    def test_writeNotCoalesced(self):
+        """
+        Writes which do not follow on from the previous one, or which would
+        make the write larger than
+        L{threadedsftp.ThreadedSFTPServer.maxCoalescedWrite}, are made
+        separately.
+        """
+        self.file.writeChunk(0, 'abc')
+        self.file.writeChunk(3, 'def')
+        self.file.writeChunk(20, 'ghi')
+        self.file.writeChunk(23, 'jklmnop')
+        self.file.writeChunk(30, 'q')
+        self.pool.runAll()
+        self.assertEqual(self.memoryFile.calls,
+                         [('write', 0, 'abc'), ('write', 3, 'def'),
+                          ('write', 20, 'ghijklmnop'), ('write', 30, 'q')])
+
+
+    def test_writeFailure(self):
+        """
+        If a coalesced write fails, the L{Deferred} of every write in it
+        fails.
+        """
+        def writeChunk(offset, data):
+            raise IOError("disk full")
+        self.memoryFile.writeChunk = writeChunk
+        first = self.file.writeChunk(0, 'abc')
+        second = self.file.writeChunk(3, 'def')
+        third = self.file.writeChunk(6, 'ghi')
+        self.pool.runAll()
+        self.failureResultOf(first, IOError)
+        self.failureResultOf(second, IOError)
+        self.failureResultOf(third, IOError)
+
+
+    def test_orderPreserved(self):
+        """
+        A read requested after a write sees the data written, and writes
+        requested after it are not combined with writes requested before.
+        """
+        self.runPool(self.file.readChunk(0, 10))
+        self.file.writeChunk(0, 'abc')
+        self.file.writeChunk(3, 'def')
+        read = self.file.readChunk(0, 10)
+        self.file.writeChunk(6, 'ghi')
+        self.assertEqual(self.runPool(read), 'abcdefxxxx')
+        self.assertEqual(self.memoryFile.calls,
+                         [('read', 0, 100), ('write', 0, 'abc'),
+                          ('write', 3, 'def'), ('read', 0, 100),
+                          ('write', 6, 'ghi')])
+
+
+    def test_closeAfterWrites(self):
+        """
+        The wrapped file is closed after the writes requested before it.
+        """
+        self.file.writeChunk(0, 'abc')
+        self.file.writeChunk(3, 'def')
+        self.runPool(self.file.close())
+        self.assertEqual(self.memoryFile.calls[-1], ('close',))
+        self.assertEqual(self.memoryFile.data[:6], 'abcdef')
+
+
+    def test_runsInThreadPool(self):
+        """
+        Reads and writes are made in the thread pool.
+        """
+        read = self.file.readChunk(0, 10)
+        self.assertEqual(self.memoryFile.calls, [])
+        self.assertEqual(len(self.pool.calls), 1)
+        self.assertEqual(self.runPool(read), 'x' * 10)
+
+
+    def test_failure(self):
+        """
+        An exception raised by the wrapped file fails the L{Deferred}.
+        """
+        def readChunk(offset, length):
+            raise IOError("input/output error")
+        self.memoryFile.readChunk = readChunk
+        d = self.file.readChunk(0, 10)
+        self.pool.runAll()
+        self.failureResultOf(d, IOError)
+
+
+    def test_userLimit(self):
+        """
+        No more than the user's limit of calls are made at once; the others
+        wait their turn.  Other users are not held up.
+        """
+        limits = threadedsftp.ConcurrencyLimits(default=1)
+        server = self.makeServer(self.backend, limits)
+        otherBackend = MemorySFTPServer('bob')
+        otherBackend.files['c'] = MemoryFile('c')
+        other = self.makeServer(otherBackend, limits)
+        self.backend.files['b'] = MemoryFile('b')
+        first = self.successResultOf(server.openFile('a', 0, {}))
+        second = self.successResultOf(server.openFile('b', 0, {}))
+        third = self.successResultOf(other.openFile('c', 0, {}))
+        firstRead = first.readChunk(0, 1)
+        secondRead = second.readChunk(0, 1)
+        thirdRead = third.readChunk(0, 1)
+        self.assertEqual(len(self.pool.calls), 2)
+        self.pool.runOne()
+        self.assertEqual(self.successResultOf(firstRead), 'x')
+        self.assertEqual(len(self.pool.calls), 2)
+        self.pool.runAll()
+        self.assertEqual(self.successResultOf(secondRead), 'b')
+        self.assertEqual(self.successResultOf(thirdRead), 'c')
+
+
+    def test_getAttrs(self):
+        """
+        Attributes are got in the thread pool, after earlier writes.
+        """
+        self.file.writeChunk(250, 'abc')
+        self.assertEqual(self.runPool(self.file.getAttrs()), {'size': 253})
+
+
+    def test_setAttrs(self):
+        """
+        Attributes are set in the reactor thread, after earlier writes.
+        """
+        self.file.writeChunk(0, 'abc')
+        d = self.file.setAttrs({})
+        self.assertNoResult(d)
+        self.assertEqual(len(self.pool.calls), 1)
+        self.pool.runAll()
+        self.failureResultOf(d, NotImplementedError)
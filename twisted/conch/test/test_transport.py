@@ -580,6 +580,30 @@ class BaseSSHTransportTests(TransportTestCase):
         self.assertEqual(proto.getPacket(), 'ABCDEFG')
 
 
+    def test_dataReceivedManyPackets(self):
+        """
+        All of the complete packets delivered by one call to C{dataReceived}
+        are dispatched, and only the incomplete packet after them is left in
+        the buffer.
+        """
+        proto = MockTransportBase()
+        proto.sendKexInit = lambda: None
+        proto.makeConnection(self.transport)
+        self.transport.clear()
+        proto.gotVersion = True
+        proto.currentEncryptions = MockCipher()
+        for message in ['a', 'bc', 'def']:
+            proto.sendIgnore(message)
+        value = self.transport.value()
+        proto.dataReceived(value[:-1])
+        self.assertEqual(proto.ignoreds, [common.NS('a'), common.NS('bc')])
+        self.assertEqual(proto._bufOffset, 0)
+        proto.dataReceived(value[-1:])
+        self.assertEqual(proto.ignoreds,
+                         [common.NS('a'), common.NS('bc'), common.NS('def')])
+        self.assertEqual(proto.buf, '')
+
+
     def test_ciphersAreValid(self):
         """
         Test that all the supportedCiphers are valid.
@@ -1915,6 +1939,30 @@ class SSHCiphersTests(unittest.TestCase):
                 self.assertTrue(getClass(cip).__name__.startswith(modName))
 
 
+    def test_counterMode(self):
+        """
+        The counter mode ciphers returned by L{SSHCiphers._getCipher} start
+        counting at the initialization vector and carry into higher bytes,
+        just like L{transport._Counter}.  (The initialization vector is not
+        zero in the bytes an 8-byte block cipher uses, since
+        L{transport._Counter} would start counting at one instead.)
+        """
+        ciphers = transport.SSHCiphers('A', 'B', 'C', 'D')
+        iv = '\x01\x02\x03\x04\x05\x06\xff\xfe' + '\x07' * 6 + '\xff\xfe'
+        key = '\x01' * 32
+        for cipName, (modName, keySize, counter) in ciphers.cipherMap.items():
+            if not counter:
+                continue
+            mod = __import__('Crypto.Cipher.%s' % modName, {}, {}, 'x')
+            expected = mod.new(
+                key[:keySize], mod.MODE_CTR, iv[:mod.block_size],
+                counter=transport._Counter(iv, mod.block_size))
+            data = '\x00' * (mod.block_size * 4)
+            self.assertEqual(
+                ciphers._getCipher(cipName, iv, key).encrypt(data),
+                expected.encrypt(data))
+
+
     def test_setKeysCiphers(self):
         """
         Test that setKeys sets up the ciphers.
@@ -415,19 +415,25 @@ class UnixSFTPFile:
             server.avatar._runAsUser(server._setAttrs, filename, attrs)
         self.fd = fd
 
+    # Access to an open file was checked when it was opened, so operations
+    # on the descriptor need not switch users.  They may then be called from
+    # threads other than the reactor's (see
+    # twisted.conch.ssh.threadedsftp), which must never switch users, since
+    # the effective IDs belong to the whole process.
+
     def close(self):
-        return self.server.avatar._runAsUser(os.close, self.fd)
+        return os.close(self.fd)
 
     def readChunk(self, offset, length):
-        return self.server.avatar._runAsUser([ (os.lseek, (self.fd, offset, 0)),
-                                               (os.read, (self.fd, length)) ])
+        os.lseek(self.fd, offset, 0)
+        return os.read(self.fd, length)
 
     def writeChunk(self, offset, data):
-        return self.server.avatar._runAsUser([(os.lseek, (self.fd, offset, 0)),
-                                       (os.write, (self.fd, data))])
+        os.lseek(self.fd, offset, 0)
+        return os.write(self.fd, data)
 
     def getAttrs(self):
-        s = self.server.avatar._runAsUser(os.fstat, self.fd)
+        s = os.fstat(self.fd)
         return self.server._getAttrs(s)
 
     def setAttrs(self, attrs):
@@ -0,0 +1,364 @@
+# -*- test-case-name: twisted.internet.test.test_mmsg -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Very low-level ctypes-based interface to the Linux C{recvmmsg(2)} and
+C{sendmmsg(2)} system calls, which receive or send several datagrams at once.
+
+ctypes and a version of libc which supports these system calls are required.
+Only IPv4 and IPv6 datagram sockets are supported.
+"""
+
+from __future__ import division, absolute_import
+
+import ctypes
+import ctypes.util
+import os
+import socket
+import struct
+from errno import EAGAIN, EMSGSIZE, EWOULDBLOCK
+
+from twisted.python.runtime import platform
+
+if not platform.isLinux():
+    raise ImportError("recvmmsg and sendmmsg are only available on Linux.")
+
+
+
+class _iovec(object):
+    """
+    The layout of C{struct iovec}.  (C{size_t} is the same size as C{unsigned
+    long} on Linux.)
+    """
+    format = "PL"
+    size = struct.calcsize("@" + format)
+
+
+
+class _mmsghdr(object):
+    """
+    The layout of C{struct mmsghdr}: the fields of C{struct msghdr}, from
+    C{msg_name} to C{msg_flags}, padded to the alignment of a pointer and
+    followed by C{msg_len}.
+    """
+    format = "PIPLPLi0PI"
+    size = struct.calcsize("@" + format + "0P")
+
+
+
+def _arrayFormat(layout):
+    """
+    Make a function returning a L{struct.Struct} for an array of a C
+    structure.
+
+    @param layout: L{_iovec} or L{_mmsghdr}.
+    """
+    padding = layout.size - struct.calcsize("@" + layout.format)
+    element = layout.format + "x" * padding
+    cache = {}
+    def arrayFormat(count):
+        format = cache.get(count)
+        if format is None:
+            format = cache[count] = struct.Struct("@" + element * count)
+        return format
+    return arrayFormat
+
+_iovecFormat = _arrayFormat(_iovec)
+_headerFormat = _arrayFormat(_mmsghdr)
+
+
+
+def _flatten(sequences):
+    """
+    Concatenate some sequences into a L{list}.
+    """
+    result = []
+    for sequence in sequences:
+        result.extend(sequence)
+    return result
+
+
+
+# Large enough for a struct sockaddr_in6, the largest address supported.
+_NAME_SIZE = 32
+
+_familyFormat = struct.Struct("=H")
+_ipv4Format = struct.Struct("!H4s")
+_ipv6Format = struct.Struct("!HI16s")
+_scopeFormat = struct.Struct("=I")
+
+# Addresses recently decoded or encoded, which are most often those of the
+# same few peers.
+_decoded = {}
+_encoded = {}
+_CACHE_SIZE = 1024
+
+
+
+def _error():
+    """
+    Make a L{socket.error} describing the last failed system call.
+    """
+    errno = ctypes.get_errno()
+    return socket.error(errno, os.strerror(errno))
+
+
+
+def decodeAddress(name):
+    """
+    Convert a C{struct sockaddr_in} or C{struct sockaddr_in6} to the address
+    tuple L{socket.socket.recvfrom} would give for it.
+
+    @param name: The bytes of the structure.
+    @type name: L{bytes}
+
+    @return: C{(host, port)} for an IPv4 address, or C{(host, port,
+        flowinfo, scopeid)} for an IPv6 one.
+    """
+    address = _decoded.get(name)
+    if address is None:
+        family, = _familyFormat.unpack_from(name)
+        if family == socket.AF_INET:
+            port, host = _ipv4Format.unpack_from(name, 2)
+            address = (socket.inet_ntop(family, host), port)
+        else:
+            port, flowinfo, host = _ipv6Format.unpack_from(name, 2)
+            scopeid, = _scopeFormat.unpack_from(name, 24)
+            address = (socket.inet_ntop(family, host), port, flowinfo,
+                       scopeid)
+        if len(_decoded) >= _CACHE_SIZE:
+            _decoded.clear()
+        _decoded[name] = address
+    return address
+
+
+
+def encodeAddress(family, address):
+    """
+    Convert an address tuple to a C{struct sockaddr_in} or C{struct
+    sockaddr_in6}.
+
+    @param family: L{socket.AF_INET} or L{socket.AF_INET6}.
+
+    @param address: C{(host, port)}, where C{host} is an IP address.
+
+    @return: The bytes of the structure.
+    @rtype: L{bytes}
+
+    @raise ValueError: If the host is not an IP address of the given family.
+    """
+    key = (family, address)
+    name = _encoded.get(key)
+    if name is None:
+        host, port = address[:2]
+        try:
+            host = socket.inet_pton(family, host)
+        except (socket.error, TypeError, UnicodeError):
+            raise ValueError("Cannot encode %r" % (address,))
+        if family == socket.AF_INET:
+            name = (_familyFormat.pack(family) +
+                    _ipv4Format.pack(port, host) + b"\0" * 8)
+        else:
+            name = (_familyFormat.pack(family) +
+                    _ipv6Format.pack(port, 0, host) + _scopeFormat.pack(0))
+        if len(_encoded) >= _CACHE_SIZE:
+            _encoded.clear()
+        _encoded[key] = name
+    return name
+
+
+
+def _buffer(size):
+    """
+    Allocate a buffer which can be filled and read without calling any
+    foreign functions, and whose address can be given to them.
+
+    @param size: The size of the buffer in bytes.
+
+    @return: A L{bytearray} and a ctypes array sharing its memory.
+    """
+    data = bytearray(size)
+    return data, (ctypes.c_char * size).from_buffer(data)
+
+
+
+class Receiver(object):
+    """
+    Buffers for receiving up to C{count} datagrams of up to C{size} bytes each
+    with one call to C{recvmmsg}.
+
+    The buffers are only used during a call to L{receive}, so one receiver
+    may be shared by any number of sockets used from the same thread.
+
+    @ivar _used: Whether the last call to C{recvmmsg} received anything, and
+        so overwrote some of the headers.
+    """
+    _used = True
+
+    def __init__(self, count, size):
+        self.count = count
+        self.size = size
+        self._data, data = _buffer(count * size)
+        self._view = memoryview(self._data)
+        self._names, names = _buffer(count * _NAME_SIZE)
+        self._iovecs, iovecs = _buffer(count * _iovec.size)
+        self._headers, self._headersArray = _buffer(count * _mmsghdr.size)
+        _iovecFormat(count).pack_into(self._iovecs, 0, *_flatten(
+                (ctypes.addressof(data) + i * size, size)
+                for i in range(count)))
+        # recvmmsg overwrites the lengths in the headers, so they are reset
+        # from this copy before each call.
+        self._pristine = _headerFormat(count).pack(*_flatten(
+                (ctypes.addressof(names) + i * _NAME_SIZE, _NAME_SIZE,
+                 ctypes.addressof(iovecs) + i * _iovec.size, 1, 0, 0, 0, 0)
+                for i in range(count)))
+
+
+    def receive(self, fd):
+        """
+        Receive the datagrams waiting on a socket, up to C{count} of them.
+
+        @param fd: The file descriptor of a non-blocking IPv4 or IPv6
+            datagram socket.
+
+        @return: A L{list} of C{(data, address)} pairs, as
+            L{socket.socket.recvfrom} would return them, which is empty if
+            there were none waiting.
+
+        @raise socket.error: If datagrams could not be received for any other
+            reason.
+        """
+        if self._used:
+            self._headers[:] = self._pristine
+        received = _recvmmsg(fd, self._headersArray, self.count, 0, None)
+        if received < 0:
+            errno = ctypes.get_errno()
+            if errno == EAGAIN or errno == EWOULDBLOCK:
+                self._used = False
+                return []
+            raise _error()
+        self._used = True
+        fields = _headerFormat(received).unpack_from(self._headers)
+        names = bytes(self._names[:received * _NAME_SIZE])
+        data = self._view
+        size = self.size
+        decoded = _decoded
+        datagrams = []
+        offset = nameOffset = 0
+        for nameLength, length in zip(fields[1::8], fields[7::8]):
+            name = names[nameOffset:nameOffset + nameLength]
+            address = decoded.get(name)
+            if address is None:
+                address = decodeAddress(name)
+            datagrams.append((data[offset:offset + length].tobytes(), address))
+            offset += size
+            nameOffset += _NAME_SIZE
+        return datagrams
+
+
+
+class Sender(object):
+    """
+    Buffers for sending up to C{count} datagrams, of up to C{size} bytes
+    altogether, with one call to C{sendmmsg}.
+
+    The buffers are allocated when they are first used, and are only used
+    during a call to L{send}, so one sender may be shared by any number of
+    sockets used from the same thread.
+    """
+    _data = None
+
+    def __init__(self, count, size):
+        self.count = count
+        self.size = size
+
+
+    def _allocate(self):
+        """
+        Allocate the buffers.
+        """
+        self._data, data = _buffer(self.size)
+        self._view = memoryview(self._data)
+        self._names, names = _buffer(self.count * _NAME_SIZE)
+        self._iovecs, iovecs = _buffer(self.count * _iovec.size)
+        self._headers, self._headersArray = _buffer(
+            self.count * _mmsghdr.size)
+        self._addresses = (ctypes.addressof(data), ctypes.addressof(names),
+                           ctypes.addressof(iovecs))
+
+
+    def send(self, fd, datagrams):
+        """
+        Send datagrams from a socket, as many as fit in the buffers.
+
+        @param fd: The file descriptor of a non-blocking IPv4 or IPv6
+            datagram socket.
+
+        @param datagrams: A L{list} of C{(data, name)} pairs, where C{name} is
+            the destination address as returned by L{encodeAddress}, or
+            C{None} to send to the address the socket is connected to.
+
+        @return: The number of datagrams sent from the start of
+            C{datagrams}, which is at least one.
+
+        @raise socket.error: If the first datagram could not be sent.
+        """
+        if self._data is None:
+            self._allocate()
+        dataAddress, namesAddress, iovecsAddress = self._addresses
+        view = self._view
+        names = self._names
+        iovecs = []
+        headers = []
+        offset = nameOffset = 0
+        for data, name in datagrams[:self.count]:
+            end = offset + len(data)
+            if end > self.size:
+                if not iovecs:
+                    raise socket.error(EMSGSIZE, os.strerror(EMSGSIZE))
+                break
+            view[offset:end] = data
+            iovecs.extend((dataAddress + offset, len(data)))
+            offset = end
+            if name is None:
+                headers.extend((0, 0, iovecsAddress, 1, 0, 0, 0, 0))
+            else:
+                names[nameOffset:nameOffset + len(name)] = name
+                headers.extend((namesAddress + nameOffset, len(name),
+                                iovecsAddress, 1, 0, 0, 0, 0))
+                nameOffset += _NAME_SIZE
+            iovecsAddress += _iovec.size
+        count = len(iovecs) // 2
+        _iovecFormat(count).pack_into(self._iovecs, 0, *iovecs)
+        _headerFormat(count).pack_into(self._headers, 0, *headers)
+        sent = _sendmmsg(fd, self._headersArray, count, 0)
+        if sent < 0:
+            raise _error()
+        return sent
+
+
+
+def initializeModule(libc):
+    """
+    Initialize the module, checking that the expected APIs exist and setting
+    the restype of C{recvmmsg} and C{sendmmsg}.
+
+    (Their argtypes are left unset, since converting the arguments according
+    to them takes about as long as the system calls themselves.  Only
+    integers, ctypes arrays and C{None} are passed to them.)
+    """
+    for function in ("recvmmsg", "sendmmsg"):
+        if getattr(libc, function, None) is None:
+            raise ImportError("libc6 2.14 or higher needed")
+    libc.recvmmsg.restype = ctypes.c_int
+    libc.sendmmsg.restype = ctypes.c_int
+    return libc.recvmmsg, libc.sendmmsg
+
+
+
+name = ctypes.util.find_library('c')
+if not name:
+    raise ImportError("Can't find C library.")
+libc = ctypes.CDLL(name, use_errno=True)
+_recvmmsg, _sendmmsg = initializeModule(libc)
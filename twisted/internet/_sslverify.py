@@ -5,17 +5,23 @@
 
 from __future__ import division, absolute_import
 
+import hmac
 import itertools
+import os
 import warnings
 
-from binascii import a2b_base64
-from hashlib import md5
+from binascii import a2b_base64, hexlify
+from collections import OrderedDict
+from hashlib import md5, sha256
+from weakref import WeakKeyDictionary, WeakSet
 
 import OpenSSL
 from OpenSSL import SSL, crypto
 try:
-    from OpenSSL.SSL import SSL_CB_HANDSHAKE_DONE, SSL_CB_HANDSHAKE_START
+    from OpenSSL.SSL import (
+        SSL_CB_EXIT, SSL_CB_HANDSHAKE_DONE, SSL_CB_HANDSHAKE_START)
 except ImportError:
+    SSL_CB_EXIT = 0x02
     SSL_CB_HANDSHAKE_START = 0x10
     SSL_CB_HANDSHAKE_DONE = 0x20
 
@@ -57,6 +63,11 @@ else:
 
 
 
+# Session resumption by clients needs pyOpenSSL 0.14 or later.
+_canResumeSessions = getattr(SSL.Connection, "set_session", None) is not None
+
+
+
 class SimpleVerificationError(Exception):
     """
     Not a very useful verification error.
@@ -203,8 +214,10 @@ from twisted.internet.interfaces import (
 
 from twisted.python import reflect, util
 from twisted.python.deprecate import _mutuallyExclusiveArguments
-from twisted.python.compat import nativeString, networkString, unicode
+from twisted.python.compat import (
+    nativeString, networkString, unicode, intToBytes)
 from twisted.python.failure import Failure
+from twisted.python.runtime import platform
 from twisted.python.util import FancyEqMixin
 
 from twisted.python.deprecate import deprecated
@@ -220,6 +233,29 @@ def _sessionCounter(counter=itertools.count()):
 
 
 
+# SSL_CTX_set_tlsext_ticket_keys is a macro, so it is not in the bindings;
+# this is the control code it passes to SSL_CTX_ctrl.
+_SSL_CTRL_SET_TLSEXT_TICKET_KEYS = 59
+
+
+
+def _ticketKeySize(version):
+    """
+    Determine the size of the session ticket keys an OpenSSL version expects.
+
+    @param version: The OpenSSL version, as an C{OPENSSL_VERSION_NUMBER}.
+    @type version: L{int}
+
+    @return: 80 bytes (a 16 byte name, a 32 byte HMAC key and a 32 byte AES
+        key) for OpenSSL 1.1.0 and later; 48 bytes (16 bytes each) before.
+    @rtype: L{int}
+    """
+    if version >= 0x10100000:
+        return 80
+    return 48
+
+
+
 _x509names = {
     'CN': 'commonName',
     'commonName': 'commonName',
@@ -1061,6 +1097,137 @@ def _tolerateErrors(wrapped):
 
 
 
+class ClientTLSSessionCache(object):
+    """
+    The TLS sessions a client has negotiated, so that it can offer them when
+    it reconnects to the same server and resume them with an abbreviated
+    handshake.
+
+    Sessions are kept for L{lifetime} seconds; a server which no longer
+    accepts a session offered to it just performs a full handshake.  Once
+    L{maxSessions} are kept, the least recently used are discarded.
+
+    @ivar maxSessions: The number of sessions to keep.
+    @type maxSessions: L{int}
+
+    @ivar lifetime: How many seconds a session is kept for.
+    @type lifetime: L{float}
+
+    @since: 15.3
+    """
+
+    def __init__(self, maxSessions=1000, lifetime=300, clock=None):
+        """
+        @param maxSessions: See L{maxSessions}.
+        @param lifetime: See L{lifetime}.
+
+        @param clock: The L{IReactorTime} provider used to expire sessions;
+            the global reactor if C{None}.
+        """
+        self.maxSessions = maxSessions
+        self.lifetime = lifetime
+        self._clock = clock
+        self._sessions = OrderedDict()
+
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+    def _now(self):
+        """
+        @return: The current time, in seconds since the epoch.
+        """
+        if self._clock is None:
+            from twisted.internet import reactor
+            self._clock = reactor
+        return self._clock.seconds()
+
+
+    def store(self, key, session):
+        """
+        Keep a session.
+
+        @param key: Identifies the server and the settings the session was
+            negotiated with.  Only connections with the same key are offered
+            the session.
+        @type key: hashable
+
+        @param session: The session.
+        @type session: L{OpenSSL.SSL.Session}
+        """
+        self._sessions.pop(key, None)
+        self._sessions[key] = (session, self._now() + self.lifetime)
+        while len(self._sessions) > self.maxSessions:
+            self._sessions.popitem(last=False)
+
+
+    def get(self, key):
+        """
+        Find the session to offer to a server.
+
+        @param key: The key the session was stored with.
+        @type key: hashable
+
+        @return: The session, or C{None} if there is none or it has expired.
+        @rtype: L{OpenSSL.SSL.Session} or C{None}
+        """
+        entry = self._sessions.pop(key, None)
+        if entry is None:
+            return None
+        session, expires = entry
+        if expires <= self._now():
+            return None
+        self._sessions[key] = entry
+        return session
+
+
+    def remove(self, key):
+        """
+        Forget the session stored with a key, if there is one.
+
+        @param key: The key the session was stored with.
+        @type key: hashable
+        """
+        self._sessions.pop(key, None)
+
+
+
+_defaultClientSessionCache = ClientTLSSessionCache()
+
+
+
+def _trustScope(trustRoot, clientCertificate):
+    """
+    Describe the settings a client session is negotiated with which must also
+    apply to any connection it is resumed on, since a resumed session's
+    certificates are not verified again.
+
+    @param trustRoot: The trust root the server's certificate was verified
+        with, or anything adaptable to L{IOpenSSLTrustRoot}.
+
+    @param clientCertificate: The certificate the client authenticated with,
+        or C{None}.
+    @type clientCertificate: L{PrivateCertificate}
+
+    @return: A hashable description of C{trustRoot} and
+        C{clientCertificate}.  Trust roots of unknown types are only equal to
+        themselves.
+    """
+    trustRoot = IOpenSSLTrustRoot(trustRoot)
+    if isinstance(trustRoot, OpenSSLDefaultPaths):
+        trust = OpenSSLDefaultPaths
+    elif isinstance(trustRoot, OpenSSLCertificateAuthorities):
+        trust = tuple(sorted(
+            certificate.digest("sha256") for certificate in trustRoot._caCerts))
+    else:
+        trust = trustRoot
+    if clientCertificate is not None:
+        clientCertificate = clientCertificate.digest("sha256")
+    return (trust, clientCertificate)
+
+
+
 @implementer(IOpenSSLClientConnectionCreator)
 class ClientTLSOptions(object):
     """
@@ -1088,9 +1255,25 @@ class ClientTLSOptions(object):
         than working with Python's built-in (but sometimes broken) IDNA
         encoding.  ASCII values, however, will always work.
     @type _hostnameASCII: L{unicode}
+
+    @ivar _sessionCache: The sessions to offer to servers, and to store new
+        sessions in, or C{None} to always perform a full handshake.
+    @type _sessionCache: L{ClientTLSSessionCache}
+
+    @ivar _sessionKey: The key of the sessions of this client's connections
+        in C{_sessionCache}, unless they are made by L{_forPort}.
+
+    @ivar _connectionSessionKeys: A L{WeakKeyDictionary} mapping each
+        connection whose session may be cached to the key to cache it with.
+
+    @ivar _verifiedSessionKeys: Like L{_connectionSessionKeys}, for the
+        connections whose server's identity has been verified.  With TLS 1.3
+        the server sends the tickets which let its sessions be resumed after
+        the handshake, so their sessions are stored again as they arrive.
     """
 
-    def __init__(self, hostname, ctx):
+    def __init__(self, hostname, ctx, sessionCache=None, port=None,
+                 trustScope=None):
         """
         Initialize L{ClientTLSOptions}.
 
@@ -1099,11 +1282,25 @@ class ClientTLSOptions(object):
 
         @param ctx: an L{SSL.Context} to use for new connections.
         @type ctx: L{SSL.Context}.
+
+        @param sessionCache: See L{_sessionCache}.
+
+        @param port: The port connections are made to, if known.
+        @type port: L{int} or C{None}
+
+        @param trustScope: The result of L{_trustScope} for the settings
+            C{ctx} was created with.
         """
         self._ctx = ctx
         self._hostname = hostname
         self._hostnameBytes = _idnaBytes(hostname)
         self._hostnameASCII = self._hostnameBytes.decode("ascii")
+        if not _canResumeSessions:
+            sessionCache = None
+        self._sessionCache = sessionCache
+        self._sessionKey = (self._hostnameBytes, port, trustScope)
+        self._connectionSessionKeys = WeakKeyDictionary()
+        self._verifiedSessionKeys = WeakKeyDictionary()
         ctx.set_info_callback(
             _tolerateErrors(self._identityVerifyingInfoCallback)
         )
@@ -1122,15 +1319,56 @@ class ClientTLSOptions(object):
         @param tlsProtocol: the TLS protocol initiating the connection.
         @type tlsProtocol: L{twisted.protocols.tls.TLSMemoryBIOProtocol}
 
+        @return: the configured client connection.
+        @rtype: L{OpenSSL.SSL.Connection}
+        """
+        return self._clientConnectionForTLS(tlsProtocol, self._sessionKey)
+
+
+    def _clientConnectionForTLS(self, tlsProtocol, sessionKey):
+        """
+        Create a TLS connection for a client, which offers and stores
+        sessions with the given key.
+
+        @param tlsProtocol: the TLS protocol initiating the connection.
+        @type tlsProtocol: L{twisted.protocols.tls.TLSMemoryBIOProtocol}
+
+        @param sessionKey: The key of the connection's sessions in
+            C{_sessionCache}.
+
         @return: the configured client connection.
         @rtype: L{OpenSSL.SSL.Connection}
         """
         context = self._ctx
         connection = SSL.Connection(context, None)
         connection.set_app_data(tlsProtocol)
+        if self._sessionCache is not None:
+            self._connectionSessionKeys[connection] = sessionKey
+            session = self._sessionCache.get(sessionKey)
+            if session is not None:
+                connection.set_session(session)
         return connection
 
 
+    def _forPort(self, port):
+        """
+        Get a client connection creator like this one, which only offers
+        sessions to the port they were negotiated with.
+
+        @param port: The port connections are made to.
+        @type port: L{int}
+
+        @return: This creator, if it was already given a port; otherwise a
+            creator which makes its connections with this one.
+        @rtype: L{IOpenSSLClientConnectionCreator}
+        """
+        hostname, knownPort, trustScope = self._sessionKey
+        if knownPort is not None:
+            return self
+        return _ClientTLSOptionsForPort(
+            self, (hostname, port, trustScope))
+
+
     def _identityVerifyingInfoCallback(self, connection, where, ret):
         """
         U{info_callback
@@ -1154,8 +1392,63 @@ class ClientTLSOptions(object):
                 verifyHostname(connection, self._hostnameASCII)
             except VerificationError:
                 f = Failure()
+                sessionKey = self._connectionSessionKeys.pop(connection, None)
+                if sessionKey is not None:
+                    self._sessionCache.remove(sessionKey)
                 transport = connection.get_app_data()
                 transport.failVerification(f)
+            else:
+                sessionKey = self._connectionSessionKeys.pop(connection, None)
+                if sessionKey is not None:
+                    self._verifiedSessionKeys[connection] = sessionKey
+                    self._storeSession(connection, sessionKey)
+        elif where & SSL_CB_EXIT:
+            sessionKey = self._verifiedSessionKeys.get(connection)
+            if sessionKey is not None:
+                self._storeSession(connection, sessionKey)
+
+
+    def _storeSession(self, connection, sessionKey):
+        """
+        Keep the current session of a connection in C{_sessionCache}.
+
+        @param connection: The connection, whose server's identity has been
+            verified.
+        @type connection: L{OpenSSL.SSL.Connection}
+
+        @param sessionKey: The key to keep the session with.
+        """
+        session = connection.get_session()
+        if session is not None:
+            self._sessionCache.store(sessionKey, session)
+
+
+
+@implementer(IOpenSSLClientConnectionCreator)
+class _ClientTLSOptionsForPort(object):
+    """
+    A client connection creator which makes its connections with a
+    L{ClientTLSOptions} that was not told the port they are made to, and
+    keeps their sessions under a key which includes that port.
+
+    @ivar _options: The L{ClientTLSOptions}.
+
+    @ivar _sessionKey: The key to offer and store sessions with.
+    """
+
+    def __init__(self, options, sessionKey):
+        self._options = options
+        self._sessionKey = sessionKey
+
+
+    def clientConnectionForTLS(self, tlsProtocol):
+        """
+        Create a TLS connection for a client.
+
+        @see: L{ClientTLSOptions.clientConnectionForTLS}
+        """
+        return self._options._clientConnectionForTLS(
+            tlsProtocol, self._sessionKey)
 
 
 
@@ -1199,6 +1492,19 @@ def optionsForClientTLS(hostname, trustRoot=None, clientCertificate=None,
         interface.
     @type extraCertificateOptions: L{dict}
 
+    @param sessionCache: keyword-only argument; where to keep the sessions
+        negotiated with the server, so that later connections can resume them
+        with an abbreviated handshake.  C{None} disables resumption.  By
+        default, a cache shared by all the creators made by this function is
+        used, unless C{extraCertificateOptions} is given (since a session must
+        only be resumed with the settings it was negotiated with).
+    @type sessionCache: L{ClientTLSSessionCache}
+
+    @param port: keyword-only argument; the port connections will be made to.
+        Sessions are only offered to the port they were negotiated with if it
+        is given, and to any port of C{hostname} otherwise.
+    @type port: L{int}
+
     @param kw: (Backwards compatibility hack to allow keyword-only arguments on
         Python 2.  Please ignore; arbitrary keyword arguments will be errors.)
     @type kw: L{dict}
@@ -1207,6 +1513,12 @@ def optionsForClientTLS(hostname, trustRoot=None, clientCertificate=None,
     @rtype: L{IOpenSSLClientConnectionCreator}
     """
     extraCertificateOptions = kw.pop('extraCertificateOptions', None) or {}
+    if extraCertificateOptions:
+        defaultSessionCache = None
+    else:
+        defaultSessionCache = _defaultClientSessionCache
+    sessionCache = kw.pop('sessionCache', defaultSessionCache)
+    port = kw.pop('port', None)
     if trustRoot is None:
         trustRoot = platformTrust()
     if kw:
@@ -1230,7 +1542,601 @@ def optionsForClientTLS(hostname, trustRoot=None, clientCertificate=None,
         trustRoot=trustRoot,
         **extraCertificateOptions
     )
-    return ClientTLSOptions(hostname, certificateOptions.getContext())
+    return ClientTLSOptions(
+        hostname, certificateOptions.getContext(), sessionCache, port,
+        _trustScope(certificateOptions.trustRoot, clientCertificate))
+
+
+
+class ITLSSessionCache(Interface):
+    """
+    Storage for the TLS sessions negotiated by a server, so that clients can
+    resume them with an abbreviated handshake.
+
+    OpenSSL keeps its own cache of sessions in each process; an
+    L{ITLSSessionCache} is consulted when a session is not found there.  A
+    cache which is shared between processes, such as
+    L{DirectoryTLSSessionCache}, allows a client to resume its session with
+    any of the processes serving a port.
+
+    Sessions are stored serialized and contain their own expiry time, which
+    OpenSSL checks when a session is retrieved, so implementations only need
+    to expire sessions to limit the resources they use.
+
+    @since: 15.3
+    """
+
+    def store(sessionID, session):
+        """
+        Store a newly negotiated session.
+
+        @param sessionID: The identifier of the session.
+        @type sessionID: L{bytes}
+
+        @param session: The serialized session.
+        @type session: L{bytes}
+        """
+
+
+    def retrieve(sessionID):
+        """
+        Find a stored session.
+
+        @param sessionID: The identifier the session was stored with.
+        @type sessionID: L{bytes}
+
+        @return: The serialized session, or C{None} if it is not stored.
+        @rtype: L{bytes} or C{None}
+        """
+
+
+    def remove(sessionID):
+        """
+        Forget a session, because OpenSSL will no longer resume it.
+
+        @param sessionID: The identifier the session was stored with.
+        @type sessionID: L{bytes}
+        """
+
+
+
+@implementer(ITLSSessionCache)
+class MemoryTLSSessionCache(object):
+    """
+    A bounded in-memory L{ITLSSessionCache} which discards the least recently
+    used sessions first.
+
+    @ivar maxSessions: The number of sessions to keep.
+    @type maxSessions: L{int}
+
+    @since: 15.3
+    """
+
+    def __init__(self, maxSessions=20480):
+        """
+        @param maxSessions: See L{maxSessions}.
+        """
+        self.maxSessions = maxSessions
+        self._sessions = OrderedDict()
+
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+    def store(self, sessionID, session):
+        self._sessions.pop(sessionID, None)
+        self._sessions[sessionID] = session
+        while len(self._sessions) > self.maxSessions:
+            self._sessions.popitem(last=False)
+
+
+    def retrieve(self, sessionID):
+        session = self._sessions.pop(sessionID, None)
+        if session is not None:
+            self._sessions[sessionID] = session
+        return session
+
+
+    def remove(self, sessionID):
+        self._sessions.pop(sessionID, None)
+
+
+
+@implementer(ITLSSessionCache)
+class DirectoryTLSSessionCache(object):
+    """
+    An L{ITLSSessionCache} which keeps each session in a file in a directory,
+    so that it can be shared by several processes on the same host.
+
+    Sessions contain the secrets needed to decrypt their connections, so on
+    POSIX the directory must only be accessible by the user the servers run
+    as, and the sessions are written to files only that user can read.
+
+    Files older than L{timeout} are ignored and removed when they are found
+    by L{retrieve}; L{removeExpired} removes all of them, and may be called
+    periodically.
+
+    @ivar directory: The directory the sessions are kept in.
+    @type directory: L{twisted.python.filepath.FilePath}
+
+    @ivar timeout: How many seconds a session is kept for.
+    @type timeout: L{int}
+
+    @since: 15.3
+    """
+
+    def __init__(self, directory, timeout=300, clock=None):
+        """
+        @param directory: See L{directory}.  It is created, accessible only
+            by the current user, if it does not exist.
+
+        @param timeout: See L{timeout}.  This should be at least the session
+            timeout of the contexts the cache is used with, which is 300
+            seconds unless it is changed.
+
+        @param clock: The L{IReactorTime} provider used to determine the age
+            of sessions; the global reactor if C{None}.
+
+        @raise ValueError: If the directory exists and its group or other
+            users have any access to it.
+        """
+        self.directory = directory
+        self.timeout = timeout
+        self._clock = clock
+        if not directory.isdir():
+            os.makedirs(directory.path, 0o700)
+        elif (platform.getType() == 'posix' and
+              os.stat(directory.path).st_mode & 0o077):
+            raise ValueError(
+                "%s is accessible by other users." % (directory.path,))
+
+
+    def _now(self):
+        """
+        @return: The current time, in seconds since the epoch.
+        """
+        if self._clock is None:
+            from twisted.internet import reactor
+            self._clock = reactor
+        return self._clock.seconds()
+
+
+    def _path(self, sessionID):
+        """
+        @return: The L{FilePath} a session is kept in.
+        """
+        return self.directory.child(nativeString(hexlify(sessionID)))
+
+
+    def store(self, sessionID, session):
+        # The session is written to a temporary file which is renamed, so
+        # other processes never see a partially written session.
+        path = self._path(sessionID)
+        if platform.getType() != 'posix':
+            path.setContent(session)
+            return
+        temporary = path.temporarySibling()
+        fd = os.open(temporary.path, os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                     0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(session)
+        os.rename(temporary.path, path.path)
+
+
+    def retrieve(self, sessionID):
+        path = self._path(sessionID)
+        try:
+            if self._now() - path.getModificationTime() > self.timeout:
+                path.remove()
+                return None
+            return path.getContent()
+        except (IOError, OSError):
+            # It does not exist, or another process removed it.
+            return None
+
+
+    def remove(self, sessionID):
+        try:
+            self._path(sessionID).remove()
+        except (IOError, OSError):
+            pass
+
+
+    def removeExpired(self):
+        """
+        Remove all of the sessions older than L{timeout}.
+        """
+        oldest = self._now() - self.timeout
+        for path in self.directory.children():
+            try:
+                if path.getModificationTime() < oldest:
+                    path.remove()
+            except (IOError, OSError):
+                pass
+
+
+
+def _getBinding():
+    """
+    Get cryptography's binding instance, which pyOpenSSL 0.14 and later are
+    based on, to use OpenSSL APIs which pyOpenSSL does not wrap.
+
+    @raise NotImplementedError: If pyOpenSSL is not based on cryptography.
+
+    @return: cryptography's bindings.
+    @rtype: C{cryptography.hazmat.bindings.openssl.Binding}
+    """
+    try:
+        from OpenSSL._util import binding
+    except ImportError:
+        raise NotImplementedError(
+            "This version of pyOpenSSL does not expose OpenSSL's session "
+            "APIs.")
+    return binding
+
+
+
+class _OpenSSLSessionCache(object):
+    """
+    Connect an L{ITLSSessionCache} to the external session cache callbacks of
+    OpenSSL contexts.
+
+    @ivar cache: The L{ITLSSessionCache}.
+
+    @ivar _callbacks: The CFFI callbacks given to OpenSSL, which must be kept
+        alive as long as the contexts they are installed in.
+    """
+
+    _requiredFunctions = (
+        "SSL_CTX_sess_set_new_cb", "SSL_CTX_sess_set_get_cb",
+        "SSL_CTX_sess_set_remove_cb", "SSL_SESSION_get_id",
+        "i2d_SSL_SESSION", "d2i_SSL_SESSION")
+
+    def __init__(self, cache):
+        """
+        @param cache: See L{cache}.
+
+        @raise NotImplementedError: If the OpenSSL bindings lack the functions
+            needed to use an external session cache.
+        """
+        binding = self._getBinding()
+        self._lib = binding.lib
+        self._ffi = binding.ffi
+        for name in self._requiredFunctions:
+            if getattr(self._lib, name, None) is None:
+                raise NotImplementedError(
+                    "This version of pyOpenSSL does not support external "
+                    "session caches.")
+        self.cache = ITLSSessionCache(cache)
+        self._callbacks = (
+            self._callback(self._lib.SSL_CTX_sess_set_new_cb,
+                           self._newSession),
+            self._callback(self._lib.SSL_CTX_sess_set_get_cb,
+                           self._getSession),
+            self._callback(self._lib.SSL_CTX_sess_set_remove_cb,
+                           self._removeSession),
+        )
+
+
+    def _getBinding(self):
+        """
+        Get cryptography's binding instance.  Overridden by tests.
+        """
+        return _getBinding()
+
+
+    def _callback(self, setter, function):
+        """
+        Wrap a function in a CFFI callback of the type a setter accepts.  The
+        type is taken from the bindings since its C{const} qualifiers differ
+        between OpenSSL versions.
+
+        @param setter: An C{SSL_CTX_sess_set_*_cb} function.
+        @param function: The Python function to wrap.
+
+        @return: The callback.
+        """
+        return self._ffi.callback(self._ffi.typeof(setter).args[1], function)
+
+
+    def addToContext(self, context):
+        """
+        Make a server context store its sessions in the cache, and look for
+        sessions there which it does not have itself.
+
+        @param context: The context.
+        @type context: L{OpenSSL.SSL.Context}
+        """
+        context.set_session_cache_mode(SSL.SESS_CACHE_SERVER)
+        newCallback, getCallback, removeCallback = self._callbacks
+        self._lib.SSL_CTX_sess_set_new_cb(context._context, newCallback)
+        self._lib.SSL_CTX_sess_set_get_cb(context._context, getCallback)
+        self._lib.SSL_CTX_sess_set_remove_cb(context._context, removeCallback)
+
+
+    def _sessionID(self, session):
+        """
+        @return: The identifier of an C{SSL_SESSION}.
+        @rtype: L{bytes}
+        """
+        length = self._ffi.new("unsigned int *")
+        sessionID = self._lib.SSL_SESSION_get_id(session, length)
+        return self._ffi.buffer(sessionID, length[0])[:]
+
+
+    def _newSession(self, connection, session):
+        """
+        Serialize a newly negotiated C{SSL_SESSION} into the cache.
+
+        @return: C{0}, since OpenSSL's reference to the session is not kept.
+        """
+        try:
+            size = self._lib.i2d_SSL_SESSION(session, self._ffi.NULL)
+            serialized = self._ffi.new("unsigned char[]", size)
+            self._lib.i2d_SSL_SESSION(
+                session, self._ffi.new("unsigned char **", serialized))
+            self.cache.store(
+                self._sessionID(session), self._ffi.buffer(serialized, size)[:])
+        except:
+            log.err(None, "Could not store a TLS session")
+        return 0
+
+
+    def _getSession(self, connection, sessionID, length, copy):
+        """
+        Deserialize an C{SSL_SESSION} from the cache.
+
+        @return: The session, which OpenSSL takes ownership of, or C{NULL}.
+        """
+        try:
+            serialized = self.cache.retrieve(
+                self._ffi.buffer(sessionID, length)[:])
+            if serialized is None:
+                return self._ffi.NULL
+            serializedBuffer = self._ffi.new("unsigned char[]", serialized)
+            session = self._lib.d2i_SSL_SESSION(
+                self._ffi.NULL,
+                self._ffi.new("unsigned char **", serializedBuffer),
+                len(serialized))
+            copy[0] = 0
+            return session
+        except:
+            log.err(None, "Could not retrieve a TLS session")
+            return self._ffi.NULL
+
+
+    def _removeSession(self, context, session):
+        """
+        Remove an C{SSL_SESSION} which has expired or is no longer valid from
+        the cache.
+        """
+        try:
+            self.cache.remove(self._sessionID(session))
+        except:
+            log.err(None, "Could not remove a TLS session")
+
+
+
+class SessionTicketKeys(object):
+    """
+    Keys for encrypting RFC 5077 session tickets, rotated on a schedule.
+
+    With session tickets a server does not need to store sessions: it gives
+    each client its session encrypted with a key only the server knows, and
+    the client presents it when it reconnects.  All of the processes serving
+    a port must use the same key for their clients to resume sessions with
+    each other; by default, each process would use a random key of its own.
+
+    Setting the key requires bindings which expose C{SSL_CTX_ctrl}; when they
+    do not, L{CertificateOptions <twisted.internet.ssl.CertificateOptions>}
+    refuses the keys with L{NotImplementedError}.
+
+    Keys are derived from a secret and the number of L{rotationInterval}s
+    since the epoch, so every process sharing the secret uses the same key at
+    the same time without coordinating.  Once L{start}ed, the contexts of the
+    L{CertificateOptions <twisted.internet.ssl.CertificateOptions>} using the
+    keys are given the new key at the start of each interval.  Tickets issued
+    under the previous key are no longer accepted, so clients which
+    reconnect across a rotation need a full handshake.
+
+    @ivar rotationInterval: How many seconds each key is used for.
+    @type rotationInterval: L{int}
+
+    @ivar keySize: The size of the keys, which depends on the version of
+        OpenSSL.
+    @type keySize: L{int}
+
+    @ivar _secret: The secret the keys are derived from.
+    @type _secret: L{bytes}
+
+    @ivar _contexts: The contexts which use the current key.
+    @type _contexts: L{weakref.WeakSet} of L{OpenSSL.SSL.Context}
+
+    @ivar _rotateCall: The L{IDelayedCall} which installs the next key, or
+        C{None} if rotation has not been started.
+
+    @since: 15.3
+    """
+
+    keySize = _ticketKeySize(getattr(SSL, "OPENSSL_VERSION_NUMBER", 0))
+    _rotateCall = None
+
+    def __init__(self, secret=None, rotationInterval=3600, clock=None):
+        """
+        @param secret: The secret to derive keys from; it should be at least 32
+            random bytes, kept as safe as the private key.  If C{None}, a
+            random secret is generated, so only this process can decrypt the
+            tickets.
+        @type secret: L{bytes}
+
+        @param rotationInterval: See L{rotationInterval}.
+
+        @param clock: The L{IReactorTime} provider used to determine the
+            current interval and to schedule rotation; the global reactor if
+            C{None}.
+        """
+        if secret is None:
+            secret = os.urandom(32)
+        self._secret = secret
+        self.rotationInterval = rotationInterval
+        self._clock = clock
+        self._contexts = WeakSet()
+
+
+    def _getClock(self):
+        """
+        @return: The L{IReactorTime} provider to use.
+        """
+        if self._clock is None:
+            from twisted.internet import reactor
+            self._clock = reactor
+        return self._clock
+
+
+    def _period(self):
+        """
+        @return: The number of L{rotationInterval}s since the epoch.
+        @rtype: L{int}
+        """
+        return int(self._getClock().seconds() // self.rotationInterval)
+
+
+    def keyForPeriod(self, period):
+        """
+        Derive the key for an interval.
+
+        @param period: The number of L{rotationInterval}s since the epoch.
+        @type period: L{int}
+
+        @return: The key: the name OpenSSL puts in tickets, an HMAC key and an
+            AES key, L{keySize} bytes in all.
+        @rtype: L{bytes}
+        """
+        key = b""
+        counter = 0
+        while len(key) < self.keySize:
+            key += hmac.new(
+                self._secret,
+                b"twisted session ticket key " + intToBytes(period) + b" " +
+                intToBytes(counter),
+                sha256).digest()
+            counter += 1
+        return key[:self.keySize]
+
+
+    def currentKey(self):
+        """
+        @return: The key for the current interval.
+        @rtype: L{bytes}
+        """
+        return self.keyForPeriod(self._period())
+
+
+    def addToContext(self, context):
+        """
+        Make a context encrypt session tickets with the current key, and with
+        the current key of each later interval while rotation is running.
+
+        @param context: The context.
+        @type context: L{OpenSSL.SSL.Context}
+        """
+        self._setKey(context, self.currentKey())
+        self._contexts.add(context)
+
+
+    def _ctrl(self):
+        """
+        Get the bindings' C{SSL_CTX_ctrl}, which sets the key.
+
+        @raise NotImplementedError: If the OpenSSL bindings do not expose it.
+
+        @return: cryptography's binding and C{SSL_CTX_ctrl}.
+        """
+        binding = _getBinding()
+        ctrl = getattr(binding.lib, "SSL_CTX_ctrl", None)
+        if ctrl is None:
+            raise NotImplementedError(
+                "This version of pyOpenSSL cannot set session ticket keys.")
+        return binding, ctrl
+
+
+    def _checkSupported(self):
+        """
+        Make sure the keys can be given to contexts.
+
+        @raise NotImplementedError: If the OpenSSL bindings do not allow the
+            key to be set.
+        """
+        self._ctrl()
+
+
+    def _setKey(self, context, key):
+        """
+        Set the ticket key of a context.
+
+        @param context: The context.
+        @type context: L{OpenSSL.SSL.Context}
+
+        @param key: The key.
+        @type key: L{bytes}
+
+        @raise NotImplementedError: If the OpenSSL bindings do not allow the
+            key to be set.
+        """
+        binding, ctrl = self._ctrl()
+        keyBuffer = binding.ffi.new("unsigned char[]", key)
+        if not ctrl(context._context, _SSL_CTRL_SET_TLSEXT_TICKET_KEYS,
+                    len(key), keyBuffer):
+            raise ValueError("OpenSSL rejected the session ticket key.")
+
+
+    def rotate(self):
+        """
+        Give all of the contexts using these keys the current key.
+        """
+        key = self.currentKey()
+        for context in list(self._contexts):
+            self._setKey(context, key)
+
+
+    def start(self):
+        """
+        Start rotating keys at the start of each interval.
+        """
+        if self._rotateCall is None:
+            self._scheduleRotation()
+
+
+    def stop(self):
+        """
+        Stop rotating keys.
+        """
+        if self._rotateCall is not None:
+            if self._rotateCall.active():
+                self._rotateCall.cancel()
+            self._rotateCall = None
+
+
+    def _scheduleRotation(self):
+        """
+        Arrange for L{rotate} to be called at the start of the next interval.
+        """
+        clock = self._getClock()
+        nextRotation = (self._period() + 1) * self.rotationInterval
+        self._rotateCall = clock.callLater(
+            max(0, nextRotation - clock.seconds()), self._rotateAndReschedule)
+
+
+    def _rotateAndReschedule(self):
+        """
+        Install the key for the new interval and schedule the next rotation.
+        """
+        self._rotateCall = None
+        try:
+            self.rotate()
+        finally:
+            self._scheduleRotation()
 
 
 
@@ -1251,6 +2157,8 @@ class OpenSSLCertificateOptions(object):
     # Factory for creating contexts.  Configurable for testability.
     _contextFactory = SSL.Context
     _context = None
+    _sessionCache = None
+    sessionTicketKeys = None
     # Some option constants may not be exposed by PyOpenSSL yet.
     _OP_ALL = getattr(SSL, 'OP_ALL', 0x0000FFFF)
     _OP_NO_TICKET = getattr(SSL, 'OP_NO_TICKET', 0x00004000)
@@ -1281,7 +2189,9 @@ class OpenSSLCertificateOptions(object):
                  extraCertChain=None,
                  acceptableCiphers=None,
                  dhParameters=None,
-                 trustRoot=None):
+                 trustRoot=None,
+                 sessionCache=None,
+                 sessionTicketKeys=None):
         """
         Create an OpenSSL context SSL connection context factory.
 
@@ -1372,6 +2282,20 @@ class OpenSSLCertificateOptions(object):
 
         @type trustRoot: L{IOpenSSLTrustRoot}
 
+        @param sessionCache: A cache of server sessions, consulted when a
+            client tries to resume a session this process does not know.
+            Sharing one between the processes serving a port, for example a
+            L{DirectoryTLSSessionCache}, lets clients resume their sessions
+            with any of them.  If C{None}, only OpenSSL's own in-memory cache
+            is used.  Requires C{enableSessions}.
+        @type sessionCache: L{ITLSSessionCache}
+
+        @param sessionTicketKeys: The keys to encrypt session tickets with;
+            passing them enables session tickets.  If C{None} and
+            C{enableSessionTickets} is L{True}, OpenSSL generates a random key
+            for each context.
+        @type sessionTicketKeys: L{SessionTicketKeys}
+
         @raise ValueError: when C{privateKey} or C{certificate} are set without
             setting the respective other.
         @raise ValueError: when C{verify} is L{True} but C{caCerts} doesn't
@@ -1380,6 +2304,12 @@ class OpenSSLCertificateOptions(object):
             C{privateKey} or C{certificate}.
         @raise ValueError: when C{acceptableCiphers} doesn't yield any usable
             ciphers for the current platform.
+        @raise ValueError: when C{sessionCache} is passed but
+            C{enableSessions} is L{False}.
+
+        @raise NotImplementedError: when C{sessionCache} or
+            C{sessionTicketKeys} is passed but pyOpenSSL does not expose the
+            APIs needed to use it.
 
         @raise TypeError: if C{trustRoot} is passed in combination with
             C{caCert}, C{verify}, or C{requireCertificate}.  Please prefer
@@ -1432,10 +2362,22 @@ class OpenSSLCertificateOptions(object):
         self.fixBrokenPeers = fixBrokenPeers
         if fixBrokenPeers:
             self._options |= self._OP_ALL
+        if sessionTicketKeys is not None:
+            sessionTicketKeys._checkSupported()
+            enableSessionTickets = True
         self.enableSessionTickets = enableSessionTickets
+        self.sessionTicketKeys = sessionTicketKeys
 
         if not enableSessionTickets:
             self._options |= self._OP_NO_TICKET
+
+        if sessionCache is not None:
+            if not enableSessions:
+                raise ValueError(
+                    "A session cache can only be used if sessions are "
+                    "enabled.")
+            sessionCache = _OpenSSLSessionCache(sessionCache)
+        self._sessionCache = sessionCache
         self.dhParameters = dhParameters
 
         try:
@@ -1490,6 +2432,27 @@ class OpenSSLCertificateOptions(object):
         return self._context
 
 
+    def _sessionIDContext(self):
+        """
+        Name the sessions of a new context.  OpenSSL only resumes sessions
+        created by contexts with the same name.
+
+        @return: A name which is unique to the new context, unless sessions
+            are shared with other processes through a session cache or
+            session ticket keys, in which case it is derived from the
+            certificate so that it is the same in each of them.
+        @rtype: L{str}
+        """
+        shared = (self._sessionCache is not None or
+                  self.sessionTicketKeys is not None)
+        if shared and self.certificate is not None:
+            name = "%s-%s" % (reflect.qual(self.__class__),
+                              nativeString(self.certificate.digest("sha256")))
+        else:
+            name = "%s-%d" % (reflect.qual(self.__class__), _sessionCounter())
+        return md5(networkString(name)).hexdigest()
+
+
     def _makeContext(self):
         ctx = self._contextFactory(self.method)
         ctx.set_options(self._options)
@@ -1521,10 +2484,12 @@ class OpenSSLCertificateOptions(object):
             ctx.set_verify_depth(self.verifyDepth)
 
         if self.enableSessions:
-            name = "%s-%d" % (reflect.qual(self.__class__), _sessionCounter())
-            sessionName = md5(networkString(name)).hexdigest()
+            ctx.set_session_id(self._sessionIDContext())
+            if self._sessionCache is not None:
+                self._sessionCache.addToContext(ctx)
 
-            ctx.set_session_id(sessionName)
+        if self.sessionTicketKeys is not None:
+            self.sessionTicketKeys.addToContext(ctx)
 
         if self.dhParameters:
             ctx.load_tmp_dh(self.dhParameters._dhFile.path)
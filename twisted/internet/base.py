@@ -278,6 +278,138 @@ class ThreadedResolver(object):
 
 
 
+@implementer(IResolverSimple)
+class CachingResolver(object):
+    """
+    L{CachingResolver} keeps the addresses found by another L{IResolverSimple}
+    for a while, and makes only one lookup of a name at a time, sharing its
+    result with everyone waiting for that name.
+
+    It also calls L{socket.getaddrinfo} in the reactor's threadpool, keeping
+    and sharing its results in the same way, for
+    L{twisted.internet.endpoints.HostnameEndpoint}.
+
+    Failed lookups are shared, but not kept.
+
+    Reactors which support threads use a L{CachingResolver} of a
+    L{ThreadedResolver} by default.  The resolvers of L{twisted.names} keep
+    the records they find for the TTLs given by their servers, so they need
+    not be wrapped in one, though that makes C{getaddrinfo} results cached
+    too.
+
+    @ivar reactor: The reactor whose time is used to expire results, and the
+        threadpool of which is used to call L{socket.getaddrinfo}.
+
+    @ivar resolver: The L{IResolverSimple} used to look up names.
+
+    @ivar ttl: The number of seconds for which results are kept.
+    @type ttl: L{int}
+
+    @ivar size: The number of results to keep.  When there are more, they
+        are all discarded.
+    @type size: L{int}
+
+    @ivar _results: Results kept, each as a L{tuple} of the time it expires
+        and the result, keyed by a L{tuple} of the arguments of the lookup.
+
+    @ivar _waiting: The L{Deferred}s waiting for the result of each lookup
+        in progress, keyed like C{_results}.
+
+    @since: 15.3
+    """
+    _getaddrinfo = staticmethod(socket.getaddrinfo)
+
+    def __init__(self, reactor, resolver, ttl=60, size=1000):
+        self.reactor = reactor
+        self.resolver = resolver
+        self.ttl = ttl
+        self.size = size
+        self._results = {}
+        self._waiting = {}
+
+
+    def _lookup(self, key, lookup, *args):
+        """
+        Get a result which has been kept or is being looked up, or look it up.
+
+        @param key: The L{tuple} of arguments identifying the lookup.
+
+        @param lookup: A function to look the result up, which returns a
+            L{Deferred} that fires with it.
+
+        @param args: The arguments to call C{lookup} with.
+
+        @return: A L{Deferred} which fires with the result.
+        """
+        kept = self._results.get(key)
+        if kept is not None:
+            if kept[0] > self.reactor.seconds():
+                return defer.succeed(kept[1])
+            del self._results[key]
+
+        d = Deferred()
+        waiting = self._waiting.get(key)
+        if waiting is not None:
+            waiting.append(d)
+        else:
+            self._waiting[key] = [d]
+            defer.maybeDeferred(lookup, *args).addBoth(self._found, key)
+        return d
+
+
+    def _found(self, result, key):
+        """
+        Keep the result of a lookup, if it succeeded, and give it to everyone
+        waiting for it.
+        """
+        waiting = self._waiting.pop(key)
+        if isinstance(result, failure.Failure):
+            for d in waiting:
+                d.errback(result)
+        else:
+            if self.ttl > 0:
+                if len(self._results) >= self.size:
+                    self._results.clear()
+                self._results[key] = (self.reactor.seconds() + self.ttl,
+                                      result)
+            for d in waiting:
+                d.callback(result)
+
+
+    def getHostByName(self, name, timeout = (1, 3, 11, 45)):
+        """
+        See L{twisted.internet.interfaces.IResolverSimple.getHostByName}.
+
+        If the name is already being looked up, the timeout of that lookup
+        applies.
+        """
+        return self._lookup((name,), self.resolver.getHostByName,
+                            name, timeout)
+
+
+    def getAddressInfo(self, host, port, family=0, socktype=0, proto=0,
+                       flags=0):
+        """
+        Call L{socket.getaddrinfo} in the reactor's threadpool.
+
+        @return: A L{Deferred} which fires with a new L{list} of the 5-tuples
+            returned by L{socket.getaddrinfo}.
+        """
+        args = (host, port, family, socktype, proto, flags)
+        return self._lookup(args, self._threadedGetaddrinfo,
+                            *args).addCallback(list)
+
+
+    def _threadedGetaddrinfo(self, *args):
+        """
+        Call L{socket.getaddrinfo} in the reactor's threadpool.
+        """
+        return threads.deferToThreadPool(
+            self.reactor, self.reactor.getThreadPool(), self._getaddrinfo,
+            *args)
+
+
+
 @implementer(IResolverSimple)
 class BlockingResolver:
 
@@ -461,9 +593,20 @@ class ReactorBase(object):
     @ivar _registerAsIOThread: A flag controlling whether the reactor will
         register the thread it is running in as the I/O thread when it starts.
         If C{True}, registration will be done, otherwise it will not be.
+
+    @ivar _instrumentation: The
+        L{ReactorInstrumentation<twisted.internet.instrumentation.ReactorInstrumentation>}
+        collecting statistics about this reactor, or C{None} if
+        instrumentation is not running.
     """
 
     _registerAsIOThread = True
+    _instrumentation = None
+
+    # The names of the methods which reactors implemented on top of
+    # PosixReactorBase use to dispatch I/O events, looked up on the instance
+    # at every iteration.
+    _ioHandlerNames = ("_doReadOrWrite", "_doWriteOrRead")
 
     _stopped = True
     installed = False
@@ -629,7 +772,10 @@ class ReactorBase(object):
         """See twisted.internet.interfaces.IReactorCore.iterate.
         """
         self.runUntilCurrent()
-        self.doIteration(delay)
+        if self._instrumentation is None:
+            self.doIteration(delay)
+        else:
+            self._instrumentation.doIteration(self, delay)
 
 
     def fireSystemEvent(self, eventType):
@@ -784,18 +930,76 @@ class ReactorBase(object):
         return max(0, min(longest, delay))
 
 
+    def startInstrumentation(self, slowCallbackThreshold=None,
+                             maxSlowCallbacks=100):
+        """
+        Start collecting statistics about where this reactor spends its time.
+
+        @param slowCallbackThreshold: Record callbacks which run for at least
+            this many seconds, or C{None} to record none.
+        @type slowCallbackThreshold: L{float} or C{None}
+
+        @param maxSlowCallbacks: The number of slow callbacks to remember.
+        @type maxSlowCallbacks: L{int}
+
+        @raise RuntimeError: If instrumentation is already running.
+
+        @return: The
+            L{ReactorInstrumentation<twisted.internet.instrumentation.ReactorInstrumentation>}
+            which collects the statistics.
+
+        @since: 15.3
+        """
+        from twisted.internet.instrumentation import ReactorInstrumentation
+        if self._instrumentation is not None:
+            raise RuntimeError("Reactor instrumentation is already running")
+        instrumentation = ReactorInstrumentation(
+            slowCallbackThreshold, maxSlowCallbacks)
+        for name in self._ioHandlerNames:
+            handler = getattr(self, name, None)
+            if handler is not None:
+                setattr(self, name, instrumentation.wrapIOHandler(handler))
+        self._instrumentation = instrumentation
+        return instrumentation
+
+
+    def stopInstrumentation(self):
+        """
+        Stop collecting statistics started by L{startInstrumentation}.
+
+        The statistics collected so far remain available from the
+        L{ReactorInstrumentation
+        <twisted.internet.instrumentation.ReactorInstrumentation>}.
+
+        @raise RuntimeError: If instrumentation is not running.
+
+        @since: 15.3
+        """
+        if self._instrumentation is None:
+            raise RuntimeError("Reactor instrumentation is not running")
+        for name in self._ioHandlerNames:
+            self.__dict__.pop(name, None)
+        del self._instrumentation
+
+
     def runUntilCurrent(self):
         """Run all pending timed calls.
         """
+        instrumentation = self._instrumentation
         if self.threadCallQueue:
             # Keep track of how many calls we actually make, as we're
             # making them, in case another call is added to the queue
             # while we're in this loop.
             count = 0
             total = len(self.threadCallQueue)
+            if instrumentation is not None:
+                instrumentation.threadQueueRun(total)
             for (f, a, kw) in self.threadCallQueue:
                 try:
-                    f(*a, **kw)
+                    if instrumentation is None:
+                        f(*a, **kw)
+                    else:
+                        instrumentation.runThreadCall(f, a, kw)
                 except:
                     log.err()
                 count += 1
@@ -822,7 +1026,10 @@ class ReactorBase(object):
 
             try:
                 call.called = 1
-                call.func(*call.args, **call.kw)
+                if instrumentation is None:
+                    call.func(*call.args, **call.kw)
+                else:
+                    instrumentation.runTimedCall(call, now)
             except:
                 log.deferr()
                 if hasattr(call, "creator"):
@@ -936,7 +1143,7 @@ class ReactorBase(object):
 
         def _initThreads(self):
             self.usingThreads = True
-            self.resolver = ThreadedResolver(self)
+            self.resolver = CachingResolver(self, ThreadedResolver(self))
 
         def callFromThread(self, f, *args, **kw):
             """
@@ -1203,7 +1410,10 @@ class _SignalReactorMixin(object):
                     self.runUntilCurrent()
                     t2 = self.timeout()
                     t = self.running and t2
-                    self.doIteration(t)
+                    if self._instrumentation is None:
+                        self.doIteration(t)
+                    else:
+                        self._instrumentation.doIteration(self, t)
             except:
                 log.msg("Unexpected error in main loop.")
                 log.err()
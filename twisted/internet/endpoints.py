@@ -514,6 +514,28 @@ class TCP6ServerEndpoint(_TCPServerEndpoint):
 
 
 
+def _addressInfo(endpoint):
+    """
+    Find the C{getAddressInfo} method of the resolver of the reactor of an
+    endpoint, such as L{twisted.internet.base.CachingResolver.getAddressInfo},
+    so that the results of C{getaddrinfo} are kept and shared between
+    endpoints.
+
+    @param endpoint: A L{HostnameEndpoint} or L{TCP6ClientEndpoint}.
+
+    @return: The method, or C{None} if the reactor's resolver has none or the
+        endpoint's C{_getaddrinfo} or C{_deferToThread} hooks have been
+        replaced, in which case the endpoint calls C{getaddrinfo} in a thread
+        itself.
+    """
+    if (endpoint._getaddrinfo is not socket.getaddrinfo or
+            endpoint._deferToThread is not threads.deferToThread):
+        return None
+    resolver = getattr(endpoint._reactor, 'resolver', None)
+    return getattr(resolver, 'getAddressInfo', None)
+
+
+
 @implementer(interfaces.IStreamClientEndpoint)
 class TCP4ClientEndpoint(object):
     """
@@ -614,7 +636,12 @@ class TCP6ClientEndpoint(object):
         """
         Resolve the hostname string into a tuple containing the host
         IPv6 address.
+
+        See L{_addressInfo}.
         """
+        getAddressInfo = _addressInfo(self)
+        if getAddressInfo is not None:
+            return getAddressInfo(host, 0, socket.AF_INET6)
         return self._deferToThread(
             self._getaddrinfo, host, 0, socket.AF_INET6)
 
@@ -780,7 +807,12 @@ class HostnameEndpoint(object):
         """
         Resolve the hostname string into a tuple containig the host
         address.
+
+        See L{_addressInfo}.
         """
+        getAddressInfo = _addressInfo(self)
+        if getAddressInfo is not None:
+            return getAddressInfo(host, port, 0, socket.SOCK_STREAM)
         return self._deferToThread(self._getaddrinfo, host, port, 0,
                 socket.SOCK_STREAM)
 
@@ -870,10 +902,16 @@ class SSL4ClientEndpoint(object):
         Implement L{IStreamClientEndpoint.connect} to connect with SSL over
         TCP.
         """
+        contextFactory = self._sslContextFactory
+        # Creators made by optionsForClientTLS without a port only offer their
+        # sessions to connections to the same port if they are told it.
+        forPort = getattr(contextFactory, '_forPort', None)
+        if forPort is not None:
+            contextFactory = forPort(self._port)
         try:
             wf = _WrappingFactory(protocolFactory)
             self._reactor.connectSSL(
-                self._host, self._port, wf, self._sslContextFactory,
+                self._host, self._port, wf, contextFactory,
                 timeout=self._timeout, bindAddress=self._bindAddress)
             return wf._onConnection
         except:
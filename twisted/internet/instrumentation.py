@@ -0,0 +1,369 @@
+# -*- test-case-name: twisted.internet.test.test_instrumentation -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Measurements of where a reactor spends its time.
+
+Instrumentation is started with
+L{ReactorBase.startInstrumentation<twisted.internet.base.ReactorBase.startInstrumentation>},
+which returns a L{ReactorInstrumentation} that accumulates counters and
+timings until
+L{ReactorBase.stopInstrumentation<twisted.internet.base.ReactorBase.stopInstrumentation>}
+is called.  While it is stopped, the reactor does no more work than it would
+without it.
+
+L{StatisticsReporter} periodically collects the statistics and logs them, or
+passes them to some other observer such as a metrics system.
+"""
+
+from __future__ import division, absolute_import
+
+from collections import deque
+
+from twisted.logger import Logger
+from twisted.python.deprecate import _fullyQualifiedName
+from twisted.python.reflect import qual
+from twisted.python.runtime import seconds as runtimeSeconds
+
+__all__ = ["SlowCallback", "ReactorInstrumentation", "StatisticsReporter"]
+
+
+
+def _callableName(f):
+    """
+    Name a callable for a human trying to find it.
+
+    @param f: A callable.
+
+    @return: The fully qualified name of C{f} if it is a function, method or
+        class, otherwise the fully qualified name of its class.
+    @rtype: L{str}
+    """
+    try:
+        return _fullyQualifiedName(f)
+    except AttributeError:
+        return qual(type(f))
+
+
+
+class SlowCallback(object):
+    """
+    A callback run by the reactor which took longer than the threshold
+    configured for a L{ReactorInstrumentation}.
+
+    @ivar kind: C{"timed"} for a delayed call, C{"thread"} for a call made
+        with C{callFromThread} or C{"io"} for the handling of an I/O event.
+    @type kind: L{str}
+
+    @ivar name: The fully qualified name of the callable, or for I/O events,
+        of the class of the descriptor which handled the event.
+    @type name: L{str}
+
+    @ivar duration: How long the callback ran for, in seconds.
+    @type duration: L{float}
+
+    @ivar time: When the callback finished running, in seconds since the
+        epoch.
+    @type time: L{float}
+    """
+
+    def __init__(self, kind, name, duration, time):
+        self.kind = kind
+        self.name = name
+        self.duration = duration
+        self.time = time
+
+
+    def __repr__(self):
+        return "<SlowCallback %s %s took %.6fs>" % (
+            self.kind, self.name, self.duration)
+
+
+
+class ReactorInstrumentation(object):
+    """
+    Counters and timings of the work done by a reactor.
+
+    Reactors which run Twisted's own main loop (all of the reactors
+    implemented with C{select}, C{poll}, C{epoll} and C{kqueue}) count
+    iterations and separate time spent waiting for I/O from time spent
+    handling it.  Reactors integrating with another event loop (such as the
+    GTK+ and Qt reactors) only count callbacks.
+
+    @ivar slowCallbackThreshold: Callbacks which run for at least this many
+        seconds are recorded in L{slowCallbacks}, or C{None} to record none.
+    @type slowCallbackThreshold: L{float} or C{None}
+
+    @ivar iterations: The number of iterations of the reactor's main loop.
+    @ivar ioWaitTime: Seconds spent in the reactor's I/O multiplexer waiting
+        for events, excluding the time spent handling them.
+    @ivar ioCallbacks: The number of I/O events handled.
+    @ivar ioCallbackTime: Seconds spent handling I/O events.
+    @ivar timedCalls: The number of delayed calls run.
+    @ivar timedCallTime: Seconds spent running delayed calls.
+    @ivar threadCalls: The number of calls made with C{callFromThread} run.
+    @ivar threadCallTime: Seconds spent running them.
+    @ivar threadQueueDepth: The number of calls waiting in the thread call
+        queue the last time it was run.
+    @ivar maxThreadQueueDepth: The largest value of L{threadQueueDepth}.
+    @ivar lag: How many seconds after its scheduled time the most recently
+        run delayed call was run: a measure of how far behind the reactor is.
+    @ivar maxLag: The largest value of L{lag}.
+
+    @ivar slowCallbacks: The most recent L{SlowCallback}s.
+    @type slowCallbacks: L{collections.deque}
+
+    @ivar _timer: A no-argument callable returning the current time in
+        seconds.
+    """
+
+    _counters = (
+        "iterations", "ioWaitTime", "ioCallbacks", "ioCallbackTime",
+        "timedCalls", "timedCallTime", "threadCalls", "threadCallTime",
+        "threadQueueDepth", "maxThreadQueueDepth", "lag", "maxLag")
+
+    def __init__(self, slowCallbackThreshold=None, maxSlowCallbacks=100,
+                 timer=runtimeSeconds):
+        """
+        @param slowCallbackThreshold: See L{slowCallbackThreshold}.
+
+        @param maxSlowCallbacks: The number of L{SlowCallback}s to keep.
+        @type maxSlowCallbacks: L{int}
+
+        @param timer: See L{_timer}.
+        """
+        self.slowCallbackThreshold = slowCallbackThreshold
+        self.slowCallbacks = deque(maxlen=maxSlowCallbacks)
+        self._timer = timer
+        self.reset()
+
+
+    def reset(self):
+        """
+        Set every counter and timing back to zero and forget about slow
+        callbacks.
+        """
+        for name in self._counters:
+            setattr(self, name, 0)
+        self.slowCallbacks.clear()
+
+
+    def snapshot(self, reset=False):
+        """
+        Get the current values of the counters and timings.
+
+        @param reset: If C{True}, L{reset} them afterwards, so that the next
+            snapshot covers only what happens after this one.
+
+        @return: A mapping from the name of each counter and timing to its
+            value, also including C{"callbacks"} (the total number of
+            callbacks run), C{"callbackTime"} (the total time spent running
+            them) and C{"slowCallbacks"} (a L{list} of L{SlowCallback}).
+        @rtype: L{dict}
+        """
+        statistics = dict((name, getattr(self, name))
+                          for name in self._counters)
+        statistics["callbacks"] = (
+            self.ioCallbacks + self.timedCalls + self.threadCalls)
+        statistics["callbackTime"] = (
+            self.ioCallbackTime + self.timedCallTime + self.threadCallTime)
+        statistics["slowCallbacks"] = list(self.slowCallbacks)
+        if reset:
+            self.reset()
+        return statistics
+
+
+    def _checkSlow(self, kind, thing, start, end):
+        """
+        Record a callback as slow if it took long enough.
+
+        @param kind: See L{SlowCallback.kind}.
+        @param thing: The callable, or I/O descriptor, that ran.
+        @param start: When it started running.
+        @param end: When it finished.
+        """
+        threshold = self.slowCallbackThreshold
+        if threshold is not None and end - start >= threshold:
+            if kind == "io":
+                name = qual(type(thing))
+            else:
+                name = _callableName(thing)
+            self.slowCallbacks.append(
+                SlowCallback(kind, name, end - start, end))
+
+
+    def doIteration(self, reactor, delay):
+        """
+        Call C{reactor.doIteration}, timing it.
+
+        @param reactor: The reactor being instrumented.
+        @param delay: The timeout to pass to C{doIteration}.
+        """
+        before = self.ioCallbackTime
+        start = self._timer()
+        reactor.doIteration(delay)
+        elapsed = self._timer() - start
+        self.iterations += 1
+        self.ioWaitTime += max(0, elapsed - (self.ioCallbackTime - before))
+
+
+    def wrapIOHandler(self, handler):
+        """
+        Wrap the method a reactor uses to handle an I/O event on a descriptor
+        so that it is timed.
+
+        @param handler: A callable taking the descriptor as its first
+            argument.
+
+        @return: A callable with the same signature as C{handler}.
+        """
+        def timedHandler(selectable, *args):
+            start = self._timer()
+            try:
+                return handler(selectable, *args)
+            finally:
+                end = self._timer()
+                self.ioCallbacks += 1
+                self.ioCallbackTime += end - start
+                self._checkSlow("io", selectable, start, end)
+        return timedHandler
+
+
+    def threadQueueRun(self, depth):
+        """
+        Note that the thread call queue is about to be run.
+
+        @param depth: The number of calls in it.
+        """
+        self.threadQueueDepth = depth
+        if depth > self.maxThreadQueueDepth:
+            self.maxThreadQueueDepth = depth
+
+
+    def runThreadCall(self, f, args, kwargs):
+        """
+        Run a call made with C{callFromThread}, timing it.
+        """
+        start = self._timer()
+        try:
+            f(*args, **kwargs)
+        finally:
+            end = self._timer()
+            self.threadCalls += 1
+            self.threadCallTime += end - start
+            self._checkSlow("thread", f, start, end)
+
+
+    def runTimedCall(self, call, now):
+        """
+        Run a delayed call, timing it and measuring how late it is.
+
+        @param call: The L{DelayedCall<twisted.internet.base.DelayedCall>}.
+
+        @param now: The reactor's idea of the current time, which is at or
+            after the time the call was scheduled for.
+        """
+        lag = now - call.time
+        self.lag = lag
+        if lag > self.maxLag:
+            self.maxLag = lag
+        start = self._timer()
+        try:
+            call.func(*call.args, **call.kw)
+        finally:
+            end = self._timer()
+            self.timedCalls += 1
+            self.timedCallTime += end - start
+            self._checkSlow("timed", call.func, start, end)
+
+
+
+class StatisticsReporter(object):
+    """
+    Periodically collect the statistics from a L{ReactorInstrumentation} and
+    report them.
+
+    Each report covers only the interval since the previous one: the
+    instrumentation is reset each time, so it should not be shared with
+    another consumer of its totals.
+
+    By default each report is logged as an informational event with the
+    statistics as its fields, so that observers can extract the values; slow
+    callbacks are logged as separate warnings.
+
+    @ivar instrumentation: The L{ReactorInstrumentation} to collect from.
+    @ivar interval: The number of seconds between reports.
+    @ivar observer: A callable which is called with each L{dict} returned
+        by L{ReactorInstrumentation.snapshot}.
+    """
+
+    log = Logger()
+
+    def __init__(self, instrumentation, interval=60, observer=None,
+                 clock=None):
+        """
+        @param instrumentation: See L{instrumentation}.
+        @param interval: See L{interval}.
+        @param observer: See L{observer}.  If C{None}, the statistics are
+            logged.
+        @param clock: The L{IReactorTime} provider to schedule reports with.
+            If C{None}, the global reactor.
+        """
+        self.instrumentation = instrumentation
+        self.interval = interval
+        if observer is None:
+            observer = self.logStatistics
+        self.observer = observer
+        self._clock = clock
+        self._call = None
+
+
+    def start(self):
+        """
+        Start reporting every L{interval} seconds.
+        """
+        from twisted.internet.task import LoopingCall
+        self.instrumentation.snapshot(reset=True)
+        self._call = LoopingCall(self.report)
+        if self._clock is not None:
+            self._call.clock = self._clock
+        self._call.start(self.interval, now=False)
+
+
+    def stop(self):
+        """
+        Stop reporting.
+        """
+        if self._call is not None:
+            self._call.stop()
+            self._call = None
+
+
+    def report(self):
+        """
+        Collect the statistics since the last report and pass them to the
+        observer.
+        """
+        self.observer(self.instrumentation.snapshot(reset=True))
+
+
+    def logStatistics(self, statistics):
+        """
+        Log some statistics.
+
+        @param statistics: A L{dict} returned by
+            L{ReactorInstrumentation.snapshot}.
+        """
+        fields = dict(statistics)
+        slowCallbacks = fields.pop("slowCallbacks")
+        self.log.info(
+            "Reactor: {iterations} iterations, {ioWaitTime:.3f}s waiting "
+            "for I/O, {callbacks} callbacks in {callbackTime:.3f}s, "
+            "thread queue depth {maxThreadQueueDepth}, "
+            "lag {maxLag:.3f}s",
+            **fields)
+        for slow in slowCallbacks:
+            self.log.warn(
+                "Slow {kind} callback {name} took {duration:.3f}s",
+                kind=slow.kind, name=slow.name, duration=slow.duration)
@@ -173,7 +173,8 @@ class IOCPReactor(base._SignalReactorMixin, base.ReactorBase,
             """
             port = self.listenTCP(
                 port,
-                TLSMemoryBIOFactory(contextFactory, False, factory),
+                TLSMemoryBIOFactory(
+                    contextFactory, False, factory, clock=self),
                 backlog, interface)
             port._type = 'TLS'
             return port
@@ -185,7 +186,8 @@ class IOCPReactor(base._SignalReactorMixin, base.ReactorBase,
             """
             return self.connectTCP(
                 host, port,
-                TLSMemoryBIOFactory(contextFactory, True, factory),
+                TLSMemoryBIOFactory(
+                    contextFactory, True, factory, clock=self),
                 timeout, bindAddress)
     else:
         def listenSSL(self, port, factory, contextFactory, backlog=50, interface=''):
@@ -487,7 +487,8 @@ class PosixReactorBase(_SignalReactorMixin, _DisconnectSelectableMixin,
 
     def connectSSL(self, host, port, factory, contextFactory, timeout=30, bindAddress=None):
         if tls is not None:
-            tlsFactory = tls.TLSMemoryBIOFactory(contextFactory, True, factory)
+            tlsFactory = tls.TLSMemoryBIOFactory(
+                contextFactory, True, factory, clock=self)
             return self.connectTCP(host, port, tlsFactory, timeout, bindAddress)
         elif ssl is not None:
             c = ssl.Connector(
@@ -501,7 +502,8 @@ class PosixReactorBase(_SignalReactorMixin, _DisconnectSelectableMixin,
 
     def listenSSL(self, port, factory, contextFactory, backlog=50, interface=''):
         if tls is not None:
-            tlsFactory = tls.TLSMemoryBIOFactory(contextFactory, False, factory)
+            tlsFactory = tls.TLSMemoryBIOFactory(
+                contextFactory, False, factory, clock=self)
             port = self.listenTCP(port, tlsFactory, backlog, interface)
             port._type = 'TLS'
             return port
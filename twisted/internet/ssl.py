@@ -227,7 +227,8 @@ from twisted.internet._sslverify import (
     OpenSSLCertificateOptions as CertificateOptions,
     OpenSSLDiffieHellmanParameters as DiffieHellmanParameters,
     platformTrust, OpenSSLDefaultPaths, VerificationError,
-    optionsForClientTLS,
+    optionsForClientTLS, ITLSSessionCache, MemoryTLSSessionCache,
+    DirectoryTLSSessionCache, SessionTicketKeys, ClientTLSSessionCache,
 )
 
 __all__ = [
@@ -240,4 +241,7 @@ __all__ = [
     'platformTrust', 'OpenSSLDefaultPaths',
 
     'VerificationError', 'optionsForClientTLS',
+
+    'ITLSSessionCache', 'MemoryTLSSessionCache', 'DirectoryTLSSessionCache',
+    'SessionTicketKeys', 'ClientTLSSessionCache',
 ]
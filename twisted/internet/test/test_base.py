@@ -14,9 +14,12 @@ except ImportError:
 from zope.interface import implementer
 
 from twisted.python.threadpool import ThreadPool
-from twisted.internet.interfaces import IReactorTime, IReactorThreads
+from twisted.internet.interfaces import (
+    IReactorTime, IReactorThreads, IResolverSimple)
 from twisted.internet.error import DNSLookupError
-from twisted.internet.base import ThreadedResolver, DelayedCall
+from twisted.internet.base import (
+    CachingResolver, ThreadedResolver, DelayedCall)
+from twisted.internet.defer import Deferred
 from twisted.internet.task import Clock
 from twisted.trial.unittest import TestCase
 
@@ -31,6 +34,7 @@ class FakeReactor(object):
     def __init__(self):
         self._clock = Clock()
         self.callLater = self._clock.callLater
+        self.seconds = self._clock.seconds
 
         self._threadpool = ThreadPool()
         self._threadpool.start()
@@ -156,6 +160,132 @@ class ThreadedResolverTests(TestCase):
 
 
 
+@implementer(IResolverSimple)
+class FakeResolver(object):
+    """
+    A resolver whose lookups are completed by the test.
+
+    @ivar lookups: A L{list} of the name and L{Deferred} of each lookup.
+    """
+
+    def __init__(self):
+        self.lookups = []
+
+
+    def getHostByName(self, name, timeout=(1, 3, 11, 45)):
+        d = Deferred()
+        self.lookups.append((name, d))
+        return d
+
+
+
+class CachingResolverTests(TestCase):
+    """
+    Tests for L{CachingResolver}.
+    """
+    def setUp(self):
+        self.clock = Clock()
+        self.wrapped = FakeResolver()
+        self.resolver = CachingResolver(self.clock, self.wrapped, ttl=10)
+
+
+    def test_kept(self):
+        """
+        L{CachingResolver.getHostByName} gives the address found by the
+        wrapped resolver without looking the name up again until C{ttl}
+        seconds have passed.
+        """
+        d = self.resolver.getHostByName("example.com")
+        self.wrapped.lookups[0][1].callback("192.0.2.1")
+        self.assertEqual(self.successResultOf(d), "192.0.2.1")
+
+        self.clock.advance(9)
+        d = self.resolver.getHostByName("example.com")
+        self.assertEqual(self.successResultOf(d), "192.0.2.1")
+        self.assertEqual(len(self.wrapped.lookups), 1)
+
+        self.clock.advance(1)
+        d = self.resolver.getHostByName("example.com")
+        self.assertNoResult(d)
+        self.assertEqual([name for (name, _) in self.wrapped.lookups],
+                         ["example.com", "example.com"])
+
+
+    def test_shared(self):
+        """
+        Lookups of a name which is already being looked up wait for the same
+        result.
+        """
+        first = self.resolver.getHostByName("example.com")
+        second = self.resolver.getHostByName("example.com")
+        other = self.resolver.getHostByName("example.org")
+        self.assertEqual([name for (name, _) in self.wrapped.lookups],
+                         ["example.com", "example.org"])
+
+        self.wrapped.lookups[0][1].callback("192.0.2.1")
+        self.assertEqual(self.successResultOf(first), "192.0.2.1")
+        self.assertEqual(self.successResultOf(second), "192.0.2.1")
+        self.assertNoResult(other)
+
+
+    def test_failureShared(self):
+        """
+        A failed lookup fails every lookup waiting for it, and is not kept.
+        """
+        first = self.resolver.getHostByName("example.com")
+        second = self.resolver.getHostByName("example.com")
+        self.wrapped.lookups[0][1].errback(DNSLookupError("example.com"))
+        self.failureResultOf(first, DNSLookupError)
+        self.failureResultOf(second, DNSLookupError)
+
+        self.resolver.getHostByName("example.com")
+        self.assertEqual(len(self.wrapped.lookups), 2)
+
+
+    def test_size(self):
+        """
+        When more results have been found than L{CachingResolver.size}, those
+        kept are discarded.
+        """
+        self.resolver.size = 2
+        for name in ["a.example.com", "b.example.com", "c.example.com"]:
+            self.resolver.getHostByName(name)
+            self.wrapped.lookups[-1][1].callback("192.0.2.1")
+        self.assertEqual(list(self.resolver._results.keys()),
+                         [("c.example.com",)])
+
+
+    def test_getAddressInfo(self):
+        """
+        L{CachingResolver.getAddressInfo} calls L{socket.getaddrinfo} in the
+        reactor's threadpool, and keeps the result, giving each lookup its
+        own copy.
+        """
+        reactor = FakeReactor()
+        self.addCleanup(reactor._stop)
+        calls = []
+        result = [(socket.AF_INET, socket.SOCK_STREAM, 6, "",
+                   ("192.0.2.1", 80))]
+        def fakeGetaddrinfo(*args):
+            calls.append(args)
+            return result
+
+        resolver = CachingResolver(reactor, FakeResolver())
+        resolver._getaddrinfo = fakeGetaddrinfo
+        d = resolver.getAddressInfo("example.com", 80, 0, socket.SOCK_STREAM)
+        reactor._runThreadCalls()
+        first = self.successResultOf(d)
+        second = self.successResultOf(
+            resolver.getAddressInfo("example.com", 80, 0, socket.SOCK_STREAM))
+
+        self.assertEqual(calls,
+                         [("example.com", 80, 0, socket.SOCK_STREAM, 0, 0)])
+        self.assertEqual(first, result)
+        self.assertEqual(second, result)
+        self.assertIsNot(first, second)
+
+
+
 def nothing():
     """
     Function used by L{DelayedCallTests.test_str}.
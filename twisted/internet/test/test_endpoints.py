@@ -56,6 +56,7 @@ try:
     from twisted.internet.ssl import PrivateCertificate, Certificate
     from twisted.internet.ssl import CertificateOptions, KeyPair
     from twisted.internet.ssl import DiffieHellmanParameters
+    from twisted.internet.ssl import optionsForClientTLS
     from OpenSSL.SSL import (
         ContextType, SSLv23_METHOD, TLSv1_METHOD, OP_NO_SSLv3
     )
@@ -1796,6 +1797,28 @@ class HostnameEndpointsOneIPv4Tests(ClientEndpointTestCaseMixin,
                 {})], calls)
 
 
+    def test_nameResolutionByReactorResolver(self):
+        """
+        If the reactor's resolver has a C{getAddressInfo} method, such as
+        L{twisted.internet.base.CachingResolver.getAddressInfo},
+        _nameResolution uses it instead of calling _getaddrinfo in a thread
+        itself.
+        """
+        calls = []
+
+        class Resolver(object):
+            def getAddressInfo(self, *args):
+                calls.append(args)
+                return defer.Deferred()
+
+        mreactor = MemoryReactor()
+        mreactor.resolver = Resolver()
+        endpoint = endpoints.HostnameEndpoint(mreactor, b'ipv4.example.com',
+            1234)
+        endpoint.connect(object())
+        self.assertEqual([(b"ipv4.example.com", 1234, 0, SOCK_STREAM)], calls)
+
+
 
 class HostnameEndpointsOneIPv6Tests(ClientEndpointTestCaseMixin,
                                     unittest.TestCase):
@@ -2212,6 +2235,24 @@ class SSL4EndpointsTests(EndpointTestCaseMixin,
                 address)
 
 
+    def test_clientSessionKeyedByPort(self):
+        """
+        L{SSL4ClientEndpoint} tells a connection creator made by
+        L{optionsForClientTLS} the port it connects to, so that the sessions
+        of its connections are only offered to that port.
+        """
+        options = optionsForClientTLS(
+            u"example.com", trustRoot=testCertificate)
+        reactor = MemoryReactor()
+        endpoint = endpoints.SSL4ClientEndpoint(
+            reactor, "example.com", 8443, options)
+        endpoint.connect(Factory.forProtocol(Protocol))
+        contextFactory = reactor.sslClients[0][3]
+        self.assertEqual(
+            contextFactory._sessionKey,
+            (b"example.com", 8443, options._sessionKey[2]))
+
+
 
 class UNIXEndpointsTests(EndpointTestCaseMixin,
                          unittest.TestCase):
@@ -0,0 +1,379 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Tests for L{twisted.internet.instrumentation} and the instrumentation of
+L{twisted.internet.base.ReactorBase}.
+"""
+
+from __future__ import division, absolute_import
+
+from twisted.internet.base import _SignalReactorMixin
+from twisted.internet.instrumentation import (
+    ReactorInstrumentation, StatisticsReporter, SlowCallback)
+from twisted.internet.task import Clock
+from twisted.internet.test.reactormixins import ReactorBuilder
+from twisted.logger import Logger
+from twisted.python.reflect import qual
+from twisted.trial.unittest import SynchronousTestCase
+
+
+
+class FakeTimer(object):
+    """
+    A timer for L{ReactorInstrumentation} which only advances when told to.
+
+    @ivar now: The current time.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+
+    def __call__(self):
+        return self.now
+
+
+    def advance(self, amount):
+        self.now += amount
+
+
+
+class FakeDelayedCall(object):
+    """
+    Enough of a L{twisted.internet.base.DelayedCall} for
+    L{ReactorInstrumentation.runTimedCall}.
+    """
+
+    def __init__(self, time, func, *args, **kw):
+        self.time = time
+        self.func = func
+        self.args = args
+        self.kw = kw
+
+
+
+def slowFunction():
+    """
+    A function named in the records of slow callbacks.
+    """
+
+
+
+class Descriptor(object):
+    """
+    A class named in the records of slow I/O callbacks.
+    """
+
+
+
+class ReactorInstrumentationTests(SynchronousTestCase):
+    """
+    Tests for L{ReactorInstrumentation}.
+    """
+
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.instrumentation = ReactorInstrumentation(
+            slowCallbackThreshold=0.5, timer=self.timer)
+
+
+    def test_timedCall(self):
+        """
+        L{ReactorInstrumentation.runTimedCall} runs the call, counting and
+        timing it, and measures how late it is.
+        """
+        calls = []
+        def f(a, b):
+            calls.append((a, b))
+            self.timer.advance(0.25)
+        self.instrumentation.runTimedCall(
+            FakeDelayedCall(10, f, 1, b=2), 12)
+        self.instrumentation.runTimedCall(FakeDelayedCall(11, f, 3, b=4), 12)
+        self.assertEqual(calls, [(1, 2), (3, 4)])
+        self.assertEqual(self.instrumentation.timedCalls, 2)
+        self.assertEqual(self.instrumentation.timedCallTime, 0.5)
+        self.assertEqual(self.instrumentation.lag, 1)
+        self.assertEqual(self.instrumentation.maxLag, 2)
+        self.assertEqual(list(self.instrumentation.slowCallbacks), [])
+
+
+    def test_timedCallFails(self):
+        """
+        A delayed call which raises an exception is still counted, and the
+        exception is raised to the reactor.
+        """
+        self.assertRaises(
+            ZeroDivisionError, self.instrumentation.runTimedCall,
+            FakeDelayedCall(10, lambda: 1 // 0), 10)
+        self.assertEqual(self.instrumentation.timedCalls, 1)
+
+
+    def test_slowTimedCall(self):
+        """
+        A delayed call which takes at least the threshold is recorded in
+        L{ReactorInstrumentation.slowCallbacks} by its qualified name.
+        """
+        def slow():
+            self.timer.advance(0.5)
+        self.instrumentation.runTimedCall(FakeDelayedCall(10, slow), 10)
+        [record] = self.instrumentation.slowCallbacks
+        self.assertIsInstance(record, SlowCallback)
+        self.assertEqual(record.kind, "timed")
+        self.assertEqual(record.name, __name__ + ".slow")
+        self.assertEqual(record.duration, 0.5)
+        self.assertEqual(record.time, self.timer.now)
+
+
+    def test_threadCall(self):
+        """
+        L{ReactorInstrumentation.runThreadCall} runs the call, counting and
+        timing it, and records it if it is slow.
+        """
+        calls = []
+        def f(a, b):
+            calls.append((a, b))
+            self.timer.advance(1)
+        self.instrumentation.threadQueueRun(3)
+        self.instrumentation.threadQueueRun(1)
+        self.instrumentation.runThreadCall(f, (1,), {"b": 2})
+        self.assertEqual(calls, [(1, 2)])
+        self.assertEqual(self.instrumentation.threadCalls, 1)
+        self.assertEqual(self.instrumentation.threadCallTime, 1)
+        self.assertEqual(self.instrumentation.threadQueueDepth, 1)
+        self.assertEqual(self.instrumentation.maxThreadQueueDepth, 3)
+        [record] = self.instrumentation.slowCallbacks
+        self.assertEqual(record.kind, "thread")
+
+
+    def test_slowCallableName(self):
+        """
+        Slow callables which are classes are named after themselves, other
+        callables which are not functions or methods after their class.
+        """
+        class Callable(object):
+            def __call__(this):
+                pass
+        instrumentation = ReactorInstrumentation(
+            slowCallbackThreshold=0, timer=self.timer)
+        instrumentation.runThreadCall(Callable(), (), {})
+        instrumentation.runThreadCall(Descriptor, (), {})
+        self.assertEqual(
+            [record.name for record in instrumentation.slowCallbacks],
+            [__name__ + ".Callable", __name__ + ".Descriptor"])
+
+
+    def test_noThreshold(self):
+        """
+        If the threshold is C{None}, no callbacks are recorded as slow.
+        """
+        instrumentation = ReactorInstrumentation(timer=self.timer)
+        instrumentation.runThreadCall(self.timer.advance, (100,), {})
+        self.assertEqual(list(instrumentation.slowCallbacks), [])
+
+
+    def test_maxSlowCallbacks(self):
+        """
+        Only the most recent slow callbacks are kept.
+        """
+        instrumentation = ReactorInstrumentation(
+            slowCallbackThreshold=0, maxSlowCallbacks=2, timer=self.timer)
+        for f in slowFunction, Descriptor, slowFunction:
+            instrumentation.runThreadCall(f, (), {})
+        self.assertEqual(
+            [record.name for record in instrumentation.slowCallbacks],
+            [__name__ + ".Descriptor", __name__ + ".slowFunction"])
+
+
+    def test_ioHandler(self):
+        """
+        L{ReactorInstrumentation.wrapIOHandler} wraps an I/O handler so that
+        its calls are counted and timed, and recorded by the class of the
+        descriptor if they are slow.
+        """
+        calls = []
+        def handler(selectable, fd, event):
+            calls.append((selectable, fd, event))
+            self.timer.advance(0.5)
+            return "why"
+        wrapped = self.instrumentation.wrapIOHandler(handler)
+        descriptor = Descriptor()
+        self.assertEqual(wrapped(descriptor, 3, 1), "why")
+        self.assertEqual(calls, [(descriptor, 3, 1)])
+        self.assertEqual(self.instrumentation.ioCallbacks, 1)
+        self.assertEqual(self.instrumentation.ioCallbackTime, 0.5)
+        [record] = self.instrumentation.slowCallbacks
+        self.assertEqual(record.kind, "io")
+        self.assertEqual(record.name, __name__ + ".Descriptor")
+
+
+    def test_doIteration(self):
+        """
+        L{ReactorInstrumentation.doIteration} calls the reactor's
+        C{doIteration} and counts the time spent in it, less the time spent
+        handling I/O, as time waiting for I/O.
+        """
+        handler = self.instrumentation.wrapIOHandler(
+            lambda selectable: self.timer.advance(2))
+        delays = []
+        class Reactor(object):
+            def doIteration(this, delay):
+                delays.append(delay)
+                self.timer.advance(3)
+                handler(None)
+        self.instrumentation.doIteration(Reactor(), 5)
+        self.assertEqual(delays, [5])
+        self.assertEqual(self.instrumentation.iterations, 1)
+        self.assertEqual(self.instrumentation.ioWaitTime, 3)
+        self.assertEqual(self.instrumentation.ioCallbackTime, 2)
+
+
+    def test_snapshot(self):
+        """
+        L{ReactorInstrumentation.snapshot} returns the counters along with
+        totals across kinds of callbacks, and optionally resets them.
+        """
+        self.instrumentation.runThreadCall(self.timer.advance, (1,), {})
+        self.instrumentation.runTimedCall(
+            FakeDelayedCall(10, self.timer.advance, 0.25), 10)
+        snapshot = self.instrumentation.snapshot()
+        self.assertEqual(snapshot["callbacks"], 2)
+        self.assertEqual(snapshot["callbackTime"], 1.25)
+        self.assertEqual(snapshot["threadCalls"], 1)
+        self.assertEqual(len(snapshot["slowCallbacks"]), 1)
+        self.assertEqual(self.instrumentation.snapshot(reset=True), snapshot)
+        snapshot = self.instrumentation.snapshot()
+        self.assertEqual(snapshot["callbacks"], 0)
+        self.assertEqual(snapshot["threadCalls"], 0)
+        self.assertEqual(snapshot["slowCallbacks"], [])
+
+
+
+class StatisticsReporterTests(SynchronousTestCase):
+    """
+    Tests for L{StatisticsReporter}.
+    """
+
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.instrumentation = ReactorInstrumentation(
+            slowCallbackThreshold=1, timer=self.timer)
+        self.clock = Clock()
+
+
+    def test_report(self):
+        """
+        Every interval, L{StatisticsReporter} passes the statistics since
+        the last report to its observer.
+        """
+        reports = []
+        self.instrumentation.runThreadCall(lambda: None, (), {})
+        reporter = StatisticsReporter(
+            self.instrumentation, 10, reports.append, self.clock)
+        reporter.start()
+        self.instrumentation.runThreadCall(lambda: None, (), {})
+        self.clock.advance(9)
+        self.assertEqual(reports, [])
+        self.clock.advance(1)
+        self.assertEqual([report["threadCalls"] for report in reports], [1])
+        self.clock.advance(10)
+        self.assertEqual(
+            [report["threadCalls"] for report in reports], [1, 0])
+        reporter.stop()
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+    def test_log(self):
+        """
+        By default, L{StatisticsReporter} logs the statistics, and logs a
+        warning for each slow callback.
+        """
+        events = []
+        reporter = StatisticsReporter(
+            self.instrumentation, 10, clock=self.clock)
+        reporter.log = Logger(observer=events.append)
+        reporter.start()
+        self.addCleanup(reporter.stop)
+        self.instrumentation.runThreadCall(self.timer.advance, (2,), {})
+        self.clock.advance(10)
+        self.assertEqual(len(events), 2)
+        self.assertEqual(events[0]["threadCalls"], 1)
+        self.assertEqual(events[0]["callbackTime"], 2)
+        self.assertEqual(events[1]["name"], __name__ + ".FakeTimer.advance")
+        self.assertEqual(events[1]["kind"], "thread")
+        self.assertEqual(events[1]["duration"], 2)
+
+
+
+class ReactorInstrumentationTestsBuilder(ReactorBuilder):
+    """
+    Tests for the instrumentation of reactors.
+    """
+
+    def test_startTwice(self):
+        """
+        L{ReactorBase.startInstrumentation} raises L{RuntimeError} if
+        instrumentation is already running.
+        """
+        reactor = self.buildReactor()
+        reactor.startInstrumentation()
+        self.assertRaises(RuntimeError, reactor.startInstrumentation)
+
+
+    def test_stopNotStarted(self):
+        """
+        L{ReactorBase.stopInstrumentation} raises L{RuntimeError} if
+        instrumentation is not running.
+        """
+        reactor = self.buildReactor()
+        self.assertRaises(RuntimeError, reactor.stopInstrumentation)
+
+
+    def test_stop(self):
+        """
+        After L{ReactorBase.stopInstrumentation}, the reactor no longer
+        collects statistics.
+        """
+        reactor = self.buildReactor()
+        instrumentation = reactor.startInstrumentation()
+        reactor.stopInstrumentation()
+        reactor.callLater(0, reactor.stop)
+        self.runReactor(reactor)
+        self.assertEqual(instrumentation.timedCalls, 0)
+        self.assertEqual(instrumentation.iterations, 0)
+        self.assertEqual(instrumentation.ioCallbacks, 0)
+        for name in reactor._ioHandlerNames:
+            self.assertNotIn(name, reactor.__dict__)
+
+
+    def test_statistics(self):
+        """
+        While instrumentation is running, the reactor counts delayed calls,
+        calls from threads and I/O events, and records slow callbacks.
+        """
+        reactor = self.buildReactor()
+        instrumentation = reactor.startInstrumentation(
+            slowCallbackThreshold=0)
+        reactor.callLater(
+            0.01, reactor.callInThread, reactor.callFromThread, reactor.stop)
+        self.runReactor(reactor)
+        reactor.stopInstrumentation()
+
+        self.assertEqual(instrumentation.timedCalls, 1)
+        self.assertEqual(instrumentation.threadCalls, 1)
+        self.assertTrue(instrumentation.maxThreadQueueDepth >= 1)
+        self.assertTrue(instrumentation.maxLag >= 0)
+        self.assertIn(
+            ("timed", qual(type(reactor)) + ".callInThread"),
+            [(record.kind, record.name)
+             for record in instrumentation.slowCallbacks])
+        if type(reactor).mainLoop == _SignalReactorMixin.mainLoop:
+            self.assertTrue(instrumentation.iterations > 0)
+            self.assertTrue(instrumentation.ioWaitTime > 0)
+        if any(hasattr(reactor, name) for name in reactor._ioHandlerNames):
+            # The thread woke the reactor up with I/O on its waker.
+            self.assertTrue(instrumentation.ioCallbacks > 0)
+
+
+
+globals().update(ReactorInstrumentationTestsBuilder.makeTestCaseClasses())
@@ -0,0 +1,218 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Tests for L{twisted.internet._mmsg}.
+"""
+
+from __future__ import division, absolute_import
+
+import errno
+import socket
+
+from twisted.trial.unittest import SynchronousTestCase
+
+try:
+    from twisted.internet import _mmsg
+except ImportError:
+    _mmsg = None
+
+
+
+class AddressTests(SynchronousTestCase):
+    """
+    Tests for L{_mmsg.encodeAddress} and L{_mmsg.decodeAddress}.
+    """
+    if _mmsg is None:
+        skip = "recvmmsg and sendmmsg are not available."
+
+    def test_ipv4(self):
+        """
+        An IPv4 address is encoded as a C{struct sockaddr_in}, which decodes
+        to the same address.
+        """
+        name = _mmsg.encodeAddress(socket.AF_INET, ("192.0.2.1", 53))
+        self.assertEqual(len(name), 16)
+        self.assertEqual(_mmsg.decodeAddress(name), ("192.0.2.1", 53))
+
+
+    def test_ipv6(self):
+        """
+        An IPv6 address is encoded as a C{struct sockaddr_in6}, which decodes
+        to the address with a flow and scope ID of C{0}.
+        """
+        name = _mmsg.encodeAddress(socket.AF_INET6, ("2001:db8::1", 53))
+        self.assertEqual(len(name), 28)
+        self.assertEqual(_mmsg.decodeAddress(name),
+                         ("2001:db8::1", 53, 0, 0))
+
+
+    def test_notAnAddress(self):
+        """
+        L{_mmsg.encodeAddress} raises L{ValueError} for a host which is not
+        an address of the given family.
+        """
+        self.assertRaises(ValueError, _mmsg.encodeAddress, socket.AF_INET,
+                          ("<broadcast>", 53))
+        self.assertRaises(ValueError, _mmsg.encodeAddress, socket.AF_INET,
+                          ("::1", 53))
+
+
+
+class SendReceiveTests(SynchronousTestCase):
+    """
+    Tests for L{_mmsg.Sender} and L{_mmsg.Receiver}.
+    """
+    if _mmsg is None:
+        skip = "recvmmsg and sendmmsg are not available."
+
+    def socket(self, family=socket.AF_INET, host="127.0.0.1"):
+        """
+        Make a non-blocking datagram socket bound to a loopback address.
+        """
+        skt = socket.socket(family, socket.SOCK_DGRAM)
+        self.addCleanup(skt.close)
+        skt.bind((host, 0))
+        skt.setblocking(False)
+        return skt
+
+
+    def test_sendReceive(self):
+        """
+        L{_mmsg.Sender.send} sends several datagrams, each to its own
+        address, and L{_mmsg.Receiver.receive} receives them with the address
+        they came from.
+        """
+        sender = self.socket()
+        first = self.socket()
+        second = self.socket()
+        sent = _mmsg.Sender(4, 100).send(sender.fileno(), [
+                (b"one", _mmsg.encodeAddress(
+                        socket.AF_INET, first.getsockname())),
+                (b"two", _mmsg.encodeAddress(
+                        socket.AF_INET, second.getsockname())),
+                (b"three", _mmsg.encodeAddress(
+                        socket.AF_INET, first.getsockname()))])
+        self.assertEqual(sent, 3)
+        receiver = _mmsg.Receiver(4, 100)
+        self.assertEqual(
+            receiver.receive(first.fileno()),
+            [(b"one", sender.getsockname()), (b"three", sender.getsockname())])
+        self.assertEqual(
+            receiver.receive(second.fileno()),
+            [(b"two", sender.getsockname())])
+
+
+    def test_connected(self):
+        """
+        Datagrams without a destination address are sent to the address the
+        socket is connected to.
+        """
+        sender = self.socket()
+        receiving = self.socket()
+        sender.connect(receiving.getsockname())
+        self.assertEqual(
+            _mmsg.Sender(4, 100).send(sender.fileno(), [(b"x", None)]), 1)
+        self.assertEqual(receiving.recvfrom(100),
+                         (b"x", sender.getsockname()))
+
+
+    def test_ipv6(self):
+        """
+        Datagrams can be sent and received over IPv6.
+        """
+        try:
+            sender = self.socket(socket.AF_INET6, "::1")
+        except socket.error:
+            raise self.skipTest("IPv6 is not available.")
+        sender.sendto(b"x", sender.getsockname())
+        self.assertEqual(_mmsg.Receiver(1, 100).receive(sender.fileno()),
+                         [(b"x", sender.getsockname())])
+
+
+    def test_batch(self):
+        """
+        L{_mmsg.Receiver.receive} receives no more than C{count} datagrams,
+        each truncated to C{size} bytes.
+        """
+        skt = self.socket()
+        for data in [b"abcd", b"ef", b"ghijkl"]:
+            skt.sendto(data, skt.getsockname())
+        receiver = _mmsg.Receiver(2, 3)
+        self.assertEqual(
+            [data for (data, addr) in receiver.receive(skt.fileno())],
+            [b"abc", b"ef"])
+        self.assertEqual(
+            [data for (data, addr) in receiver.receive(skt.fileno())],
+            [b"ghi"])
+
+
+    def test_receiveNothing(self):
+        """
+        L{_mmsg.Receiver.receive} returns an empty list if there are no
+        datagrams to receive, and receives datagrams which arrive later.
+        """
+        skt = self.socket()
+        receiver = _mmsg.Receiver(1, 100)
+        self.assertEqual(receiver.receive(skt.fileno()), [])
+        skt.sendto(b"x", skt.getsockname())
+        self.assertEqual(receiver.receive(skt.fileno()),
+                         [(b"x", skt.getsockname())])
+
+
+    def test_receiveError(self):
+        """
+        L{_mmsg.Receiver.receive} raises L{socket.error} if datagrams cannot
+        be received.
+        """
+        skt = self.socket()
+        fd = skt.fileno()
+        skt.close()
+        exc = self.assertRaises(socket.error, _mmsg.Receiver(1, 100).receive,
+                                fd)
+        self.assertEqual(exc.args[0], errno.EBADF)
+
+
+    def test_sendLimits(self):
+        """
+        L{_mmsg.Sender.send} sends no more than C{count} datagrams, of no more
+        than C{size} bytes altogether, and returns the number sent.
+        """
+        skt = self.socket()
+        name = _mmsg.encodeAddress(socket.AF_INET, skt.getsockname())
+        sender = _mmsg.Sender(2, 5)
+        self.assertEqual(
+            sender.send(skt.fileno(), [(b"ab", name), (b"cd", name),
+                                       (b"ef", name)]), 2)
+        self.assertEqual(
+            sender.send(skt.fileno(), [(b"abc", name), (b"def", name)]), 1)
+        self.assertEqual([skt.recv(100) for i in range(3)],
+                         [b"ab", b"cd", b"abc"])
+
+
+    def test_sendError(self):
+        """
+        L{_mmsg.Sender.send} raises L{socket.error} if the first datagram
+        cannot be sent, and returns the number sent if a later one cannot.
+        """
+        skt = self.socket()
+        name = _mmsg.encodeAddress(socket.AF_INET, skt.getsockname())
+        sender = _mmsg.Sender(4, 2 ** 20)
+        tooLong = b"x" * 70000
+        exc = self.assertRaises(socket.error, sender.send, skt.fileno(),
+                                [(tooLong, name)])
+        self.assertEqual(exc.args[0], errno.EMSGSIZE)
+        self.assertEqual(
+            sender.send(skt.fileno(), [(b"x", name), (tooLong, name)]), 1)
+
+
+    def test_sendTooLarge(self):
+        """
+        L{_mmsg.Sender.send} raises L{socket.error} with C{EMSGSIZE} if the
+        first datagram is larger than its buffer.
+        """
+        skt = self.socket()
+        name = _mmsg.encodeAddress(socket.AF_INET, skt.getsockname())
+        exc = self.assertRaises(socket.error, _mmsg.Sender(1, 2).send,
+                                skt.fileno(), [(b"abc", name)])
+        self.assertEqual(exc.args[0], errno.EMSGSIZE)
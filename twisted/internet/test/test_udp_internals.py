@@ -11,7 +11,7 @@ import socket
 
 from twisted.trial import unittest
 from twisted.internet.protocol import DatagramProtocol
-from twisted.internet import udp
+from twisted.internet import error, udp
 from twisted.python.runtime import platformType
 
 if platformType == 'win32':
@@ -34,6 +34,7 @@ class StringUDPSocket(object):
     def __init__(self, retvals):
         self.retvals = retvals
         self.connectedAddr = None
+        self.sent = []
 
 
     def connect(self, addr):
@@ -50,6 +51,13 @@ class StringUDPSocket(object):
         return ret, None
 
 
+    def sendto(self, data, addr):
+        """
+        Record the data and address in C{self.sent}.
+        """
+        self.sent.append((data, addr))
+
+
 
 class KeepReads(DatagramProtocol):
     """
@@ -163,3 +171,135 @@ class ErrorsTests(unittest.SynchronousTestCase):
         port.socket = StringUDPSocket([b"good", socket.error(-1337)])
         self.assertRaises(socket.error, port.doRead)
         self.assertEqual(protocol.reads, [b"good"])
+
+
+
+class KeepBatches(DatagramProtocol):
+    """
+    Accumulate batches of reads in a list.
+    """
+
+    def __init__(self):
+        self.batches = []
+
+
+    def datagramsReceived(self, datagrams):
+        self.batches.append([data for (data, addr) in datagrams])
+
+
+
+class StringReceiver(object):
+    """
+    A fake L{twisted.internet._mmsg.Receiver}, which returns a fixed sequence
+    of batches of datagrams.
+
+    @ivar batches: A C{list} of C{list}s of strings.
+    """
+
+    def __init__(self, batches):
+        self.batches = batches
+
+
+    def receive(self, fd):
+        """
+        Return the next batch from C{self.batches}, or an empty list if there
+        are no more.
+        """
+        if self.batches:
+            return [(data, None) for data in self.batches.pop(0)]
+        return []
+
+
+
+class BatchTests(unittest.SynchronousTestCase):
+    """
+    Tests for receiving and sending datagrams in batches with C{udp.Port}.
+    """
+
+    def test_receiveBatches(self):
+        """
+        C{doRead} receives datagrams one at a time until it has received two,
+        then receives them in batches until there are no more.
+        """
+        protocol = KeepReads()
+        port = udp.Port(None, protocol)
+        port.socket = StringUDPSocket([b"a", b"b", b"f"])
+        port.socket.fileno = lambda: -1
+        port._receiver = StringReceiver([[b"c", b"d"], [b"e"]])
+        port.doRead()
+        self.assertEqual(protocol.reads, [b"a", b"b", b"c", b"d", b"e"])
+        self.assertEqual(port.socket.retvals, [b"f"])
+
+
+    def test_datagramsReceived(self):
+        """
+        If the protocol has a C{datagramsReceived} method, it is called once
+        with all of the datagrams read by C{doRead}.
+        """
+        protocol = KeepBatches()
+        port = udp.Port(None, protocol)
+        port.socket = StringUDPSocket(
+            [b"a", b"b", b"c", socket.error(EWOULDBLOCK), b"d",
+             socket.error(EWOULDBLOCK)])
+        port.doRead()
+        self.assertEqual(protocol.batches, [[b"a", b"b", b"c"]])
+        port.doRead()
+        self.assertEqual(protocol.batches, [[b"a", b"b", b"c"], [b"d"]])
+
+
+    def test_datagramsReceivedBeforeRefused(self):
+        """
+        Datagrams read before a connection refusal are delivered before the
+        protocol's C{connectionRefused} method is called.
+        """
+        udp._sockErrReadRefuse.append(-6000)
+        self.addCleanup(udp._sockErrReadRefuse.remove, -6000)
+
+        events = []
+        protocol = KeepBatches()
+        protocol.datagramsReceived = events.append
+        protocol.connectionRefused = lambda: events.append("refused")
+
+        port = udp.Port(None, protocol)
+        port.socket = StringUDPSocket([b"a", socket.error(-6000)])
+        port.connect("127.0.0.1", 9999)
+        port.doRead()
+        self.assertEqual(events, [[(b"a", None)], "refused"])
+
+
+    def test_datagramsReceivedError(self):
+        """
+        An exception raised by C{datagramsReceived} is logged.
+        """
+        protocol = KeepBatches()
+        protocol.datagramsReceived = lambda datagrams: 1 // 0
+        port = udp.Port(None, protocol)
+        port.socket = StringUDPSocket([b"a", socket.error(EWOULDBLOCK)])
+        port.doRead()
+        self.assertEqual(len(self.flushLoggedErrors(ZeroDivisionError)), 1)
+
+
+    def test_writeDatagrams(self):
+        """
+        C{writeDatagrams} sends each datagram to its address.
+        """
+        port = udp.Port(None, KeepReads())
+        port.socket = StringUDPSocket([])
+        port.writeDatagrams([(b"a", ("127.0.0.1", 1)),
+                             (b"b", ("127.0.0.2", 2))])
+        self.assertEqual(port.socket.sent, [(b"a", ("127.0.0.1", 1)),
+                                            (b"b", ("127.0.0.2", 2))])
+
+
+    def test_writeDatagramsHostname(self):
+        """
+        C{writeDatagrams} logs the L{error.InvalidAddressError} C{write}
+        raises for a datagram addressed to a hostname, and sends the others.
+        """
+        port = udp.Port(None, KeepReads())
+        port.socket = StringUDPSocket([])
+        port.writeDatagrams([(b"a", ("example.com", 1)),
+                             (b"b", ("127.0.0.2", 2))])
+        self.assertEqual(
+            len(self.flushLoggedErrors(error.InvalidAddressError)), 1)
+        self.assertEqual(port.socket.sent, [(b"b", ("127.0.0.2", 2))])
@@ -54,6 +54,20 @@ from twisted.internet import base, defer, address
 from twisted.python import log, failure
 from twisted.internet import abstract, error, interfaces
 
+try:
+    from twisted.internet import _mmsg
+except ImportError:
+    _mmsg = None
+    _sender = None
+else:
+    # Buffers for sending datagrams in batches, only used during a single
+    # system call, so all of the ports share them.
+    _sender = _mmsg.Sender(64, 2 ** 20)
+
+# Buffers for receiving datagrams in batches, keyed by the number and size of
+# the datagrams, and shared in the same way.
+_receivers = {}
+
 
 
 @implementer(
@@ -66,6 +80,11 @@ class Port(base.BasePort):
     @ivar maxThroughput: Maximum number of bytes read in one event
         loop iteration.
 
+    @ivar batchSize: The largest number of datagrams received or sent by one
+        system call, on platforms where several can be.  (On other platforms
+        each system call receives or sends just one.)
+    @type batchSize: L{int}
+
     @ivar addressFamily: L{socket.AF_INET} or L{socket.AF_INET6}, depending on
         whether this port is listening on an IPv4 address or an IPv6 address.
 
@@ -76,14 +95,19 @@ class Port(base.BasePort):
         was created and initialized outside of the reactor and will be used to
         listen for connections (instead of a new socket being created by this
         L{Port}).
+
+    @ivar _receiver: The L{_mmsg.Receiver} used to receive datagrams in
+        batches, or C{None} if they are received one at a time.
     """
 
     addressFamily = socket.AF_INET
     socketType = socket.SOCK_DGRAM
     maxThroughput = 256 * 1024
+    batchSize = 64
 
     _realPortNumber = None
     _preexistingSocket = None
+    _receiver = None
 
     def __init__(self, port, proto, interface='', maxPacketSize=8192, reactor=None):
         """
@@ -213,6 +237,15 @@ class Port(base.BasePort):
 
 
     def _connectToProtocol(self):
+        if (_mmsg is not None and
+                self.addressFamily in (socket.AF_INET, socket.AF_INET6)):
+            # Don't let the shared buffers grow past a megabyte or so for
+            # ports accepting large datagrams.
+            key = (max(1, min(self.batchSize, 2 ** 20 // self.maxPacketSize)),
+                   self.maxPacketSize)
+            if key not in _receivers:
+                _receivers[key] = _mmsg.Receiver(*key)
+            self._receiver = _receivers[key]
         self.protocol.makeConnection(self)
         self.startReading()
 
@@ -220,12 +253,30 @@ class Port(base.BasePort):
     def doRead(self):
         """
         Called when my socket is ready for reading.
+
+        If the protocol has a C{datagramsReceived} method, it is called once
+        with a L{list} of C{(data, addr)} pairs for all of the datagrams read,
+        instead of C{datagramReceived} being called for each one.
         """
+        datagramsReceived = getattr(self.protocol, 'datagramsReceived', None)
+        received = []
         read = 0
+        reads = 0
         while read < self.maxThroughput:
             try:
-                data, addr = self.socket.recvfrom(self.maxPacketSize)
+                # Receiving a batch costs more than receiving one datagram
+                # when there is only one waiting, so batches are only
+                # received once a few datagrams have turned up together.
+                if self._receiver is None or reads < 2:
+                    datagrams = [self.socket.recvfrom(self.maxPacketSize)]
+                else:
+                    datagrams = self._receiver.receive(self.socket.fileno())
+                    if not datagrams:
+                        break
+                reads += 1
             except socket.error as se:
+                if received:
+                    self._deliver(datagramsReceived, received)
                 no = se.args[0]
                 if no in _sockErrReadIgnore:
                     return
@@ -234,7 +285,7 @@ class Port(base.BasePort):
                         self.protocol.connectionRefused()
                     return
                 raise
-            else:
+            for data, addr in datagrams:
                 read += len(data)
                 if self.addressFamily == socket.AF_INET6:
                     # Remove the flow and scope ID from the address tuple,
@@ -244,10 +295,32 @@ class Port(base.BasePort):
                     # unpack to (host, port) but also includes the flow info
                     # and scope ID. See http://tm.tl/6826
                     addr = addr[:2]
-                try:
-                    self.protocol.datagramReceived(data, addr)
-                except:
-                    log.err()
+                if datagramsReceived is not None:
+                    received.append((data, addr))
+                elif self.disconnected:
+                    # The protocol stopped the port while handling an earlier
+                    # datagram of the batch.
+                    return
+                else:
+                    try:
+                        self.protocol.datagramReceived(data, addr)
+                    except:
+                        log.err()
+        if received:
+            self._deliver(datagramsReceived, received)
+
+
+    def _deliver(self, datagramsReceived, datagrams):
+        """
+        Deliver a batch of datagrams to the protocol.
+
+        @param datagramsReceived: The protocol's C{datagramsReceived} method.
+        @param datagrams: A L{list} of C{(data, addr)} pairs.
+        """
+        try:
+            datagramsReceived(datagrams)
+        except:
+            log.err()
 
 
     def write(self, datagram, addr=None):
@@ -278,21 +351,7 @@ class Port(base.BasePort):
                     raise
         else:
             assert addr != None
-            if (not abstract.isIPAddress(addr[0])
-                    and not abstract.isIPv6Address(addr[0])
-                    and addr[0] != "<broadcast>"):
-                raise error.InvalidAddressError(
-                    addr[0],
-                    "write() only accepts IP addresses, not hostnames")
-            if ((abstract.isIPAddress(addr[0]) or addr[0] == "<broadcast>")
-                    and self.addressFamily == socket.AF_INET6):
-                raise error.InvalidAddressError(
-                    addr[0],
-                    "IPv6 port write() called with IPv4 or broadcast address")
-            if (abstract.isIPv6Address(addr[0])
-                    and self.addressFamily == socket.AF_INET):
-                raise error.InvalidAddressError(
-                    addr[0], "IPv4 port write() called with IPv6 address")
+            self._checkAddress(addr)
             try:
                 return self.socket.sendto(datagram, addr)
             except socket.error as se:
@@ -309,9 +368,116 @@ class Port(base.BasePort):
                 else:
                     raise
 
+
+    def _checkAddress(self, addr):
+        """
+        Check that datagrams can be sent to an address from this port.
+
+        @param addr: See L{write}.
+
+        @raise error.InvalidAddressError: If they cannot.
+        """
+        if (not abstract.isIPAddress(addr[0])
+                and not abstract.isIPv6Address(addr[0])
+                and addr[0] != "<broadcast>"):
+            raise error.InvalidAddressError(
+                addr[0],
+                "write() only accepts IP addresses, not hostnames")
+        if ((abstract.isIPAddress(addr[0]) or addr[0] == "<broadcast>")
+                and self.addressFamily == socket.AF_INET6):
+            raise error.InvalidAddressError(
+                addr[0],
+                "IPv6 port write() called with IPv4 or broadcast address")
+        if (abstract.isIPv6Address(addr[0])
+                and self.addressFamily == socket.AF_INET):
+            raise error.InvalidAddressError(
+                addr[0], "IPv4 port write() called with IPv6 address")
+
+
     def writeSequence(self, seq, addr):
         self.write("".join(seq), addr)
 
+
+    def writeDatagrams(self, datagrams):
+        """
+        Write several datagrams, with as few system calls as the platform
+        allows.
+
+        A datagram which L{write} would fail to send, for example because it
+        is too long (L{error.MessageLengthError}) or addressed to a hostname
+        (L{error.InvalidAddressError}), is not sent and the error is logged;
+        the datagrams after it are still sent.
+
+        @param datagrams: C{(datagram, addr)} pairs, each giving the arguments
+            to pass to L{write} to send one of the datagrams.
+        @type datagrams: iterable
+
+        @since: 15.3
+        """
+        if self._receiver is None:
+            for datagram, addr in datagrams:
+                self._writeOrLog(datagram, addr)
+            return
+        batch = []
+        addresses = []
+        for datagram, addr in datagrams:
+            if self._connectedAddr:
+                assert addr in (None, self._connectedAddr)
+                name = None
+            else:
+                assert addr != None
+                try:
+                    name = _mmsg.encodeAddress(self.addressFamily, addr)
+                except ValueError:
+                    # Not an address of the right family, or one which needs
+                    # more work to encode, like "<broadcast>": write knows
+                    # what to do with it.
+                    self._writeBatch(batch, addresses)
+                    batch, addresses = [], []
+                    self._writeOrLog(datagram, addr)
+                    continue
+            batch.append((datagram, name))
+            addresses.append(addr)
+            if len(batch) == self.batchSize:
+                self._writeBatch(batch, addresses)
+                batch, addresses = [], []
+        self._writeBatch(batch, addresses)
+
+
+    def _writeBatch(self, batch, addresses):
+        """
+        Send datagrams with as few calls to C{sendmmsg} as possible.
+
+        @param batch: C{(datagram, name)} pairs to pass to
+            L{_mmsg.Sender.send}.
+        @param addresses: The address each datagram is sent to, as passed to
+            L{writeDatagrams}.
+        """
+        while batch:
+            if len(batch) == 1:
+                # sendto is quicker for a single datagram.
+                self._writeOrLog(batch[0][0], addresses[0])
+                return
+            try:
+                sent = _sender.send(self.socket.fileno(), batch)
+            except socket.error:
+                # Let write retry the datagram which could not be sent and
+                # deal with the error in the usual way.
+                self._writeOrLog(batch[0][0], addresses[0])
+                sent = 1
+            del batch[:sent], addresses[:sent]
+
+
+    def _writeOrLog(self, datagram, addr):
+        """
+        Send a datagram with L{write}, logging the error if it cannot be sent
+        instead of raising it, for L{writeDatagrams}.
+        """
+        try:
+            self.write(datagram, addr)
+        except:
+            log.err(None, "Could not send a datagram to %r" % (addr,))
+
     def connect(self, host, port):
         """
         'Connect' to remote server.
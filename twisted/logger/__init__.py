@@ -63,7 +63,7 @@ __all__ = [
     "LimitedHistoryLogObserver",
 
     # From ._file
-    "FileLogObserver", "textFileLogObserver",
+    "FileLogObserver", "BufferedFileLogObserver", "textFileLogObserver",
 
     # From ._filter
     "PredicateResult", "ILogFilterPredicate",
@@ -100,7 +100,9 @@ from ._observer import ILogObserver, LogPublisher
 
 from ._buffer import LimitedHistoryLogObserver
 
-from ._file import FileLogObserver, textFileLogObserver
+from ._file import (
+    FileLogObserver, BufferedFileLogObserver, textFileLogObserver
+)
 
 from ._filter import (
     PredicateResult, ILogFilterPredicate, FilteringLogObserver,
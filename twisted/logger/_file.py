@@ -6,6 +6,16 @@
 File log observer.
 """
 
+import atexit
+import threading
+import time
+import weakref
+
+try:
+    from Queue import Queue, Empty, Full
+except ImportError:
+    from queue import Queue, Empty, Full
+
 from zope.interface import implementer
 
 from twisted.python.compat import ioType, unicode
@@ -47,6 +57,23 @@ class FileLogObserver(object):
         @param event: An event.
         @type event: L{dict}
         """
+        text = self._textForEvent(event)
+        if text:
+            self._outFile.write(text)
+            self._outFile.flush()
+
+
+    def _textForEvent(self, event):
+        """
+        Format an event, including any traceback, and encode it for the file.
+
+        @param event: An event.
+        @type event: L{dict}
+
+        @return: The text to write to the file, which may be empty.
+        @rtype: L{unicode}, or L{bytes} if the file does not accept
+            L{unicode}.
+        """
         text = self.formatEvent(event)
 
         if text is None:
@@ -62,9 +89,239 @@ class FileLogObserver(object):
         if self._encoding is not None:
             text = text.encode(self._encoding)
 
-        if text:
-            self._outFile.write(text)
-            self._outFile.flush()
+        return text
+
+
+
+# Put on the queue of a BufferedFileLogObserver to end its writer thread.
+_stopWriting = object()
+
+
+
+@implementer(ILogObserver)
+class BufferedFileLogObserver(object):
+    """
+    Log observer that formats events on the calling thread and writes them
+    to a file in batches from a dedicated writer thread, so that a slow disk
+    does not block the caller.
+
+    Formatted events are put on a bounded queue.  The writer thread takes
+    everything that is queued, writes it with a single C{write} call, and
+    flushes the file once C{flushSize} characters have been written since
+    the last flush or C{flushInterval} seconds have passed.  Call L{stop} to
+    write out and flush everything queued and end the writer thread; it is
+    also called when the interpreter exits.  Neither the writer thread nor
+    that exit hook keeps the observer alive: once it has been garbage
+    collected, the writer thread writes out what is left and ends.
+
+    @ivar written: The number of events which were written.
+    @type written: L{int}
+    """
+
+    written = 0
+    _overflowed = 0
+    _failed = 0
+
+    _thread = None
+    _stopped = False
+
+    def __init__(self, fileObserver, maxQueueSize=10000, blockWhenFull=False,
+                 flushInterval=1.0, flushSize=2 ** 16):
+        """
+        @param fileObserver: The observer whose file and formatting to use,
+            for example one returned by L{textFileLogObserver} or
+            L{jsonFileLogObserver<twisted.logger.jsonFileLogObserver>}.
+        @type fileObserver: L{FileLogObserver}
+
+        @param maxQueueSize: The largest number of events which may be
+            waiting to be written.
+        @type maxQueueSize: L{int}
+
+        @param blockWhenFull: If C{True}, the caller waits for room when the
+            queue is full; otherwise the event is dropped and counted in
+            C{dropped}.
+        @type blockWhenFull: L{bool}
+
+        @param flushInterval: The longest time, in seconds, that written
+            events may sit in the file's buffer.
+        @type flushInterval: L{float}
+
+        @param flushSize: The number of characters which may be written
+            before the file is flushed.
+        @type flushSize: L{int}
+        """
+        self._fileObserver = fileObserver
+        self._queue = Queue(maxQueueSize)
+        self._blockWhenFull = blockWhenFull
+        self.flushInterval = flushInterval
+        self.flushSize = flushSize
+        self._lock = threading.Lock()
+
+
+    def __call__(self, event):
+        """
+        Format an event and queue it to be written.
+
+        @param event: An event.
+        @type event: L{dict}
+        """
+        if self._stopped:
+            self._overflowed += 1
+            return
+        text = self._fileObserver._textForEvent(event)
+        if not text:
+            return
+        if self._thread is None:
+            self._start()
+        # Holding the lock keeps stop from queueing the end of the writer
+        # thread between the check and the put; the writer thread never
+        # takes it, so a put waiting for room is not stuck.
+        with self._lock:
+            if self._stopped:
+                self._overflowed += 1
+                return
+            try:
+                self._queue.put(text, self._blockWhenFull)
+            except Full:
+                self._overflowed += 1
+
+
+    @property
+    def dropped(self):
+        """
+        The number of events which were not written, either because the queue
+        was full, because they were observed after L{stop}, or because writing
+        them failed.
+
+        @rtype: L{int}
+        """
+        return self._overflowed + self._failed
+
+
+    def _start(self):
+        """
+        Start the writer thread, unless it has been started already or
+        L{stop} has been called.
+        """
+        with self._lock:
+            if self._thread is not None or self._stopped:
+                return
+            observerRef = weakref.ref(self)
+            self._thread = threading.Thread(
+                target=_writeLoop, name="BufferedFileLogObserver",
+                args=(observerRef, self._queue, self._fileObserver._outFile))
+            self._thread.daemon = True
+            self._thread.start()
+            atexit.register(_stopAtExit, observerRef, self._thread)
+
+
+    def stop(self):
+        """
+        Write out everything queued, flush the file, and end the writer
+        thread.  Events observed afterwards are dropped.
+        """
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(_stopWriting)
+            thread.join()
+
+
+
+def _writeLoop(observerRef, queue, outFile):
+    """
+    Take batches of text from the queue of a L{BufferedFileLogObserver} and
+    write them to its file, until told to stop or until the observer has
+    been garbage collected.
+
+    @param observerRef: A weak reference to the observer, to read its flush
+        settings from and to record what was written and dropped on.
+    @type observerRef: L{weakref.ref}
+
+    @param queue: The queue of the observer.
+    @type queue: L{Queue}
+
+    @param outFile: The file to write to.
+    """
+    flushInterval = flushSize = None
+    unflushed = 0
+    lastFlush = time.time()
+    stopping = False
+    while not stopping:
+        observer = observerRef()
+        if observer is None:
+            # Nothing more can be queued: write out what is left.
+            stopping = True
+        else:
+            flushInterval = observer.flushInterval
+            flushSize = observer.flushSize
+        del observer
+
+        try:
+            batch = [queue.get(not stopping, flushInterval)]
+        except Empty:
+            batch = []
+        while True:
+            try:
+                batch.append(queue.get_nowait())
+            except Empty:
+                break
+        late = 0
+        if _stopWriting in batch:
+            stopping = True
+            index = batch.index(_stopWriting)
+            late = len(batch) - index - 1
+            del batch[index:]
+
+        written = failed = 0
+        if batch:
+            try:
+                outFile.write(batch[0][:0].join(batch))
+            except Exception:
+                failed = len(batch)
+            else:
+                written = len(batch)
+                unflushed += sum(map(len, batch))
+        observer = observerRef()
+        if observer is not None:
+            observer.written += written
+            observer._failed += failed
+            if late:
+                with observer._lock:
+                    observer._overflowed += late
+        del observer
+
+        now = time.time()
+        if unflushed and (stopping or unflushed >= flushSize or
+                          now - lastFlush >= flushInterval):
+            try:
+                outFile.flush()
+            except Exception:
+                pass
+            unflushed = 0
+            lastFlush = now
+
+
+
+def _stopAtExit(observerRef, thread):
+    """
+    Stop a L{BufferedFileLogObserver} when the interpreter exits, or wait for
+    its writer thread to finish if it has been garbage collected.
+
+    @param observerRef: A weak reference to the observer.
+    @type observerRef: L{weakref.ref}
+
+    @param thread: The writer thread of the observer.
+    @type thread: L{threading.Thread}
+    """
+    observer = observerRef()
+    if observer is not None:
+        observer.stop()
+    else:
+        thread.join()
 
 
 
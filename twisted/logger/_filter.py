@@ -13,6 +13,10 @@ from zope.interface import Interface, implementer
 from twisted.python.constants import NamedConstant, Names
 from ._levels import InvalidLogLevelError, LogLevel
 from ._observer import ILogObserver
+from ._logger import (
+    _NO_LEVEL, _minimumLevelsChanged, _minimumPriorityForObserver,
+    _levelForPriority
+)
 
 
 
@@ -40,6 +44,16 @@ class ILogFilterPredicate(Interface):
 
 
 
+def _ignoreEvent(event):
+    """
+    An observer which ignores every event.
+
+    @param event: An event.
+    @type event: L{dict}
+    """
+
+
+
 def shouldLogEvent(predicates, event):
     """
     Determine whether an event should be logged, based on the result of
@@ -86,7 +100,7 @@ class FilteringLogObserver(object):
 
     def __init__(
         self, observer, predicates,
-        negativeObserver=lambda event: None
+        negativeObserver=_ignoreEvent
     ):
         """
         @param observer: An observer to which this observer will forward
@@ -102,7 +116,8 @@ class FilteringLogObserver(object):
         @type negativeObserver: L{ILogObserver}
         """
         self._observer = observer
-        self._shouldLogEvent = partial(shouldLogEvent, list(predicates))
+        self._predicates = list(predicates)
+        self._shouldLogEvent = partial(shouldLogEvent, self._predicates)
         self._negativeObserver = negativeObserver
 
 
@@ -118,6 +133,40 @@ class FilteringLogObserver(object):
             self._negativeObserver(event)
 
 
+    def minimumLogLevelForNamespace(self, namespace):
+        """
+        Determine the lowest log level this observer forwards to an observer
+        which cares about it.
+
+        Events below the level published by the first predicate are passed
+        to the negative observer; other events are passed to the wrapped
+        observer or the negative observer, according to the predicates.  So
+        the level is the lower of that for the negative observer (unless it
+        is the default, which ignores every event), and the higher of that
+        for the first predicate and that for the wrapped observer.
+
+        @param namespace: A logging namespace.
+        @type namespace: L{str} (native string)
+
+        @return: The lowest level which is not discarded, or C{None} if any
+            event may be forwarded.
+        @rtype: L{LogLevel} or C{None}
+        """
+        positive = _minimumPriorityForObserver(self._observer, namespace)
+        if self._predicates:
+            positive = max(
+                positive,
+                _minimumPriorityForObserver(self._predicates[0], namespace)
+            )
+        if self._negativeObserver is _ignoreEvent:
+            negative = _NO_LEVEL
+        else:
+            negative = _minimumPriorityForObserver(
+                self._negativeObserver, namespace
+            )
+        return _levelForPriority(min(positive, negative))
+
+
 
 @implementer(ILogFilterPredicate)
 class LogLevelFilterPredicate(object):
@@ -189,6 +238,7 @@ class LogLevelFilterPredicate(object):
             self._logLevelsByNamespace[namespace] = level
         else:
             self._logLevelsByNamespace[None] = level
+        _minimumLevelsChanged()
 
 
     def clearLogLevels(self):
@@ -197,6 +247,21 @@ class LogLevelFilterPredicate(object):
         """
         self._logLevelsByNamespace.clear()
         self._logLevelsByNamespace[None] = self.defaultLogLevel
+        _minimumLevelsChanged()
+
+
+    def minimumLogLevelForNamespace(self, namespace):
+        """
+        Determine the lowest log level of events in a namespace which are not
+        filtered out.  This is the log level for the namespace.
+
+        @param namespace: A logging namespace.
+        @type namespace: L{str} (native string)
+
+        @return: The log level for the specified namespace.
+        @rtype: L{LogLevel}
+        """
+        return self.logLevelForNamespace(namespace)
 
 
     def __call__(self, event):
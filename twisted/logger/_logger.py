@@ -7,20 +7,111 @@ Logger class.
 """
 
 from time import time
+from weakref import ref
 
 from twisted.python.compat import currentframe
 from twisted.python.failure import Failure
 from ._levels import InvalidLogLevelError, LogLevel
 
 
+_levelPriorities = LogLevel._levelPriorities
+_levelsByPriority = dict(
+    (priority, level) for (level, priority) in _levelPriorities.items()
+)
+
+# A priority higher than that of any level, for observers which discard
+# every event.
+_NO_LEVEL = len(_levelPriorities)
+
+# Incremented whenever the minimum log level published by some observer may
+# have changed; see L{_minimumLevelsChanged}.
+_minimumLevelGeneration = 0
+
+
+
+def _minimumLevelsChanged():
+    """
+    Note that the minimum log level published by an observer, by way of a
+    C{minimumLogLevelForNamespace} method, may have changed.  L{Logger}s ask
+    their observer for its minimum level again before emitting their next
+    event.
+    """
+    global _minimumLevelGeneration
+    _minimumLevelGeneration += 1
+
+
+
+def _minimumPriorityForObserver(observer, namespace):
+    """
+    Determine the lowest priority of events in a namespace which an observer
+    may do anything with.
+
+    Observers (and filter predicates) publish the lowest log level they care
+    about with an optional C{minimumLogLevelForNamespace} method, which takes
+    a namespace and returns a L{LogLevel}, or C{None} if any event may be of
+    interest.  Such an observer promises to ignore every event in that
+    namespace with a lower level, and to call L{_minimumLevelsChanged} when
+    the level it would return changes.
+
+    @param observer: An observer or filter predicate.
+
+    @param namespace: A logging namespace.
+    @type namespace: L{str} (native string)
+
+    @return: The priority (see L{LogLevel._priorityForLevel}) of the lowest
+        level the observer cares about; C{0} if it may care about any event.
+    @rtype: L{int}
+    """
+    minimumLevel = getattr(observer, "minimumLogLevelForNamespace", None)
+    if minimumLevel is None:
+        return 0
+    level = minimumLevel(namespace)
+    if level is None:
+        return 0
+    return _levelPriorities[level]
+
+
+
+def _levelForPriority(priority):
+    """
+    Find the log level with a given priority.
+
+    @param priority: A priority, as returned by
+        L{_minimumPriorityForObserver}.
+    @type priority: L{int}
+
+    @return: The level with that priority, or C{None} for the lowest
+        priority (which matches every event) or a priority higher than any
+        level's.
+    @rtype: L{LogLevel} or C{None}
+    """
+    if 0 < priority < _NO_LEVEL:
+        return _levelsByPriority[priority]
+    return None
+
+
 
 class Logger(object):
     """
     A L{Logger} emits log messages to an observer.  You should instantiate it
     as a class or module attribute, as documented in L{this module's
     documentation <twisted.logger>}.
+
+    Events with a level lower than the minimum level published by the
+    observer for this logger's namespace are discarded by L{emit} without
+    being constructed.
+
+    @ivar source: The object which is emitting events via this logger.
     """
 
+    _minimumGeneration = -1
+    _minimumObserver = None
+    _minimumPriority = 0
+
+    _source = None
+    _sourceReference = None
+    _boundLoggers = None
+
     @staticmethod
     def _namespaceFromCallingContext():
         """
@@ -79,17 +170,55 @@ class Logger(object):
         the L{Logger}.  In the above example, C{Something.log.source} would be
         C{Something}, and C{Something().log.source} would be an instance of
         C{Something}.
+
+        The L{Logger} created for each class or instance is cached for as
+        long as that class or instance exists, provided it can be weakly
+        referenced.
         """
         if oself is None:
             source = type
         else:
             source = oself
 
-        return self.__class__(
+        key = id(source)
+        boundLoggers = self._boundLoggers
+        if boundLoggers is None:
+            boundLoggers = self._boundLoggers = {}
+        else:
+            logger = boundLoggers.get(key)
+            if (
+                logger is not None and
+                logger._sourceReference() is source and
+                logger.observer is self.observer
+            ):
+                return logger
+
+        logger = self.__class__(
             ".".join([type.__module__, type.__name__]),
-            source,
             observer=self.observer,
         )
+        try:
+            logger._sourceReference = ref(
+                source, lambda reference: boundLoggers.pop(key, None)
+            )
+        except TypeError:
+            logger.source = source
+        else:
+            boundLoggers[key] = logger
+        return logger
+
+
+    def _getSource(self):
+        if self._sourceReference is not None:
+            return self._sourceReference()
+        return self._source
+
+
+    def _setSource(self, source):
+        self._sourceReference = None
+        self._source = source
+
+    source = property(_getSource, _setSource)
 
 
     def __repr__(self):
@@ -111,7 +240,9 @@ class Logger(object):
             non-deterministic behavior from observers that schedule work for
             later execution.
         """
-        if level not in LogLevel.iterconstants():
+        try:
+            priority = _levelPriorities[level]
+        except (KeyError, TypeError):
             self.failure(
                 "Got invalid log level {invalidLevel!r} in {logger}.emit().",
                 Failure(InvalidLogLevelError(level)),
@@ -120,6 +251,14 @@ class Logger(object):
             )
             return
 
+        if (
+            self._minimumGeneration != _minimumLevelGeneration or
+            self._minimumObserver is not self.observer
+        ):
+            self._updateMinimumPriority()
+        if priority < self._minimumPriority and "log_trace" not in kwargs:
+            return
+
         event = kwargs
         event.update(
             log_logger=self, log_level=level, log_namespace=self.namespace,
@@ -132,6 +271,17 @@ class Logger(object):
         self.observer(event)
 
 
+    def _updateMinimumPriority(self):
+        """
+        Ask our observer for the lowest level it cares about in our namespace.
+        """
+        self._minimumGeneration = _minimumLevelGeneration
+        self._minimumObserver = self.observer
+        self._minimumPriority = _minimumPriorityForObserver(
+            self.observer, self.namespace
+        )
+
+
     def failure(self, format, failure=None, level=LogLevel.critical, **kwargs):
         """
         Log an failure and emit a traceback.
@@ -9,7 +9,10 @@ Basic log observers.
 from zope.interface import Interface, implementer
 
 from twisted.python.failure import Failure
-from ._logger import Logger
+from ._logger import (
+    Logger, _minimumLevelsChanged, _minimumPriorityForObserver,
+    _levelForPriority
+)
 
 
 
@@ -91,6 +94,7 @@ class LogPublisher(object):
             raise TypeError("Observer is not callable: {0!r}".format(observer))
         if observer not in self._observers:
             self._observers.append(observer)
+            _minimumLevelsChanged()
 
 
     def removeObserver(self, observer):
@@ -103,6 +107,29 @@ class LogPublisher(object):
             self._observers.remove(observer)
         except ValueError:
             pass
+        else:
+            _minimumLevelsChanged()
+
+
+    def minimumLogLevelForNamespace(self, namespace):
+        """
+        Determine the lowest log level that any of the contained observers
+        cares about.
+
+        @param namespace: A logging namespace.
+        @type namespace: L{str} (native string)
+
+        @return: The lowest level published by the contained observers, or
+            C{None} if any of them does not publish one, or if there are no
+            observers.
+        @rtype: L{LogLevel} or C{None}
+        """
+        if not self._observers:
+            return None
+        return _levelForPriority(min(
+            _minimumPriorityForObserver(observer, namespace)
+            for observer in self._observers
+        ))
 
 
     def __call__(self, event):
@@ -6,6 +6,9 @@ Test cases for L{twisted.logger._file}.
 """
 
 from io import StringIO
+import gc
+import threading
+import weakref
 
 from zope.interface.verify import verifyObject, BrokenMethodImplementation
 
@@ -15,7 +18,9 @@ from twisted.python.failure import Failure
 from twisted.python.compat import unicode
 from .._observer import ILogObserver
 from .._file import FileLogObserver
+from .._file import BufferedFileLogObserver, _stopWriting, _writeLoop
 from .._file import textFileLogObserver
+from .._json import jsonFileLogObserver, eventsFromJSONLogFile
 
 
 
@@ -169,24 +174,196 @@ class TextFileLogObserverTests(TestCase):
 
 
 
+class BufferedFileLogObserverTests(TestCase):
+    """
+    Tests for L{BufferedFileLogObserver}.
+    """
+
+    def test_interface(self):
+        """
+        L{BufferedFileLogObserver} is an L{ILogObserver}.
+        """
+        observer = BufferedFileLogObserver(
+            FileLogObserver(StringIO(), lambda e: unicode(e)))
+        try:
+            verifyObject(ILogObserver, observer)
+        except BrokenMethodImplementation as e:
+            self.fail(e)
+
+
+    def test_writesOnStop(self):
+        """
+        Once L{BufferedFileLogObserver.stop} returns, every observed event has
+        been written to the file of the wrapped observer, which was flushed.
+        """
+        fileHandle = DummyFile()
+        observer = BufferedFileLogObserver(
+            FileLogObserver(fileHandle, lambda e: u"{x}\n".format(**e)))
+        for i in range(100):
+            observer(dict(x=i))
+        observer.stop()
+        self.assertEqual(fileHandle.written,
+                         u"".join(u"{0}\n".format(i) for i in range(100)))
+        self.assertTrue(fileHandle.writes <= 100)
+        self.assertTrue(fileHandle.flushes >= 1)
+        self.assertEqual((observer.written, observer.dropped), (100, 0))
+
+
+    def test_textFileLogObserver(self):
+        """
+        L{BufferedFileLogObserver} writes the same text as the
+        L{FileLogObserver} returned by L{textFileLogObserver} would.
+        """
+        fileHandle = StringIO()
+        observer = BufferedFileLogObserver(
+            textFileLogObserver(fileHandle, timeFormat=u"%f"))
+        observer(dict(log_format=u"XYZZY", log_time=1.23456))
+        observer.stop()
+        self.assertEqual(fileHandle.getvalue(), u"234560 [-#-] XYZZY\n")
+
+
+    def test_jsonFileLogObserver(self):
+        """
+        Events written by a L{BufferedFileLogObserver} wrapping the observer
+        returned by L{jsonFileLogObserver} can be read back.
+        """
+        fileHandle = StringIO()
+        observer = BufferedFileLogObserver(jsonFileLogObserver(fileHandle))
+        observer(dict(x=1))
+        observer(dict(x=2))
+        observer.stop()
+        fileHandle.seek(0)
+        self.assertEqual(
+            [event["x"] for event in eventsFromJSONLogFile(fileHandle)],
+            [1, 2])
+
+
+    def test_dropWhenFull(self):
+        """
+        When the queue is full, events are dropped and counted in
+        C{dropped}.
+        """
+        fileHandle = DummyFile()
+        fileHandle.blocked = threading.Event()
+        observer = BufferedFileLogObserver(
+            FileLogObserver(fileHandle, lambda e: u"x"), maxQueueSize=1)
+        for i in range(10):
+            observer(dict(x=i))
+        fileHandle.blocked.set()
+        observer.stop()
+        self.assertTrue(observer.dropped > 0)
+        self.assertEqual(observer.written + observer.dropped, 10)
+        self.assertEqual(len(fileHandle.written), observer.written)
+
+
+    def test_dropAfterStop(self):
+        """
+        Events observed after L{BufferedFileLogObserver.stop} are dropped.
+        """
+        fileHandle = DummyFile()
+        observer = BufferedFileLogObserver(
+            FileLogObserver(fileHandle, lambda e: u"x"))
+        observer.stop()
+        observer(dict(x=1))
+        self.assertEqual((observer.written, observer.dropped), (0, 1))
+        self.assertEqual(fileHandle.written, u"")
+
+
+    def test_noStartAfterStop(self):
+        """
+        The writer thread is not started once
+        L{BufferedFileLogObserver.stop} has been called.
+        """
+        observer = BufferedFileLogObserver(
+            FileLogObserver(DummyFile(), lambda e: u"x"))
+        observer.stop()
+        observer._start()
+        self.assertIdentical(observer._thread, None)
+
+
+    def test_dropAfterStopQueued(self):
+        """
+        Events which were queued after the writer thread was told to stop are
+        counted in C{dropped}.
+        """
+        fileHandle = DummyFile()
+        observer = BufferedFileLogObserver(
+            FileLogObserver(fileHandle, lambda e: u"x"))
+        observer._queue.put(u"x")
+        observer._queue.put(_stopWriting)
+        observer._queue.put(u"y")
+        _writeLoop(weakref.ref(observer), observer._queue, fileHandle)
+        self.assertEqual(fileHandle.written, u"x")
+        self.assertEqual((observer.written, observer.dropped), (1, 1))
+
+
+    def test_notKeptAlive(self):
+        """
+        Neither its writer thread nor its exit hook keep a
+        L{BufferedFileLogObserver} alive; once it has been garbage collected,
+        the writer thread writes out what was queued and ends.
+        """
+        fileHandle = DummyFile()
+        observer = BufferedFileLogObserver(
+            FileLogObserver(fileHandle, lambda e: u"x"), flushInterval=0.01)
+        observer(dict(x=1))
+        thread = observer._thread
+        observerRef = weakref.ref(observer)
+        del observer
+        gc.collect()
+        self.assertIdentical(observerRef(), None)
+        thread.join(10)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(fileHandle.written, u"x")
+        self.assertTrue(fileHandle.flushes >= 1)
+
+
+    def test_writeFailure(self):
+        """
+        Events which could not be written are counted in C{dropped}, and the
+        writer thread carries on with later events.
+        """
+        fileHandle = DummyFile()
+        fileHandle.failures = 1
+        observer = BufferedFileLogObserver(
+            FileLogObserver(fileHandle, lambda e: u"x"))
+        observer(dict(x=1))
+        observer.stop()
+        self.assertEqual(observer.dropped, 1)
+
+
+
 class DummyFile(object):
     """
     File that counts writes and flushes.
     """
 
+    blocked = None
+    failures = 0
+
     def __init__(self):
         self.writes = 0
         self.flushes = 0
+        self.written = u""
 
 
     def write(self, data):
         """
         Write data.
 
+        If C{blocked} is a L{threading.Event}, wait for it to be set first.
+        If C{failures} is positive, decrement it and raise L{IOError}.
+
         @param data: data
         @type data: L{unicode} or L{bytes}
         """
+        if self.blocked is not None:
+            self.blocked.wait()
+        if self.failures:
+            self.failures -= 1
+            raise IOError("Simulated write failure")
         self.writes += 1
+        self.written += data
 
 
     def flush(self):
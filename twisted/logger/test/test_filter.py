@@ -13,6 +13,7 @@ from .._levels import InvalidLogLevelError
 from .._levels import LogLevel
 from .._observer import ILogObserver
 from .._observer import LogPublisher
+from .._logger import Logger
 from .._filter import FilteringLogObserver
 from .._filter import PredicateResult
 from .._filter import LogLevelFilterPredicate
@@ -272,6 +273,57 @@ class FilteringLogObserverTests(unittest.TestCase):
 
 
 
+    def test_minimumLogLevel(self):
+        """
+        L{FilteringLogObserver.minimumLogLevelForNamespace} is the higher of
+        the levels published by its first predicate and its observer.
+        """
+        predicate = LogLevelFilterPredicate(LogLevel.info)
+        warn = FilteringLogObserver(
+            lambda e: None, [LogLevelFilterPredicate(LogLevel.warn)]
+        )
+        self.assertEqual(
+            FilteringLogObserver(
+                lambda e: None, [predicate]
+            ).minimumLogLevelForNamespace("x"),
+            LogLevel.info
+        )
+        self.assertEqual(
+            FilteringLogObserver(
+                warn, [predicate]
+            ).minimumLogLevelForNamespace("x"),
+            LogLevel.warn
+        )
+        self.assertEqual(
+            FilteringLogObserver(
+                warn, [lambda e: PredicateResult.yes]
+            ).minimumLogLevelForNamespace("x"),
+            LogLevel.warn
+        )
+
+
+    def test_minimumLogLevelUnpublished(self):
+        """
+        L{FilteringLogObserver.minimumLogLevelForNamespace} is C{None} if
+        neither the first predicate nor the observer publishes a level, or if
+        the negative observer does not.
+        """
+        predicate = LogLevelFilterPredicate(LogLevel.info)
+        self.assertIs(
+            FilteringLogObserver(
+                lambda e: None, [lambda e: PredicateResult.maybe, predicate]
+            ).minimumLogLevelForNamespace("x"),
+            None
+        )
+        self.assertIs(
+            FilteringLogObserver(
+                lambda e: None, [predicate], lambda e: None
+            ).minimumLogLevelForNamespace("x"),
+            None
+        )
+
+
+
 class LogLevelFilterPredicateTests(unittest.TestCase):
     """
     Tests for L{LogLevelFilterPredicate}.
@@ -409,3 +461,39 @@ class LogLevelFilterPredicateTests(unittest.TestCase):
 
         checkPredicate(None, LogLevel.critical, PredicateResult.no)
         checkPredicate("twext.web2", None, PredicateResult.no)
+
+
+    def test_minimumLogLevel(self):
+        """
+        L{LogLevelFilterPredicate.minimumLogLevelForNamespace} is the log
+        level for the namespace.
+        """
+        predicate = LogLevelFilterPredicate(LogLevel.info)
+        predicate.setLogLevelForNamespace("twext.web2", LogLevel.debug)
+        self.assertEqual(
+            predicate.minimumLogLevelForNamespace("twext.web2.foo"),
+            LogLevel.debug
+        )
+        self.assertEqual(
+            predicate.minimumLogLevelForNamespace("twext"), LogLevel.info
+        )
+
+
+    def test_setLogLevelChangesMinimumLogLevel(self):
+        """
+        Changing the log levels of a L{LogLevelFilterPredicate} takes effect
+        on the events emitted by a L{Logger} which uses it.
+        """
+        events = []
+        predicate = LogLevelFilterPredicate(LogLevel.info)
+        log = Logger(
+            "a.b", observer=FilteringLogObserver(events.append, [predicate])
+        )
+        log.debug("ignored")
+        predicate.setLogLevelForNamespace("a", LogLevel.debug)
+        log.debug("observed")
+        predicate.clearLogLevels()
+        log.debug("ignored")
+        self.assertEqual(
+            [event["log_format"] for event in events], ["observed"]
+        )
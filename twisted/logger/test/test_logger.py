@@ -5,6 +5,9 @@
 Test cases for L{twisted.logger._logger}.
 """
 
+import gc
+from weakref import ref
+
 from twisted.trial import unittest
 
 from .._levels import InvalidLogLevelError
@@ -12,6 +15,7 @@ from .._levels import LogLevel
 from .._format import formatEvent
 from .._logger import Logger
 from .._global import globalLogPublisher
+from .._logger import _minimumLevelsChanged
 
 
 
@@ -54,6 +58,31 @@ class LogComposedObject(object):
 
 
 
+class MinimumLevelObserver(object):
+    """
+    An observer which records events and publishes a minimum log level.
+
+    @ivar events: The observed events.
+    @ivar minimumLevel: The level to publish.
+    @ivar queries: The number of times the minimum level was asked for.
+    """
+
+    def __init__(self, minimumLevel):
+        self.events = []
+        self.minimumLevel = minimumLevel
+        self.queries = 0
+
+
+    def __call__(self, event):
+        self.events.append(event)
+
+
+    def minimumLogLevelForNamespace(self, namespace):
+        self.queries += 1
+        return self.minimumLevel
+
+
+
 class LoggerTests(unittest.TestCase):
     """
     Tests for L{Logger}.
@@ -252,3 +281,97 @@ class LoggerTests(unittest.TestCase):
 
         log = TestLogger(observer=publisher)
         log.info("Hello.", log_trace=[])
+
+
+    def test_descriptorCached(self):
+        """
+        Retrieving a L{Logger} used as a descriptor repeatedly from the same
+        instance or class gives the same L{Logger}.
+        """
+        obj = LogComposedObject()
+        other = LogComposedObject()
+        self.assertIs(obj.log, obj.log)
+        self.assertIs(LogComposedObject.log, LogComposedObject.log)
+        self.assertIsNot(obj.log, other.log)
+        self.assertIs(other.log.source, other)
+
+
+    def test_descriptorCacheReleased(self):
+        """
+        The cached L{Logger} does not keep its source alive.
+        """
+        obj = LogComposedObject()
+        obj.log
+        key = id(obj)
+        reference = ref(obj)
+        del obj
+        gc.collect()
+        self.assertIs(reference(), None)
+        self.assertNotIn(
+            key, LogComposedObject.__dict__["log"]._boundLoggers
+        )
+
+
+    def test_descriptorNotWeaklyReferenceable(self):
+        """
+        A L{Logger} used as a descriptor on a class whose instances cannot be
+        weakly referenced still has the instance as its source.
+        """
+        class Slotted(object):
+            __slots__ = ()
+            log = Logger()
+
+        obj = Slotted()
+        self.assertIs(obj.log.source, obj)
+
+
+    def test_belowMinimumLevel(self):
+        """
+        Events below the minimum level published by the observer are not
+        emitted.
+        """
+        observer = MinimumLevelObserver(LogLevel.warn)
+        log = Logger(observer=observer)
+        log.debug("debug")
+        log.info("info")
+        log.warn("warn")
+        log.error("error")
+        self.assertEqual(
+            [event["log_format"] for event in observer.events],
+            ["warn", "error"]
+        )
+
+
+    def test_minimumLevelCached(self):
+        """
+        L{Logger} asks its observer for its minimum level again only after
+        the minimum levels have changed, or when its observer is replaced.
+        """
+        observer = MinimumLevelObserver(LogLevel.warn)
+        log = Logger(observer=observer)
+        log.debug("debug")
+        log.debug("debug")
+        self.assertEqual(observer.queries, 1)
+
+        observer.minimumLevel = LogLevel.debug
+        _minimumLevelsChanged()
+        log.debug("debug")
+        self.assertEqual(observer.queries, 2)
+        self.assertEqual(len(observer.events), 1)
+
+        replacement = MinimumLevelObserver(None)
+        log.observer = replacement
+        log.debug("debug")
+        self.assertEqual(replacement.queries, 1)
+        self.assertEqual(len(replacement.events), 1)
+
+
+    def test_traceBelowMinimumLevel(self):
+        """
+        Traced events are emitted even if they are below the minimum level
+        published by the observer.
+        """
+        observer = MinimumLevelObserver(LogLevel.warn)
+        log = Logger(observer=observer)
+        log.debug("debug", log_trace=[])
+        self.assertEqual(len(observer.events), 1)
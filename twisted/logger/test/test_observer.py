@@ -9,9 +9,11 @@ from zope.interface.verify import verifyObject, BrokenMethodImplementation
 
 from twisted.trial import unittest
 
+from .._levels import LogLevel
 from .._logger import Logger
 from .._observer import ILogObserver
 from .._observer import LogPublisher
+from .._filter import FilteringLogObserver, LogLevelFilterPredicate
 
 
 
@@ -188,3 +190,58 @@ class LogPublisherTests(unittest.TestCase):
 
         self.assertEqual(traces[1], ((publisher, o1),))
         self.assertEqual(traces[2], ((publisher, o1), (publisher, o2)))
+
+
+    def test_minimumLogLevel(self):
+        """
+        L{LogPublisher.minimumLogLevelForNamespace} is the lowest level
+        published by its observers.
+        """
+        warn = FilteringLogObserver(
+            lambda e: None, [LogLevelFilterPredicate(LogLevel.warn)]
+        )
+        info = FilteringLogObserver(
+            lambda e: None, [LogLevelFilterPredicate(LogLevel.info)]
+        )
+        publisher = LogPublisher(warn, info)
+        self.assertEqual(
+            publisher.minimumLogLevelForNamespace("x"), LogLevel.info
+        )
+
+
+    def test_minimumLogLevelUnpublished(self):
+        """
+        L{LogPublisher.minimumLogLevelForNamespace} is C{None} if it has no
+        observers or any observer does not publish a minimum level.
+        """
+        warn = FilteringLogObserver(
+            lambda e: None, [LogLevelFilterPredicate(LogLevel.warn)]
+        )
+        self.assertIs(LogPublisher().minimumLogLevelForNamespace("x"), None)
+        self.assertIs(
+            LogPublisher(warn, lambda e: None).minimumLogLevelForNamespace(
+                "x"
+            ),
+            None
+        )
+
+
+    def test_observersChangeMinimumLogLevel(self):
+        """
+        Adding and removing observers takes effect on the events emitted by a
+        L{Logger} which uses the publisher.
+        """
+        events = []
+        warn = FilteringLogObserver(
+            events.append, [LogLevelFilterPredicate(LogLevel.warn)]
+        )
+        publisher = LogPublisher(warn)
+        log = Logger(observer=publisher)
+        log.info("ignored")
+        publisher.addObserver(events.append)
+        log.info("observed")
+        publisher.removeObserver(events.append)
+        log.info("ignored")
+        self.assertEqual(
+            [event["log_format"] for event in events], ["observed"]
+        )
@@ -44,22 +44,6 @@ def getSerial(filename = '/tmp/twisted-names.serial'):
     return serial
 
 
-#class LookupCacherMixin(object):
-#    _cache = None
-#
-#    def _lookup(self, name, cls, type, timeout = 10):
-#        if not self._cache:
-#            self._cache = {}
-#            self._meth = super(LookupCacherMixin, self)._lookup
-#
-#        if self._cache.has_key((name, cls, type)):
-#            return self._cache[(name, cls, type)]
-#        else:
-#            r = self._meth(name, cls, type, timeout)
-#            self._cache[(name, cls, type)] = r
-#            return r
-
-
 
 class FileAuthority(common.ResolverBase):
     """
@@ -69,6 +53,16 @@ class FileAuthority(common.ResolverBase):
         processing will be done.
     @ivar _ADDRESS_TYPES: Record types which are useful for inclusion in the
         additional section generated during additional processing.
+
+    @ivar _cache: The answers found by L{_lookup}, each as a L{tuple} of the
+        L{tuple}s of records in each section, keyed by the name and type of
+        the query; or C{None} if none have been found since the zone was
+        loaded.  The C{soa} and C{records} of the zone the answers were found
+        in are kept in C{_cachedZone}, so that replacing either (by loading
+        the zone again, or by a zone transfer) discards them.
+
+    @ivar _cacheSize: The number of answers to keep in C{_cache}.  When there
+        are more, they are all discarded.
     """
     # See https://twistedmatrix.com/trac/ticket/6650
     _ADDITIONAL_PROCESSING_TYPES = (dns.CNAME, dns.MX, dns.NS)
@@ -76,11 +70,13 @@ class FileAuthority(common.ResolverBase):
 
     soa = None
     records = None
+    _cache = None
+    _cachedZone = (None, None)
+    _cacheSize = 10000
 
     def __init__(self, filename):
         common.ResolverBase.__init__(self)
         self.loadFile(filename)
-        self._cache = {}
 
 
     def __setstate__(self, state):
@@ -123,6 +119,10 @@ class FileAuthority(common.ResolverBase):
         """
         Determine a response to a particular DNS query.
 
+        Answers are found by L{_answer}, and kept until the zone is loaded
+        again, so that the records of each section of an answer are shared by
+        every response to the same query.
+
         @param name: The name which is being queried and for which to lookup a
             response.
         @type name: L{bytes}
@@ -143,6 +143,40 @@ class FileAuthority(common.ResolverBase):
             I{additional} sections of a DNS response) or with a L{Failure} if
             there is a problem processing the query.
         """
+        cache = self._cache
+        zone = self._cachedZone
+        if (cache is None or zone[0] is not self.soa or
+                zone[1] is not self.records or len(cache) >= self._cacheSize):
+            self._cache = cache = {}
+            self._cachedZone = (self.soa, self.records)
+
+        key = (name, type)
+        answer = cache.get(key)
+        if answer is None:
+            try:
+                answer = self._answer(name, type)
+            except (error.DomainError, error.AuthoritativeDomainError):
+                return defer.fail()
+            cache[key] = answer
+        results, authority, additional = answer
+        return defer.succeed((list(results), list(authority), list(additional)))
+
+
+    def _answer(self, name, type):
+        """
+        Find the records of the response to a particular DNS query.
+
+        @param name: See L{_lookup}.
+        @param type: See L{_lookup}.
+
+        @return: A L{tuple} of the L{tuple}s of records of the I{answer},
+            I{authority}, and I{additional} sections of the response.
+
+        @raise AuthoritativeDomainError: If the name is in this zone, but does
+            not exist.
+
+        @raise DomainError: If the name is not in this zone.
+        """
         cnames = []
         results = []
         authority = []
@@ -192,18 +226,18 @@ class FileAuthority(common.ResolverBase):
                 authority.append(
                     dns.RRHeader(self.soa[0], dns.SOA, dns.IN, ttl, self.soa[1], auth=True)
                     )
-            return defer.succeed((results, authority, additional))
+            return (tuple(results), tuple(authority), tuple(additional))
         else:
             if dns._isSubdomainOf(name, self.soa[0]):
                 # We may be the authority and we didn't find it.
                 # XXX: The QNAME may also be a in a delegated child zone. See
                 # #6581 and #6580
-                return defer.fail(failure.Failure(dns.AuthoritativeDomainError(name)))
+                raise dns.AuthoritativeDomainError(name)
             else:
                 # The QNAME is not a descendant of this zone. Fail with
                 # DomainError so that the next chained authority or
                 # resolver will be queried.
-                return defer.fail(failure.Failure(error.DomainError(name)))
+                raise error.DomainError(name)
 
 
     def lookupZone(self, name, timeout = 10):
@@ -8,26 +8,200 @@ An in-memory caching resolver.
 
 from __future__ import division, absolute_import
 
-from twisted.names import dns, common
+import heapq
+import itertools
+from collections import OrderedDict
+
+from twisted.names import dns, common, error
 from twisted.python import failure, log
 from twisted.internet import defer
 
 
 
+class _CacheEntry(object):
+    """
+    A result held by L{CacheResolver}.
+
+    @ivar when: The time at which the result was added to the cache.
+
+    @ivar ttl: The number of seconds for which the result may be used.
+    @type ttl: L{int}
+
+    @ivar payload: The answer, authority and additional records, each as a
+        L{tuple} of L{dns.RRHeader}, or L{None} for a name which does not
+        exist.
+
+    @ivar _built: The records last returned by L{result}, and the number of
+        whole seconds their TTLs were reduced by.
+
+    @ivar _stale: The records last returned by L{staleResult}.
+    """
+    __slots__ = ['when', 'ttl', 'payload', '_built', '_stale']
+
+    def __init__(self, when, ttl, payload):
+        self.when = when
+        self.ttl = ttl
+        self.payload = payload
+        self._built = None
+        self._stale = None
+
+
+    def result(self, elapsed):
+        """
+        Get the records of the result, with their TTLs reduced by the time
+        they have been in the cache.
+
+        Records with the same reduced TTLs are only built once, so repeated
+        lookups within a second share them.
+
+        @param elapsed: The number of whole seconds since the result was
+            added to the cache.
+        @type elapsed: L{int}
+
+        @return: A 3-tuple of lists of L{dns.RRHeader}.
+        """
+        built = self._built
+        if built is None or built[0] != elapsed:
+            records = tuple(
+                tuple([dns.RRHeader(r.name.name, r.type, r.cls,
+                                    r.ttl - elapsed, r.payload)
+                       for r in section])
+                for section in self.payload)
+            self._built = built = (elapsed, records)
+        answers, authority, additional = built[1]
+        return list(answers), list(authority), list(additional)
+
+
+    def staleResult(self, ttl):
+        """
+        Get the records of the result after it has expired, all with the
+        same TTL.
+
+        @param ttl: The TTL to give the records.
+        @type ttl: L{int}
+
+        @return: A 3-tuple of lists of L{dns.RRHeader}.
+        """
+        records = tuple(
+            tuple([dns.RRHeader(r.name.name, r.type, r.cls, ttl, r.payload)
+                   for r in section])
+            for section in self.payload)
+        self._stale = records
+        answers, authority, additional = records
+        return list(answers), list(authority), list(additional)
+
+
+    def gave(self, payload):
+        """
+        Check whether a result is the one last returned by this entry.
+
+        @param payload: A 3-tuple of lists of L{dns.RRHeader}.
+        @rtype: L{bool}
+        """
+        for records in (self._built and self._built[1], self._stale):
+            if records is not None and all(
+                    len(given) == len(section) and
+                    all(a is b for a, b in zip(given, section))
+                    for given, section in zip(payload, records)):
+                return True
+        return False
+
+
+
 class CacheResolver(common.ResolverBase):
     """
     A resolver that serves records from a local, memory cache.
 
+    At most L{maxEntries} results are kept: adding more evicts those which
+    were least recently used.  A result expires when its smallest TTL has
+    passed; expired results are never returned, and are removed by a single
+    timer set for the earliest expiry, rather than by one for each result.
+
+    Names which do not exist, and names without records of the type asked
+    for, are cached for the time given by the SOA record which came with the
+    answer, as described by RFC 2308.
+
+    If the cache has an L{upstream} resolver, it can also refresh results
+    which are looked up shortly before they expire, so that popular names
+    never have to wait for it (see L{prefetch}), and answer with expired
+    results when it cannot be reached, or does not answer quickly enough, as
+    described by RFC 8767 (see L{staleTTL} and L{clientResponseTimeout}).
+
     @ivar _reactor: A provider of L{interfaces.IReactorTime}.
+
+    @ivar upstream: The L{IResolver} used to refresh results, or L{None}.
+        L{server.DNSServerFactory<twisted.names.server.DNSServerFactory>}
+        sets this to its clients if it is L{None}.
+
+    @ivar prefetch: The fraction of its TTL which may be left of a result
+        when it is looked up for it to be refreshed in the background, or
+        L{None} not to refresh results before they expire.
+    @type prefetch: L{float}
+
+    @ivar staleTTL: The number of seconds after a result expires for which it
+        is kept, and used if L{upstream} cannot refresh it.
+    @type staleTTL: L{int}
+
+    @ivar staleAnswerTTL: The TTL given to the records of expired results.
+    @type staleAnswerTTL: L{int}
+
+    @ivar clientResponseTimeout: The number of seconds to wait for
+        L{upstream} to refresh an expired result before answering with the
+        expired result, or L{None} to wait until its lookup fails.  The
+        refresh carries on after the expired result has been used.
+    @type clientResponseTimeout: L{float}
+
+    @ivar maxEntries: The largest number of results to keep, or L{None} for
+        no limit.
+    @type maxEntries: L{int}
+
+    @ivar hits: The number of lookups answered from the cache with results
+        which had not expired.
+    @type hits: L{int}
+
+    @ivar misses: The number of lookups not answered from the cache.
+    @type misses: L{int}
+
+    @ivar evictions: The number of results removed before they expired, to
+        keep the size of the cache within L{maxEntries}.
+    @type evictions: L{int}
     """
     cache = None
+    maxEntries = None
+    hits = 0
+    misses = 0
+    evictions = 0
+    upstream = None
+    prefetch = None
+    staleTTL = 0
+    staleAnswerTTL = 30
+    clientResponseTimeout = 1.8
+    _expiryCall = None
 
-    def __init__(self, cache=None, verbose=0, reactor=None):
+    def __init__(self, cache=None, verbose=0, reactor=None,
+                 maxEntries=10000, upstream=None, prefetch=None, staleTTL=0,
+                 clientResponseTimeout=1.8):
+        """
+        @param maxEntries: See L{maxEntries}.
+        @param upstream: See L{upstream}.
+        @param prefetch: See L{prefetch}.
+        @param staleTTL: See L{staleTTL}.
+        @param clientResponseTimeout: See L{clientResponseTimeout}.
+        @since: 15.3 for C{maxEntries}, C{upstream}, C{prefetch},
+            C{staleTTL} and C{clientResponseTimeout}.
+        """
         common.ResolverBase.__init__(self)
 
-        self.cache = {}
+        self.cache = OrderedDict()
         self.verbose = verbose
-        self.cancel = {}
+        self.maxEntries = maxEntries
+        self.upstream = upstream
+        self.prefetch = prefetch
+        self.staleTTL = staleTTL
+        self.clientResponseTimeout = clientResponseTimeout
+        self._refreshing = {}
+        self._expiryQueue = []
+        self._counter = itertools.count()
         if reactor is None:
             from twisted.internet import reactor
         self._reactor = reactor
@@ -40,48 +214,195 @@ class CacheResolver(common.ResolverBase):
     def __setstate__(self, state):
         self.__dict__ = state
 
+        entries = self.cache
+        if isinstance(entries, dict):
+            entries = entries.items()
+        self.cache = OrderedDict()
+        self._refreshing = {}
+        self._expiryQueue = []
+        self._counter = itertools.count()
         now = self._reactor.seconds()
-        for (k, (when, (ans, add, ns))) in self.cache.items():
-            diff = now - when
-            for rec in ans + add + ns:
-                if rec.ttl < diff:
-                    del self.cache[k]
-                    break
+        for query, saved in entries:
+            if len(saved) == 2:
+                # Cache saved by an older version.
+                when, payload = saved
+                entry = _CacheEntry(when, self._ttl(payload),
+                                    self._sections(payload))
+            else:
+                entry = _CacheEntry(*saved)
+            if now - entry.when <= entry.ttl + self.staleTTL:
+                self._store(query, entry)
 
 
     def __getstate__(self):
-        for c in self.cancel.values():
-            c.cancel()
-        self.cancel.clear()
-        return self.__dict__
+        if self._expiryCall is not None:
+            self._expiryCall.cancel()
+            self._expiryCall = None
+        state = self.__dict__.copy()
+        del state['_expiryQueue'], state['_counter'], state['_refreshing']
+        state['cache'] = [(query, (entry.when, entry.ttl, entry.payload))
+                          for query, entry in self.cache.items()]
+        return state
 
 
     def _lookup(self, name, cls, type, timeout):
         now = self._reactor.seconds()
         q = dns.Query(name, type, cls)
-        try:
-            when, (ans, auth, add) = self.cache[q]
-        except KeyError:
+        entry = self.cache.get(q)
+        stale = False
+        if entry is not None:
+            elapsed = int(now - entry.when)
+            if elapsed > entry.ttl:
+                stale = (self.upstream is not None and
+                         now - entry.when <= entry.ttl + self.staleTTL)
+                if not stale:
+                    entry = None
+        if entry is None:
+            self.misses += 1
             if self.verbose > 1:
                 log.msg('Cache miss for ' + repr(name))
             return defer.fail(failure.Failure(dns.DomainError(name)))
-        else:
-            if self.verbose:
-                log.msg('Cache hit for ' + repr(name))
-            diff = now - when
-
-            try:
-                result = (
-                    [dns.RRHeader(r.name.name, r.type, r.cls, r.ttl - diff,
-                                  r.payload) for r in ans],
-                    [dns.RRHeader(r.name.name, r.type, r.cls, r.ttl - diff,
-                                  r.payload) for r in auth],
-                    [dns.RRHeader(r.name.name, r.type, r.cls, r.ttl - diff,
-                                  r.payload) for r in add])
-            except ValueError:
-                return defer.fail(failure.Failure(dns.DomainError(name)))
-            else:
-                return defer.succeed(result)
+
+        # Move the entry to the most recently used end.
+        del self.cache[q]
+        self.cache[q] = entry
+        if stale:
+            self.misses += 1
+            return self._lookupStale(q, entry, timeout)
+
+        self.hits += 1
+        if self.verbose:
+            log.msg('Cache hit for ' + repr(name))
+        if (self.prefetch is not None and self.upstream is not None and
+                entry.ttl > 0 and
+                entry.ttl - (now - entry.when) <= entry.ttl * self.prefetch):
+            self._refresh(q, timeout).addErrback(self._ebPrefetch, q)
+        return self._fromEntry(name, entry, entry.result, elapsed)
+
+
+    def _lookupStale(self, query, entry, timeout):
+        """
+        Answer a lookup for an expired result with a fresh result from
+        L{upstream}, or with the expired result if L{upstream} fails or has
+        not answered within L{clientResponseTimeout}.
+
+        @return: A L{Deferred} which fires with the answer.
+        """
+        d = defer.Deferred()
+        d.addErrback(self._ebRefreshStale, query, entry)
+        timer = None
+        if self.clientResponseTimeout is not None:
+            timer = self._reactor.callLater(
+                self.clientResponseTimeout, d.errback,
+                failure.Failure(defer.TimeoutError(
+                    'No answer within %s seconds' % (
+                        self.clientResponseTimeout,))))
+
+        def answer(result):
+            if timer is None:
+                d.callback(result)
+            elif timer.active():
+                timer.cancel()
+                d.callback(result)
+            # Otherwise the expired result has been used already, and the
+            # refresh has only updated the cache.
+        self._refresh(query, timeout).addBoth(answer)
+        return d
+
+
+    def _fromEntry(self, name, entry, getResult, *args):
+        """
+        Answer a lookup from a cache entry.
+
+        @param getResult: The method of C{entry} to get its records with.
+        @param args: The arguments to pass to C{getResult}.
+
+        @return: A L{Deferred} which fires with the records of the entry, or
+            fails with L{dns.AuthoritativeDomainError} if the entry is for a
+            name which does not exist.
+        """
+        if entry.payload is None:
+            # Stop a resolver chain from asking anyone else.
+            return defer.fail(failure.Failure(
+                dns.AuthoritativeDomainError(name)))
+        return defer.succeed(getResult(*args))
+
+
+    def _refresh(self, query, timeout):
+        """
+        Ask L{upstream} for a fresh result for a query, and cache it.
+
+        Only one request for each query is made at a time.
+
+        @return: A L{Deferred} which fires with the result from L{upstream},
+            or fails as its lookup did.
+        """
+        d = defer.Deferred()
+        waiting = self._refreshing.get(query)
+        if waiting is not None:
+            waiting.append(d)
+            return d
+        self._refreshing[query] = waiting = [d]
+        if self.verbose > 1:
+            log.msg('Refreshing %r' % (query,))
+        refreshed = self.upstream.query(query, timeout)
+        refreshed.addCallbacks(self._cbRefresh, self._ebRefresh,
+                               callbackArgs=(query,), errbackArgs=(query,))
+        def done(result):
+            del self._refreshing[query]
+            for waiter in waiting:
+                waiter.callback(result)
+        refreshed.addBoth(done)
+        return d
+
+
+    def _cbRefresh(self, result, query):
+        """
+        Cache a result from L{upstream}.
+        """
+        self.cacheResult(query, result)
+        return result
+
+
+    def _ebRefresh(self, reason, query):
+        """
+        Cache the answer from L{upstream} that the name of a query does not
+        exist.
+        """
+        if reason.check(error.DNSNameError):
+            answer = reason.value.args and reason.value.args[0]
+            if isinstance(answer, dns.Message):
+                self.cacheNegativeResult(query, answer.authority)
+        return reason
+
+
+    def _ebRefreshStale(self, reason, query, entry):
+        """
+        Answer a lookup with an expired result if L{upstream} could not give
+        a fresh one, unless it answered that the name does not exist.
+        """
+        if reason.check(error.DNSNameError):
+            # The negative answer is cached now, and no other resolver needs
+            # to ask for it again.
+            return failure.Failure(
+                dns.AuthoritativeDomainError(query.name.name))
+        if self.cache.get(query) is not entry:
+            # The entry has since been replaced, or removed.
+            return reason
+        if self.verbose:
+            log.msg('Serving expired %r: %s' % (query, reason.getErrorMessage()))
+        return self._fromEntry(query.name.name, entry, entry.staleResult,
+                               min(self.staleAnswerTTL, self.staleTTL))
+
+
+    def _ebPrefetch(self, reason, query):
+        """
+        Ignore the failure of a background refresh; the result will be looked
+        up again when it expires.
+        """
+        if self.verbose > 1:
+            log.msg('Refreshing %r failed: %s' % (
+                query, reason.getErrorMessage()))
 
 
     def lookupAllRecords(self, name, timeout = None):
@@ -101,25 +422,148 @@ class CacheResolver(common.ResolverBase):
             considered to have been added to the cache. If C{None} is given,
             the current time is used.
         """
+        existing = self.cache.get(query)
+        if existing is not None and existing.gave(payload):
+            # A result this cache gave, being cached again by a server.
+            return
+
         if self.verbose > 1:
             log.msg('Adding %r to cache' % query)
 
-        self.cache[query] = (cacheTime or self._reactor.seconds(), payload)
+        entry = _CacheEntry(cacheTime or self._reactor.seconds(),
+                            self._ttl(payload), self._sections(payload))
+        self._store(query, entry)
+
+
+    def cacheNegativeResult(self, query, authority, cacheTime=None):
+        """
+        Cache the answer that the name of a query does not exist.
+
+        The answer is cached for the smaller of the TTL and the minimum field
+        of the SOA record in C{authority}, as described by RFC 2308.  If
+        there is no SOA record, the answer is not cached.
+
+        @param query: a L{dns.Query} instance.
 
-        if query in self.cancel:
-            self.cancel[query].cancel()
+        @param authority: The authority records of the answer.
+        @type authority: L{list} of L{dns.RRHeader}
 
-        s = list(payload[0]) + list(payload[1]) + list(payload[2])
-        if s:
-            m = s[0].ttl
-            for r in s:
-                m = min(m, r.ttl)
-        else:
-            m = 0
+        @param cacheTime: The time (seconds since epoch) at which the entry is
+            considered to have been added to the cache. If C{None} is given,
+            the current time is used.
 
-        self.cancel[query] = self._reactor.callLater(m, self.clearEntry, query)
+        @since: 15.3
+        """
+        ttl = self._negativeTTL(authority)
+        if ttl is None:
+            return
+        if self.verbose > 1:
+            log.msg('Adding nonexistent %r to cache' % query)
+        entry = _CacheEntry(cacheTime or self._reactor.seconds(), ttl, None)
+        self._store(query, entry)
+
+
+    def _sections(self, payload):
+        """
+        Convert the sections of a result to tuples, so they cannot be
+        changed by the caller.
+        """
+        return tuple(tuple(section) for section in payload)
+
+
+    def _ttl(self, payload):
+        """
+        Get the number of seconds for which a result may be cached: the
+        smallest TTL of its records, or, for a result without answers, the
+        time allowed by its SOA record if that is smaller.
+        """
+        ttls = [r.ttl for section in payload for r in section]
+        if not ttls:
+            return 0
+        ttl = min(ttls)
+        if not payload[0]:
+            negativeTTL = self._negativeTTL(payload[1])
+            if negativeTTL is not None:
+                ttl = min(ttl, negativeTTL)
+        return ttl
+
+
+    def _negativeTTL(self, authority):
+        """
+        Get the number of seconds for which a negative answer may be cached,
+        from the SOA record among its authority records.
+
+        @return: The smaller of the TTL and minimum field of the SOA record,
+            or L{None} if there is no SOA record.
+        """
+        for r in authority:
+            if r.type == dns.SOA:
+                return min(r.ttl, r.payload.minimum)
+        return None
+
+
+    def _store(self, query, entry):
+        """
+        Add an entry to the cache, evicting the least recently used entries
+        if there are too many, and make sure it is removed when it expires.
+        """
+        if query in self.cache:
+            del self.cache[query]
+        self.cache[query] = entry
+        if self.maxEntries is not None:
+            while len(self.cache) > self.maxEntries:
+                self.cache.popitem(last=False)
+                self.evictions += 1
+
+        queue = self._expiryQueue
+        if len(queue) > 2 * len(self.cache) + 64:
+            # Drop the records of entries which have been replaced or evicted.
+            queue[:] = [item for item in queue
+                        if self.cache.get(item[2]) is item[3]]
+            heapq.heapify(queue)
+        heapq.heappush(
+            queue, (entry.when + entry.ttl + self.staleTTL,
+                    next(self._counter), query, entry))
+        self._scheduleExpiry()
+
+
+    def _scheduleExpiry(self):
+        """
+        Set the expiry timer for the entry which expires first.
+        """
+        queue = self._expiryQueue
+        call = self._expiryCall
+        if not queue:
+            if call is not None:
+                call.cancel()
+                self._expiryCall = None
+            return
+        first = queue[0][0]
+        delay = max(0, first - self._reactor.seconds())
+        if call is None:
+            self._expiryCall = self._reactor.callLater(delay, self._expire)
+        elif call.getTime() > first:
+            call.reset(delay)
+
+
+    def _expire(self):
+        """
+        Remove all of the entries which have expired.
+        """
+        self._expiryCall = None
+        now = self._reactor.seconds()
+        queue = self._expiryQueue
+        while queue and queue[0][0] <= now:
+            expires, counter, query, entry = heapq.heappop(queue)
+            if self.cache.get(query) is entry:
+                del self.cache[query]
+        self._scheduleExpiry()
 
 
     def clearEntry(self, query):
-        del self.cache[query]
-        del self.cancel[query]
+        """
+        Remove an entry from the cache.
+
+        @param query: a L{dns.Query} instance.
+        """
+        self.cache.pop(query, None)
@@ -18,6 +18,7 @@ better caching, respect timeouts
 
 import os
 import errno
+import random
 import warnings
 
 from zope.interface import moduleProvides
@@ -50,9 +51,29 @@ class Resolver(common.ResolverBase):
     @ivar _reactor: A provider of L{IReactorTCP}, L{IReactorUDP}, and
         L{IReactorTime} which will be used to set up network resources and
         track timeouts.
+
+    @ivar udpPoolSize: The number of UDP sockets to keep open and share
+        between queries, or C{0} to open a new socket for each query.
+    @type udpPoolSize: L{int}
+
+    @ivar udpPoolRotation: The number of seconds after which each shared UDP
+        socket is replaced by one bound to a new random port.
+    @type udpPoolRotation: L{int} or L{float}
+
+    @ivar tcpIdleTimeout: The number of seconds after which a TCP connection
+        to a server is closed if no queries have been made over it, or
+        C{None} to leave it to the server to close it.
+    @type tcpIdleTimeout: L{int} or L{float} or C{None}
+
+    @ivar _udpPool: The L{_DatagramProtocolPool} of shared sockets, created
+        when it is first used.
     """
     index = 0
     timeout = None
+    udpPoolSize = 0
+    udpPoolRotation = 60
+    tcpIdleTimeout = 30
+    _udpPool = None
 
     factory = None
     servers = None
@@ -64,7 +85,9 @@ class Resolver(common.ResolverBase):
     _lastResolvTime = None
     _resolvReadInterval = 60
 
-    def __init__(self, resolv=None, servers=None, timeout=(1, 3, 11, 45), reactor=None):
+    def __init__(self, resolv=None, servers=None, timeout=(1, 3, 11, 45),
+                 reactor=None, udpPoolSize=0, udpPoolRotation=60,
+                 tcpIdleTimeout=30):
         """
         Construct a resolver which will query domain name servers listed in
         the C{resolv.conf(5)}-format file given by C{resolv} as well as
@@ -92,7 +115,18 @@ class Resolver(common.ResolverBase):
             for DNS datagrams, and enforce timeouts.  If not provided, the
             global reactor will be used.
 
+        @param udpPoolSize: See L{udpPoolSize}.  Sharing sockets saves
+            binding and closing one for every query, but gives an attacker
+            trying to spoof responses far fewer ports to guess: only use it
+            where that is an acceptable trade-off, such as on a trusted
+            network.
+        @param udpPoolRotation: See L{udpPoolRotation}.
+        @param tcpIdleTimeout: See L{tcpIdleTimeout}.
+
         @raise ValueError: Raised if no nameserver addresses can be found.
+
+        @since: 15.3 for C{udpPoolSize}, C{udpPoolRotation} and
+            C{tcpIdleTimeout}.
         """
         common.ResolverBase.__init__(self)
 
@@ -101,6 +135,9 @@ class Resolver(common.ResolverBase):
         self._reactor = reactor
 
         self.timeout = timeout
+        self.udpPoolSize = udpPoolSize
+        self.udpPoolRotation = udpPoolRotation
+        self.tcpIdleTimeout = tcpIdleTimeout
 
         if servers is None:
             self.servers = []
@@ -112,7 +149,8 @@ class Resolver(common.ResolverBase):
         if not len(self.servers) and not resolv:
             raise ValueError("No nameservers specified")
 
-        self.factory = DNSClientFactory(self, timeout)
+        self.factory = DNSClientFactory(self, timeout, self._reactor,
+                                        tcpIdleTimeout)
         self.factory.noisy = 0   # Be quiet by default
 
         self.connections = []
@@ -127,6 +165,7 @@ class Resolver(common.ResolverBase):
         d = self.__dict__.copy()
         d['connections'] = []
         d['_parseCall'] = None
+        d.pop('_udpPool', None)
         return d
 
 
@@ -232,7 +271,7 @@ class Resolver(common.ResolverBase):
         """
         self.connections.append(protocol)
         for (d, q, t) in self.pending:
-            self.queryTCP(q, t).chainDeferred(d)
+            protocol.query(q, t).chainDeferred(d)
         del self.pending[:]
 
 
@@ -257,9 +296,18 @@ class Resolver(common.ResolverBase):
         @param *args: Positional arguments to be passed to
             L{DNSDatagramProtocol.query}.
 
+        If L{udpPoolSize} is not C{0}, a protocol from the pool of shared
+        ones is used instead, and left connected.
+
         @return: A L{Deferred} which will be called back with the result of the
             query.
         """
+        if self.udpPoolSize:
+            if self._udpPool is None:
+                self._udpPool = _DatagramProtocolPool(
+                    self._connectedProtocol, self.udpPoolSize,
+                    self.udpPoolRotation, self._reactor)
+            return self._udpPool.query(*args)
         protocol = self._connectedProtocol()
         d = protocol.query(*args)
         def cbQueried(result):
@@ -269,6 +317,22 @@ class Resolver(common.ResolverBase):
         return d
 
 
+    def closeUDPPool(self):
+        """
+        Close the UDP sockets shared by queries if L{udpPoolSize} is not
+        C{0}.  Queries still waiting for responses on them will time out.
+        Later queries open new ones.
+
+        @return: A L{Deferred} which fires when the sockets are closed.
+
+        @since: 15.3
+        """
+        if self._udpPool is None:
+            return defer.succeed(None)
+        pool, self._udpPool = self._udpPool, None
+        return pool.close().addCallback(lambda ignored: None)
+
+
     def queryUDP(self, queries, timeout = None):
         """
         Make a number of DNS queries via UDP.
@@ -335,6 +399,13 @@ class Resolver(common.ResolverBase):
         """
         Make a number of DNS queries via TCP.
 
+        The connection to the server is kept open after the queries are
+        answered, and later queries are pipelined over it, until it has been
+        idle for L{tcpIdleTimeout} seconds.  Queries made while it is being
+        opened wait for it rather than opening another.  Queries made over a
+        connection the server turns out to have closed are made again over a
+        new one.
+
         @type queries: Any non-zero number of C{dns.Query} instances
         @param queries: The queries to make.
 
@@ -344,15 +415,21 @@ class Resolver(common.ResolverBase):
         @rtype: C{Deferred}
         """
         if not len(self.connections):
-            address = self.pickServer()
-            if address is None:
-                return defer.fail(IOError("No domain name servers available"))
-            host, port = address
-            self._reactor.connectTCP(host, port, self.factory)
+            if not self.pending:
+                address = self.pickServer()
+                if address is None:
+                    return defer.fail(
+                        IOError("No domain name servers available"))
+                host, port = address
+                self._reactor.connectTCP(host, port, self.factory)
             self.pending.append((defer.Deferred(), queries, timeout))
             return self.pending[-1][0]
         else:
-            return self.connections[0].query(queries, timeout)
+            d = self.connections[0].query(queries, timeout)
+            def ebClosed(reason):
+                reason.trap(error.ConnectionClosed)
+                return self.queryTCP(queries, timeout)
+            return d.addErrback(ebClosed)
 
 
     def filterAnswers(self, message):
@@ -439,6 +516,131 @@ class Resolver(common.ResolverBase):
 
 
 
+class _DatagramProtocolPool(object):
+    """
+    A pool of L{dns.DNSDatagramProtocol}s, each bound to a random port, which
+    are shared by the UDP queries of a L{Resolver}.
+
+    Each query is sent from a randomly chosen protocol, with a random message
+    ID which no other query in the pool is using, and only a response from
+    the address the query was sent to is accepted.  Protocols are replaced
+    by new ones, bound to new random ports, once they are C{rotation} seconds
+    old; an old protocol is disconnected when the last query sent from it
+    completes.
+
+    @ivar size: The number of protocols to keep.
+    @ivar rotation: The number of seconds to use each protocol for.
+
+    @ivar _newProtocol: A callable returning a new protocol, connected to a
+        randomly selected port.
+
+    @ivar _protocols: A L{dict} mapping each protocol in use to the time it
+        was created.
+
+    @ivar _outstanding: A L{dict} mapping protocols to the number of their
+        queries which have not completed.
+    """
+    _random = random.SystemRandom()
+
+    def __init__(self, newProtocol, size, rotation, reactor):
+        self._newProtocol = newProtocol
+        self.size = size
+        self.rotation = rotation
+        self._reactor = reactor
+        self._protocols = {}
+        self._outstanding = {}
+
+
+    def _pick(self, id):
+        """
+        Choose a protocol to send a query from, replacing any which are too
+        old.
+
+        @param id: The message ID the query must be sent with, or L{None}.
+
+        @return: The protocol, and the ID to use: C{id}, or L{None} for a new
+            one if C{id} is in use by every protocol.
+        """
+        now = self._reactor.seconds()
+        for proto, created in list(self._protocols.items()):
+            if now - created >= self.rotation:
+                del self._protocols[proto]
+                if not self._outstanding.get(proto):
+                    proto.transport.stopListening()
+        while len(self._protocols) < self.size:
+            proto = self._newProtocol()
+            proto._checkSource = True
+            self._protocols[proto] = now
+
+        candidates = list(self._protocols)
+        if id is not None:
+            free = [proto for proto in candidates
+                    if id not in proto.liveMessages]
+            if free:
+                candidates = free
+            else:
+                id = None
+        return self._random.choice(candidates), id
+
+
+    def _pickID(self):
+        """
+        Choose a random message ID which no outstanding query sent from any
+        of the protocols is using.
+
+        @return: The ID.
+        @rtype: L{int}
+        """
+        protocols = set(self._protocols) | set(self._outstanding)
+        while True:
+            id = dns.randomSource()
+            for proto in protocols:
+                if id in proto.liveMessages:
+                    break
+            else:
+                return id
+
+
+    def query(self, address, queries, timeout=10, id=None):
+        """
+        Send a query from one of the protocols.
+
+        @see: L{dns.DNSDatagramProtocol.query}
+        """
+        proto, id = self._pick(id)
+        if id is None:
+            id = self._pickID()
+        self._outstanding[proto] = self._outstanding.get(proto, 0) + 1
+        d = proto.query(address, queries, timeout, id)
+        def cbQueried(result):
+            proto.removeResend(id)
+            if proto in self._outstanding:
+                self._outstanding[proto] -= 1
+                if not self._outstanding[proto]:
+                    del self._outstanding[proto]
+                    if proto not in self._protocols:
+                        proto.transport.stopListening()
+            return result
+        d.addBoth(cbQueried)
+        return d
+
+
+    def close(self):
+        """
+        Disconnect every protocol, including those with queries outstanding.
+
+        @return: A L{Deferred} which fires when all of them have stopped
+            listening.
+        """
+        protocols = set(self._protocols) | set(self._outstanding)
+        self._protocols.clear()
+        self._outstanding.clear()
+        return defer.gatherResults([
+                defer.maybeDeferred(proto.transport.stopListening)
+                for proto in protocols])
+
+
+
 class AXFRController:
     timeoutCall = None
 
@@ -502,9 +704,31 @@ class ThreadedResolver(_ThreadedResolverImpl):
 
 
 class DNSClientFactory(protocol.ClientFactory):
-    def __init__(self, controller, timeout = 10):
+    """
+    A factory of L{dns.DNSProtocol} connections to a server, whose events
+    are passed to a controller.
+
+    @ivar idleTimeout: The L{dns.DNSProtocol.idleTimeout} of the connections.
+
+    @ivar _reactor: The reactor the connections use, or C{None} for the
+        global one.
+    """
+    def __init__(self, controller, timeout = 10, reactor=None,
+                 idleTimeout=None):
+        """
+        @param controller: The object notified of the connections' events,
+            such as a L{Resolver}.
+
+        @param reactor: See L{_reactor}.
+
+        @param idleTimeout: See L{idleTimeout}.
+
+        @since: 15.3 for C{reactor} and C{idleTimeout}.
+        """
         self.controller = controller
         self.timeout = timeout
+        self._reactor = reactor
+        self.idleTimeout = idleTimeout
 
 
     def clientConnectionLost(self, connector, reason):
@@ -538,7 +762,8 @@ class DNSClientFactory(protocol.ClientFactory):
 
 
     def buildProtocol(self, addr):
-        p = dns.DNSProtocol(self.controller)
+        p = dns.DNSProtocol(self.controller, self._reactor)
+        p.idleTimeout = self.idleTimeout
         p.factory = self
         return p
 
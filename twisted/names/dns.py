@@ -57,6 +57,7 @@ from zope.interface import implementer, Interface, Attribute
 # Twisted imports
 from twisted.internet import protocol, defer
 from twisted.internet.error import CannotListenError
+from twisted.protocols.policies import TimeoutMixin
 from twisted.python import log, failure
 from twisted.python import util as tputil
 from twisted.python import randbytes
@@ -2286,11 +2287,14 @@ class Message(tputil.FancyEqMixin):
         Encode this L{Message} into a byte string in the format described by RFC
         1035.
 
+        This gives the same result as L{encode}, but encodes L{Query} and
+        L{RRHeader} objects and the common record types in a single pass
+        with L{_MessageEncoder}, only calling the C{encode} method of other
+        objects.
+
         @rtype: C{bytes}
         """
-        strio = BytesIO()
-        self.encode(strio)
-        return strio.getvalue()
+        return _MessageEncoder().encode(self)
 
 
     def fromStr(self, str):
@@ -2298,11 +2302,575 @@ class Message(tputil.FancyEqMixin):
         Decode a byte string in the format described by RFC 1035 into this
         L{Message}.
 
+        This gives the same result as L{decode} for well-formed messages, but
+        decodes them in a single pass with L{_MessageDecoder}, and leaves the
+        payloads of address records to be decoded when they are first used.
+
         @param str: L{bytes}
         """
-        strio = BytesIO(str)
-        self.decode(strio)
+        _MessageDecoder(str).decode(self)
+
+
+
+class _LazyRRHeader(RRHeader):
+    """
+    An L{RRHeader} decoded by L{_MessageDecoder} whose payload is decoded from
+    its RDATA when it is first used, rather than when the message is.
+
+    Only records whose RDATA does not refer to the rest of the message, and
+    which cannot fail to decode, are decoded this way.
+
+    @ivar _recordType: The L{IRecord} implementation to decode the payload
+        with.
+
+    @ivar _rdata: The RDATA of the record, or C{None} once the payload has
+        been decoded or replaced.
+    @type _rdata: L{bytes}
+    """
+    _payload = None
+
+    def __init__(self, name, type, cls, ttl, auth, recordType, rdata):
+        self.name = Name(name)
+        self.type = type
+        self.cls = cls
+        self.ttl = ttl
+        self.auth = auth
+        self.rdlength = len(rdata)
+        self._recordType = recordType
+        self._rdata = rdata
+
+
+    def _getPayload(self):
+        if self._rdata is not None:
+            payload = self._recordType(ttl=self.ttl)
+            payload.decode(BytesIO(self._rdata), self.rdlength)
+            self._payload = payload
+            self._rdata = None
+        return self._payload
+
+
+    def _setPayload(self, payload):
+        self._payload = payload
+        self._rdata = None
+
+    payload = property(_getPayload, _setPayload)
+
+
+
+class _MessageDecoder(object):
+    """
+    A single-pass decoder of one message in the format described by RFC 1035,
+    which reads fields at offsets into the message instead of from a file.
+
+    @ivar _data: The message.
+    @type _data: L{bytes}
+
+    @ivar _octets: The message as a sequence of integers.
+    @type _octets: L{bytearray}
+
+    @ivar _names: A mapping from the offsets of names which have been decoded
+        to the names, so that compression pointers to them are not followed
+        again.
+    @type _names: L{dict}
+
+    @cvar _payloadDecoders: A mapping from L{IRecord} implementations to the
+        methods which decode their payloads, given the offsets of the start
+        and end of their RDATA.  The payloads of other types are decoded by
+        their C{decode} methods.
+
+    @cvar _lazyPayloads: A mapping from L{IRecord} implementations whose
+        payloads are decoded lazily, by L{_LazyRRHeader}, to the length their
+        RDATA must have for that.
+    """
+    _queryHeader = struct.Struct("!HH")
+    _recordHeader = struct.Struct(RRHeader.fmt)
+    _messageHeader = struct.Struct(Message.headerFmt)
+
+    def __init__(self, data):
+        """
+        @param data: See L{_data}.
+        """
+        self._data = data
+        self._octets = bytearray(data)
+        self._names = {}
+
+
+    def decode(self, message):
+        """
+        Decode the message into a L{Message}, appending its records to the
+        sections already there.
+
+        Like L{Message.decode}, a message which ends part way through a
+        question or record is decoded as far as the last complete one.
+
+        @param message: The L{Message} to decode into.
+
+        @raise EOFError: If the message is too short to contain a header.
+
+        @raise ValueError: If a name in the message contains a compression
+            loop.
+        """
+        data = self._data
+        if len(data) < Message.headerSize:
+            raise EOFError()
+        (message.id, byte3, byte4, nqueries, nans, nns,
+         nadd) = self._messageHeader.unpack_from(data)
+        message.maxSize = 0
+        message.answer = (byte3 >> 7) & 1
+        message.opCode = (byte3 >> 3) & 0xf
+        message.auth = (byte3 >> 2) & 1
+        message.trunc = (byte3 >> 1) & 1
+        message.recDes = byte3 & 1
+        message.recAv = (byte4 >> 7) & 1
+        message.authenticData = (byte4 >> 5) & 1
+        message.checkingDisabled = (byte4 >> 4) & 1
+        message.rCode = byte4 & 0xf
+
+        message.queries = queries = []
+        offset = Message.headerSize
+        try:
+            for i in range(nqueries):
+                name, offset = self._name(offset)
+                type, cls = self._unpack(self._queryHeader, offset)
+                offset += self._queryHeader.size
+                queries.append(Query(name, type, cls))
+
+            for (records, count) in ((message.answers, nans),
+                                     (message.authority, nns),
+                                     (message.additional, nadd)):
+                for i in range(count):
+                    offset = self._record(message, records, offset)
+        except EOFError:
+            pass
+
 
+    def _unpack(self, format, offset):
+        """
+        Unpack a fixed size field.
+
+        @param format: The L{struct.Struct} of the field.
+        @param offset: The offset of the field.
+
+        @return: The unpacked values.
+
+        @raise EOFError: If the message ends before the field does.
+        """
+        if offset + format.size > len(self._data):
+            raise EOFError()
+        return format.unpack_from(self._data, offset)
+
+
+    def _name(self, offset):
+        """
+        Decode a name, following any compression pointers in it.
+
+        @param offset: The offset of the name.
+
+        @return: A L{tuple} of the name as L{bytes} and the offset following
+            it.
+
+        @raise EOFError: If the message ends before the name does.
+
+        @raise ValueError: If the name contains a compression loop.
+        """
+        data = self._data
+        octets = self._octets
+        names = self._names
+        start = offset
+        end = None
+        labels = []
+        pointers = []
+        try:
+            while True:
+                length = octets[offset]
+                if length == 0:
+                    offset += 1
+                    break
+                if length >> 6 == 3:
+                    pointer = (length & 63) << 8 | octets[offset + 1]
+                    if end is None:
+                        end = offset + 2
+                    suffix = names.get(pointer)
+                    if suffix is not None:
+                        if suffix:
+                            labels.append(suffix)
+                        break
+                    for (visited, index) in pointers:
+                        if visited == pointer:
+                            raise ValueError(
+                                "Compression loop in encoded name")
+                    pointers.append((pointer, len(labels)))
+                    offset = pointer
+                    continue
+                offset += 1
+                label = data[offset:offset + length]
+                if len(label) < length:
+                    raise EOFError()
+                labels.append(label)
+                offset += length
+        except IndexError:
+            raise EOFError()
+        name = b'.'.join(labels)
+        names[start] = name
+        for (pointer, index) in pointers:
+            names[pointer] = b'.'.join(labels[index:])
+        if end is None:
+            end = offset
+        return name, end
+
+
+    def _record(self, message, records, offset):
+        """
+        Decode a resource record and append it to a section.
+
+        @param message: The L{Message} being decoded, whose
+            C{lookupRecordType} gives the type of the payload.
+        @param records: The L{list} of L{RRHeader} to append to.
+        @param offset: The offset of the record.
+
+        @return: The offset following the record.
+
+        @raise EOFError: If the message ends before the record does.
+        """
+        name, offset = self._name(offset)
+        type, cls, ttl, rdlength = self._unpack(self._recordHeader, offset)
+        offset += self._recordHeader.size
+        end = offset + rdlength
+        if end > len(self._data):
+            raise EOFError()
+        recordType = message.lookupRecordType(type)
+        if not recordType:
+            return end
+        if self._lazyPayloads.get(recordType) == rdlength:
+            records.append(_LazyRRHeader(
+                    name, type, cls, ttl, message.auth, recordType,
+                    self._data[offset:end]))
+            return end
+        decoder = self._payloadDecoders.get(recordType)
+        if decoder is None:
+            payload = recordType(ttl=ttl)
+            strio = BytesIO(self._data)
+            strio.seek(offset)
+            payload.decode(strio, rdlength)
+        else:
+            payload = decoder(self, recordType, ttl, offset, end)
+        header = RRHeader(name, type, cls, ttl, auth=message.auth)
+        header.rdlength = rdlength
+        header.payload = payload
+        records.append(header)
+        return end
+
+
+    def _simplePayload(self, recordType, ttl, offset, end):
+        """
+        Decode the payload of a L{SimpleRecord}.
+        """
+        payload = recordType(ttl=ttl)
+        payload.name = Name(self._name(offset)[0])
+        return payload
+
+
+    def _mxPayload(self, recordType, ttl, offset, end):
+        """
+        Decode the payload of a L{Record_MX}.
+        """
+        preference, = self._unpack(self._preference, offset)
+        return recordType(preference, self._name(offset + 2)[0], ttl)
+
+    _preference = struct.Struct("!H")
+
+
+    def _soaPayload(self, recordType, ttl, offset, end):
+        """
+        Decode the payload of a L{Record_SOA}.
+        """
+        mname, offset = self._name(offset)
+        rname, offset = self._name(offset)
+        serial, refresh, retry, expire, minimum = self._unpack(
+            self._soaFields, offset)
+        return recordType(mname, rname, serial, refresh, retry, expire,
+                          minimum, ttl)
+
+    _soaFields = struct.Struct("!LlllL")
+
+
+    def _srvPayload(self, recordType, ttl, offset, end):
+        """
+        Decode the payload of a L{Record_SRV}.
+        """
+        priority, weight, port = self._unpack(self._srvFields, offset)
+        return recordType(priority, weight, port,
+                          self._name(offset + self._srvFields.size)[0], ttl)
+
+    _srvFields = struct.Struct("!HHH")
+
+
+    def _unknownPayload(self, recordType, ttl, offset, end):
+        """
+        Decode the payload of an L{UnknownRecord}.
+        """
+        return recordType(self._data[offset:end], ttl)
+
+    _payloadDecoders = {
+        Record_MX: _mxPayload,
+        Record_SOA: _soaPayload,
+        Record_SRV: _srvPayload,
+        UnknownRecord: _unknownPayload,
+        }
+    for recordType in (Record_NS, Record_MD, Record_MF, Record_CNAME,
+                       Record_MB, Record_MG, Record_MR, Record_PTR,
+                       Record_DNAME):
+        _payloadDecoders[recordType] = _simplePayload
+    del recordType
+
+    _lazyPayloads = {
+        Record_A: 4,
+        Record_AAAA: 16,
+        }
+
+
+
+_networkShort = struct.Struct("!H")
+
+
+
+def _encodeName(buffer, name, compDict):
+    """
+    Append a name to a message being encoded, as L{Name.encode} writes it,
+    replacing the longest suffix of it which has already been written with a
+    compression pointer.
+
+    @param buffer: The message, from its first byte.
+    @type buffer: L{bytearray}
+
+    @param name: The name.
+    @type name: L{bytes}
+
+    @param compDict: A mapping from each suffix of the names written so far
+        to its offset, to which the suffixes of this name are added, or
+        C{None} if the name must not be compressed.
+    @type compDict: L{dict}
+    """
+    offset = None
+    if compDict is not None:
+        offset = compDict.get(name)
+    while offset is None:
+        if not name:
+            buffer.append(0)
+            return
+        if compDict is not None and len(buffer) <= 0x3fff:
+            compDict[name] = len(buffer)
+        index = name.find(b'.')
+        if index > 0:
+            label = name[:index]
+            name = name[index + 1:]
+        else:
+            # This is the last label, or everything from an empty label on,
+            # which Name.encode also writes as one label.
+            label = name
+            name = b''
+        buffer.append(len(label))
+        buffer += label
+        if compDict is not None:
+            offset = compDict.get(name)
+    buffer += _networkShort.pack(0xc000 | offset)
+
+
+
+class _MessageEncoder(object):
+    """
+    A single-pass encoder of messages in the format described by RFC 1035,
+    which appends each field to a L{bytearray}.
+
+    An encoder may be used for any number of messages, one at a time.
+
+    @ivar _buffer: The message being encoded, starting with space for its
+        header, or C{None} when no message is being encoded.
+    @type _buffer: L{bytearray}
+
+    @ivar _compDict: A mapping from each suffix of the names written to the
+        message so far to its offset, which is also passed to the C{encode}
+        method of objects the encoder does not know how to encode.
+    @type _compDict: L{dict}
+
+    @cvar _payloadEncoders: A mapping from L{IRecord} implementations to the
+        methods which encode their payloads.
+
+    @cvar _opaquePayloads: A mapping from L{IRecord} implementations whose
+        RDATA is the value of one of their attributes to the name of that
+        attribute.
+    """
+    _queryHeader = _MessageDecoder._queryHeader
+    _recordHeader = _MessageDecoder._recordHeader
+    _messageHeader = _MessageDecoder._messageHeader
+
+    def __init__(self):
+        self._buffer = None
+        self._compDict = None
+
+
+    def encode(self, message):
+        """
+        Encode a message, truncating it and setting its C{trunc} flag if it is
+        longer than its C{maxSize}, as L{Message.encode} does.
+
+        @param message: The L{Message} to encode.
+
+        @return: The encoded message.
+        @rtype: L{bytes}
+        """
+        self._buffer = buffer = bytearray(Message.headerSize)
+        self._compDict = compDict = {}
+        queryHeader = self._queryHeader
+        recordHeader = self._recordHeader
+        payloadEncoders = self._payloadEncoders
+        opaquePayloads = self._opaquePayloads
+        try:
+            for query in message.queries:
+                if query.__class__ is Query:
+                    _encodeName(buffer, query.name.name, compDict)
+                    buffer += queryHeader.pack(query.type, query.cls)
+                else:
+                    self._other(query)
+            for section in (message.answers, message.authority,
+                            message.additional):
+                for record in section:
+                    if record.__class__ is _OPTHeader:
+                        self._optHeader(record)
+                        continue
+                    if (record.__class__ is not RRHeader and
+                            record.__class__ is not _LazyRRHeader):
+                        self._other(record)
+                        continue
+                    _encodeName(buffer, record.name.name, compDict)
+                    payload = record.payload
+                    attribute = opaquePayloads.get(payload.__class__)
+                    if attribute is not None:
+                        rdata = getattr(payload, attribute)
+                        buffer += recordHeader.pack(
+                            record.type, record.cls, record.ttl, len(rdata))
+                        buffer += rdata
+                        continue
+                    buffer += recordHeader.pack(
+                        record.type, record.cls, record.ttl, 0)
+                    if payload is not None:
+                        start = len(buffer)
+                        encoder = payloadEncoders.get(payload.__class__)
+                        if encoder is None:
+                            self._other(payload)
+                        else:
+                            encoder(self, payload)
+                        _networkShort.pack_into(
+                            buffer, start - 2, len(buffer) - start)
+        finally:
+            self._buffer = self._compDict = None
+
+        if message.maxSize and len(buffer) > message.maxSize:
+            message.trunc = 1
+            del buffer[message.maxSize:]
+        byte3 = (((message.answer & 1) << 7)
+                 | ((message.opCode & 0xf) << 3)
+                 | ((message.auth & 1) << 2)
+                 | ((message.trunc & 1) << 1)
+                 | (message.recDes & 1))
+        byte4 = (((message.recAv & 1) << 7)
+                 | ((message.authenticData & 1) << 5)
+                 | ((message.checkingDisabled & 1) << 4)
+                 | (message.rCode & 0xf))
+        self._messageHeader.pack_into(
+            buffer, 0, message.id, byte3, byte4, len(message.queries),
+            len(message.answers), len(message.authority),
+            len(message.additional))
+        return bytes(buffer)
+
+
+    def _other(self, encodable):
+        """
+        Write an object by calling its C{encode} method, with a file
+        positioned at the current end of the message body.
+
+        @param encodable: The L{IEncodable} provider.
+        """
+        buffer = self._buffer
+        position = len(buffer) - Message.headerSize
+        strio = BytesIO()
+        strio.seek(position)
+        encodable.encode(strio, self._compDict)
+        buffer += strio.getvalue()[position:]
+
+
+    def _optHeader(self, header):
+        """
+        Write an L{_OPTHeader}.
+        """
+        strio = BytesIO()
+        for option in header.options:
+            option.encode(strio)
+        options = strio.getvalue()
+        _encodeName(self._buffer, header.name.name, self._compDict)
+        self._buffer += self._recordHeader.pack(
+            header.type, header.udpPayloadSize,
+            (header.extendedRCODE << 24 | header.version << 16
+             | header.dnssecOK << 15),
+            len(options))
+        self._buffer += options
+
+
+    def _simplePayload(self, payload):
+        """
+        Write the payload of a L{SimpleRecord}.
+        """
+        _encodeName(self._buffer, payload.name.name, self._compDict)
+
+
+    def _mxPayload(self, payload):
+        """
+        Write the payload of a L{Record_MX}.
+        """
+        self._buffer += _networkShort.pack(payload.preference)
+        _encodeName(self._buffer, payload.name.name, self._compDict)
+
+
+    def _soaPayload(self, payload):
+        """
+        Write the payload of a L{Record_SOA}.
+        """
+        _encodeName(self._buffer, payload.mname.name, self._compDict)
+        _encodeName(self._buffer, payload.rname.name, self._compDict)
+        self._buffer += self._soaFields.pack(
+            payload.serial, payload.refresh, payload.retry, payload.expire,
+            payload.minimum)
+
+    _soaFields = _MessageDecoder._soaFields
+
+
+    def _srvPayload(self, payload):
+        """
+        Write the payload of a L{Record_SRV}, whose target is never
+        compressed.
+        """
+        self._buffer += self._srvFields.pack(
+            payload.priority, payload.weight, payload.port)
+        _encodeName(self._buffer, payload.target.name, None)
+
+    _srvFields = _MessageDecoder._srvFields
+
+    _payloadEncoders = {
+        Record_MX: _mxPayload,
+        Record_SOA: _soaPayload,
+        Record_SRV: _srvPayload,
+        }
+    for recordType in (Record_NS, Record_MD, Record_MF, Record_CNAME,
+                       Record_MB, Record_MG, Record_MR, Record_PTR,
+                       Record_DNAME):
+        _payloadEncoders[recordType] = _simplePayload
+    del recordType
+
+    _opaquePayloads = {
+        Record_A: 'address',
+        Record_AAAA: 'address',
+        UnknownRecord: 'data',
+        }
 
 
 class _EDNSMessage(tputil.FancyEqMixin, object):
@@ -2701,8 +3269,23 @@ class DNSMixin(object):
 class DNSDatagramProtocol(DNSMixin, protocol.DatagramProtocol):
     """
     DNS protocol over UDP.
+
+    @ivar _written: While datagrams received together are being handled, a
+        L{list} of the datagrams written in response, to be sent together
+        afterwards; otherwise C{None}.
+
+    @ivar _checkSource: If C{True}, a response is only accepted from the
+        address its query was sent to, as when the socket is shared by
+        queries to several servers; others are logged and ignored.
+    @type _checkSource: L{bool}
+
+    @ivar _queried: If L{_checkSource} is C{True}, a L{dict} mapping the ID
+        of each outstanding query to the address it was sent to.
     """
     resends = None
+    _written = None
+    _checkSource = False
+    _queried = None
 
     def stopProtocol(self):
         """
@@ -2710,6 +3293,7 @@ class DNSDatagramProtocol(DNSMixin, protocol.DatagramProtocol):
         """
         self.liveMessages = {}
         self.resends = {}
+        self._queried = {}
         self.transport = None
 
     def startProtocol(self):
@@ -2718,6 +3302,7 @@ class DNSDatagramProtocol(DNSMixin, protocol.DatagramProtocol):
         """
         self.liveMessages = {}
         self.resends = {}
+        self._queried = {}
 
     def writeMessage(self, message, address):
         """
@@ -2725,11 +3310,51 @@ class DNSDatagramProtocol(DNSMixin, protocol.DatagramProtocol):
 
         @type message: L{Message}
         """
-        self.transport.write(message.toStr(), address)
+        if self._written is not None:
+            self._written.append((message.toStr(), address))
+        else:
+            self.transport.write(message.toStr(), address)
 
     def startListening(self):
         self._reactor.listenUDP(0, self, maxPacketSize=512)
 
+
+    def datagramsReceived(self, datagrams):
+        """
+        Handle several datagrams received together, then send any messages
+        written in response to them together.
+
+        A message which cannot be sent, for example because it is too long,
+        is logged and does not stop the others from being sent.
+
+        @param datagrams: A L{list} of C{(data, addr)} pairs, each as would
+            be passed to L{datagramReceived}.
+
+        @since: 15.3
+        """
+        self._written = written = []
+        try:
+            for data, addr in datagrams:
+                try:
+                    self.datagramReceived(data, addr)
+                except:
+                    log.err()
+        finally:
+            self._written = None
+        if not written or self.transport is None:
+            return
+        writeDatagrams = getattr(self.transport, 'writeDatagrams', None)
+        if writeDatagrams is not None and len(written) > 1:
+            # This logs each message it cannot send and carries on.
+            writeDatagrams(written)
+            return
+        for data, addr in written:
+            try:
+                self.transport.write(data, addr)
+            except:
+                log.err(None, "Sending response to %r failed" % (addr,))
+
+
     def datagramReceived(self, data, addr):
         """
         Read a datagram, extract the message in it and trigger the associated
@@ -2750,6 +3375,12 @@ class DNSDatagramProtocol(DNSMixin, protocol.DatagramProtocol):
             return
 
         if m.id in self.liveMessages:
+            if self._checkSource:
+                if tuple(addr[:2]) != self._queried.get(m.id):
+                    log.msg("Response (%d) received from %r, not from the "
+                            "address queried" % (m.id, addr))
+                    return
+                del self._queried[m.id]
             d, canceller = self.liveMessages[m.id]
             del self.liveMessages[m.id]
             canceller.cancel()
@@ -2799,15 +3430,46 @@ class DNSDatagramProtocol(DNSMixin, protocol.DatagramProtocol):
         def writeMessage(m):
             self.writeMessage(m, address)
 
-        return self._query(queries, timeout, id, writeMessage)
+        d = self._query(queries, timeout, id, writeMessage)
+        if self._checkSource and id in self.liveMessages:
+            self._queried[id] = tuple(address[:2])
+        return d
 
 
-class DNSProtocol(DNSMixin, protocol.Protocol):
+    def _clearFailed(self, deferred, id):
+        """
+        Clean the Deferred after a timeout, and forget the address the query
+        was sent to.
+        """
+        if self._queried is not None:
+            self._queried.pop(id, None)
+        DNSMixin._clearFailed(self, deferred, id)
+
+
+class DNSProtocol(DNSMixin, protocol.Protocol, TimeoutMixin):
     """
     DNS protocol over TCP.
+
+    Any number of queries may be pipelined over one connection, in either
+    direction, and their responses are matched to them by message ID in
+    whatever order they arrive (RFC 7766).
+
+    @ivar idleTimeout: The number of seconds after which the connection is
+        closed if nothing has been sent or received over it, or C{None} to
+        keep it open.  It is kept open for as long as queries sent over it
+        are waiting for responses, or queries received over it have not been
+        answered.
+    @type idleTimeout: L{int} or L{float} or C{None}
+
+    @ivar _unanswered: The IDs of the queries received which have not yet
+        been answered.
+    @type _unanswered: L{set}
+
+    @since: 15.3 for C{idleTimeout}.
     """
-    length = None
     buffer = b''
+    idleTimeout = None
+    _unanswered = None
 
     def writeMessage(self, message):
         """
@@ -2817,53 +3479,78 @@ class DNSProtocol(DNSMixin, protocol.Protocol):
         """
         s = message.toStr()
         self.transport.write(struct.pack('!H', len(s)) + s)
+        if message.answer and self._unanswered:
+            self._unanswered.discard(message.id)
+        self.resetTimeout()
+
 
     def connectionMade(self):
         """
-        Connection is made: reset internal state, and notify the controller.
+        Connection is made: reset internal state, start the idle timeout and
+        notify the controller.
         """
         self.liveMessages = {}
+        self._unanswered = set()
+        self.setTimeout(self.idleTimeout)
         self.controller.connectionMade(self)
 
 
     def connectionLost(self, reason):
         """
-        Notify the controller that this protocol is no longer
-        connected.
+        Notify the controller that this protocol is no longer connected, then
+        fail the queries still waiting for responses.
         """
+        self.setTimeout(None)
         self.controller.connectionLost(self)
+        liveMessages, self.liveMessages = self.liveMessages, {}
+        for d, canceller in (liveMessages or {}).values():
+            canceller.cancel()
+            d.errback(reason)
 
 
-    def dataReceived(self, data):
-        self.buffer += data
+    def timeoutConnection(self):
+        """
+        Close the idle connection, unless queries are still outstanding over
+        it, in which case wait for another timeout period.
+        """
+        if self.liveMessages or self._unanswered:
+            self.setTimeout(self.idleTimeout)
+        else:
+            self.transport.loseConnection()
 
-        while self.buffer:
-            if self.length is None and len(self.buffer) >= 2:
-                self.length = struct.unpack('!H', self.buffer[:2])[0]
-                self.buffer = self.buffer[2:]
 
-            if len(self.buffer) >= self.length:
-                myChunk = self.buffer[:self.length]
-                m = Message()
-                m.fromStr(myChunk)
+    def dataReceived(self, data):
+        """
+        Extract each length-prefixed message received, and trigger the
+        Deferred of the query it answers or pass it to the controller.
+        """
+        self.resetTimeout()
+        buffer = self.buffer + data
+        offset = 0
+        while len(buffer) - offset >= 2:
+            length, = struct.unpack('!H', buffer[offset:offset + 2])
+            end = offset + 2 + length
+            if len(buffer) < end:
+                break
+            m = Message()
+            m.fromStr(buffer[offset + 2:end])
+            offset = end
 
-                try:
-                    d, canceller = self.liveMessages[m.id]
-                except KeyError:
-                    self.controller.messageReceived(m, self)
-                else:
-                    del self.liveMessages[m.id]
-                    canceller.cancel()
-                    # XXX we shouldn't need this hack
-                    try:
-                        d.callback(m)
-                    except:
-                        log.err()
-
-                self.buffer = self.buffer[self.length:]
-                self.length = None
+            try:
+                d, canceller = self.liveMessages[m.id]
+            except KeyError:
+                if not m.answer:
+                    self._unanswered.add(m.id)
+                self.controller.messageReceived(m, self)
             else:
-                break
+                del self.liveMessages[m.id]
+                canceller.cancel()
+                # XXX we shouldn't need this hack
+                try:
+                    d.callback(m)
+                except:
+                    log.err()
+        self.buffer = buffer[offset:]
 
 
     def query(self, queries, timeout=60):
@@ -8,12 +8,14 @@ hosts(5) support.
 
 from __future__ import division, absolute_import
 
+import os
+
 from twisted.python.compat import nativeString
 from twisted.names import dns
 from twisted.python import failure
 from twisted.python.filepath import FilePath
 from twisted.internet import defer
-from twisted.internet.abstract import isIPAddress
+from twisted.internet.abstract import isIPAddress, isIPv6Address
 
 from twisted.names import common
 
@@ -72,14 +74,114 @@ def searchFileFor(file, name):
 
 
 
+def _indexHosts(content):
+    """
+    Find the addresses of every name in the contents of a hosts(5) format
+    file.
+
+    @param content: The contents of the file.
+    @type content: L{bytes}
+
+    @return: Two L{dict}s mapping each lowercased name to a L{list} of its
+        IPv4 and IPv6 addresses respectively, as C{str}, in the order they
+        appear in the file.  Lines whose address is neither are ignored.
+    """
+    ipv4 = {}
+    ipv6 = {}
+    for line in content.splitlines():
+        idx = line.find(b'#')
+        if idx != -1:
+            line = line[:idx]
+        parts = line.split()
+        if len(parts) < 2:
+            continue
+
+        address = nativeString(parts[0])
+        if isIPAddress(address):
+            addresses = ipv4
+        elif isIPv6Address(address):
+            addresses = ipv6
+        else:
+            continue
+        for name in parts[1:]:
+            addresses.setdefault(name.lower(), []).append(address)
+    return ipv4, ipv6
+
+
+
 class Resolver(common.ResolverBase):
     """
     A resolver that services hosts(5) format files.
+
+    The file is read into memory when it is first used, and read again only
+    when its size, modification time or inode have changed, which is checked
+    at most once every C{_checkInterval} seconds.
+
+    @ivar _checkInterval: The number of seconds between checks for changes
+        to the file.
+
+    @ivar _nextCheck: The time at which the file should next be checked for
+        changes.
+
+    @ivar _stat: The inode, size and modification time of the file when it
+        was last read, or C{None} if it could not be read.
+
+    @ivar _ipv4: A L{dict} mapping each lowercased name in the file to a
+        L{list} of its IPv4 addresses.
+
+    @ivar _ipv6: Like C{_ipv4}, for IPv6 addresses.
     """
-    def __init__(self, file=b'/etc/hosts', ttl = 60 * 60):
+    _checkInterval = 5
+    _nextCheck = None
+    _stat = None
+
+    def __init__(self, file=b'/etc/hosts', ttl = 60 * 60, reactor=None):
+        """
+        @param file: The name of the hosts(5)-format file.
+
+        @param ttl: The TTL to give the records found in the file.
+        @type ttl: L{int}
+
+        @param reactor: The reactor used to tell when to check the file for
+            changes, or C{None} for the global reactor.  (Added in 15.3.)
+        """
         common.ResolverBase.__init__(self)
         self.file = file
         self.ttl = ttl
+        if reactor is None:
+            from twisted.internet import reactor
+        self._reactor = reactor
+        self._ipv4 = {}
+        self._ipv6 = {}
+
+
+    def _index(self):
+        """
+        Read the file again if it has changed since it was last read, and it
+        has not been checked for changes within C{_checkInterval} seconds.
+        """
+        now = self._reactor.seconds()
+        if self._nextCheck is not None and now < self._nextCheck:
+            return
+        self._nextCheck = now + self._checkInterval
+
+        try:
+            st = os.stat(self.file)
+        except OSError:
+            stat = None
+        else:
+            stat = (st.st_ino, st.st_size, st.st_mtime)
+        if stat is not None and stat == self._stat:
+            return
+
+        try:
+            content = FilePath(self.file).getContent()
+        except (IOError, OSError):
+            self._stat = None
+            self._ipv4, self._ipv6 = {}, {}
+        else:
+            self._stat = stat
+            self._ipv4, self._ipv6 = _indexHosts(content)
 
 
     def _aRecords(self, name):
@@ -87,12 +189,11 @@ class Resolver(common.ResolverBase):
         Return a tuple of L{dns.RRHeader} instances for all of the IPv4
         addresses in the hosts file.
         """
+        self._index()
         return tuple([
             dns.RRHeader(name, dns.A, dns.IN, self.ttl,
                          dns.Record_A(addr, self.ttl))
-            for addr
-            in searchFileForAll(FilePath(self.file), name)
-            if isIPAddress(addr)])
+            for addr in self._ipv4.get(name.lower(), ())])
 
 
     def _aaaaRecords(self, name):
@@ -100,12 +201,11 @@ class Resolver(common.ResolverBase):
         Return a tuple of L{dns.RRHeader} instances for all of the IPv6
         addresses in the hosts file.
         """
+        self._index()
         return tuple([
             dns.RRHeader(name, dns.AAAA, dns.IN, self.ttl,
                          dns.Record_AAAA(addr, self.ttl))
-            for addr
-            in searchFileForAll(FilePath(self.file), name)
-            if not isIPAddress(addr)])
+            for addr in self._ipv6.get(name.lower(), ())])
 
 
     def _respond(self, name, records):
@@ -17,13 +17,49 @@ for resolvers to deal with.  Fix it.
 @author: Jp Calderone
 """
 
+import struct
 import time
 
 from twisted.internet import protocol
-from twisted.names import dns, resolve
+from twisted.names import dns, error, resolve
 from twisted.python import log
 
 
+
+class _EncodedResponse(object):
+    """
+    A response message which has already been encoded.
+
+    It has the attributes of the message, but its C{toStr} method gives the
+    encoding rather than encoding the message again.
+    """
+
+    def __init__(self, message, encoded):
+        """
+        @param message: The response message.
+        @type message: L{dns.Message}
+
+        @param encoded: The encoding of C{message}.
+        @type encoded: L{bytes}
+        """
+        self._message = message
+        self._encoded = encoded
+
+
+    def __getattr__(self, name):
+        return getattr(self._message, name)
+
+
+    def toStr(self):
+        """
+        Get the encoding of the message.
+
+        @rtype: L{bytes}
+        """
+        return self._encoded
+
+
+
 class DNSServerFactory(protocol.ServerFactory):
     """
     Server factory and tracker for L{DNSProtocol} connections.  This class also
@@ -59,11 +95,30 @@ class DNSServerFactory(protocol.ServerFactory):
     @ivar _messageFactory: A response message constructor with an initializer
          signature matching L{dns.Message.__init__}.
     @type _messageFactory: C{callable}
+
+    @ivar _responses: The last response to each question, keyed by the name,
+        type and class of the query and the size the response may be
+        truncated to.  Each is kept as a L{tuple} of the L{tuple}s of records
+        in each section of the response and either the response message or,
+        once a later response has been found to have the same records, its
+        encoding.  See L{_encodedResponse}.
+    @type _responses: L{dict}
+
+    @ivar _responsesSize: The number of responses to keep in C{_responses}.
+        When there are more, they are all discarded.
+
+    @ivar idleTimeout: The L{dns.DNSProtocol.idleTimeout} of the connections,
+        over which clients may pipeline any number of queries.
+    @type idleTimeout: L{int} or L{float} or C{None}
+
+    @since: 15.3 for C{idleTimeout}.
     """
 
     protocol = dns.DNSProtocol
     cache = None
+    idleTimeout = 30
     _messageFactory = dns.Message
+    _responsesSize = 10000
 
 
     def __init__(self, authorities=None, caches=None, clients=None, verbose=0):
@@ -74,7 +129,10 @@ class DNSServerFactory(protocol.ServerFactory):
         @param caches: Resolvers which provide cached non-authoritative
             answers. The first cache instance is assigned to
             C{DNSServerFactory.cache} and its C{cacheResult} method will be
-            called when a response is received from one of C{clients}.
+            called when a response is received from one of C{clients}.  Caches
+            with an C{upstream} attribute of L{None} have it set to a
+            L{resolve.ResolverChain} of C{clients}, so that they can refresh
+            their results (see L{twisted.names.cache.CacheResolver}).
         @type caches: L{list} of L{Cache<twisted.names.cache.Cache} instances
 
         @param clients: Resolvers which are capable of performing recursive DNS
@@ -99,7 +157,13 @@ class DNSServerFactory(protocol.ServerFactory):
         self.verbose = verbose
         if caches:
             self.cache = caches[-1]
+            if clients:
+                upstream = resolve.ResolverChain(clients)
+                for cache in caches:
+                    if getattr(cache, 'upstream', False) is None:
+                        cache.upstream = upstream
         self.connections = []
+        self._responses = {}
 
 
     def _verboseLog(self, *args, **kwargs):
@@ -115,6 +179,7 @@ class DNSServerFactory(protocol.ServerFactory):
 
     def buildProtocol(self, addr):
         p = self.protocol(self)
+        p.idleTimeout = self.idleTimeout
         p.factory = self
         return p
 
@@ -298,7 +363,8 @@ class DNSServerFactory(protocol.ServerFactory):
         response = self._responseFromMessage(
             message=message, rCode=dns.OK,
             answers=ans, authority=auth, additional=add)
-        self.sendReply(protocol, response, address)
+        self.sendReply(protocol, self._encodedResponse(message, response),
+                       address)
 
         l = len(ans) + len(auth) + len(add)
         self._verboseLog("Lookup found %d record%s" % (l, l != 1 and "s" or ""))
@@ -309,6 +375,50 @@ class DNSServerFactory(protocol.ServerFactory):
             )
 
 
+    def _encodedResponse(self, message, response):
+        """
+        Reuse the encoding of an earlier response to the same question, if it
+        had the same records.
+
+        Authorities such as L{twisted.names.authority.FileAuthority} answer
+        each question with the same records until their zone is loaded again,
+        so the responses to repeated questions differ only in their IDs.  The
+        first response which repeats an earlier one is encoded, and later ones
+        reuse that encoding with their own ID.
+
+        @param message: The query message.
+        @type message: L{dns.Message}
+
+        @param response: The response message.
+        @type response: L{dns.Message}
+
+        @return: C{response}, or an L{_EncodedResponse} for it.
+        """
+        if len(message.queries) != 1:
+            return response
+        records = (tuple(response.answers), tuple(response.authority),
+                   tuple(response.additional))
+        if not (records[0] or records[1] or records[2]):
+            return response
+
+        query = message.queries[0]
+        key = (query.name.name, query.type, query.cls, message.maxSize)
+        responses = self._responses
+        previous = responses.get(key)
+        if previous is None or previous[0] != records:
+            if len(responses) >= self._responsesSize:
+                responses.clear()
+            responses[key] = (records, response)
+            return response
+
+        encoded = previous[1]
+        if not isinstance(encoded, bytes):
+            encoded = encoded.toStr()
+            responses[key] = (records, encoded)
+        return _EncodedResponse(
+            response, struct.pack("!H", response.id) + encoded[2:])
+
+
     def gotResolverError(self, failure, protocol, message, address):
         """
         A callback used by L{DNSServerFactory.handleQuery} for handling deferred
@@ -337,6 +447,8 @@ class DNSServerFactory(protocol.ServerFactory):
         """
         if failure.check(dns.DomainError, dns.AuthoritativeDomainError):
             rCode = dns.ENAME
+            if self.cache and failure.check(error.DNSNameError):
+                self._cacheNameError(message.queries[0], failure.value)
         else:
             rCode = dns.ESERVER
             log.err(failure)
@@ -347,6 +459,24 @@ class DNSServerFactory(protocol.ServerFactory):
         self._verboseLog("Lookup failed")
 
 
+    def _cacheNameError(self, query, exception):
+        """
+        Cache the answer that the name of a query does not exist, if the
+        answer came from another server and the cache supports it.
+
+        @param query: The query which failed.
+        @type query: L{dns.Query}
+
+        @param exception: The L{error.DNSNameError} the query failed with.
+        """
+        cacheNegativeResult = getattr(self.cache, 'cacheNegativeResult', None)
+        if cacheNegativeResult is None or not exception.args:
+            return
+        answer = exception.args[0]
+        if isinstance(answer, dns.Message):
+            cacheNegativeResult(query, answer.authority)
+
+
     def handleQuery(self, message, protocol, address):
         """
         Called by L{DNSServerFactory.messageReceived} when a query message is
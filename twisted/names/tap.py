@@ -23,6 +23,12 @@ class Options(usage.Options):
         ["resolv-conf", None, None,
             "Override location of resolv.conf (implies --recursive)"],
         ["hosts-file", None, None, "Perform lookups with a hosts file"],
+        ["prefetch", None, None,
+            "Refresh cached records looked up when less than this fraction "
+            "of their TTL is left (implies --cache)"],
+        ["serve-stale", None, None,
+            "Serve cached records for up to this many seconds after they "
+            "expire if they cannot be refreshed (implies --cache)"],
     ]
 
     optFlags = [
@@ -87,6 +93,20 @@ class Options(usage.Options):
     def postOptions(self):
         if self['resolv-conf']:
             self['recursive'] = True
+        if self['prefetch'] is not None:
+            try:
+                self['prefetch'] = float(self['prefetch'])
+            except ValueError:
+                raise usage.UsageError(
+                    "Invalid prefetch fraction: %r" % (self['prefetch'],))
+            self['cache'] = True
+        if self['serve-stale'] is not None:
+            try:
+                self['serve-stale'] = int(self['serve-stale'])
+            except ValueError:
+                raise usage.UsageError(
+                    "Invalid serve-stale time: %r" % (self['serve-stale'],))
+            self['cache'] = True
 
         self.svcs = []
         self.zones = []
@@ -127,7 +147,9 @@ def _buildResolvers(config):
 
     ca, cl = [], []
     if config['cache']:
-        ca.append(cache.CacheResolver(verbose=config['verbose']))
+        ca.append(cache.CacheResolver(verbose=config['verbose'],
+                                      prefetch=config['prefetch'],
+                                      staleTTL=config['serve-stale'] or 0))
     if config['hosts-file']:
         cl.append(hosts.Resolver(file=config['hosts-file']))
     if config['recursive']:
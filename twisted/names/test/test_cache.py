@@ -7,14 +7,34 @@ Tests for L{twisted.names.cache}.
 
 from __future__ import division, absolute_import
 
+import copy
 import time
 
 from zope.interface.verify import verifyClass
 
 from twisted.trial import unittest
 
-from twisted.names import dns, cache
-from twisted.internet import task, interfaces
+from twisted.names import dns, cache, error
+from twisted.internet import defer, task, interfaces
+
+
+class FakeUpstream(object):
+    """
+    A fake upstream resolver for L{cache.CacheResolver}.
+
+    @ivar queries: The queries made, and the L{defer.Deferred} returned for
+        each.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+
+    def query(self, query, timeout=None):
+        d = defer.Deferred()
+        self.queries.append((query, d))
+        return d
+
 
 
 class CachingTests(unittest.TestCase):
@@ -142,3 +162,375 @@ class CachingTests(unittest.TestCase):
 
         return self.assertFailure(
             c.lookupAddress(b"example.com"), dns.DomainError)
+
+
+    def _records(self, ttl):
+        """
+        Make a result for C{example.com} with records of the given TTL.
+        """
+        return ([dns.RRHeader(b"example.com", dns.A, dns.IN, ttl,
+                              dns.Record_A("127.0.0.1", ttl))], [], [])
+
+
+    def test_leastRecentlyUsedEvicted(self):
+        """
+        When more than C{maxEntries} results are cached, the least recently
+        used one is evicted.
+        """
+        clock = task.Clock()
+        c = cache.CacheResolver(reactor=clock, maxEntries=2)
+        a = dns.Query(name=b"a.example.com", type=dns.A, cls=dns.IN)
+        b = dns.Query(name=b"b.example.com", type=dns.A, cls=dns.IN)
+        d = dns.Query(name=b"d.example.com", type=dns.A, cls=dns.IN)
+        c.cacheResult(a, self._records(60))
+        c.cacheResult(b, self._records(60))
+        c.lookupAddress(b"a.example.com")
+        c.cacheResult(d, self._records(60))
+
+        self.assertEqual(list(c.cache), [a, d])
+        self.assertEqual(c.evictions, 1)
+
+
+    def test_counters(self):
+        """
+        L{cache.CacheResolver} counts the lookups it answers and those it
+        does not.
+        """
+        clock = task.Clock()
+        c = cache.CacheResolver(reactor=clock)
+        c.cacheResult(dns.Query(name=b"example.com", type=dns.A, cls=dns.IN),
+                      self._records(60))
+        c.lookupAddress(b"example.com")
+        c.lookupAddress(b"example.com")
+        self.failureResultOf(c.lookupAddress(b"example.org"), dns.DomainError)
+
+        self.assertEqual((c.hits, c.misses, c.evictions), (2, 1, 0))
+
+
+    def test_singleTimer(self):
+        """
+        Entries are removed as they expire by a single timer.
+        """
+        clock = task.Clock()
+        c = cache.CacheResolver(reactor=clock)
+        queries = [dns.Query(name=name, type=dns.A, cls=dns.IN)
+                   for name in (b"a.example.com", b"b.example.com",
+                                b"c.example.com")]
+        for ttl, query in zip([30, 10, 20], queries):
+            c.cacheResult(query, self._records(ttl))
+        self.assertEqual(len(clock.getDelayedCalls()), 1)
+
+        clock.advance(10)
+        self.assertEqual(list(c.cache), [queries[0], queries[2]])
+        clock.advance(10)
+        self.assertEqual(list(c.cache), [queries[0]])
+        self.assertEqual(len(clock.getDelayedCalls()), 1)
+        clock.advance(10)
+        self.assertEqual(list(c.cache), [])
+        self.assertEqual(clock.getDelayedCalls(), [])
+
+
+    def test_replacedEntryExpiry(self):
+        """
+        An entry which is cached again expires according to its new TTL.
+        """
+        clock = task.Clock()
+        c = cache.CacheResolver(reactor=clock)
+        query = dns.Query(name=b"example.com", type=dns.A, cls=dns.IN)
+        c.cacheResult(query, self._records(10))
+        clock.advance(5)
+        c.cacheResult(query, self._records(10))
+        clock.advance(5)
+        self.assertIn(query, c.cache)
+        clock.advance(5)
+        self.assertNotIn(query, c.cache)
+
+
+    def test_recordsShared(self):
+        """
+        Lookups within the same second of the life of an entry get the same
+        records, in new lists.
+        """
+        clock = task.Clock()
+        c = cache.CacheResolver(reactor=clock)
+        c.cacheResult(dns.Query(name=b"example.com", type=dns.A, cls=dns.IN),
+                      self._records(60))
+        clock.advance(1.2)
+        first = self.successResultOf(c.lookupAddress(b"example.com"))
+        clock.advance(0.5)
+        second = self.successResultOf(c.lookupAddress(b"example.com"))
+        clock.advance(0.5)
+        third = self.successResultOf(c.lookupAddress(b"example.com"))
+
+        self.assertIs(first[0][0], second[0][0])
+        self.assertIsNot(first[0], second[0])
+        self.assertEqual(first[0][0].ttl, 59)
+        self.assertEqual(third[0][0].ttl, 58)
+
+
+    def _soa(self, ttl, minimum):
+        """
+        Make an authority section with an SOA record for C{example.com}.
+        """
+        return [dns.RRHeader(b"example.com", dns.SOA, dns.IN, ttl,
+                             dns.Record_SOA(minimum=minimum, ttl=ttl))]
+
+
+    def test_negativeResult(self):
+        """
+        A name which does not exist is cached for the smaller of the TTL and
+        the minimum of its SOA record, and lookups of it fail with
+        L{dns.AuthoritativeDomainError} so that no other resolver is asked.
+        """
+        clock = task.Clock()
+        c = cache.CacheResolver(reactor=clock)
+        query = dns.Query(name=b"example.com", type=dns.A, cls=dns.IN)
+        c.cacheNegativeResult(query, self._soa(300, 60))
+
+        self.failureResultOf(
+            c.lookupAddress(b"example.com"), dns.AuthoritativeDomainError)
+        clock.advance(60)
+        self.assertNotIn(query, c.cache)
+        self.failureResultOf(c.lookupAddress(b"example.com"), dns.DomainError)
+
+
+    def test_negativeResultWithoutSOA(self):
+        """
+        A name which does not exist is not cached if there is no SOA record.
+        """
+        clock = task.Clock()
+        c = cache.CacheResolver(reactor=clock)
+        c.cacheNegativeResult(
+            dns.Query(name=b"example.com", type=dns.A, cls=dns.IN), [])
+        self.assertEqual(list(c.cache), [])
+
+
+    def test_noData(self):
+        """
+        A result with no answers is cached for no longer than the minimum of
+        its SOA record.
+        """
+        clock = task.Clock()
+        c = cache.CacheResolver(reactor=clock)
+        query = dns.Query(name=b"example.com", type=dns.A, cls=dns.IN)
+        c.cacheResult(query, ([], self._soa(300, 60), []))
+
+        result = self.successResultOf(c.lookupAddress(b"example.com"))
+        self.assertEqual(result[0], [])
+        clock.advance(60)
+        self.assertNotIn(query, c.cache)
+
+
+    def test_copy(self):
+        """
+        Copying or pickling a L{cache.CacheResolver} stops its expiry timer,
+        and the copy sets it again.
+        """
+        clock = task.Clock()
+        c = cache.CacheResolver(reactor=clock)
+        first = dns.Query(name=b"a.example.com", type=dns.A, cls=dns.IN)
+        second = dns.Query(name=b"b.example.com", type=dns.A, cls=dns.IN)
+        c.cacheResult(first, self._records(60))
+        c.cacheResult(second, self._records(10))
+        restored = copy.copy(c)
+        self.assertEqual(len(clock.getDelayedCalls()), 1)
+        self.assertEqual(list(restored.cache), [first, second])
+        clock.advance(10)
+        self.assertEqual(list(restored.cache), [first])
+
+
+
+    def test_prefetch(self):
+        """
+        A result looked up when less than C{prefetch} of its TTL is left is
+        refreshed from C{upstream} in the background, once.
+        """
+        clock = task.Clock()
+        upstream = FakeUpstream()
+        c = cache.CacheResolver(reactor=clock, upstream=upstream, prefetch=0.1)
+        query = dns.Query(name=b"example.com", type=dns.A, cls=dns.IN)
+        c.cacheResult(query, self._records(100))
+
+        clock.advance(89)
+        self.successResultOf(c.lookupAddress(b"example.com"))
+        self.assertEqual(upstream.queries, [])
+        clock.advance(1)
+        result = self.successResultOf(c.lookupAddress(b"example.com"))
+        self.assertEqual(result[0][0].ttl, 10)
+        self.successResultOf(c.lookupAddress(b"example.com"))
+        self.assertEqual([q for (q, d) in upstream.queries], [query])
+
+        upstream.queries[0][1].callback(self._records(100))
+        clock.advance(50)
+        result = self.successResultOf(c.lookupAddress(b"example.com"))
+        self.assertEqual(result[0][0].ttl, 50)
+
+
+    def test_prefetchFailure(self):
+        """
+        If a background refresh fails, the cached result is still used until
+        it expires.
+        """
+        clock = task.Clock()
+        upstream = FakeUpstream()
+        c = cache.CacheResolver(reactor=clock, upstream=upstream, prefetch=0.1)
+        c.cacheResult(dns.Query(name=b"example.com", type=dns.A, cls=dns.IN),
+                      self._records(100))
+        clock.advance(95)
+        self.successResultOf(c.lookupAddress(b"example.com"))
+        upstream.queries[0][1].errback(error.DNSServerError())
+        clock.advance(1)
+        result = self.successResultOf(c.lookupAddress(b"example.com"))
+        self.assertEqual(result[0][0].ttl, 4)
+
+
+    def test_cachedAgain(self):
+        """
+        Caching a result the cache gave again, as L{server.DNSServerFactory}
+        does, does not change the entry.
+        """
+        clock = task.Clock()
+        c = cache.CacheResolver(reactor=clock)
+        query = dns.Query(name=b"example.com", type=dns.A, cls=dns.IN)
+        c.cacheResult(query, self._records(100))
+        entry = c.cache[query]
+        clock.advance(50.5)
+        c.cacheResult(query, self.successResultOf(c.lookupAddress(
+                    b"example.com")))
+        self.assertIs(c.cache[query], entry)
+
+
+    def test_serveStale(self):
+        """
+        An expired result is refreshed from C{upstream}, and used if that
+        fails within C{staleTTL} of its expiry, with a TTL of
+        C{staleAnswerTTL}.
+        """
+        clock = task.Clock()
+        upstream = FakeUpstream()
+        c = cache.CacheResolver(reactor=clock, upstream=upstream,
+                                staleTTL=3600)
+        query = dns.Query(name=b"example.com", type=dns.A, cls=dns.IN)
+        c.cacheResult(query, self._records(100))
+
+        clock.advance(200)
+        d = c.lookupAddress(b"example.com")
+        self.assertNoResult(d)
+        upstream.queries[0][1].errback(error.DNSQueryTimeoutError(None))
+        result = self.successResultOf(d)
+        self.assertEqual(result[0][0].ttl, 30)
+        self.assertEqual(result[0][0].payload.dottedQuad(), "127.0.0.1")
+
+        clock.advance(3500)
+        self.assertNotIn(query, c.cache)
+        self.failureResultOf(c.lookupAddress(b"example.com"), dns.DomainError)
+
+
+    def test_staleAfterClientResponseTimeout(self):
+        """
+        An expired result is used if C{upstream} has not answered within
+        C{clientResponseTimeout}, and the refresh carries on, replacing it
+        in the cache when C{upstream} answers.
+        """
+        clock = task.Clock()
+        upstream = FakeUpstream()
+        c = cache.CacheResolver(reactor=clock, upstream=upstream,
+                                staleTTL=3600)
+        query = dns.Query(name=b"example.com", type=dns.A, cls=dns.IN)
+        c.cacheResult(query, self._records(100))
+
+        clock.advance(200)
+        d = c.lookupAddress(b"example.com")
+        clock.advance(1)
+        self.assertNoResult(d)
+        clock.advance(0.8)
+        result = self.successResultOf(d)
+        self.assertEqual(result[0][0].ttl, 30)
+
+        upstream.queries[0][1].callback(self._records(300))
+        self.assertEqual(c.cache[query].ttl, 300)
+        self.assertEqual(c.cache[query].when, clock.seconds())
+
+
+    def test_clientResponseTimeout(self):
+        """
+        The time to wait for C{upstream} before using an expired result is
+        given by the C{clientResponseTimeout} argument; if it is L{None},
+        the lookup waits until C{upstream} answers.
+        """
+        for timeout in (5, None):
+            clock = task.Clock()
+            upstream = FakeUpstream()
+            c = cache.CacheResolver(reactor=clock, upstream=upstream,
+                                    staleTTL=3600,
+                                    clientResponseTimeout=timeout)
+            c.cacheResult(
+                dns.Query(name=b"example.com", type=dns.A, cls=dns.IN),
+                self._records(100))
+
+            clock.advance(200)
+            d = c.lookupAddress(b"example.com")
+            clock.advance(4.9)
+            self.assertNoResult(d)
+            if timeout is None:
+                clock.advance(60)
+                self.assertNoResult(d)
+                upstream.queries[0][1].errback(
+                    error.DNSQueryTimeoutError(None))
+            else:
+                clock.advance(0.1)
+            self.assertEqual(self.successResultOf(d)[0][0].ttl, 30)
+
+
+    def test_staleRefreshed(self):
+        """
+        An expired result is replaced by the result from C{upstream}.
+        """
+        clock = task.Clock()
+        upstream = FakeUpstream()
+        c = cache.CacheResolver(reactor=clock, upstream=upstream,
+                                staleTTL=3600)
+        query = dns.Query(name=b"example.com", type=dns.A, cls=dns.IN)
+        c.cacheResult(query, self._records(100))
+
+        clock.advance(200)
+        d = c.lookupAddress(b"example.com")
+        fresh = self._records(300)
+        upstream.queries[0][1].callback(fresh)
+        self.assertIs(self.successResultOf(d), fresh)
+        self.assertEqual(c.cache[query].ttl, 300)
+        # The client response timer has been cancelled.
+        clock.advance(2)
+
+
+    def test_staleNameError(self):
+        """
+        An expired result is not used if C{upstream} answers that the name
+        does not exist.
+        """
+        clock = task.Clock()
+        upstream = FakeUpstream()
+        c = cache.CacheResolver(reactor=clock, upstream=upstream,
+                                staleTTL=3600)
+        query = dns.Query(name=b"example.com", type=dns.A, cls=dns.IN)
+        c.cacheResult(query, self._records(100))
+
+        clock.advance(200)
+        d = c.lookupAddress(b"example.com")
+        answer = dns.Message(rCode=dns.ENAME)
+        answer.authority = self._soa(300, 60)
+        upstream.queries[0][1].errback(error.DNSNameError(answer))
+        self.failureResultOf(d, dns.AuthoritativeDomainError)
+        self.assertIsNone(c.cache[query].payload)
+
+
+    def test_staleWithoutUpstream(self):
+        """
+        An expired result is not used if there is no C{upstream}.
+        """
+        clock = task.Clock()
+        c = cache.CacheResolver(reactor=clock, staleTTL=3600)
+        c.cacheResult(dns.Query(name=b"example.com", type=dns.A, cls=dns.IN),
+                      self._records(100))
+        clock.advance(200)
+        self.failureResultOf(c.lookupAddress(b"example.com"), dns.DomainError)
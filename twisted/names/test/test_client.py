@@ -7,6 +7,8 @@ Test cases for L{twisted.names.client}.
 
 from __future__ import division, absolute_import
 
+import struct
+
 from zope.interface.verify import verifyClass, verifyObject
 
 from twisted.python import failure
@@ -14,7 +16,8 @@ from twisted.python.filepath import FilePath
 from twisted.python.runtime import platform
 
 from twisted.internet import defer
-from twisted.internet.error import CannotListenError, ConnectionRefusedError
+from twisted.internet.error import (
+    CannotListenError, ConnectionDone, ConnectionRefusedError)
 from twisted.internet.interfaces import IResolver
 from twisted.internet.test.modulehelpers import AlternateReactor
 from twisted.internet.task import Clock
@@ -797,6 +800,353 @@ class ResolverTests(unittest.TestCase):
         self.assertEqual(len(prePending), 0)
 
 
+    def _connectedTCP(self, reactor, resolver):
+        """
+        Connect the TCP connection L{client.Resolver.queryTCP} last started to
+        a transport.
+
+        @return: The connected L{dns.DNSProtocol}.
+        """
+        factory = reactor.tcpClients[-1][2]
+        protocol = factory.buildProtocol(None)
+        protocol.makeConnection(proto_helpers.StringTransport())
+        return protocol
+
+
+    def _answer(self, protocol, id):
+        """
+        Give a L{dns.DNSProtocol} an empty response to one of its queries.
+        """
+        s = dns.Message(id=id, answer=1).toStr()
+        protocol.dataReceived(struct.pack('!H', len(s)) + s)
+
+
+    def test_tcpQueriesPipelined(self):
+        """
+        L{client.Resolver.queryTCP} opens a single connection for the queries
+        made while it is being opened, sends them all over it once it is,
+        and fires each L{Deferred} with the response matched to it by ID.
+        """
+        reactor = proto_helpers.MemoryReactorClock()
+        resolver = client.Resolver(
+            servers=[('192.0.2.100', 53)], reactor=reactor)
+        d1 = resolver.queryTCP([dns.Query(b'example.com')])
+        d2 = resolver.queryTCP([dns.Query(b'example.net')])
+        self.assertEqual(len(reactor.tcpClients), 1)
+        protocol = self._connectedTCP(reactor, resolver)
+        data = protocol.transport.value()
+        ids = []
+        while data:
+            length, = struct.unpack('!H', data[:2])
+            m = dns.Message()
+            m.fromStr(data[2:2 + length])
+            ids.append(m.id)
+            data = data[2 + length:]
+        id1, id2 = ids
+        self._answer(protocol, id2)
+        self._answer(protocol, id1)
+        self.assertEqual(self.successResultOf(d1).id, id1)
+        self.assertEqual(self.successResultOf(d2).id, id2)
+
+
+    def test_tcpConnectionReused(self):
+        """
+        The TCP connection is kept open after its queries are answered, and
+        used for later queries.
+        """
+        reactor = proto_helpers.MemoryReactorClock()
+        resolver = client.Resolver(
+            servers=[('192.0.2.100', 53)], reactor=reactor)
+        resolver.queryTCP([dns.Query(b'example.com')])
+        protocol = self._connectedTCP(reactor, resolver)
+        self._answer(protocol, list(protocol.liveMessages)[0])
+        d = resolver.queryTCP([dns.Query(b'example.net')])
+        self.assertEqual(len(reactor.tcpClients), 1)
+        self.assertFalse(protocol.transport.disconnecting)
+        self._answer(protocol, list(protocol.liveMessages)[0])
+        self.successResultOf(d)
+
+
+    def test_tcpIdleTimeout(self):
+        """
+        The TCP connection is closed once no queries have been made over it
+        for L{client.Resolver.tcpIdleTimeout} seconds.
+        """
+        reactor = proto_helpers.MemoryReactorClock()
+        resolver = client.Resolver(
+            servers=[('192.0.2.100', 53)], reactor=reactor, tcpIdleTimeout=5)
+        resolver.queryTCP([dns.Query(b'example.com')])
+        protocol = self._connectedTCP(reactor, resolver)
+        self._answer(protocol, list(protocol.liveMessages)[0])
+        reactor.advance(4)
+        self.assertFalse(protocol.transport.disconnecting)
+        reactor.advance(1)
+        self.assertTrue(protocol.transport.disconnecting)
+
+
+    def test_tcpQueryRetriedAfterClose(self):
+        """
+        A query made over a TCP connection which the server closes before
+        answering it is made again over a new connection.
+        """
+        reactor = proto_helpers.MemoryReactorClock()
+        resolver = client.Resolver(
+            servers=[('192.0.2.100', 53)], reactor=reactor)
+        resolver.queryTCP([dns.Query(b'example.com')])
+        protocol = self._connectedTCP(reactor, resolver)
+        self._answer(protocol, list(protocol.liveMessages)[0])
+        d = resolver.queryTCP([dns.Query(b'example.net')])
+        protocol.connectionLost(failure.Failure(ConnectionDone()))
+        self.assertNoResult(d)
+        self.assertEqual(len(reactor.tcpClients), 2)
+        protocol = self._connectedTCP(reactor, resolver)
+        id = list(protocol.liveMessages)[0]
+        self._answer(protocol, id)
+        self.assertEqual(self.successResultOf(d).id, id)
+
+
+    def test_tcpQueryNotRetriedOnNewConnection(self):
+        """
+        A query made over a TCP connection opened for it fails if the server
+        closes the connection before answering it.
+        """
+        reactor = proto_helpers.MemoryReactorClock()
+        resolver = client.Resolver(
+            servers=[('192.0.2.100', 53)], reactor=reactor)
+        d = resolver.queryTCP([dns.Query(b'example.com')])
+        protocol = self._connectedTCP(reactor, resolver)
+        protocol.connectionLost(failure.Failure(ConnectionDone()))
+        self.failureResultOf(d, ConnectionDone)
+        self.assertEqual(len(reactor.tcpClients), 1)
+
+
+
+class PooledDNSDatagramProtocol(StubDNSDatagramProtocol):
+    """
+    A L{StubDNSDatagramProtocol} which, like L{dns.DNSDatagramProtocol},
+    keeps track of the IDs of its outstanding queries and of those which it
+    may receive retransmitted responses to.
+
+    @ivar liveMessages: A C{dict} with the ID of each outstanding query as
+        a key.
+    @ivar resends: A C{dict} with the ID of each query sent with an explicit
+        ID as a key.
+    """
+    def __init__(self):
+        StubDNSDatagramProtocol.__init__(self)
+        self.liveMessages = {}
+        self.resends = {}
+
+
+    def query(self, address, queries, timeout=10, id=None):
+        """
+        Record the query and its ID, choosing a new one if none is given.
+        """
+        if id is None:
+            id = len(self.queries) + 1000
+        else:
+            self.resends[id] = 1
+        self.liveMessages[id] = None
+        result = StubDNSDatagramProtocol.query(
+            self, address, queries, timeout, id)
+        def cbQueried(passthrough):
+            del self.liveMessages[id]
+            return passthrough
+        return result.addBoth(cbQueried)
+
+
+    def removeResend(self, id):
+        """
+        Forget that a retransmitted response to the query C{id} may arrive.
+        """
+        del self.resends[id]
+
+
+
+class DatagramProtocolPoolTests(unittest.TestCase):
+    """
+    Tests for L{client.Resolver} with C{udpPoolSize} set, which sends UDP
+    queries from a L{client._DatagramProtocolPool}.
+    """
+    def setUp(self):
+        self.clock = Clock()
+        self.protocols = []
+        self.resolver = client.Resolver(
+            servers=[('example.com', 53)], reactor=self.clock,
+            udpPoolSize=2, udpPoolRotation=60)
+        self.resolver._connectedProtocol = self.connectedProtocol
+
+
+    def connectedProtocol(self):
+        """
+        Make a new L{PooledDNSDatagramProtocol}, recording it in
+        C{self.protocols}.
+        """
+        protocol = PooledDNSDatagramProtocol()
+        self.protocols.append(protocol)
+        return protocol
+
+
+    def answerAll(self):
+        """
+        Answer every outstanding query with an empty message.
+        """
+        for protocol in self.protocols:
+            for query in protocol.queries:
+                if not query[-1].called:
+                    query[-1].callback(dns.Message())
+
+
+    def test_defaultUnpooled(self):
+        """
+        L{client.Resolver} does not share sockets between queries unless
+        C{udpPoolSize} is given.
+        """
+        resolver = client.Resolver(servers=[('example.com', 53)])
+        self.assertEqual(resolver.udpPoolSize, 0)
+        self.assertIs(resolver._udpPool, None)
+
+
+    def test_reused(self):
+        """
+        Queries are sent from no more than C{udpPoolSize} protocols, which
+        stay connected after the queries complete.
+        """
+        for i in range(10):
+            self.resolver._query(
+                ('example.com', 53), [dns.Query(b'example.com')], 10)
+        self.assertEqual(len(self.protocols), 2)
+        self.assertEqual(
+            sum(len(protocol.queries) for protocol in self.protocols), 10)
+        self.answerAll()
+        for protocol in self.protocols:
+            self.assertFalse(protocol.transport.disconnected)
+            self.assertEqual(protocol.liveMessages, {})
+
+
+    def test_rotation(self):
+        """
+        Protocols older than C{udpPoolRotation} seconds are replaced by new
+        ones, and disconnected once their queries are complete.
+        """
+        self.resolver._query(
+            ('example.com', 53), [dns.Query(b'example.com')], 10)
+        old = self.protocols[:]
+        self.clock.advance(60)
+        self.resolver._query(
+            ('example.com', 53), [dns.Query(b'example.com')], 10)
+        self.assertEqual(len(self.protocols), 4)
+        busy = [protocol for protocol in old if protocol.queries]
+        idle = [protocol for protocol in old if not protocol.queries]
+        self.assertTrue(idle[0].transport.disconnected)
+        self.assertFalse(busy[0].transport.disconnected)
+        busy[0].queries[0][-1].callback(dns.Message())
+        self.assertTrue(busy[0].transport.disconnected)
+        for protocol in self.protocols[2:]:
+            self.assertFalse(protocol.transport.disconnected)
+
+
+    def test_reissuedID(self):
+        """
+        A query reissued with the ID of an earlier one is sent from a
+        protocol which does not have a query with that ID outstanding, and
+        the ID is forgotten once the query completes.
+        """
+        self.resolver._query(
+            ('example.com', 53), [dns.Query(b'example.com')], 10, 1234)
+        self.resolver._query(
+            ('example.com', 53), [dns.Query(b'example.com')], 10, 1234)
+        self.assertEqual(
+            sorted(len(protocol.queries) for protocol in self.protocols),
+            [1, 1])
+        self.answerAll()
+        for protocol in self.protocols:
+            self.assertEqual(protocol.resends, {})
+
+
+    def test_reissuedIDInUse(self):
+        """
+        If every protocol has a query with the ID of a reissued query
+        outstanding, the reissued query is sent with a new ID.
+        """
+        for i in range(3):
+            self.resolver._query(
+                ('example.com', 53), [dns.Query(b'example.com')], 10, 1234)
+        ids = sorted(query[3] for protocol in self.protocols
+                     for query in protocol.queries)
+        self.assertEqual(len(ids), 3)
+        self.assertEqual(ids.count(1234), 2)
+
+
+    def test_idsSpread(self):
+        """
+        Each query is sent with a random ID which no outstanding query from
+        any protocol in the pool is using.
+        """
+        ids = iter([1234, 1234, 5678])
+        self.patch(dns, 'randomSource', lambda: next(ids))
+        for i in range(2):
+            self.resolver._query(
+                ('example.com', 53), [dns.Query(b'example.com')], 10)
+        self.assertEqual(
+            sorted(query[3] for protocol in self.protocols
+                   for query in protocol.queries),
+            [1234, 5678])
+
+
+    def test_checkSource(self):
+        """
+        The protocols in the pool only accept responses from the addresses
+        their queries were sent to.
+        """
+        self.resolver._query(
+            ('example.com', 53), [dns.Query(b'example.com')], 10)
+        for protocol in self.protocols:
+            self.assertTrue(protocol._checkSource)
+
+
+    def test_closeUDPPool(self):
+        """
+        L{client.Resolver.closeUDPPool} disconnects every protocol in the
+        pool, including those with queries outstanding, and a new pool is
+        made for later queries.
+        """
+        self.resolver._query(
+            ('example.com', 53), [dns.Query(b'example.com')], 10)
+        d = self.resolver.closeUDPPool()
+        self.assertIs(self.successResultOf(d), None)
+        self.assertEqual(len(self.protocols), 2)
+        for protocol in self.protocols:
+            self.assertTrue(protocol.transport.disconnected)
+        self.assertIs(self.resolver._udpPool, None)
+        self.answerAll()
+
+        self.resolver._query(
+            ('example.com', 53), [dns.Query(b'example.com')], 10)
+        self.assertEqual(len(self.protocols), 4)
+        for protocol in self.protocols[2:]:
+            self.assertFalse(protocol.transport.disconnected)
+
+
+    def test_closeUDPPoolUnused(self):
+        """
+        L{client.Resolver.closeUDPPool} does nothing if no pool has been
+        made.
+        """
+        d = self.resolver.closeUDPPool()
+        self.assertIs(self.successResultOf(d), None)
+        self.assertEqual(self.protocols, [])
+
+
+    def test_getstate(self):
+        """
+        The pool is not part of the state of the resolver.
+        """
+        self.resolver._query(
+            ('example.com', 53), [dns.Query(b'example.com')], 10)
+        self.assertNotIn('_udpPool', self.resolver.__getstate__())
+
+
 
 class ClientTests(unittest.TestCase):
 
@@ -17,7 +17,8 @@ from zope.interface.verify import verifyClass
 from twisted.python.failure import Failure
 from twisted.python.util import FancyEqMixin, FancyStrMixin
 from twisted.internet import address, task
-from twisted.internet.error import CannotListenError, ConnectionDone
+from twisted.internet.error import (
+    CannotListenError, ConnectionDone, InvalidAddressError)
 from twisted.trial import unittest
 from twisted.names import dns
 
@@ -1171,6 +1172,37 @@ class DatagramProtocolTests(unittest.TestCase):
         return d
 
 
+    def test_responseFromOtherAddress(self):
+        """
+        If C{_checkSource} is set, a response from an address other than the
+        one its query was sent to is ignored, and the query still waits for
+        a response from that address.
+        """
+        self.proto._checkSource = True
+        d = self.proto.query(('127.0.0.1', 21345), [dns.Query(b'foo')])
+        m = dns.Message()
+        m.id = next(iter(self.proto.liveMessages.keys()))
+        self.proto.datagramReceived(m.toStr(), ('127.0.0.2', 21345))
+        self.proto.datagramReceived(m.toStr(), ('127.0.0.1', 53))
+        self.assertNoResult(d)
+        self.assertEqual(self.controller.messages, [])
+        self.proto.datagramReceived(m.toStr(), ('127.0.0.1', 21345))
+        self.assertEqual(self.successResultOf(d).id, m.id)
+        self.assertEqual(self.proto._queried, {})
+
+
+    def test_checkSourceTimeout(self):
+        """
+        If C{_checkSource} is set, the address a query was sent to is
+        forgotten when the query times out.
+        """
+        self.proto._checkSource = True
+        d = self.proto.query(('127.0.0.1', 21345), [dns.Query(b'foo')])
+        self.clock.advance(10)
+        self.failureResultOf(d, dns.DNSQueryTimeoutError)
+        self.assertEqual(self.proto._queried, {})
+
+
     def test_writeError(self):
         """
         Exceptions raised by the transport's write method should be turned into
@@ -1216,6 +1248,71 @@ class DatagramProtocolTests(unittest.TestCase):
                          message.toStr())
 
 
+    def test_datagramsReceived(self):
+        """
+        L{DNSDatagramProtocol.datagramsReceived} handles each datagram like
+        L{DNSDatagramProtocol.datagramReceived}, and sends the messages
+        written in response with one call to the transport's
+        C{writeDatagrams} method.
+        """
+        written = []
+        self.proto.transport.writeDatagrams = written.append
+        def messageReceived(msg, proto, addr=None):
+            proto.writeMessage(msg, addr)
+        self.controller.messageReceived = messageReceived
+        first, second = dns.Message(id=1), dns.Message(id=2)
+        self.proto.datagramsReceived([
+                (first.toStr(), ('127.0.0.1', 21345)),
+                (second.toStr(), ('127.0.0.2', 21345))])
+        self.assertEqual(written, [[(first.toStr(), ('127.0.0.1', 21345)),
+                                    (second.toStr(), ('127.0.0.2', 21345))]])
+        self.proto.writeMessage(first, ('127.0.0.1', 21345))
+        self.assertEqual(len(written), 1)
+        self.assertEqual(self.proto.transport.written,
+                         [(first.toStr(), ('127.0.0.1', 21345))])
+
+
+    def test_datagramsReceivedOneReply(self):
+        """
+        L{DNSDatagramProtocol.datagramsReceived} sends a single message written
+        in response to the datagrams with the transport's C{write} method.
+        """
+        self.proto.transport.writeDatagrams = lambda datagrams: 1 // 0
+        def messageReceived(msg, proto, addr=None):
+            proto.writeMessage(msg, addr)
+        self.controller.messageReceived = messageReceived
+        message = dns.Message(id=1)
+        self.proto.datagramsReceived([(message.toStr(), ('127.0.0.1', 53))])
+        self.assertEqual(self.proto.transport.written,
+                         [(message.toStr(), ('127.0.0.1', 53))])
+
+
+    def test_datagramsReceivedBadReply(self):
+        """
+        If its transport cannot send messages together,
+        L{DNSDatagramProtocol.datagramsReceived} sends each message written
+        in response to the datagrams with the transport's C{write} method,
+        and logs the error for one which cannot be sent without stopping
+        the others.
+        """
+        transportWrite = self.proto.transport.write
+        def write(data, addr):
+            if addr[0] == '127.0.0.2':
+                raise InvalidAddressError(addr[0], "bad address")
+            transportWrite(data, addr)
+        self.proto.transport.write = write
+        def messageReceived(msg, proto, addr=None):
+            proto.writeMessage(msg, addr)
+        self.controller.messageReceived = messageReceived
+        messages = [dns.Message(id=i) for i in range(3)]
+        self.proto.datagramsReceived([
+                (m.toStr(), ('127.0.0.%d' % (m.id + 1,), 53))
+                for m in messages])
+        self.assertEqual(self.proto.transport.written,
+                         [(messages[0].toStr(), ('127.0.0.1', 53)),
+                          (messages[2].toStr(), ('127.0.0.3', 53))])
+        self.assertEqual(len(self.flushLoggedErrors(InvalidAddressError)), 1)
+
 
 class TestTCPController(TestController):
     """
@@ -1326,6 +1423,123 @@ class DNSProtocolTests(unittest.TestCase):
         self.assertEqual(self.controller.messages[-1][0].toStr(),
                          message.toStr())
 
+    def _written(self):
+        """
+        Decode the length-prefixed messages written to the transport.
+
+        @return: A L{list} of L{dns.Message}.
+        """
+        data = self.proto.transport.value()
+        messages = []
+        while data:
+            length, = struct.unpack('!H', data[:2])
+            m = dns.Message()
+            m.fromStr(data[2:2 + length])
+            messages.append(m)
+            data = data[2 + length:]
+        return messages
+
+
+    def _response(self, id, address):
+        """
+        Make the length-prefixed encoding of a response giving an address.
+        """
+        m = dns.Message(id=id, answer=1)
+        m.answers = [dns.RRHeader(payload=dns.Record_A(address=address))]
+        s = m.toStr()
+        return struct.pack('!H', len(s)) + s
+
+
+    def test_pipelinedQueries(self):
+        """
+        Queries sent one after another over the same connection are answered
+        by their responses in whatever order these arrive, however the bytes
+        of the responses are split up.
+        """
+        first = self.proto.query([dns.Query(b'foo')])
+        second = self.proto.query([dns.Query(b'bar')])
+        firstID, secondID = [m.id for m in self._written()]
+        data = (self._response(secondID, '5.6.7.8') +
+                self._response(firstID, '1.2.3.4'))
+        for i in range(len(data)):
+            self.proto.dataReceived(data[i:i + 1])
+        self.assertEqual(
+            self.successResultOf(first).answers[0].payload.dottedQuad(),
+            '1.2.3.4')
+        self.assertEqual(
+            self.successResultOf(second).answers[0].payload.dottedQuad(),
+            '5.6.7.8')
+        self.assertEqual(self.proto.liveMessages, {})
+        self.assertEqual(self.proto.buffer, b'')
+
+
+    def test_connectionLostFailsQueries(self):
+        """
+        Queries still waiting for responses when the connection is lost fail
+        with the reason it was lost, without waiting for their timeouts.
+        """
+        d = self.proto.query([dns.Query(b'foo')])
+        self.proto.connectionLost(Failure(ConnectionDone()))
+        self.failureResultOf(d, ConnectionDone)
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+    def _idleProtocol(self):
+        """
+        Make a connected L{dns.DNSProtocol} with an idle timeout of ten
+        seconds.
+        """
+        self.proto = dns.DNSProtocol(self.controller, reactor=self.clock)
+        self.proto.idleTimeout = 10
+        self.proto.makeConnection(proto_helpers.StringTransport())
+        return self.proto
+
+
+    def test_idleTimeout(self):
+        """
+        The connection is closed once nothing has been sent or received over
+        it for L{dns.DNSProtocol.idleTimeout} seconds.
+        """
+        proto = self._idleProtocol()
+        self.clock.advance(9)
+        proto.dataReceived(b'\x00')
+        self.clock.advance(9)
+        self.assertFalse(proto.transport.disconnecting)
+        self.clock.advance(1)
+        self.assertTrue(proto.transport.disconnecting)
+
+
+    def test_idleTimeoutQueryOutstanding(self):
+        """
+        The connection is not closed while a query sent over it is waiting
+        for its response.
+        """
+        proto = self._idleProtocol()
+        d = proto.query([dns.Query(b'foo')], timeout=60)
+        self.clock.advance(30)
+        self.assertFalse(proto.transport.disconnecting)
+        proto.dataReceived(self._response(self._written()[0].id, '1.2.3.4'))
+        self.successResultOf(d)
+        self.clock.advance(10)
+        self.assertTrue(proto.transport.disconnecting)
+
+
+    def test_idleTimeoutQueryUnanswered(self):
+        """
+        The connection is not closed while a query received over it has not
+        been answered.
+        """
+        proto = self._idleProtocol()
+        query = dns.Message(id=1234)
+        query.addQuery(b'foo')
+        s = query.toStr()
+        proto.dataReceived(struct.pack('!H', len(s)) + s)
+        self.clock.advance(30)
+        self.assertFalse(proto.transport.disconnecting)
+        proto.writeMessage(dns.Message(id=1234, answer=1))
+        self.clock.advance(10)
+        self.assertTrue(proto.transport.disconnecting)
+
 
 
 class ReprTests(unittest.TestCase):
@@ -4416,6 +4630,203 @@ class MessageStandardEncodingTests(StandardEncodingTestsMixin,
 
 
 
+class MessageCodecTests(unittest.SynchronousTestCase):
+    """
+    Tests for the single-pass codec used by L{dns.Message.toStr} and
+    L{dns.Message.fromStr}, which must agree with L{dns.Message.encode} and
+    L{dns.Message.decode}.
+    """
+    def everyRecordMessage(self):
+        """
+        Make a response with a record of each of the types in
+        L{RECORD_TYPES}, whose names share suffixes.
+        """
+        payloads = [
+            dns.Record_NS(b'ns1.example.com'),
+            dns.Record_MD(b'md.example.com'),
+            dns.Record_MF(b'mf.example.com'),
+            dns.Record_CNAME(b'www.example.com'),
+            dns.Record_MB(b'mb.example.com'),
+            dns.Record_MG(b'mg.example.com'),
+            dns.Record_MR(b'mr.example.com'),
+            dns.Record_PTR(b'host.example.org'),
+            dns.Record_DNAME(b'example.org'),
+            dns.Record_A('192.0.2.1'),
+            dns.Record_SOA(b'ns1.example.com', b'hostmaster.example.com',
+                           1, 2, 3, 4, 5),
+            dns.Record_NULL(b'null payload'),
+            dns.Record_WKS('192.0.2.2', 6, b'\x00\x01'),
+            dns.Record_SRV(1, 2, 53, b'ns1.example.com'),
+            dns.Record_AFSDB(1, b'afs.example.com'),
+            dns.Record_RP(b'admin.example.com', b'info.example.com'),
+            dns.Record_HINFO(b'cpu', b'os'),
+            dns.Record_MINFO(b'r.example.com', b'e.example.com'),
+            dns.Record_MX(10, b'mail.example.com'),
+            dns.Record_TXT(b'first', b'second'),
+            dns.Record_AAAA('2001:db8::1'),
+            dns.Record_A6(64, '::1', b'prefix.example.com'),
+            dns.Record_NAPTR(100, 10, b'u', b'sip+E2U', b'!^.*$!sip:i@e!',
+                             b'replacement.example.com'),
+            dns.UnknownRecord(b'unknown payload'),
+            ]
+        m = dns.Message(id=10, answer=1, auth=1, maxSize=0)
+        m.addQuery(b'www.example.com', dns.A)
+        for payload in payloads:
+            m.answers.append(dns.RRHeader(
+                    b'www.example.com', getattr(payload, 'TYPE', 1234), ttl=60,
+                    payload=payload, auth=True))
+        return m
+
+
+    def test_encode(self):
+        """
+        L{dns.Message.toStr} gives the same bytes as L{dns.Message.encode}
+        for a message including every record type.
+        """
+        m = self.everyRecordMessage()
+        strio = BytesIO()
+        m.encode(strio)
+        self.assertEqual(m.toStr(), strio.getvalue())
+
+
+    def test_decode(self):
+        """
+        L{dns.Message.fromStr} decodes the same message as
+        L{dns.Message.decode} from a message including every record type.
+        """
+        encoded = self.everyRecordMessage().toStr()
+        expected = dns.Message()
+        expected.decode(BytesIO(encoded))
+        m = dns.Message()
+        m.fromStr(encoded)
+        self.assertEqual(m, expected)
+        self.assertEqual([r.rdlength for r in m.answers],
+                         [r.rdlength for r in expected.answers])
+
+
+    def test_compression(self):
+        """
+        Each name is written with a compression pointer to the longest
+        suffix of it which was written earlier.
+        """
+        m = dns.Message()
+        m.addQuery(b'example.com')
+        m.addQuery(b'www.example.com')
+        m.addQuery(b'www.example.com')
+        m.addQuery(b'ftp.www.example.com')
+        m.addQuery(b'com')
+        m.addQuery(b'example.org')
+        self.assertEqual(
+            m.toStr()[dns.Message.headerSize:],
+            b'\x07example\x03com\x00\x00\xff\x00\x01'
+            b'\x03www\xc0\x0c\x00\xff\x00\x01'
+            b'\xc0\x1d\x00\xff\x00\x01'
+            b'\x03ftp\xc0\x1d\x00\xff\x00\x01'
+            b'\xc0\x14\x00\xff\x00\x01'
+            b'\x07example\x03org\x00\x00\xff\x00\x01')
+
+
+    def test_compressionLimit(self):
+        """
+        Names written beyond the reach of a compression pointer are not
+        referred to by later names.
+        """
+        m = dns.Message(maxSize=0)
+        for i in range(400):
+            name = b'host' + str(i).encode('ascii') + b'.example.com'
+            m.answers.append(dns.RRHeader(
+                    name, dns.TXT, ttl=60,
+                    payload=dns.Record_TXT(b'x' * 40, ttl=60)))
+            m.answers.append(dns.RRHeader(
+                    name, ttl=60, payload=dns.Record_A('192.0.2.1', 60)))
+        encoded = m.toStr()
+        self.assertTrue(len(encoded) > 0x3fff)
+        decoded = dns.Message()
+        decoded.fromStr(encoded)
+        self.assertEqual(decoded.answers, m.answers)
+
+
+    def test_encoderReused(self):
+        """
+        A L{dns._MessageEncoder} may encode several messages, each as if it
+        were the only one.
+        """
+        first = self.everyRecordMessage()
+        second = dns.Message()
+        second.addQuery(b'example.org')
+        encoder = dns._MessageEncoder()
+        self.assertEqual(encoder.encode(first), first.toStr())
+        self.assertEqual(encoder.encode(second), second.toStr())
+
+
+    def test_lazyPayload(self):
+        """
+        The payloads of address records are decoded when they are first
+        used.
+        """
+        m = dns.Message()
+        m.fromStr(MessageComplete.bytes())
+        header = m.additional[0]
+        self.assertIsInstance(header, dns._LazyRRHeader)
+        self.assertEqual(header._rdata, b'\x05\x06\x07\x08')
+        self.assertEqual(header.payload,
+                         dns.Record_A('5.6.7.8', ttl=0xffffffff))
+        self.assertIdentical(header._rdata, None)
+        self.assertIdentical(header.payload, header.payload)
+
+
+    def test_lazyPayloadReplaced(self):
+        """
+        The payload of a record whose payload is decoded lazily may be
+        replaced before it is decoded.
+        """
+        m = dns.Message()
+        m.fromStr(MessageComplete.bytes())
+        payload = dns.Record_A('192.0.2.1')
+        m.additional[0].payload = payload
+        self.assertIdentical(m.additional[0].payload, payload)
+        self.assertIn(b'\xc0\x00\x02\x01', m.toStr())
+
+
+    def test_lazyPayloadLength(self):
+        """
+        An address record whose RDATA is not the length of an address is
+        decoded along with the message, as L{dns.Message.decode} does.
+        """
+        encoded = (
+            b'\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00'
+            b'\x00\x00\x01\x00\x01\x00\x00\x00\x00\x00\x05'
+            b'\x01\x02\x03\x04\x05')
+        m = dns.Message()
+        m.fromStr(encoded)
+        self.assertNotIsInstance(m.answers[0], dns._LazyRRHeader)
+        self.assertEqual(m.answers[0].payload.address, b'\x01\x02\x03\x04')
+
+
+    def test_compressionLoop(self):
+        """
+        L{dns.Message.fromStr} raises L{ValueError} if a name includes a
+        compression pointer which forms a loop.
+        """
+        m = dns.Message()
+        self.assertRaises(
+            ValueError, m.fromStr,
+            b'\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00'
+            b'\x01a\xc0\x0c\x00\x01\x00\x01')
+
+
+    def test_truncatedRecord(self):
+        """
+        L{dns.Message.fromStr} decodes the records of a message which ends
+        part way through a record up to the last complete one.
+        """
+        m = dns.Message()
+        m.fromStr(MessageComplete.bytes()[:-1])
+        self.assertEqual(
+            (len(m.answers), len(m.authority), len(m.additional)),
+            (1, 1, 0))
+
+
 class EDNSMessageEDNSEncodingTests(unittest.SynchronousTestCase):
     """
     Tests for the encoding and decoding of various EDNS messages.
@@ -10,6 +10,7 @@ from __future__ import division, absolute_import
 from twisted.trial.unittest import TestCase
 from twisted.python.filepath import FilePath
 from twisted.internet.defer import gatherResults
+from twisted.internet.task import Clock
 
 from twisted.names.dns import (
     A, AAAA, IN, DomainError, RRHeader, Query, Record_A, Record_AAAA)
@@ -255,3 +256,87 @@ class HostsTests(TestCase, GoodTempPathMixin):
         """
         return self.assertFailure(self.resolver.lookupAllRecords(b'foueoa'),
                                   DomainError)
+
+
+
+class HostsChangeTests(TestCase, GoodTempPathMixin):
+    """
+    Tests for how L{twisted.names.hosts.Resolver} reads its hosts file into
+    memory, and reads it again when it changes.
+    """
+    def setUp(self):
+        self.hosts = self.path()
+        self.hosts.setContent(b"1.1.1.1 example\n")
+        self.clock = Clock()
+        self.resolver = Resolver(self.hosts.path, 60, reactor=self.clock)
+
+
+    def addresses(self, name):
+        """
+        Look up the IPv4 addresses of a name.
+
+        @return: A L{list} of the addresses, as C{str}.
+        """
+        answers, authority, additional = self.successResultOf(
+            self.resolver.lookupAddress(name))
+        return [answer.payload.dottedQuad() for answer in answers]
+
+
+    def test_checkInterval(self):
+        """
+        Changes to the hosts file are only noticed once C{_checkInterval}
+        seconds have passed since it was last checked.
+        """
+        self.assertEqual(self.addresses(b"example"), ["1.1.1.1"])
+        self.hosts.setContent(b"1.1.1.2 example\n1.1.1.3 example\n")
+        self.clock.advance(self.resolver._checkInterval - 1)
+        self.assertEqual(self.addresses(b"example"), ["1.1.1.1"])
+        self.clock.advance(1)
+        self.assertEqual(self.addresses(b"example"), ["1.1.1.2", "1.1.1.3"])
+
+
+    def test_unchanged(self):
+        """
+        The hosts file is not read again if it has not changed.
+        """
+        self.addresses(b"example")
+        reads = []
+        self.patch(FilePath, "getContent",
+                   lambda path: reads.append(path) or b"")
+        self.clock.advance(self.resolver._checkInterval)
+        self.assertEqual(self.addresses(b"example"), ["1.1.1.1"])
+        self.assertEqual(reads, [])
+
+
+    def test_removed(self):
+        """
+        Once the hosts file has been removed, names are no longer found.
+        """
+        self.addresses(b"example")
+        self.hosts.remove()
+        self.clock.advance(self.resolver._checkInterval)
+        self.failureResultOf(self.resolver.lookupAddress(b"example"),
+                             DomainError)
+
+
+    def test_unexpectedReadError(self):
+        """
+        Errors other than those from reading the hosts file are not
+        mistaken for a missing file.
+        """
+        def getContent(path):
+            1 // 0
+        self.patch(FilePath, "getContent", getContent)
+        self.assertRaises(ZeroDivisionError,
+                          self.resolver.lookupAddress, b"example")
+
+
+    def test_invalidAddress(self):
+        """
+        Lines whose address is neither an IPv4 nor an IPv6 address are
+        ignored.
+        """
+        self.hosts.setContent(b"example.com example\n1.1.1.1 example\n")
+        self.assertEqual(self.addresses(b"example"), ["1.1.1.1"])
+        self.failureResultOf(self.resolver.lookupIPV6Address(b"example"),
+                             DomainError)
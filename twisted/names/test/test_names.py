@@ -607,6 +607,56 @@ class AuthorityTests(unittest.TestCase):
         self._referralTest('lookupAllRecords')
 
 
+    def test_answerShared(self):
+        """
+        Repeated lookups of the same name and type give new lists of the same
+        records.
+        """
+        first = self.successResultOf(
+            test_domain_com.lookupMailExchange('test-domain.com'))
+        second = self.successResultOf(
+            test_domain_com.lookupMailExchange('test-domain.com'))
+        self.assertEqual(first, second)
+        for firstSection, secondSection in zip(first, second):
+            self.assertIsNot(firstSection, secondSection)
+            for firstRecord, secondRecord in zip(firstSection, secondSection):
+                self.assertIs(firstRecord, secondRecord)
+
+
+    def test_answerReloaded(self):
+        """
+        When the records of the zone of a L{FileAuthority} are replaced, lookups
+        give the new records.
+        """
+        name = str(soa_record.mname)
+        authority = NoFileAuthority(
+            soa=(name, soa_record),
+            records={name: [soa_record, dns.Record_A('192.0.2.1')]})
+        answer, _, _ = self.successResultOf(authority.lookupAddress(name))
+        self.assertEqual(justPayload((answer,)), [dns.Record_A('192.0.2.1')])
+
+        authority.records = {name: [soa_record, dns.Record_A('192.0.2.2')]}
+        answer, _, _ = self.successResultOf(authority.lookupAddress(name))
+        self.assertEqual(justPayload((answer,)), [dns.Record_A('192.0.2.2')])
+
+
+    def test_answerCacheSize(self):
+        """
+        When more answers have been found than L{FileAuthority} keeps, those
+        it kept are discarded.
+        """
+        name = str(soa_record.mname)
+        authority = NoFileAuthority(
+            soa=(name, soa_record),
+            records={name: [soa_record, dns.Record_A('192.0.2.1')]})
+        authority._cacheSize = 2
+        authority.lookupAddress(name)
+        authority.lookupAuthority(name)
+        self.assertEqual(len(authority._cache), 2)
+        authority.lookupMailExchange(name)
+        self.assertEqual(authority._cache.keys(), [(name, dns.MX)])
+
+
 
 class AdditionalProcessingTests(unittest.TestCase):
     """
@@ -1020,3 +1070,26 @@ class SecondaryAuthorityTests(unittest.TestCase):
         result = self.successResultOf(secondary.lookupAddress('example.com'))
         self.assertEqual((
                 [RRHeader(b'example.com', payload=a, auth=True)], [], []), result)
+
+
+    def test_lookupAfterTransfer(self):
+        """
+        Once a later zone transfer has completed, lookups give the records it
+        transferred rather than those of the earlier one.
+        """
+        secondary = SecondaryAuthority('192.168.1.1', 'example.com')
+        soa = RRHeader(b'example.com', type=SOA, payload=Record_SOA(
+                mname=b'ns1.example.com', rname=b'admin.example.com',
+                ttl=12000))
+
+        first = Record_A(b'192.0.2.1', ttl=60)
+        secondary._cbZone(([soa, RRHeader(b'example.com', payload=first), soa],
+                           [], []))
+        result = self.successResultOf(secondary.lookupAddress('example.com'))
+        self.assertEqual(justPayload(result), [first])
+
+        second = Record_A(b'192.0.2.2', ttl=60)
+        secondary._cbZone(([soa, RRHeader(b'example.com', payload=second), soa],
+                           [], []))
+        result = self.successResultOf(secondary.lookupAddress('example.com'))
+        self.assertEqual(justPayload(result), [second])
@@ -329,6 +329,23 @@ class DNSServerFactoryTests(unittest.TestCase):
             dummyResolver)
 
 
+    def test_cacheUpstream(self):
+        """
+        L{server.DNSServerFactory.__init__} sets the C{upstream} attribute of
+        caches which have one set to L{None} to a L{resolve.ResolverChain} of
+        C{clients}.
+        """
+        cache = RaisingCache()
+        cache.upstream = None
+        configured = RaisingCache()
+        upstream = configured.upstream = object()
+        clients = [object(), object()]
+        server.DNSServerFactory(caches=[cache, configured], clients=clients)
+        self.assertIsInstance(cache.upstream, resolve.ResolverChain)
+        self.assertEqual(cache.upstream.resolvers, clients)
+        self.assertIs(configured.upstream, upstream)
+
+
     def test_canRecurseDefault(self):
         """
         L{server.DNSServerFactory.canRecurse} is a flag indicating that this
@@ -404,6 +421,18 @@ class DNSServerFactoryTests(unittest.TestCase):
         )
 
 
+    def test_buildProtocolIdleTimeout(self):
+        """
+        L{server.DNSServerFactory.buildProtocol} gives the protocol it builds
+        the factory's C{idleTimeout}, so that connections clients keep open
+        to pipeline their queries over are closed once they are idle.
+        """
+        f = server.DNSServerFactory()
+        self.assertEqual(f.buildProtocol(addr=None).idleTimeout, 30)
+        f.idleTimeout = None
+        self.assertIdentical(f.buildProtocol(addr=None).idleTimeout, None)
+
+
     def test_verboseLogQuiet(self):
         """
         L{server.DNSServerFactory._verboseLog} does not log messages unless
@@ -923,6 +952,29 @@ class DNSServerFactoryTests(unittest.TestCase):
         self.assertIs(additional, expectedAdditional)
 
 
+    def test_gotResolverErrorCachesNameError(self):
+        """
+        L{server.DNSServerFactory.gotResolverError} passes the authority
+        records of a L{error.DNSNameError} answer to the
+        C{cacheNegativeResult} method of the cache.
+        """
+        cached = []
+        cache = RaisingCache()
+        cache.cacheNegativeResult = (
+            lambda query, authority: cached.append((query, authority)))
+        f = NoResponseDNSServerFactory(caches=[cache])
+
+        request = dns.Message()
+        request.addQuery(b'example.com')
+        answer = dns.Message(rCode=dns.ENAME)
+        answer.authority = [dns.RRHeader(b'com', dns.SOA)]
+        f.gotResolverError(
+            failure.Failure(error.DNSNameError(answer)),
+            protocol=NoopProtocol(), message=request, address=None)
+
+        self.assertEqual(cached, [(request.queries[0], answer.authority)])
+
+
     def test_gotResolverErrorCallsResponseFromMessage(self):
         """
         L{server.DNSServerFactory.gotResolverError} calls
@@ -1063,6 +1115,97 @@ class DNSServerFactoryTests(unittest.TestCase):
         self.assertEqual([dns.Message(rCode=0, answer=True)], responses)
 
 
+    def _repeatedResponses(self, first, second, records, otherRecords=None):
+        """
+        Make a L{server.DNSServerFactory} respond to two queries with the same
+        records, or with C{otherRecords} the second time, and return the
+        responses it sends.
+
+        @param first: The first query message.
+        @param second: The second query message.
+        @param records: The answer, authority and additional records.
+        @param otherRecords: The records of the second response, if not
+            C{records}.
+
+        @return: A L{list} of the responses.
+        """
+        factory = server.DNSServerFactory()
+        responses = []
+        factory.sendReply = (
+            lambda protocol, response, address: responses.append(response)
+        )
+        for message, sections in [(first, records),
+                                  (second, otherRecords or records)]:
+            factory.gotResolverResponse(
+                [list(section) for section in sections],
+                protocol=None, message=message, address=None)
+        return responses
+
+
+    def test_gotResolverResponseReusesEncoding(self):
+        """
+        When L{server.DNSServerFactory.gotResolverResponse} is given the same
+        records for a query as for an earlier one, it sends a response whose
+        encoding is that of the earlier response with the ID of the query.
+        """
+        records = ([dns.RRHeader(b'example.com', payload=dns.Record_A(
+                        '192.0.2.1'), auth=True)], [], [])
+        first = dns.Message(id=1)
+        first.addQuery(b'example.com')
+        second = dns.Message(id=2)
+        second.addQuery(b'example.com')
+
+        responses = self._repeatedResponses(first, second, records)
+
+        self.assertIsInstance(responses[1], server._EncodedResponse)
+        self.assertEqual(responses[1].id, 2)
+        self.assertEqual(responses[1].answers, records[0])
+        expected = dns.Message(id=2, answer=True, auth=True)
+        expected.queries = second.queries
+        expected.answers = records[0]
+        self.assertEqual(responses[1].toStr(), expected.toStr())
+
+
+    def test_gotResolverResponseDifferentRecords(self):
+        """
+        L{server.DNSServerFactory.gotResolverResponse} does not reuse the
+        encoding of an earlier response to the same query with other records.
+        """
+        first = dns.Message(id=1)
+        first.addQuery(b'example.com')
+        second = dns.Message(id=2)
+        second.addQuery(b'example.com')
+
+        responses = self._repeatedResponses(
+            first, second,
+            ([dns.RRHeader(b'example.com', payload=dns.Record_A(
+                            '192.0.2.1'))], [], []),
+            ([dns.RRHeader(b'example.com', payload=dns.Record_A(
+                            '192.0.2.2'))], [], []))
+
+        self.assertNotIsInstance(responses[1], server._EncodedResponse)
+
+
+    def test_gotResolverResponseDifferentQuestion(self):
+        """
+        L{server.DNSServerFactory.gotResolverResponse} does not reuse the
+        encoding of an earlier response to a query for a differently spelled
+        name, or with a different maximum response size.
+        """
+        records = ([dns.RRHeader(b'example.com', payload=dns.Record_A(
+                        '192.0.2.1'))], [], [])
+        first = dns.Message(id=1)
+        first.addQuery(b'example.com')
+        otherName = dns.Message(id=2)
+        otherName.addQuery(b'EXAMPLE.com')
+        otherSize = dns.Message(id=2, maxSize=1024)
+        otherSize.addQuery(b'example.com')
+
+        for second in [otherName, otherSize]:
+            responses = self._repeatedResponses(first, second, records)
+            self.assertNotIsInstance(responses[1], server._EncodedResponse)
+
+
     def test_sendReplyWithAddress(self):
         """
         If L{server.DNSServerFactory.sendReply} is supplied with a protocol
@@ -97,3 +97,28 @@ class OptionsTests(TestCase):
                     recurser._parseCall.cancel()
 
         self.assertIsInstance(cl[-1], ResolverChain)
+
+
+    def test_prefetchAndServeStale(self):
+        """
+        The I{--prefetch} and I{--serve-stale} options enable caching, and
+        configure the cache to refresh results and serve expired results.
+        """
+        options = Options()
+        options.parseOptions(['--prefetch', '0.1', '--serve-stale', '3600'])
+        self.assertTrue(options['cache'])
+        ca, cl = _buildResolvers(options)
+        self.assertEqual(ca[0].prefetch, 0.1)
+        self.assertEqual(ca[0].staleTTL, 3600)
+
+
+    def test_malformedPrefetchAndServeStale(self):
+        """
+        L{Options.parseOptions} raises L{UsageError} if the value of the
+        I{--prefetch} or I{--serve-stale} option is not a number.
+        """
+        options = Options()
+        self.assertRaises(
+            UsageError, options.parseOptions, ['--prefetch', 'soon'])
+        self.assertRaises(
+            UsageError, options.parseOptions, ['--serve-stale', 'long'])
@@ -190,7 +190,8 @@ from twisted.python._tzhelper import (
 
 from twisted.python import log, filepath
 
-from twisted.internet.interfaces import IFileDescriptorReceiver
+from twisted.internet.interfaces import (
+    IFileDescriptorReceiver, IConsumer, IPushProducer)
 from twisted.internet.main import CONNECTION_LOST
 from twisted.internet.error import PeerVerifyError, ConnectionLost
 from twisted.internet.error import ConnectionClosed
@@ -255,6 +256,7 @@ __all__ = [
     'RemoteAmpError',
     'SimpleStringLocator',
     'StartTLS',
+    'Stream',
     'String',
     'TooLong',
     'UNHANDLED_ERROR_CODE',
@@ -281,6 +283,15 @@ UNHANDLED_ERROR_CODE = 'UNHANDLED'
 MAX_KEY_LENGTH = 0xff
 MAX_VALUE_LENGTH = 0xffff
 
+# Keys used by the frames which carry the contents of a L{Stream} argument.
+# These never appear in the same box as any of the keys above.
+_STREAM = '_stream'
+_STREAM_DATA = '_stream_data'
+_STREAM_CREDIT = '_stream_credit'
+_STREAM_END = '_stream_end'
+_STREAM_ERROR = '_stream_error'
+_STREAM_STOP = '_stream_stop'
+
 
 class IArgumentType(Interface):
     """
@@ -733,10 +744,14 @@ class BoxDispatcher:
     _failAllReason = None
     _outstandingRequests = None
     _counter = 0L
+    _streamCounter = 0L
+    _argumentStreams = None
     boxSender = None
 
     def __init__(self, locator):
         self._outstandingRequests = {}
+        self._outgoingStreams = {}
+        self._incomingStreams = {}
         self.locator = locator
 
 
@@ -753,9 +768,15 @@ class BoxDispatcher:
     def stopReceivingBoxes(self, reason):
         """
         No further boxes will be received here.  Terminate all currently
-        oustanding command deferreds with the given reason.
+        oustanding command deferreds and streams with the given reason.
         """
         self.failAllOutgoing(reason)
+        streams = (self._incomingStreams.values() +
+                   self._outgoingStreams.values())
+        self._incomingStreams = {}
+        self._outgoingStreams = {}
+        for stream in streams:
+            stream._connectionLost(reason)
 
 
     def failAllOutgoing(self, reason):
@@ -951,13 +972,37 @@ class BoxDispatcher:
             errorBox[ERROR_DESCRIPTION] = desc
             errorBox[ERROR_CODE] = code
             return errorBox
-        deferred = self.dispatchCommand(box)
+        self._argumentStreams = streams = []
+        try:
+            deferred = self.dispatchCommand(box)
+        finally:
+            self._argumentStreams = None
         if ASK in box:
             deferred.addCallbacks(formatAnswer, formatError)
             deferred.addCallback(self._safeEmit)
+        if streams:
+            deferred.addBoth(self._refuseStreams, streams)
         deferred.addErrback(self.unhandledError)
 
 
+    def _refuseStreams(self, result, streams):
+        """
+        Once the result of a command has been sent, tell our peer to stop
+        sending the streams among its arguments which the responder did not
+        take delivery of, and forget them.
+
+        @param result: the result of the command, passed through.
+
+        @param streams: the streams received as arguments of the command.
+        @type streams: C{list} of L{_IncomingStream}
+
+        @return: C{result}
+        """
+        for stream in streams:
+            stream._refuse()
+        return result
+
+
     def ampBoxReceived(self, box):
         """
         An AmpBox was received, representing a command, or an answer to a
@@ -970,7 +1015,9 @@ class BoxDispatcher:
         '_answer', '_command' / '_ask', or '_error' key; i.e. one which does not
         fit into the command / response protocol defined by AMP.
         """
-        if ANSWER in box:
+        if _STREAM in box:
+            self._streamFrameReceived(box)
+        elif ANSWER in box:
             self._answerReceived(box)
         elif ERROR in box:
             self._errorReceived(box)
@@ -980,6 +1027,105 @@ class BoxDispatcher:
             raise NoEmptyBoxes(box)
 
 
+    def _sendStream(self, source):
+        """
+        Allocate a stream identifier for the contents of a L{Stream} argument
+        being sent to our peer.
+
+        Nothing is sent until the peer grants credit for the stream, which it
+        does once it has parsed the box carrying the identifier and a consumer
+        has been attached to the other end.
+
+        @param source: an object with a C{startProducing} method, as described
+            by L{Stream}.
+
+        @return: the identifier to put into the box.
+        @rtype: C{str}
+        """
+        self._streamCounter += 1
+        identifier = '%x' % (self._streamCounter,)
+        if self._failAllReason is None:
+            self._outgoingStreams[identifier] = _OutgoingStream(
+                self, identifier, source)
+        return identifier
+
+
+    def _abandonStreams(self, reason, identifiers):
+        """
+        Forget and stop the streams sent as the arguments of a command which
+        failed, and tell our peer they did not complete, since it will not
+        receive them.
+
+        @param reason: the L{Failure} of the command.
+
+        @param identifiers: the identifiers of the streams.
+        @type identifiers: C{list} of C{str}
+
+        @return: C{reason}
+        """
+        for identifier in identifiers:
+            stream = self._outgoingStreams.pop(identifier, None)
+            if stream is not None:
+                stream._abandon()
+        return reason
+
+
+    def _receiveStream(self, identifier, window):
+        """
+        Create the local end of a stream whose identifier was received as the
+        value of a L{Stream} argument.
+
+        @param identifier: the identifier chosen by our peer.
+        @type identifier: C{str}
+
+        @param window: the number of bytes the peer may send before waiting
+            for the consumer to catch up.
+        @type window: C{int}
+
+        @rtype: L{_IncomingStream}
+        """
+        stream = _IncomingStream(self, identifier, window)
+        if self._failAllReason is None:
+            self._incomingStreams[identifier] = stream
+        else:
+            stream._connectionLost(self._failAllReason)
+        if self._argumentStreams is not None:
+            self._argumentStreams.append(stream)
+        return stream
+
+
+    def _streamFrameReceived(self, box):
+        """
+        A frame belonging to a L{Stream} argument was received.  Data and
+        end-of-stream frames are addressed to streams the peer is sending to
+        us, credit and stop frames to streams we are sending to the peer.
+
+        Frames for streams which are not (or no longer) known are dropped:
+        they may legitimately arrive after one side has stopped a stream.
+
+        @param box: an L{AmpBox} with a value for its C{_stream} key.
+        """
+        identifier = box[_STREAM]
+        if _STREAM_DATA in box:
+            stream = self._incomingStreams.get(identifier)
+            if stream is not None:
+                stream._dataReceived(box[_STREAM_DATA])
+        elif _STREAM_END in box:
+            stream = self._incomingStreams.pop(identifier, None)
+            if stream is not None:
+                stream._endReceived(box.get(_STREAM_ERROR))
+        elif _STREAM_CREDIT in box:
+            stream = self._outgoingStreams.get(identifier)
+            if stream is not None:
+                stream._creditReceived(int(box[_STREAM_CREDIT]))
+        elif _STREAM_STOP in box:
+            stream = self._outgoingStreams.pop(identifier, None)
+            if stream is not None:
+                stream._stopReceived()
+        else:
+            raise NoEmptyBoxes(box)
+
+
     def _safeEmit(self, aBox):
         """
         Emit a box, ignoring L{ProtocolSwitched} and L{ConnectionLost} errors
@@ -1606,6 +1752,489 @@ class Descriptor(Integer):
 
 
 
+class _OutgoingStream(object):
+    """
+    The sending end of a L{Stream} argument.
+
+    Data written to this consumer is split into frames of at most
+    L{MAX_VALUE_LENGTH} bytes and sent as boxes on the AMP connection, so it
+    is interleaved with any other commands and responses.  The receiver
+    grants credit as its consumer accepts data; whenever the credit is used
+    up the producer is paused until more arrives.
+
+    @ivar identifier: the identifier of this stream on the connection.
+
+    @ivar producer: the producer registered with L{registerProducer}, or
+        C{None}.  When no producer is registered, C{source} is paused and
+        resumed instead.
+
+    @ivar _credit: the number of bytes which may still be sent before the
+        receiver grants more credit.
+    """
+    implements(IConsumer)
+
+    producer = None
+    streamingProducer = True
+
+    _credit = 0
+    _started = False
+    _paused = False
+    _done = False
+    _pulling = False
+    _pullAgain = False
+
+    def __init__(self, dispatcher, identifier, source):
+        self._dispatcher = dispatcher
+        self.identifier = identifier
+        self._source = source
+
+
+    def _sendFrame(self, frame):
+        """
+        Send a frame for this stream to the receiver.
+
+        @param frame: the keys and values of the frame, other than the stream
+            identifier.
+        @type frame: C{dict}
+        """
+        box = AmpBox(frame)
+        box[_STREAM] = self.identifier
+        self._dispatcher._safeEmit(box)
+
+
+    def _creditReceived(self, credit):
+        """
+        The receiver is ready for C{credit} more bytes.  The first grant
+        starts the source.
+        """
+        self._credit += credit
+        if not self._started:
+            self._started = True
+            d = maybeDeferred(self._source.startProducing, self)
+            d.addCallbacks(self._sourceFinished, self._sourceFailed)
+        elif self._paused and self._credit > 0:
+            self._paused = False
+            if self.streamingProducer:
+                self._pausable().resumeProducing()
+        self._pull()
+
+
+    def _stopReceived(self):
+        """
+        The receiver no longer wants any data.
+        """
+        self._stopSource()
+
+
+    def _connectionLost(self, reason):
+        """
+        The AMP connection was lost before the stream finished.
+        """
+        self._stopSource()
+
+
+    def _abandon(self):
+        """
+        The command this stream is an argument of failed.  Stop the source
+        and tell the receiver that the stream did not complete.
+        """
+        if not self._done:
+            self._stopSource()
+            self._sendFrame({_STREAM_END: '', _STREAM_ERROR: "Command failed"})
+
+
+    def _stopSource(self):
+        if not self._done:
+            self._done = True
+            if self._started:
+                self._pausable().stopProducing()
+
+
+    def _pausable(self):
+        """
+        Return the object which should be paused, resumed and stopped.
+        """
+        if self.producer is not None:
+            return self.producer
+        return self._source
+
+
+    def _pull(self):
+        """
+        Ask a non-streaming producer for more data for as long as there is
+        credit left, without recursing through L{write}.
+        """
+        if self.producer is None or self.streamingProducer:
+            return
+        if self._pulling:
+            self._pullAgain = True
+            return
+        self._pulling = True
+        try:
+            self._pullAgain = True
+            while (self._pullAgain and self._credit > 0 and not self._done
+                   and self.producer is not None):
+                self._pullAgain = False
+                self.producer.resumeProducing()
+        finally:
+            self._pulling = False
+
+
+    def _sourceFinished(self, ignored):
+        """
+        The source has produced everything; tell the receiver.
+        """
+        if not self._done:
+            self._done = True
+            self._dispatcher._outgoingStreams.pop(self.identifier, None)
+            self._sendFrame({_STREAM_END: ''})
+
+
+    def _sourceFailed(self, reason):
+        """
+        The source failed.  Log the failure locally and tell the receiver
+        that the stream did not complete.
+        """
+        if not self._done:
+            self._done = True
+            self._dispatcher._outgoingStreams.pop(self.identifier, None)
+            log.err(reason, "Amp stream source failed")
+            self._sendFrame({_STREAM_END: '', _STREAM_ERROR: "Unknown Error"})
+
+
+    def write(self, data):
+        """
+        Send C{data} to the receiver, pausing the producer if that uses up
+        the available credit.
+
+        Data written after the credit is exhausted is still sent; a
+        well-behaved producer will not write much more once paused.
+        """
+        if self._done:
+            return
+        for i in range(0, len(data), MAX_VALUE_LENGTH):
+            self._sendFrame({_STREAM_DATA: data[i:i + MAX_VALUE_LENGTH]})
+        self._credit -= len(data)
+        if self._credit <= 0:
+            if not self._paused:
+                self._paused = True
+                if self.streamingProducer:
+                    self._pausable().pauseProducing()
+        elif self._pulling:
+            self._pullAgain = True
+
+
+    def registerProducer(self, producer, streaming):
+        """
+        Register a producer to be paused and resumed by this stream.
+
+        @raise RuntimeError: if a producer is already registered.
+        """
+        if self.producer is not None:
+            raise RuntimeError(
+                "Cannot register producer %s, because producer %s was never "
+                "unregistered." % (producer, self.producer))
+        self.producer = producer
+        self.streamingProducer = streaming
+        if streaming:
+            if self._paused:
+                producer.pauseProducing()
+        else:
+            self._pull()
+
+
+    def unregisterProducer(self):
+        """
+        Unregister the producer registered with L{registerProducer}.
+        """
+        self.producer = None
+        self.streamingProducer = True
+
+
+
+class _IncomingStream(object):
+    """
+    The receiving end of a L{Stream} argument, delivered to application code
+    as the value of the argument.
+
+    Call L{deliverTo} with an L{IConsumer} provider to start receiving the
+    data.  This object registers itself with that consumer as a streaming
+    producer; pausing it withholds credit from the sender, which stops
+    sending once the data already granted has been delivered.
+
+    @ivar identifier: the identifier of this stream on the connection.
+
+    @ivar consumer: the consumer passed to L{deliverTo}, or C{None}.
+
+    @ivar window: the number of bytes the sender may send ahead of the
+        consumer.
+    """
+    implements(IPushProducer)
+
+    consumer = None
+
+    _paused = False
+    _consumed = 0
+    _registered = False
+    _finished = None
+    _ended = False
+    _result = None
+
+    def __init__(self, dispatcher, identifier, window):
+        self._dispatcher = dispatcher
+        self.identifier = identifier
+        self.window = window
+        self._early = []
+
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, self.identifier)
+
+
+    def deliverTo(self, consumer):
+        """
+        Deliver the contents of this stream to C{consumer}.
+
+        @param consumer: the consumer to write the stream to.
+        @type consumer: L{IConsumer} provider
+
+        @return: a L{Deferred} which fires with C{None} when the whole stream
+            has been written to C{consumer}, or fails if the stream could not
+            be completely received.
+
+        @raise RuntimeError: if a consumer has already been attached.
+        """
+        if self.consumer is not None:
+            raise RuntimeError("%r is already being delivered to %r" % (
+                    self, self.consumer))
+        self.consumer = consumer
+        finished = self._finished = Deferred()
+        early, self._early = self._early, None
+        if not self._ended:
+            consumer.registerProducer(self, True)
+            self._registered = True
+        for data in early:
+            consumer.write(data)
+        if self._ended:
+            self._finish(self._result)
+        else:
+            self._grant(self.window)
+        return finished
+
+
+    def _grant(self, credit):
+        """
+        Allow the sender to send C{credit} more bytes.
+        """
+        box = AmpBox()
+        box[_STREAM] = self.identifier
+        box[_STREAM_CREDIT] = str(credit)
+        self._dispatcher._safeEmit(box)
+
+
+    def _dataReceived(self, data):
+        """
+        A data frame arrived; hand it to the consumer and, once half of the
+        window has been consumed, grant the sender more credit.
+        """
+        if self.consumer is None:
+            # The sender is not allowed to send anything before credit is
+            # granted, but tolerate it.
+            self._early.append(data)
+            return
+        self.consumer.write(data)
+        self._consumed += len(data)
+        if not self._paused and self._consumed >= self.window // 2:
+            self._grant(self._consumed)
+            self._consumed = 0
+
+
+    def _endReceived(self, error):
+        """
+        The sender has finished the stream.
+
+        @param error: C{None} if the stream completed, otherwise a
+            description of the error.
+        """
+        if error is None:
+            result = None
+        else:
+            result = Failure(UnknownRemoteError(error))
+        if self.consumer is None:
+            self._ended = True
+            self._result = result
+        else:
+            self._finish(result)
+
+
+    def _connectionLost(self, reason):
+        """
+        The AMP connection was lost before the stream finished.
+        """
+        if self.consumer is None:
+            self._ended = True
+            self._result = reason
+        else:
+            self._finish(reason)
+
+
+    def _finish(self, result):
+        """
+        Detach from the consumer and fire the L{Deferred} returned by
+        L{deliverTo}.
+        """
+        finished, self._finished = self._finished, None
+        if finished is None:
+            return
+        self._dispatcher._incomingStreams.pop(self.identifier, None)
+        if self._registered:
+            self._registered = False
+            self.consumer.unregisterProducer()
+        if isinstance(result, Failure):
+            finished.errback(result)
+        else:
+            finished.callback(None)
+
+
+    def _refuse(self):
+        """
+        If nothing has taken delivery of this stream, tell the sender to stop
+        and forget the stream.  A later L{deliverTo} fails.
+        """
+        if self.consumer is not None:
+            return
+        self._dispatcher._incomingStreams.pop(self.identifier, None)
+        if not self._ended:
+            box = AmpBox()
+            box[_STREAM] = self.identifier
+            box[_STREAM_STOP] = ''
+            self._dispatcher._safeEmit(box)
+        self._ended = True
+        self._result = Failure(
+            Exception("Stream was not delivered before the response"))
+        self._early = []
+
+
+    def pauseProducing(self):
+        """
+        Stop granting credit to the sender.
+        """
+        self._paused = True
+
+
+    def resumeProducing(self):
+        """
+        Grant the sender credit for everything consumed while paused.
+        """
+        self._paused = False
+        if self._consumed:
+            self._grant(self._consumed)
+            self._consumed = 0
+
+
+    def stopProducing(self):
+        """
+        Tell the sender to stop the stream.  The L{Deferred} returned by
+        L{deliverTo} fails.
+        """
+        box = AmpBox()
+        box[_STREAM] = self.identifier
+        box[_STREAM_STOP] = ''
+        self._dispatcher._safeEmit(box)
+        self._finish(Failure(
+                Exception("Consumer asked us to stop producing")))
+
+
+
+class Stream(Argument):
+    """
+    Send a stream of bytes of any length as the value of an argument.
+
+    The stream is not part of the box carrying the command or response.
+    Instead its contents follow it as a sequence of flow-controlled frames,
+    each a box of at most L{MAX_VALUE_LENGTH} bytes of data, which are
+    interleaved with any other boxes on the same connection.  A large
+    transfer therefore does not hold up other commands, and it proceeds as
+    fast as the receiving consumer accepts data.
+
+    On the sending side the value of the argument is an object with a
+    C{startProducing} method which will be called with an L{IConsumer}
+    provider, in the manner of
+    L{IBodyProducer<twisted.web.iweb.IBodyProducer>}.  It returns a
+    L{Deferred} which fires when everything has been written.  The object
+    is paused and resumed like an L{IPushProducer} unless it registers a
+    different producer with the consumer.  Production begins only once the
+    receiver is ready for data.
+
+    On the receiving side the value of the argument is an L{IPushProducer}
+    provider with a C{deliverTo} method.  Call it with an L{IConsumer}
+    provider to receive the data; it returns a L{Deferred} which fires when
+    the stream is complete.  A responder must call it before its result is
+    sent: the sender is told to stop the streams among the arguments of a
+    command which have not been delivered by then.  If the command fails,
+    the sender ends its streams with an error.
+
+    For example::
+
+        class Upload(amp.Command):
+            arguments = [('name', amp.Unicode()),
+                         ('contents', amp.Stream())]
+
+        class Uploader(amp.AMP):
+            @Upload.responder
+            def upload(self, name, contents):
+                consumer = ftp.FileConsumer(open(name, 'wb'))
+                d = contents.deliverTo(consumer)
+                return d.addCallback(lambda ignored: {})
+
+        d = proto.callRemote(Upload, name=u'big',
+                             contents=FileBodyProducer(open('big', 'rb')))
+
+    This argument type requires an L{AMP} instance as the protocol.
+
+    @ivar window: the number of bytes the sender may send ahead of the
+        receiving consumer.
+    """
+
+    window = 2 ** 18
+
+    def __init__(self, optional=False, window=None):
+        """
+        Create a Stream.
+
+        @param optional: a boolean indicating whether this argument can be
+            omitted in the protocol.
+
+        @param window: if not C{None}, the number of bytes the sender may
+            send ahead of the receiving consumer.
+        """
+        Argument.__init__(self, optional)
+        if window is not None:
+            self.window = window
+
+
+    def fromStringProto(self, inString, proto):
+        """
+        Create the receiving end of the stream with the identifier given by
+        C{inString}.
+
+        @return: the receiving end of the stream.
+        @rtype: L{IPushProducer} provider with a C{deliverTo} method.
+        """
+        return proto._receiveStream(inString, self.window)
+
+
+    def toStringProto(self, inObject, proto):
+        """
+        Arrange for C{inObject} to be streamed to our peer once it is ready.
+
+        @return: the identifier of the new stream.
+        @rtype: C{str}
+        """
+        return proto._sendStream(inObject)
+
+
+
 class Command:
     """
     Subclass me to specify an AMP Command.
@@ -1838,11 +2467,14 @@ class Command:
                                                UnknownRemoteError)
             return Failure(errorType(rje.description))
 
-        d = proto._sendBoxCommand(self.commandName,
-                                  self.makeArguments(self.structured, proto),
-                                  self.requiresAnswer)
+        box = self.makeArguments(self.structured, proto)
+        d = proto._sendBoxCommand(self.commandName, box, self.requiresAnswer)
 
         if self.requiresAnswer:
+            streams = [box[argName] for (argName, argument) in self.arguments
+                       if isinstance(argument, Stream) and argName in box]
+            if streams:
+                d.addErrback(proto._abandonStreams, streams)
             d.addCallback(self.parseResponse, proto)
             d.addErrback(_massageError)
 
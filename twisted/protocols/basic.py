@@ -11,8 +11,7 @@ from __future__ import absolute_import, division
 
 # System imports
 import re
-from struct import pack, unpack, calcsize
-from io import BytesIO
+from struct import Struct, pack, calcsize
 import math
 
 from zope.interface import implementer
@@ -54,7 +53,240 @@ class IncompleteNetstring(Exception):
     """
 
 
-class NetstringReceiver(protocol.Protocol):
+class _InvalidFrame(Exception):
+    """
+    Raised by C{_parseFrames} when the data being parsed does not form a
+    valid frame.
+
+    @ivar reason: A value describing the problem, which is passed to
+        C{_frameInvalid}.
+    """
+
+    def __init__(self, reason):
+        Exception.__init__(self, reason)
+        self.reason = reason
+
+
+
+class _StringFramingMixin:
+    """
+    Buffering and delivery of framed strings, shared by L{NetstringReceiver}
+    and L{IntNStringReceiver}.
+
+    Frames are parsed from the data passed to C{dataReceived} by offset:
+    neither the data nor the buffer of data left over from earlier calls is
+    re-sliced as each frame is parsed, and only the payloads delivered to the
+    application are copied.  A protocol which sets L{deliverMemoryViews}
+    avoids even that copy.
+
+    A protocol which can handle several strings at once can override
+    L{stringsReceived} instead of C{stringReceived} to be given every complete
+    string in each chunk of data in a single call.
+
+    Classes using this mixin implement C{_parseFrames} and C{_frameInvalid}.
+
+    @ivar deliverMemoryViews: If C{True}, strings are delivered as
+        C{memoryview}s of the received data instead of as C{bytes}.  A view
+        may be kept after the callback it was passed to returns; use its
+        C{tobytes} method to convert it.
+    @type deliverMemoryViews: C{bool}
+
+    @ivar _buffer: The data being parsed.  While C{dataReceived} runs this is
+        the data it was called with, appended to any data left over from
+        previous calls; between calls it is either empty or a C{bytearray}
+        holding the start of an incomplete frame, which more data is appended
+        to in place.
+    @type _buffer: C{bytes} or C{bytearray}
+
+    @ivar _bufferOffset: The offset in C{_buffer} of the first byte which has
+        not been parsed into a string that was delivered.
+    @type _bufferOffset: C{int}
+
+    @ivar _bufferNeeded: The length C{_buffer} must reach before the frame
+        at its start is complete, if that is known, otherwise C{0}.  Set by
+        C{_parseFrames}, so that data can be added to an incomplete frame
+        without parsing it again.
+    @type _bufferNeeded: C{int}
+
+    @ivar _switchableBuffer: If C{True}, a C{recvd} attribute set by
+        C{stringReceived} or L{stringsReceived} replaces the unparsed data.
+    @type _switchableBuffer: C{bool}
+    """
+
+    deliverMemoryViews = False
+    paused = False
+    _buffer = b""
+    _bufferOffset = 0
+    _bufferNeeded = 0
+    _switchableBuffer = False
+
+    def stringsReceived(self, strings):
+        """
+        Called with all of the complete strings parsed from a chunk of data.
+
+        By default this calls C{stringReceived} with each one.  Override it
+        to handle a batch of strings at once; if it is overridden,
+        C{stringReceived} is not called and pausing the protocol only takes
+        effect after the whole batch has been delivered.
+
+        @param strings: The strings which were received, with all framing
+            removed.
+        @type strings: L{list} of C{bytes} (or of C{memoryview} if
+            L{deliverMemoryViews} is set)
+
+        @since: 15.3
+        """
+        for string in strings:
+            self.stringReceived(string)
+
+
+    def dataReceived(self, data):
+        """
+        Parse framed strings out of C{data} and any incomplete frame received
+        before it and deliver them to L{stringsReceived} or
+        C{stringReceived}.
+
+        @param data: Some bytes received from the transport.
+        @type data: C{bytes}
+        """
+        buffer = self._buffer
+        if buffer:
+            buffer += data
+            if len(buffer) < self._bufferNeeded:
+                return
+            if not self.deliverMemoryViews:
+                # Slicing strings out of bytes is cheaper than copying them
+                # out of a bytearray.
+                buffer = bytes(buffer)
+        else:
+            buffer = data
+        self._buffer = buffer
+        self._bufferOffset = 0
+        self._bufferNeeded = 0
+        stringsReceived = getattr(self.stringsReceived, "__func__", None)
+        try:
+            if stringsReceived is _defaultStringsReceived:
+                self._deliverEach(buffer)
+            else:
+                self._deliverBatches(buffer)
+        except _InvalidFrame as e:
+            self._compactBuffer()
+            self._frameInvalid(e.reason)
+        finally:
+            self._compactBuffer()
+
+
+    def _switchBuffer(self):
+        """
+        Replace the unparsed data with a C{recvd} attribute set by
+        application code.
+
+        @return: The new data to parse.
+        """
+        buffer = self.__dict__.pop("recvd")
+        self._buffer = buffer
+        self._bufferOffset = 0
+        self._bufferNeeded = 0
+        return buffer
+
+
+    def _deliverEach(self, buffer):
+        """
+        Deliver each string in C{buffer} to C{stringReceived} as soon as it
+        is parsed, stopping if the protocol is paused.
+
+        @param buffer: The data to parse.
+        @type buffer: C{bytes} or C{bytearray}
+
+        @raise _InvalidFrame: If an invalid frame is found.
+        """
+        switchable = self._switchableBuffer
+        offset = 0
+        while buffer and not self.paused:
+            if self.deliverMemoryViews:
+                source = memoryview(buffer)
+            else:
+                source = buffer
+            for start, end, offset in self._parseFrames(buffer, offset):
+                self._bufferOffset = offset
+                self.stringReceived(source[start:end])
+                if switchable and "recvd" in self.__dict__:
+                    buffer = self._switchBuffer()
+                    offset = 0
+                    break
+                if self.paused:
+                    return
+            else:
+                return
+
+
+    def _deliverBatches(self, buffer):
+        """
+        Deliver all of the strings in C{buffer} to L{stringsReceived} at
+        once.
+
+        @param buffer: The data to parse.
+        @type buffer: C{bytes} or C{bytearray}
+
+        @raise _InvalidFrame: If an invalid frame is found, after the strings
+            before it have been delivered.
+        """
+        switchable = self._switchableBuffer
+        while buffer and not self.paused:
+            if self.deliverMemoryViews:
+                source = memoryview(buffer)
+            else:
+                source = buffer
+            strings = []
+            offset = 0
+            invalid = None
+            try:
+                for start, end, offset in self._parseFrames(buffer, 0):
+                    strings.append(source[start:end])
+            except _InvalidFrame as e:
+                invalid = e
+            if not strings:
+                break
+            self._bufferOffset = offset
+            self.stringsReceived(strings)
+            if switchable and "recvd" in self.__dict__:
+                buffer = self._switchBuffer()
+            elif invalid is None:
+                return
+            else:
+                break
+        else:
+            return
+        if invalid is not None:
+            raise invalid
+
+
+    def _compactBuffer(self):
+        """
+        Discard the data which has been delivered from C{_buffer}, keeping
+        any incomplete frame in a C{bytearray} which more data can be
+        appended to.
+        """
+        buffer = self._buffer
+        offset = self._bufferOffset
+        if offset >= len(buffer):
+            self._buffer = b""
+        elif offset or not isinstance(buffer, bytearray):
+            # Always copy, rather than deleting from the front of the
+            # bytearray: delivered memoryviews may still refer to it.
+            self._buffer = bytearray(buffer[offset:])
+        self._bufferOffset = 0
+        self._bufferNeeded -= offset
+
+
+
+_defaultStringsReceived = getattr(
+    _StringFramingMixin.stringsReceived, "__func__",
+    _StringFramingMixin.stringsReceived)
+
+
+
+class NetstringReceiver(_StringFramingMixin, protocol.Protocol):
     """
     A protocol that sends and receives netstrings.
 
@@ -65,7 +297,9 @@ class NetstringReceiver(protocol.Protocol):
 
     Override L{stringReceived} to handle received netstrings. This
     method is called with the netstring payload as a single argument
-    whenever a complete netstring is received.
+    whenever a complete netstring is received.  Alternatively, override
+    L{stringsReceived} to handle all of the netstrings in each chunk of
+    received data at once.
 
     Security features:
         1. Messages are limited in size, useful if you don't want
@@ -90,32 +324,8 @@ class NetstringReceiver(protocol.Protocol):
         not allowed.
     @type _LENGTH_PREFIX: C{re.Match}
 
-    @ivar _PARSING_LENGTH: Indicates that the C{NetstringReceiver} is in
-        the state of parsing the length portion of a netstring.
-    @type _PARSING_LENGTH: C{int}
-
-    @ivar _PARSING_PAYLOAD: Indicates that the C{NetstringReceiver} is in
-        the state of parsing the payload portion (data and trailing comma)
-        of a netstring.
-    @type _PARSING_PAYLOAD: C{int}
-
     @ivar brokenPeer: Indicates if the connection is still functional
     @type brokenPeer: C{int}
-
-    @ivar _state: Indicates if the protocol is consuming the length portion
-        (C{PARSING_LENGTH}) or the payload (C{PARSING_PAYLOAD}) of a netstring
-    @type _state: C{int}
-
-    @ivar _remainingData: Holds the chunk of data that has not yet been consumed
-    @type _remainingData: C{string}
-
-    @ivar _payload: Holds the payload portion of a netstring including the
-        trailing comma
-    @type _payload: C{BytesIO}
-
-    @ivar _expectedPayloadSize: Holds the payload size plus one for the trailing
-        comma.
-    @type _expectedPayloadSize: C{int}
     """
     MAX_LENGTH = 99999
     _LENGTH = re.compile(b'(0|[1-9]\d*)(:)')
@@ -132,20 +342,16 @@ class NetstringReceiver(protocol.Protocol):
                           "specified by self.MAX_LENGTH")
     _MISSING_COMMA = "The received netstring is not terminated by a comma."
 
-    # The following constants are used for determining if the NetstringReceiver
-    # is parsing the length portion of a netstring, or the payload.
-    _PARSING_LENGTH, _PARSING_PAYLOAD = range(2)
+    brokenPeer = 0
 
     def makeConnection(self, transport):
         """
         Initializes the protocol.
         """
         protocol.Protocol.makeConnection(self, transport)
-        self._remainingData = b""
-        self._currentPayloadSize = 0
-        self._payload = BytesIO()
-        self._state = self._PARSING_LENGTH
-        self._expectedPayloadSize = 0
+        self._buffer = b""
+        self._bufferOffset = 0
+        self._bufferNeeded = 0
         self.brokenPeer = 0
 
 
@@ -163,28 +369,6 @@ class NetstringReceiver(protocol.Protocol):
         self.transport.write(_formatNetstring(string))
 
 
-    def dataReceived(self, data):
-        """
-        Receives some characters of a netstring.
-
-        Whenever a complete netstring is received, this method extracts
-        its payload and calls L{stringReceived} to process it.
-
-        @param data: A chunk of data representing a (possibly partial)
-            netstring
-        @type data: C{bytes}
-        """
-        self._remainingData += data
-        while self._remainingData:
-            try:
-                self._consumeData()
-            except IncompleteNetstring:
-                break
-            except NetstringParseError:
-                self._handleParseError()
-                break
-
-
     def stringReceived(self, string):
         """
         Override this for notification when each complete string is received.
@@ -209,80 +393,69 @@ class NetstringReceiver(protocol.Protocol):
         return math.ceil(math.log10(self.MAX_LENGTH)) + 1
 
 
-    def _consumeData(self):
+    def _parseFrames(self, buffer, offset):
         """
-        Consumes the content of C{self._remainingData}.
+        Find the netstrings in some data.
 
-        @raise IncompleteNetstring: if C{self._remainingData} does not
-            contain enough data to complete the current netstring.
-        @raise NetstringParseError: if the received data do not
-            form a valid netstring.
-        """
-        if self._state == self._PARSING_LENGTH:
-            self._consumeLength()
-            self._prepareForPayloadConsumption()
-        if self._state == self._PARSING_PAYLOAD:
-            self._consumePayload()
+        @param buffer: The data to parse.
+        @type buffer: C{bytes} or C{bytearray}
 
+        @param offset: The offset in C{buffer} to start parsing at.
+        @type offset: C{int}
 
-    def _consumeLength(self):
-        """
-        Consumes the length portion of C{self._remainingData}.
+        @return: An iterator of 3-tuples giving the offsets of the start and
+            end of each netstring's payload and of the data following it.
+            It stops at the first incomplete netstring, setting
+            C{_bufferNeeded} if its length is known.
 
-        @raise IncompleteNetstring: if C{self._remainingData} contains
-            a partial length specification (digits without trailing
-            comma).
-        @raise NetstringParseError: if the received data do not form a valid
-            netstring.
+        @raise _InvalidFrame: if the data do not form a valid netstring.
+            Its reason is the L{NetstringParseError}.
         """
-        lengthMatch = self._LENGTH.match(self._remainingData)
-        if not lengthMatch:
-            self._checkPartialLengthSpecification()
-            raise IncompleteNetstring()
-        self._processLength(lengthMatch)
-
-
-    def _checkPartialLengthSpecification(self):
+        matchLength = self._LENGTH.match
+        bufferLength = len(buffer)
+        try:
+            while offset < bufferLength:
+                lengthMatch = matchLength(buffer, offset)
+                if lengthMatch is None:
+                    self._checkPartialLengthSpecification(buffer, offset)
+                    return
+                start = lengthMatch.end()
+                end = start + self._extractLength(lengthMatch.group(1))
+                if end >= bufferLength:
+                    self._bufferNeeded = end + 1
+                    return
+                if buffer[end:end + 1] != b",":
+                    raise NetstringParseError(self._MISSING_COMMA)
+                offset = end + 1
+                yield start, end, offset
+        except NetstringParseError as e:
+            raise _InvalidFrame(e)
+
+
+    def _checkPartialLengthSpecification(self, buffer, offset):
         """
         Makes sure that the received data represents a valid number.
 
-        Checks if C{self._remainingData} represents a number smaller or
-        equal to C{self.MAX_LENGTH}.
+        Checks if the data in C{buffer} from C{offset} represents a number
+        smaller or equal to C{self.MAX_LENGTH}.
+
+        @param buffer: The received data.
+        @type buffer: C{bytes} or C{bytearray}
+
+        @param offset: The offset in C{buffer} of the start of the length
+            specification.
+        @type offset: C{int}
 
-        @raise NetstringParseError: if C{self._remainingData} is no
-            number or is too big (checked by L{extractLength}).
+        @raise NetstringParseError: if the data is no number or is too big
+            (checked by L{_extractLength}).
         """
-        partialLengthMatch = self._LENGTH_PREFIX.match(self._remainingData)
+        partialLengthMatch = self._LENGTH_PREFIX.match(buffer, offset)
         if not partialLengthMatch:
             raise NetstringParseError(self._MISSING_LENGTH)
         lengthSpecification = (partialLengthMatch.group(1))
         self._extractLength(lengthSpecification)
 
 
-    def _processLength(self, lengthMatch):
-        """
-        Processes the length definition of a netstring.
-
-        Extracts and stores in C{self._expectedPayloadSize} the number
-        representing the netstring size.  Removes the prefix
-        representing the length specification from
-        C{self._remainingData}.
-
-        @raise NetstringParseError: if the received netstring does not
-            start with a number or the number is bigger than
-            C{self.MAX_LENGTH}.
-        @param lengthMatch: A regular expression match object matching
-            a netstring length specification
-        @type lengthMatch: C{re.Match}
-        """
-        endOfNumber = lengthMatch.end(1)
-        startOfData = lengthMatch.end(2)
-        lengthString = self._remainingData[:endOfNumber]
-        # Expect payload plus trailing comma:
-        self._expectedPayloadSize = self._extractLength(lengthString) + 1
-        self._remainingData = self._remainingData[startOfData:]
-
-
     def _extractLength(self, lengthAsString):
         """
         Attempts to extract the length information of a netstring.
@@ -321,92 +494,13 @@ class NetstringReceiver(protocol.Protocol):
             raise NetstringParseError(self._TOO_LONG % (self.MAX_LENGTH,))
 
 
-    def _prepareForPayloadConsumption(self):
-        """
-        Sets up variables necessary for consuming the payload of a netstring.
-        """
-        self._state = self._PARSING_PAYLOAD
-        self._currentPayloadSize = 0
-        self._payload.seek(0)
-        self._payload.truncate()
-
-
-    def _consumePayload(self):
+    def _frameInvalid(self, reason):
         """
-        Consumes the payload portion of C{self._remainingData}.
-
-        If the payload is complete, checks for the trailing comma and
-        processes the payload. If not, raises an L{IncompleteNetstring}
-        exception.
+        Handle an invalid netstring by calling L{_handleParseError}.
 
-        @raise IncompleteNetstring: if the payload received so far
-            contains fewer characters than expected.
-        @raise NetstringParseError: if the payload does not end with a
-        comma.
+        @param reason: The L{NetstringParseError} describing the problem.
         """
-        self._extractPayload()
-        if self._currentPayloadSize < self._expectedPayloadSize:
-            raise IncompleteNetstring()
-        self._checkForTrailingComma()
-        self._state = self._PARSING_LENGTH
-        self._processPayload()
-
-
-    def _extractPayload(self):
-        """
-        Extracts payload information from C{self._remainingData}.
-
-        Splits C{self._remainingData} at the end of the netstring.  The
-        first part becomes C{self._payload}, the second part is stored
-        in C{self._remainingData}.
-
-        If the netstring is not yet complete, the whole content of
-        C{self._remainingData} is moved to C{self._payload}.
-        """
-        if self._payloadComplete():
-            remainingPayloadSize = (self._expectedPayloadSize -
-                                    self._currentPayloadSize)
-            self._payload.write(self._remainingData[:remainingPayloadSize])
-            self._remainingData = self._remainingData[remainingPayloadSize:]
-            self._currentPayloadSize = self._expectedPayloadSize
-        else:
-            self._payload.write(self._remainingData)
-            self._currentPayloadSize += len(self._remainingData)
-            self._remainingData = b""
-
-
-    def _payloadComplete(self):
-        """
-        Checks if enough data have been received to complete the netstring.
-
-        @return: C{True} iff the received data contain at least as many
-            characters as specified in the length section of the
-            netstring
-        @rtype: C{bool}
-        """
-        return (len(self._remainingData) + self._currentPayloadSize >=
-                self._expectedPayloadSize)
-
-
-    def _processPayload(self):
-        """
-        Processes the actual payload with L{stringReceived}.
-
-        Strips C{self._payload} of the trailing comma and calls
-        L{stringReceived} with the result.
-        """
-        self.stringReceived(self._payload.getvalue()[:-1])
-
-
-    def _checkForTrailingComma(self):
-        """
-        Checks if the netstring has a trailing comma at the expected position.
-
-        @raise NetstringParseError: if the last payload character is
-            anything but a comma.
-        """
-        if self._payload.getvalue()[-1:] != b",":
-            raise NetstringParseError(self._MISSING_COMMA)
+        self._handleParseError()
 
 
     def _handleParseError(self):
@@ -521,9 +615,27 @@ class LineReceiver(protocol.Protocol, _PauseableMixin):
     @cvar MAX_LENGTH: The maximum length of a line to allow (If a
                       sent line is longer than this, the connection is dropped).
                       Default is 16384.
+
+    @ivar _buffer: Bytes received but not yet delivered, starting at
+        C{_bufferOffset}.  Lines are sliced out of it in place, and the
+        delivered bytes are only discarded once C{dataReceived} is done, so
+        that delivering many lines from one chunk does not copy the rest of
+        the chunk once per line.
+    @type _buffer: C{bytes}
+
+    @ivar _bufferOffset: The index in C{_buffer} of the first byte not yet
+        delivered.
+    @type _bufferOffset: C{int}
+
+    @ivar _searchOffset: The index in C{_buffer} up to which it is known not
+        to contain a complete delimiter, so that the search for the end of a
+        long partial line resumes where it left off when more data arrives.
+    @type _searchOffset: C{int}
     """
     line_mode = 1
     _buffer = b''
+    _bufferOffset = 0
+    _searchOffset = 0
     _busyReceiving = False
     delimiter = b'\r\n'
     MAX_LENGTH = 16384
@@ -535,7 +647,9 @@ class LineReceiver(protocol.Protocol, _PauseableMixin):
         @return: All of the cleared buffered data.
         @rtype: C{bytes}
         """
-        b, self._buffer = self._buffer, b""
+        b = self._buffer[self._bufferOffset:]
+        self._buffer = b""
+        self._bufferOffset = self._searchOffset = 0
         return b
 
 
@@ -552,34 +666,41 @@ class LineReceiver(protocol.Protocol, _PauseableMixin):
         try:
             self._busyReceiving = True
             self._buffer += data
-            while self._buffer and not self.paused:
+            while not self.paused:
+                buffer = self._buffer
+                start = self._bufferOffset
                 if self.line_mode:
-                    try:
-                        line, self._buffer = self._buffer.split(
-                            self.delimiter, 1)
-                    except ValueError:
-                        if len(self._buffer) > self.MAX_LENGTH:
-                            line, self._buffer = self._buffer, b''
-                            return self.lineLengthExceeded(line)
+                    delimiter = self.delimiter
+                    searchFrom = self._searchOffset - len(delimiter) + 1
+                    if searchFrom < start:
+                        searchFrom = start
+                    end = buffer.find(delimiter, searchFrom)
+                    if end == -1:
+                        if len(buffer) - start > self.MAX_LENGTH:
+                            return self.lineLengthExceeded(
+                                self.clearLineBuffer())
+                        self._searchOffset = len(buffer)
                         return
-                    else:
-                        lineLength = len(line)
-                        if lineLength > self.MAX_LENGTH:
-                            exceeded = line + self.delimiter + self._buffer
-                            self._buffer = b''
-                            return self.lineLengthExceeded(exceeded)
-                        why = self.lineReceived(line)
-                        if (why or self.transport and
-                            self.transport.disconnecting):
-                            return why
-                else:
-                    data = self._buffer
-                    self._buffer = b''
-                    why = self.rawDataReceived(data)
+                    if end - start > self.MAX_LENGTH:
+                        return self.lineLengthExceeded(self.clearLineBuffer())
+                    self._bufferOffset = end + len(delimiter)
+                    why = self.lineReceived(buffer[start:end])
+                    if (why or self.transport and
+                        self.transport.disconnecting):
+                        return why
+                elif start < len(buffer):
+                    why = self.rawDataReceived(self.clearLineBuffer())
                     if why:
                         return why
+                else:
+                    return
         finally:
             self._busyReceiving = False
+            if self._bufferOffset:
+                self._buffer = self._buffer[self._bufferOffset:]
+                self._searchOffset = max(
+                    0, self._searchOffset - self._bufferOffset)
+                self._bufferOffset = 0
 
 
     def setLineMode(self, extra=b''):
@@ -674,19 +795,18 @@ class _RecvdCompatHack(object):
     the default __set__ behavior in both new-style and old-style subclasses.
     """
     def __get__(self, oself, type=None):
-        return oself._unprocessed[oself._compatibilityOffset:]
+        return bytes(oself._buffer[oself._bufferOffset:])
 
 
 
-class IntNStringReceiver(protocol.Protocol, _PauseableMixin):
+class IntNStringReceiver(_StringFramingMixin, protocol.Protocol,
+                         _PauseableMixin):
     """
     Generic class for length prefixed protocols.
 
-    @ivar _unprocessed: bytes received, but not yet broken up into messages /
-        sent to stringReceived.  _compatibilityOffset must be updated when this
-        value is updated so that the C{recvd} attribute can be generated
-        correctly.
-    @type _unprocessed: C{bytes}
+    Override L{stringReceived} to handle each received string, or
+    L{stringsReceived} to handle all of the strings in each chunk of received
+    data at once.
 
     @ivar structFormat: format used for struct packing/unpacking. Define it in
         subclass.
@@ -695,15 +815,10 @@ class IntNStringReceiver(protocol.Protocol, _PauseableMixin):
     @ivar prefixLength: length of the prefix, in bytes. Define it in subclass,
         using C{struct.calcsize(structFormat)}
     @type prefixLength: C{int}
-
-    @ivar _compatibilityOffset: the offset within C{_unprocessed} to the next
-        message to be parsed. (used to generate the recvd attribute)
-    @type _compatibilityOffset: C{int}
     """
 
     MAX_LENGTH = 99999
-    _unprocessed = b""
-    _compatibilityOffset = 0
+    _switchableBuffer = True
 
     # Backwards compatibility support for applications which directly touch the
     # "internal" parse buffer.
@@ -732,54 +847,89 @@ class IntNStringReceiver(protocol.Protocol, _PauseableMixin):
         self.transport.loseConnection()
 
 
-    def dataReceived(self, data):
+    def _parseFrames(self, buffer, offset):
         """
-        Convert int prefixed strings into calls to stringReceived.
+        Find the length prefixed strings in some data.
+
+        @param buffer: The data to parse.
+        @type buffer: C{bytes} or C{bytearray}
+
+        @param offset: The offset in C{buffer} to start parsing at.
+        @type offset: C{int}
+
+        @return: An iterator of 3-tuples giving the offsets of the start and
+            end of each string and of the data following it.  It stops at the
+            first incomplete string, setting C{_bufferNeeded} if its length is
+            known.
+
+        @raise _InvalidFrame: if a length prefix greater than C{MAX_LENGTH}
+            is found.  Its reason is the length.
         """
-        # Try to minimize string copying (via slices) by keeping one buffer
-        # containing all the data we have so far and a separate offset into that
-        # buffer.
-        alldata = self._unprocessed + data
-        currentOffset = 0
+        unpackLength = Struct(self.structFormat).unpack_from
         prefixLength = self.prefixLength
-        fmt = self.structFormat
-        self._unprocessed = alldata
-
-        while len(alldata) >= (currentOffset + prefixLength) and not self.paused:
-            messageStart = currentOffset + prefixLength
-            length, = unpack(fmt, alldata[currentOffset:messageStart])
+        bufferLength = len(buffer)
+        while offset + prefixLength <= bufferLength:
+            length, = unpackLength(buffer, offset)
+            # MAX_LENGTH may be changed by stringReceived, as AMP does.
             if length > self.MAX_LENGTH:
-                self._unprocessed = alldata
-                self._compatibilityOffset = currentOffset
-                self.lengthLimitExceeded(length)
+                raise _InvalidFrame(length)
+            start = offset + prefixLength
+            offset = start + length
+            if offset > bufferLength:
+                self._bufferNeeded = offset
                 return
-            messageEnd = messageStart + length
-            if len(alldata) < messageEnd:
-                break
+            yield start, offset, offset
+
+
+    def _deliverEach(self, buffer):
+        """
+        Deliver each string in C{buffer} to C{stringReceived} as soon as it
+        is parsed, stopping if the protocol is paused.
+
+        This does the same as L{_StringFramingMixin._deliverEach} with
+        L{_parseFrames} written inline, which is noticeably faster for short
+        strings.
+
+        @param buffer: The data to parse.
+        @type buffer: C{bytes} or C{bytearray}
 
-            # Here we have to slice the working buffer so we can send just the
-            # netstring into the stringReceived callback.
-            packet = alldata[messageStart:messageEnd]
-            currentOffset = messageEnd
-            self._compatibilityOffset = currentOffset
-            self.stringReceived(packet)
-
-            # Check to see if the backwards compat "recvd" attribute got written
-            # to by application code.  If so, drop the current data buffer and
-            # switch to the new buffer given by that attribute's value.
-            if 'recvd' in self.__dict__:
-                alldata = self.__dict__.pop('recvd')
-                self._unprocessed = alldata
-                self._compatibilityOffset = currentOffset = 0
-                if alldata:
-                    continue
+        @raise _InvalidFrame: If a length prefix greater than C{MAX_LENGTH}
+            is found.
+        """
+        unpackLength = Struct(self.structFormat).unpack_from
+        prefixLength = self.prefixLength
+        views = self.deliverMemoryViews
+        source = memoryview(buffer) if views else buffer
+        bufferLength = len(buffer)
+        offset = 0
+        while offset + prefixLength <= bufferLength and not self.paused:
+            length, = unpackLength(buffer, offset)
+            # MAX_LENGTH may be changed by stringReceived, as AMP does.
+            if length > self.MAX_LENGTH:
+                raise _InvalidFrame(length)
+            start = offset + prefixLength
+            end = start + length
+            if end > bufferLength:
+                self._bufferNeeded = end
                 return
+            self._bufferOffset = offset = end
+            self.stringReceived(source[start:end])
+            if "recvd" in self.__dict__:
+                buffer = self._switchBuffer()
+                source = memoryview(buffer) if views else buffer
+                bufferLength = len(buffer)
+                offset = 0
 
-        # Slice off all the data that has been processed, avoiding holding onto
-        # memory to store it, and update the compatibility attributes to reflect
-        # that change.
-        self._unprocessed = alldata[currentOffset:]
-        self._compatibilityOffset = 0
+
+    def _frameInvalid(self, length):
+        """
+        Handle a length prefix greater than C{MAX_LENGTH} by calling
+        L{lengthLimitExceeded}.
+
+        @param length: The length prefix which was received.
+        @type length: C{int}
+        """
+        self.lengthLimitExceeded(length)
 
 
     def sendString(self, string):
@@ -12,6 +12,7 @@ from __future__ import division, absolute_import
 
 # system imports
 import sys
+import socket
 
 from zope.interface import directlyProvides, providedBy
 
@@ -665,6 +666,171 @@ class TrafficLoggingFactory(WrappingFactory):
 
 
 
+class CoalescingProtocol(ProtocolWrapper):
+    """
+    Protocol for L{CoalescingFactory}.
+
+    Writes by the wrapped protocol are held until the end of the current
+    reactor iteration, or until L{CoalescingFactory.threshold} bytes are
+    held, and then passed to the real transport with a single call to its
+    C{writeSequence} method.  The wrapped protocol can send the held data
+    sooner by calling C{flush} on its transport.
+
+    @since: 15.3
+    """
+
+    def __init__(self, factory, wrappedProtocol):
+        ProtocolWrapper.__init__(self, factory, wrappedProtocol)
+        self._buffer = []
+        self._bufferSize = 0
+        self._flushCall = None
+        self._uncorkCall = None
+        self._corkable = factory.cork and hasattr(socket, 'TCP_CORK')
+
+
+    def write(self, data):
+        self._buffer.append(data)
+        self._bufferSize += len(data)
+        self._scheduleFlush()
+
+
+    def writeSequence(self, seq):
+        for data in seq:
+            self._buffer.append(data)
+            self._bufferSize += len(data)
+        self._scheduleFlush()
+
+
+    def _scheduleFlush(self):
+        """
+        Flush the held data if there is enough of it, or arrange for it to
+        be flushed at the end of the reactor iteration.
+        """
+        if self._bufferSize >= self.factory.threshold:
+            self.flush()
+        elif self._flushCall is None and self._buffer:
+            self._flushCall = self.factory.callLater(0, self.flush)
+
+
+    def flush(self):
+        """
+        Pass all of the held data to the real transport now.
+
+        If the factory's C{cork} option is set, the connection's socket is
+        corked while the transport sends the data, and uncorked on the next
+        reactor iteration, so that the kernel sends it in as few full-sized
+        segments as possible.
+        """
+        if self._flushCall is not None:
+            if self._flushCall.active():
+                self._flushCall.cancel()
+            self._flushCall = None
+        if not self._buffer:
+            return
+        data = self._buffer
+        self._buffer = []
+        self._bufferSize = 0
+        if self._corkable and self._uncorkCall is None:
+            if self._setCork(True):
+                self._uncorkCall = self.factory.callLater(0, self._uncork)
+        self.transport.writeSequence(data)
+
+
+    def _uncork(self):
+        """
+        Let the kernel send any partial segment left by the last flush.
+        """
+        self._uncorkCall = None
+        self._setCork(False)
+
+
+    def _setCork(self, corked):
+        """
+        Set the C{TCP_CORK} option of the connection's socket.  If the
+        transport has no socket, or it cannot be corked, corking is disabled
+        for the rest of the connection.
+
+        @param corked: Whether to cork or uncork the socket.
+        @type corked: L{bool}
+
+        @return: L{True} if the option was set, L{False} otherwise.
+        """
+        try:
+            self.transport.getHandle().setsockopt(
+                socket.IPPROTO_TCP, socket.TCP_CORK, int(corked))
+        except (AttributeError, socket.error):
+            self._corkable = False
+            return False
+        return True
+
+
+    def loseConnection(self):
+        self.flush()
+        ProtocolWrapper.loseConnection(self)
+
+
+    def abortConnection(self):
+        self._discard()
+        self.transport.abortConnection()
+
+
+    def connectionLost(self, reason):
+        self._discard()
+        ProtocolWrapper.connectionLost(self, reason)
+
+
+    def _discard(self):
+        """
+        Drop any held data and cancel any pending calls.
+        """
+        self._buffer = []
+        self._bufferSize = 0
+        for call in (self._flushCall, self._uncorkCall):
+            if call is not None and call.active():
+                call.cancel()
+        self._flushCall = self._uncorkCall = None
+
+
+
+class CoalescingFactory(WrappingFactory):
+    """
+    Coalesces small writes by the protocols of a factory, like the Nagle
+    algorithm but without the delay.
+
+    Chatty protocols which make many small writes at once, such as clients
+    pipelining requests, then make one call to their transport for each
+    iteration of the reactor instead of one for each write.  The factory can
+    be used with any endpoint, for servers and clients alike.
+
+    @ivar threshold: The number of held bytes at which a protocol's writes
+        are passed to its transport without waiting for the end of the
+        reactor iteration.
+    @type threshold: L{int}
+
+    @ivar cork: Whether to also set the Linux C{TCP_CORK} option on the
+        socket of each connection while data is being sent.  This is
+        ignored on other platforms and for transports without a TCP socket.
+    @type cork: L{bool}
+
+    @since: 15.3
+    """
+    protocol = CoalescingProtocol
+
+    def __init__(self, wrappedFactory, threshold=65536, cork=False):
+        self.threshold = threshold
+        self.cork = cork
+        WrappingFactory.__init__(self, wrappedFactory)
+
+
+    def callLater(self, period, func):
+        """
+        Wrapper around L{reactor.callLater} for test purpose.
+        """
+        from twisted.internet import reactor
+        return reactor.callLater(period, func)
+
+
+
 class TimeoutMixin:
     """
     Mixin for protocols which wish to timeout connections.
@@ -129,6 +129,23 @@ class LineTester(basic.LineReceiver):
 
 
 
+class LineCollector(basic.LineReceiver):
+    """
+    A line receiver which keeps the lines it receives.
+
+    @ivar lines: The lines received.
+    @type lines: C{list} of C{bytes}
+    """
+
+    def connectionMade(self):
+        self.lines = []
+
+
+    def lineReceived(self, line):
+        self.lines.append(line)
+
+
+
 class LineOnlyTester(basic.LineOnlyReceiver):
     """
     A buffering line only receiver.
@@ -292,6 +309,54 @@ a'''
         self.assertEqual(protocol.rest, b'')
 
 
+    def test_manyLinesInOneChunk(self):
+        """
+        Every complete line in the data passed to
+        L{LineReceiver.dataReceived} is delivered, and only the incomplete
+        line at the end remains buffered.
+        """
+        proto = LineCollector()
+        proto.makeConnection(proto_helpers.StringTransport())
+        proto.dataReceived(b''.join(
+                [b'line ' + str(i).encode('ascii') + b'\r\n'
+                 for i in range(2000)]) + b'partial')
+        self.assertEqual(
+            proto.lines,
+            [b'line ' + str(i).encode('ascii') for i in range(2000)])
+        self.assertEqual(proto.clearLineBuffer(), b'partial')
+
+
+    def test_delimiterSplitAcrossChunks(self):
+        """
+        A delimiter split between two calls to L{LineReceiver.dataReceived}
+        is found, even though the search for it resumes where the previous
+        search ended rather than at the start of the line.
+        """
+        proto = LineCollector()
+        proto.makeConnection(proto_helpers.StringTransport())
+        for chunk in [b'abc', b'def\r', b'\nghi\r', b'\n\r', b'\n']:
+            proto.dataReceived(chunk)
+        self.assertEqual(proto.lines, [b'abcdef', b'ghi', b''])
+
+
+    def test_delimiterChanged(self):
+        """
+        If the delimiter is changed by L{LineReceiver.lineReceived}, the
+        following lines are split using the new delimiter.
+        """
+        class SwitchingReceiver(basic.LineReceiver):
+            def connectionMade(self):
+                self.lines = []
+            def lineReceived(self, line):
+                self.lines.append(line)
+                self.delimiter = b'\n'
+
+        proto = SwitchingReceiver()
+        proto.makeConnection(proto_helpers.StringTransport())
+        proto.dataReceived(b'a\nb\r\nc\nd')
+        self.assertEqual(proto.lines, [b'a\nb', b'c'])
+
+
     def test_stackRecursion(self):
         """
         Test switching modes many times on the same data.
@@ -546,7 +611,87 @@ class LPTestCaseMixin:
 
 
 
-class NetstringReceiverTests(unittest.SynchronousTestCase, LPTestCaseMixin):
+class StringFramingMixin(object):
+    """
+    Mixin defining tests for the framing shared by L{basic.NetstringReceiver}
+    and L{basic.IntNStringReceiver}, to be combined with L{LPTestCaseMixin} on
+    a L{TestCase} subclass.
+    """
+
+    def frame(self, *strings):
+        """
+        Frame some strings as C{self.protocol} sends them.
+
+        @return: The framed strings.
+        @rtype: C{bytes}
+        """
+        sender = self.getProtocol()
+        for string in strings:
+            sender.sendString(string)
+        return sender.transport.value()
+
+
+    def test_stringsReceived(self):
+        """
+        If C{stringsReceived} is overridden, it is called once with all of
+        the complete strings in each chunk of data, instead of
+        C{stringReceived}.
+        """
+        r = self.getProtocol()
+        batches = []
+        r.stringsReceived = batches.append
+        data = self.frame(b"a", b"bb", b"ccc")
+        r.dataReceived(data[:-1])
+        r.dataReceived(data[-1:])
+        self.assertEqual(batches, [[b"a", b"bb"], [b"ccc"]])
+        self.assertEqual(r.received, [])
+
+
+    def test_stringsReceivedDefault(self):
+        """
+        By default, C{stringsReceived} calls C{stringReceived} with each
+        string.
+        """
+        r = self.getProtocol()
+        r.stringsReceived([b"a", b"bb"])
+        self.assertEqual(r.received, [b"a", b"bb"])
+
+
+    def test_stringsBeforeInvalidBatched(self):
+        """
+        If C{stringsReceived} is overridden, the strings received before an
+        invalid frame are delivered to it before the connection is closed.
+        """
+        r = self.getProtocol()
+        batches = []
+        r.stringsReceived = batches.append
+        r.dataReceived(self.frame(b"a", b"bb") + self.illegalStrings[0])
+        self.assertEqual(batches[0][:2], [b"a", b"bb"])
+        self.assertTrue(r.transport.disconnecting)
+
+
+    def test_memoryViews(self):
+        """
+        If C{deliverMemoryViews} is set, strings are delivered as
+        C{memoryview}s, which are unaffected by data received later.
+        """
+        r = self.getProtocol()
+        r.deliverMemoryViews = True
+        data = self.frame(b"a", b"bb", b"ccc")
+        r.dataReceived(data[:4])
+        r.dataReceived(data[4:-1])
+        r.dataReceived(data[-1:] + self.frame(b"dddd")[:2])
+        r.dataReceived(self.frame(b"dddd")[2:])
+        self.assertEqual(
+            [type(string) for string in r.received], [memoryview] * 4)
+        self.assertEqual(
+            [string.tobytes() for string in r.received],
+            [b"a", b"bb", b"ccc", b"dddd"])
+
+
+
+class NetstringReceiverTests(unittest.SynchronousTestCase, LPTestCaseMixin,
+                             StringFramingMixin):
     """
     Tests for L{twisted.protocols.basic.NetstringReceiver}.
     """
@@ -675,9 +820,9 @@ class NetstringReceiverTests(unittest.SynchronousTestCase, LPTestCaseMixin):
         Netstrings can be received in two portions.
         """
         self.netstringReceiver.dataReceived(b"4:aa")
+        self.assertEqual(self.netstringReceiver.received, [])
         self.netstringReceiver.dataReceived(b"aa,")
         self.assertEqual(self.netstringReceiver.received, [b"aaaa"])
-        self.assertTrue(self.netstringReceiver._payloadComplete())
 
 
     def test_receiveNetstringPortions_2(self):
@@ -706,7 +851,6 @@ class NetstringReceiverTests(unittest.SynchronousTestCase, LPTestCaseMixin):
         and the length specification of the second netstring.
         """
         self.netstringReceiver.dataReceived(b"1:a,1")
-        self.assertTrue(self.netstringReceiver._payloadComplete())
         self.assertEqual(self.netstringReceiver.received, [b"a"])
         self.netstringReceiver.dataReceived(b":b,")
         self.assertEqual(self.netstringReceiver.received, [b"a", b"b"])
@@ -723,49 +867,55 @@ class NetstringReceiverTests(unittest.SynchronousTestCase, LPTestCaseMixin):
         self.assertTrue(self.transport.disconnecting)
 
 
-    def test_consumeLength(self):
+    def test_lengthBorderCase1(self):
         """
-        C{_consumeLength} returns the expected length of the
-        netstring, including the trailing comma.
+        A netstring whose length is C{MAX_LENGTH} is received (border case).
         """
-        self.netstringReceiver._remainingData = b"12:"
-        self.netstringReceiver._consumeLength()
-        self.assertEqual(self.netstringReceiver._expectedPayloadSize, 13)
+        self.netstringReceiver.MAX_LENGTH = 12
+        self.netstringReceiver.dataReceived(b"12:" + b"a" * 12 + b",")
+        self.assertEqual(self.netstringReceiver.received, [b"a" * 12])
+        self.assertFalse(self.transport.disconnecting)
 
 
-    def test_consumeLengthBorderCase1(self):
+    def test_lengthBorderCase2(self):
         """
-        C{_consumeLength} works as expected if the length specification
-        contains the value of C{MAX_LENGTH} (border case).
+        A length specification which exceeds C{MAX_LENGTH} by 1 is refused
+        as soon as it is received (border case).
         """
-        self.netstringReceiver._remainingData = b"12:"
-        self.netstringReceiver.MAX_LENGTH = 12
-        self.netstringReceiver._consumeLength()
-        self.assertEqual(self.netstringReceiver._expectedPayloadSize, 13)
+        self.netstringReceiver.MAX_LENGTH = 11
+        self.netstringReceiver.dataReceived(b"12:")
+        self.assertTrue(self.transport.disconnecting)
+        self.assertTrue(self.netstringReceiver.brokenPeer)
 
 
-    def test_consumeLengthBorderCase2(self):
+    def test_lengthBorderCase3(self):
         """
-        C{_consumeLength} raises a L{basic.NetstringParseError} if
-        the length specification exceeds the value of C{MAX_LENGTH}
-        by 1 (border case).
+        A length specification which exceeds C{MAX_LENGTH} by more than 1 is
+        refused as soon as it is received.
         """
-        self.netstringReceiver._remainingData = b"12:"
         self.netstringReceiver.MAX_LENGTH = 11
-        self.assertRaises(basic.NetstringParseError,
-                          self.netstringReceiver._consumeLength)
+        self.netstringReceiver.dataReceived(b"1000:")
+        self.assertTrue(self.transport.disconnecting)
 
 
-    def test_consumeLengthBorderCase3(self):
+    def test_partialLengthTooLong(self):
         """
-        C{_consumeLength} raises a L{basic.NetstringParseError} if
-        the length specification exceeds the value of C{MAX_LENGTH}
-        by more than 1.
+        A partial length specification which already exceeds C{MAX_LENGTH} is
+        refused before its colon is received.
         """
-        self.netstringReceiver._remainingData = b"1000:"
         self.netstringReceiver.MAX_LENGTH = 11
-        self.assertRaises(basic.NetstringParseError,
-                          self.netstringReceiver._consumeLength)
+        self.netstringReceiver.dataReceived(b"100")
+        self.assertTrue(self.transport.disconnecting)
+
+
+    def test_stringsBeforeInvalidDelivered(self):
+        """
+        The netstrings received before an invalid one are delivered before
+        the connection is closed.
+        """
+        self.netstringReceiver.dataReceived(b"1:a,1:b,3aaa,")
+        self.assertEqual(self.netstringReceiver.received, [b"a", b"b"])
+        self.assertTrue(self.transport.disconnecting)
 
 
     def test_stringReceivedNotImplemented(self):
@@ -972,7 +1122,7 @@ class TestInt32(TestMixin, basic.Int32StringReceiver):
 
 
 class Int32Tests(unittest.SynchronousTestCase, IntNTestCaseMixin,
-                 RecvdAttributeMixin):
+                 RecvdAttributeMixin, StringFramingMixin):
     """
     Test case for int32-prefixed protocol
     """
@@ -1003,7 +1153,7 @@ class TestInt16(TestMixin, basic.Int16StringReceiver):
 
 
 class Int16Tests(unittest.SynchronousTestCase, IntNTestCaseMixin,
-                 RecvdAttributeMixin):
+                 RecvdAttributeMixin, StringFramingMixin):
     """
     Test case for int16-prefixed protocol
     """
@@ -1062,7 +1212,7 @@ class TestInt8(TestMixin, basic.Int8StringReceiver):
 
 
 class Int8Tests(unittest.SynchronousTestCase, IntNTestCaseMixin,
-                RecvdAttributeMixin):
+                RecvdAttributeMixin, StringFramingMixin):
     """
     Test case for int8-prefixed protocol
     """
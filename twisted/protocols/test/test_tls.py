@@ -13,6 +13,7 @@ from zope.interface import Interface, directlyProvides
 from twisted.python.compat import intToBytes, iterbytes
 try:
     from twisted.protocols.tls import TLSMemoryBIOProtocol, TLSMemoryBIOFactory
+    from twisted.protocols.tls import BufferingTLSTransport
     from twisted.protocols.tls import _PullToPush, _ProducerMembrane
 except ImportError:
     # Skip the whole test module if it can't be imported.
@@ -33,9 +34,10 @@ from twisted.python import log
 from twisted.internet.interfaces import ISystemHandle, ISSLTransport
 from twisted.internet.interfaces import IPushProducer
 from twisted.internet.error import ConnectionDone, ConnectionLost
+from twisted.internet import reactor
 from twisted.internet.defer import Deferred, gatherResults
 from twisted.internet.protocol import Protocol, ClientFactory, ServerFactory
-from twisted.internet.task import TaskStopped
+from twisted.internet.task import Clock, TaskStopped
 from twisted.protocols.loopback import loopbackAsync, collapsingPumpPolicy
 from twisted.trial.unittest import TestCase
 from twisted.test.test_tcp import ConnectionLostNotifyingProtocol
@@ -121,10 +123,13 @@ class AccumulatingProtocol(Protocol):
 
 
 
-def buildTLSProtocol(server=False, transport=None):
+def buildTLSProtocol(server=False, transport=None, clock=None):
     """
     Create a protocol hooked up to a TLS transport hooked up to a
     StringTransport.
+
+    If C{clock} is given, it is passed to the L{TLSMemoryBIOFactory}, so the
+    TLS transport is a L{BufferingTLSTransport}.
     """
     # We want to accumulate bytes without disconnecting, so set high limit:
     clientProtocol = AccumulatingProtocol(999999999999)
@@ -136,7 +141,7 @@ def buildTLSProtocol(server=False, transport=None):
     else:
         contextFactory = ClientTLSContext()
     wrapperFactory = TLSMemoryBIOFactory(
-        contextFactory, not server, clientFactory)
+        contextFactory, not server, clientFactory, clock=clock)
     sslProtocol = wrapperFactory.buildProtocol(None)
 
     if transport is None:
@@ -196,6 +201,19 @@ class TLSMemoryBIOFactoryTests(TestCase):
         self.assertEqual("NoFactory (TLS)", factory.logPrefix())
 
 
+    def test_clock(self):
+        """
+        L{TLSMemoryBIOFactory} wraps protocols with L{BufferingTLSTransport}
+        if it is given a clock, and with L{TLSMemoryBIOProtocol} otherwise.
+        """
+        contextFactory = ServerTLSContext()
+        factory = TLSMemoryBIOFactory(contextFactory, False, ServerFactory())
+        self.assertIs(factory.protocol, TLSMemoryBIOProtocol)
+        factory = TLSMemoryBIOFactory(
+            contextFactory, False, ServerFactory(), clock=Clock())
+        self.assertIs(factory.protocol, BufferingTLSTransport)
+
+
 
 class TLSMemoryBIOTests(TestCase):
     """
@@ -854,6 +872,265 @@ class TLSMemoryBIOTests(TestCase):
 
 
 
+class FakeTLSConnection(object):
+    """
+    A stand-in for an L{OpenSSL.SSL.Connection} which has finished its
+    handshake, "encrypting" application bytes by bracketing them.
+
+    @ivar sent: The application bytes passed to each call of C{send}.
+    @ivar _sendBIO: The "encrypted" bytes waiting to be read by C{bio_read}.
+    """
+
+    def __init__(self):
+        self.sent = []
+        self._sendBIO = []
+
+
+    def send(self, bytes):
+        self.sent.append(bytes)
+        self._sendBIO.append(b"<" + bytes + b">")
+        return len(bytes)
+
+
+    def bio_read(self, size):
+        if not self._sendBIO:
+            raise WantReadError()
+        return self._sendBIO.pop(0)
+
+
+    def shutdown(self):
+        self._sendBIO.append(b"<close>")
+        return False
+
+
+
+class CallRecordingTransport(StringTransport):
+    """
+    A L{StringTransport} which records how many times it is written to.
+
+    @ivar writes: The number of calls to C{write} and C{writeSequence}.
+    """
+    writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        StringTransport.write(self, data)
+
+
+    def writeSequence(self, data):
+        self.writes += 1
+        StringTransport.writeSequence(self, data)
+
+
+    def abortConnection(self):
+        self.loseConnection()
+
+
+
+def fakeTLSProtocol(clock=None):
+    """
+    Create a TLS transport connected to a L{CallRecordingTransport}, whose
+    handshake is over and whose TLS connection is a L{FakeTLSConnection}.
+
+    @param clock: Passed to L{buildTLSProtocol}.
+
+    @return: A 3-tuple of the TLS transport, the L{FakeTLSConnection} and the
+        L{CallRecordingTransport}.
+    """
+    transport = CallRecordingTransport()
+    clientProtocol, tlsProtocol = buildTLSProtocol(
+        transport=transport, clock=clock)
+    tlsConnection = FakeTLSConnection()
+    tlsProtocol._tlsConnection = tlsConnection
+    transport.clear()
+    transport.writes = 0
+    return tlsProtocol, tlsConnection, transport
+
+
+
+class TLSRecordTests(TestCase):
+    """
+    Tests for how L{TLSMemoryBIOProtocol} encrypts application bytes into TLS
+    records and sends them.
+    """
+
+    def test_fullRecords(self):
+        """
+        Application bytes are passed to the TLS connection in pieces which fill
+        a TLS record each.
+        """
+        tlsProtocol, tlsConnection, transport = fakeTLSProtocol()
+        recordSize = tlsProtocol._maxRecordSize
+        tlsProtocol.write(b"x" * (recordSize * 2 + 1))
+        self.assertEqual(
+            [len(bytes) for bytes in tlsConnection.sent],
+            [recordSize, recordSize, 1])
+
+
+    def test_oneTransportWrite(self):
+        """
+        All of the TLS records resulting from one write are sent to the
+        underlying transport with a single call.
+        """
+        tlsProtocol, tlsConnection, transport = fakeTLSProtocol()
+        recordSize = tlsProtocol._maxRecordSize
+        data = b"x" * (recordSize * 3)
+        tlsProtocol.write(data)
+        self.assertEqual(transport.writes, 1)
+        self.assertEqual(
+            transport.value(),
+            b"".join(b"<" + data[i:i + recordSize] + b">"
+                     for i in range(0, len(data), recordSize)))
+
+
+    def test_flushEveryFewRecords(self):
+        """
+        The TLS records resulting from a large write are sent to the
+        underlying transport as soon as C{_recordsPerFlush} of them have been
+        encrypted, rather than all at the end.
+        """
+        tlsProtocol, tlsConnection, transport = fakeTLSProtocol()
+        recordSize = tlsProtocol._maxRecordSize
+        tlsProtocol._recordsPerFlush = 2
+        sizes = []
+        write = transport.writeSequence
+        def writeSequence(data):
+            sizes.append(len(data))
+            write(data)
+        transport.writeSequence = writeSequence
+        data = b"x" * (recordSize * 5)
+        tlsProtocol.write(data)
+        self.assertEqual(transport.writes, 3)
+        self.assertEqual(sizes, [2, 2])
+        self.assertEqual(
+            transport.value(),
+            b"".join(b"<" + data[i:i + recordSize] + b">"
+                     for i in range(0, len(data), recordSize)))
+
+
+
+class BufferingTLSTransportTests(TestCase):
+    """
+    Tests for L{BufferingTLSTransport}.
+    """
+
+    def test_writesGathered(self):
+        """
+        Bytes written to a L{BufferingTLSTransport} are encrypted together
+        and sent at the end of the reactor iteration.
+        """
+        clock = Clock()
+        tlsProtocol, tlsConnection, transport = fakeTLSProtocol(clock)
+        tlsProtocol.write(b"a")
+        tlsProtocol.writeSequence([b"b", b"c"])
+        tlsProtocol.write(b"d")
+        self.assertEqual(tlsConnection.sent, [])
+        self.assertEqual(transport.value(), b"")
+        clock.advance(0)
+        self.assertEqual(tlsConnection.sent, [b"abcd"])
+        self.assertEqual(transport.value(), b"<abcd>")
+        self.assertEqual(transport.writes, 1)
+        self.assertEqual(clock.getDelayedCalls(), [])
+
+
+    def test_largeWritesSentImmediately(self):
+        """
+        Once enough bytes are waiting, they are sent without waiting for the
+        end of the reactor iteration.
+        """
+        clock = Clock()
+        tlsProtocol, tlsConnection, transport = fakeTLSProtocol(clock)
+        tlsProtocol.write(b"a")
+        tlsProtocol.write(b"b" * tlsProtocol._maxPendingSize)
+        self.assertEqual(
+            b"".join(tlsConnection.sent),
+            b"a" + b"b" * tlsProtocol._maxPendingSize)
+        self.assertEqual(clock.getDelayedCalls(), [])
+
+
+    def test_writeUnicodeRaisesTypeError(self):
+        """
+        Writing C{unicode} to a L{BufferingTLSTransport} raises C{TypeError}.
+        """
+        tlsProtocol, tlsConnection, transport = fakeTLSProtocol(Clock())
+        self.assertRaises(TypeError, tlsProtocol.write, u"hello")
+        self.assertRaises(TypeError, tlsProtocol.writeSequence, [u"hello"])
+
+
+    def test_loseConnectionSendsPendingWrites(self):
+        """
+        L{BufferingTLSTransport.loseConnection} sends the pending writes
+        before the TLS close alert, and later writes are dropped.
+        """
+        clock = Clock()
+        tlsProtocol, tlsConnection, transport = fakeTLSProtocol(clock)
+        tlsProtocol.write(b"a")
+        tlsProtocol.loseConnection()
+        tlsProtocol.write(b"b")
+        clock.advance(0)
+        self.assertEqual(transport.value(), b"<a><close>")
+
+
+    def test_abortConnectionDiscardsPendingWrites(self):
+        """
+        L{BufferingTLSTransport.abortConnection} discards the pending writes.
+        """
+        clock = Clock()
+        tlsProtocol, tlsConnection, transport = fakeTLSProtocol(clock)
+        tlsProtocol.write(b"a")
+        tlsProtocol.abortConnection()
+        self.assertEqual(tlsConnection.sent, [])
+        self.assertEqual(clock.getDelayedCalls(), [])
+
+
+    def test_connectionLostDiscardsPendingWrites(self):
+        """
+        When the connection is lost, the pending writes are discarded and
+        sending them is no longer scheduled.
+        """
+        clock = Clock()
+        tlsProtocol, tlsConnection, transport = fakeTLSProtocol(clock)
+        tlsProtocol.write(b"a")
+        tlsProtocol._lostTLSConnection = True
+        tlsProtocol.connectionLost(Failure(ConnectionDone()))
+        self.assertEqual(tlsConnection.sent, [])
+        self.assertEqual(clock.getDelayedCalls(), [])
+
+
+    def test_loopback(self):
+        """
+        Bytes written to a L{BufferingTLSTransport} in many small writes are
+        received by the protocol on the other side of the connection.
+        """
+        data = [intToBytes(i) for i in range(1000)]
+
+        class SimpleSendingProtocol(Protocol):
+            def connectionMade(self):
+                for bytes in data:
+                    self.transport.write(bytes)
+
+        clientFactory = ClientFactory()
+        clientFactory.protocol = SimpleSendingProtocol
+        wrapperFactory = TLSMemoryBIOFactory(
+            ClientTLSContext(), True, clientFactory, clock=reactor)
+        sslClientProtocol = wrapperFactory.buildProtocol(None)
+
+        serverProtocol = AccumulatingProtocol(len(b"".join(data)))
+        serverFactory = ServerFactory()
+        serverFactory.protocol = lambda: serverProtocol
+        wrapperFactory = TLSMemoryBIOFactory(
+            ServerTLSContext(), False, serverFactory)
+        sslServerProtocol = wrapperFactory.buildProtocol(None)
+
+        connectionDeferred = loopbackAsync(sslServerProtocol, sslClientProtocol)
+
+        def cbConnectionDone(ignored):
+            self.assertEqual(b"".join(serverProtocol.received), b"".join(data))
+        connectionDeferred.addCallback(cbConnectionDone)
+        return connectionDeferred
+
+
+
 class TLSProducerTests(TestCase):
     """
     The TLS transport must support the IConsumer interface.
@@ -1087,6 +1364,7 @@ class TLSProducerTests(TestCase):
         class TLSConnection(object):
             def __init__(self):
                 self.l = []
+                self.unread = False
 
             def send(self, bytes):
                 # on first write, don't send all bytes:
@@ -1098,12 +1376,17 @@ class TLSProducerTests(TestCase):
                     raise WantReadError()
                 # otherwise just take in data:
                 self.l.append(bytes)
+                self.unread = True
                 return len(bytes)
 
             def bio_write(self, data):
                 pass
 
             def bio_read(self, size):
+                # each send puts one byte in the send BIO, until it is read:
+                if not self.unread:
+                    raise WantReadError()
+                self.unread = False
                 return b'X'
 
             def recv(self, size):
@@ -28,6 +28,11 @@ implement SSL and TLS.  Typical usage of this module looks like this::
     reactor.listenTCP(12345, tlsFactory)
     reactor.run()
 
+When a L{TLSMemoryBIOFactory} is given a clock, as the reactor's
+C{listenSSL} and C{connectSSL} do, it wraps protocols with
+L{BufferingTLSTransport} instead, which gathers the writes made during one
+reactor iteration into full TLS records.
+
 This API offers somewhat more flexibility than
 L{twisted.internet.interfaces.IReactorSSL}; for example, a
 L{TLSMemoryBIOProtocol} instance can use another instance of
@@ -267,8 +272,20 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
     @ivar _aborted: C{abortConnection} has been called.  No further data will
         be received to the wrapped protocol's C{dataReceived}.
     @type _aborted: L{bool}
+
+    @ivar _maxRecordSize: The most application data which is passed to
+        C{_tlsConnection.send} at once: the largest amount one TLS record can
+        hold.
+    @type _maxRecordSize: L{int}
+
+    @ivar _recordsPerFlush: The number of TLS records which are encrypted
+        before they are sent to the underlying transport, so that a large
+        write does not gather all of its ciphertext in memory at once.
+    @type _recordsPerFlush: L{int}
     """
 
+    _maxRecordSize = 2 ** 14
+    _recordsPerFlush = 16
     _reason = None
     _handshakeDone = False
     _lostTLSConnection = False
@@ -331,16 +348,20 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
 
     def _flushSendBIO(self):
         """
-        Read any bytes out of the send BIO and write them to the underlying
-        transport.
+        Read all of the bytes out of the send BIO and write them to the
+        underlying transport with a single call.
         """
-        try:
-            bytes = self._tlsConnection.bio_read(2 ** 15)
-        except WantReadError:
-            # There may be nothing in the send BIO right now.
-            pass
-        else:
-            self.transport.write(bytes)
+        chunks = []
+        while True:
+            try:
+                chunks.append(self._tlsConnection.bio_read(2 ** 16))
+            except WantReadError:
+                # There is nothing (more) in the send BIO right now.
+                break
+        if len(chunks) == 1:
+            self.transport.write(chunks[0])
+        elif chunks:
+            self.transport.writeSequence(chunks)
 
 
     def _flushReceiveBIO(self):
@@ -535,6 +556,10 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
         Process the given application bytes and send any resulting TLS traffic
         which arrives in the send BIO.
 
+        The bytes are encrypted in pieces of L{_maxRecordSize}, so that each
+        one fills a TLS record, and the resulting records are sent to the
+        underlying transport together, L{_recordsPerFlush} at a time.
+
         This may be called by C{dataReceived} with bytes that were buffered
         before C{loseConnection} was called, which is why this function
         doesn't check for disconnection but accepts the bytes regardless.
@@ -542,11 +567,12 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
         if self._lostTLSConnection:
             return
 
-        # A TLS payload is 16kB max
-        bufferSize = 2 ** 16
+        bufferSize = self._maxRecordSize
 
         # How far into the input we've gotten so far
         alreadySent = 0
+        # How many records have been encrypted since the send BIO was flushed
+        records = 0
 
         while alreadySent < len(bytes):
             toSend = bytes[alreadySent:alreadySent + bufferSize]
@@ -563,15 +589,23 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
                 # disconnect of underlying transport. The error will be passed
                 # to the application protocol's connectionLost method.  The
                 # other SSL implementation doesn't, but losing helpful
-                # debugging information is a bad idea.
-                self._tlsShutdownFinished(Failure())
-                break
+                # debugging information is a bad idea.  The Failure is
+                # created before flushing the records which were already
+                # encrypted, since that handles an exception of its own.
+                failure = Failure()
+                self._flushSendBIO()
+                self._tlsShutdownFinished(failure)
+                return
             else:
                 # If we sent some bytes, the handshake must be done.  Keep
                 # track of this to control error reporting behavior.
                 self._handshakeDone = True
-                self._flushSendBIO()
                 alreadySent += sent
+                records += 1
+                if records == self._recordsPerFlush:
+                    records = 0
+                    self._flushSendBIO()
+        self._flushSendBIO()
 
 
     def writeSequence(self, iovec):
@@ -619,6 +653,154 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
 
 
 
+class BufferingTLSTransport(TLSMemoryBIOProtocol):
+    """
+    A L{TLSMemoryBIOProtocol} which gathers the application's writes until the
+    end of the current reactor iteration.
+
+    Writing many small strings directly to a L{TLSMemoryBIOProtocol} encrypts
+    each of them into a TLS record of its own and writes each record to the
+    underlying transport separately.  This transport instead encrypts all of
+    the strings written during one reactor iteration together, so that they
+    fill as few records as possible, and sends those records with one write.
+    Once L{_maxPendingSize} bytes are waiting they are sent at once.
+
+    The clock used to schedule sending is the C{_clock} of the factory.
+
+    @ivar _pendingWrites: The application bytes which have been written but
+        not yet encrypted.
+    @type _pendingWrites: L{list} of L{bytes}
+
+    @ivar _pendingSize: The total length of C{_pendingWrites}.
+    @type _pendingSize: L{int}
+
+    @ivar _flushCall: The L{IDelayedCall} which will encrypt and send
+        C{_pendingWrites}, or C{None} if none is scheduled.
+
+    @ivar _maxPendingSize: How many bytes may wait to be sent before they are
+        sent without waiting for the end of the reactor iteration.
+    @type _maxPendingSize: L{int}
+
+    @since: 15.3
+    """
+
+    _maxPendingSize = 2 ** 16
+    _flushCall = None
+
+    def __init__(self, factory, wrappedProtocol, _connectWrapped=True):
+        TLSMemoryBIOProtocol.__init__(
+            self, factory, wrappedProtocol, _connectWrapped)
+        self._pendingWrites = []
+        self._pendingSize = 0
+
+
+    def write(self, bytes):
+        """
+        Buffer the given application bytes to be encrypted and sent at the end
+        of the current reactor iteration.
+
+        If C{loseConnection} was called, subsequent calls to C{write} will
+        drop the bytes on the floor.
+        """
+        if isinstance(bytes, unicode):
+            raise TypeError("Must write bytes to a TLS transport, not unicode.")
+        if self.disconnecting and self._producer is None:
+            return
+        self._pendingWrites.append(bytes)
+        self._pendingSize += len(bytes)
+        self._scheduleFlush()
+
+
+    def writeSequence(self, iovec):
+        """
+        Buffer a sequence of application bytes to be encrypted and sent at the
+        end of the current reactor iteration.
+        """
+        if self.disconnecting and self._producer is None:
+            return
+        for bytes in iovec:
+            if isinstance(bytes, unicode):
+                raise TypeError(
+                    "Must write bytes to a TLS transport, not unicode.")
+            self._pendingWrites.append(bytes)
+            self._pendingSize += len(bytes)
+        self._scheduleFlush()
+
+
+    def _scheduleFlush(self):
+        """
+        Arrange for the pending writes to be sent: now if there are too many
+        of them, otherwise at the end of the reactor iteration.
+        """
+        if self._pendingSize >= self._maxPendingSize:
+            self._flushPendingWrites()
+        elif self._flushCall is None:
+            self._flushCall = self.factory._clock.callLater(
+                0, self._flushPendingWrites)
+
+
+    def _cancelFlush(self):
+        """
+        Cancel the scheduled sending of the pending writes, if there is one.
+        """
+        if self._flushCall is not None:
+            if self._flushCall.active():
+                self._flushCall.cancel()
+            self._flushCall = None
+
+
+    def _flushPendingWrites(self):
+        """
+        Encrypt the pending writes and send the resulting TLS records.
+        """
+        self._cancelFlush()
+        if self._pendingWrites:
+            pendingWrites = self._pendingWrites
+            self._pendingWrites = []
+            self._pendingSize = 0
+            self._write(b"".join(pendingWrites))
+
+
+    def loseConnection(self):
+        """
+        Send any pending writes, then send a TLS close alert and close the
+        underlying connection.
+        """
+        if not self.disconnecting:
+            self._flushPendingWrites()
+        TLSMemoryBIOProtocol.loseConnection(self)
+
+
+    def abortConnection(self):
+        """
+        Discard any pending writes and tear down the connection.
+        """
+        self._cancelFlush()
+        self._pendingWrites = []
+        self._pendingSize = 0
+        TLSMemoryBIOProtocol.abortConnection(self)
+
+
+    def unregisterProducer(self):
+        """
+        Send any pending writes before unregistering the producer, which may
+        complete a delayed C{loseConnection}.
+        """
+        self._flushPendingWrites()
+        TLSMemoryBIOProtocol.unregisterProducer(self)
+
+
+    def connectionLost(self, reason):
+        """
+        Discard any pending writes, which can no longer be sent.
+        """
+        self._cancelFlush()
+        self._pendingWrites = []
+        self._pendingSize = 0
+        TLSMemoryBIOProtocol.connectionLost(self, reason)
+
+
+
 @implementer(IOpenSSLClientConnectionCreator, IOpenSSLServerConnectionCreator)
 class _ContextFactoryToConnectionFactory(object):
     """
@@ -712,12 +894,15 @@ class TLSMemoryBIOFactory(WrappingFactory):
         object.
     @type _connectionCreator: 1-argument callable taking
         L{TLSMemoryBIOProtocol} and returning L{OpenSSL.SSL.Connection}.
+
+    @ivar _clock: The L{IReactorTime} provider which L{BufferingTLSTransport}
+        uses to send writes at the end of a reactor iteration, or C{None}.
     """
     protocol = TLSMemoryBIOProtocol
 
     noisy = False  # disable unnecessary logging.
 
-    def __init__(self, contextFactory, isClient, wrappedFactory):
+    def __init__(self, contextFactory, isClient, wrappedFactory, clock=None):
         """
         Create a L{TLSMemoryBIOFactory}.
 
@@ -758,8 +943,17 @@ class TLSMemoryBIOFactory(WrappingFactory):
         @param wrappedFactory: A factory which will create the
             application-level protocol.
         @type wrappedFactory: L{twisted.internet.interfaces.IProtocolFactory}
+
+        @param clock: If not C{None}, protocols are wrapped with
+            L{BufferingTLSTransport}, which uses this to send the writes made
+            during one reactor iteration together, unless a subclass has set
+            a different C{protocol}.
+        @type clock: L{twisted.internet.interfaces.IReactorTime} provider
         """
         WrappingFactory.__init__(self, wrappedFactory)
+        self._clock = clock
+        if clock is not None and self.protocol is TLSMemoryBIOProtocol:
+            self.protocol = BufferingTLSTransport
         if isClient:
             creatorInterface = IOpenSSLClientConnectionCreator
         else:
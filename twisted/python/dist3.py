@@ -49,6 +49,7 @@ modules = [
     "twisted.internet",
     "twisted.internet._baseprocess",
     "twisted.internet._glibbase",
+    "twisted.internet._mmsg",
     "twisted.internet._newtls",
     "twisted.internet._posixstdio",
     "twisted.internet._signals",
@@ -63,6 +64,7 @@ modules = [
     "twisted.internet.fdesc",
     "twisted.internet.gireactor",
     "twisted.internet.gtk3reactor",
+    "twisted.internet.instrumentation",
     "twisted.internet.interfaces",
     "twisted.internet.kqreactor",
     "twisted.internet.main",
@@ -199,7 +201,9 @@ testModules = [
     "twisted.internet.test.test_gireactor",
     "twisted.internet.test.test_glibbase",
     "twisted.internet.test.test_inlinecb",
+    "twisted.internet.test.test_instrumentation",
     "twisted.internet.test.test_main",
+    "twisted.internet.test.test_mmsg",
     "twisted.internet.test.test_newtls",
     "twisted.internet.test.test_posixbase",
     "twisted.internet.test.test_posixprocess",
@@ -142,6 +142,89 @@ class _Code(object):
         self.co_filename = filename
 
 
+class _LazyAttribute(object):
+    """
+    A non-data descriptor for an attribute of L{Failure} which is expensive to
+    compute and often not needed.  The attribute is computed the first time it
+    is read and stored on the instance, which then takes precedence over the
+    descriptor.  It may also be assigned directly.
+
+    @ivar name: The name of the attribute.
+    @ivar compute: A callable which takes the instance and returns the value
+        of the attribute.
+    """
+
+    def __init__(self, name, compute):
+        self.name = name
+        self.compute = compute
+
+
+    def __get__(self, oself, type=None):
+        if oself is None:
+            return self
+        value = self.compute(oself)
+        oself.__dict__[self.name] = value
+        return value
+
+
+
+def _framesFromTraceback(tb, captureVars):
+    """
+    Extract the frames of a traceback, innermost first, in the format of
+    L{Failure.frames}.
+
+    @param tb: A traceback, or C{None}.
+
+    @param captureVars: Whether to capture the locals and globals of each
+        frame.
+
+    @return: A list of frames.
+    """
+    frames = []
+    while tb is not None:
+        f = tb.tb_frame
+        if captureVars:
+            localz = f.f_locals.copy()
+            if f.f_locals is f.f_globals:
+                globalz = {}
+            else:
+                globalz = f.f_globals.copy()
+            for d in globalz, localz:
+                if "__builtins__" in d:
+                    del d["__builtins__"]
+            localz = list(localz.items())
+            globalz = list(globalz.items())
+        else:
+            localz = globalz = ()
+        frames.append((
+            f.f_code.co_name,
+            f.f_code.co_filename,
+            tb.tb_lineno,
+            localz,
+            globalz,
+            ))
+        tb = tb.tb_next
+    return frames
+
+
+
+def _linesFromTraceback(tb):
+    """
+    Extract the code object and line number of each frame of a traceback,
+    innermost first, without keeping references to the frames themselves.
+
+    @param tb: A traceback, or C{None}.
+
+    @return: A list of C{(code, lineNumber)} tuples.
+    """
+    lines = []
+    while tb is not None:
+        lines.append((tb.tb_frame.f_code, tb.tb_lineno))
+        tb = tb.tb_next
+    return lines
+
+
+
 class Failure:
     """
     A basic abstraction for an error that has occurred.
@@ -155,10 +238,21 @@ class Failure:
     C{locals().items()}/C{globals().items()} for that frame, or an empty tuple
     if those details were not captured.
 
+    Unless locals and globals are being captured, C{frames} and C{parents}
+    are only computed when they are first used, for example by
+    L{getTraceback} or when the failure is pickled; until then the failure
+    holds on to the traceback or, once L{cleanFailure} has been called, to
+    the code object and line number of each of its frames.  A failure which
+    is created and trapped, even in a L{Deferred} errback, therefore never
+    pays for them.
+
     @ivar value: The exception instance responsible for this failure.
     @ivar type: The exception's class.
     @ivar stack: list of frames, innermost last, excluding C{Failure.__init__}.
     @ivar frames: list of frames, innermost first.
+    @ivar parents: the fully qualified names of the classes in the method
+        resolution order of C{type}, or C{[type]} if it is not an exception
+        class.
     """
 
     pickled = 0
@@ -231,8 +325,7 @@ class Failure:
             elif _PY3:
                 tb = self.value.__traceback__
 
-        frames = self.frames = []
-        stack = self.stack = []
+        stack = []
 
         # added 2003-06-23 by Chris Armstrong. Yes, I actually have a
         # use case where I need this traceback object, and I've made
@@ -275,7 +368,7 @@ class Failure:
                 globalz = globalz.items()
             else:
                 localz = globalz = ()
-            stack.insert(0, (
+            stack.append((
                 f.f_code.co_name,
                 f.f_code.co_filename,
                 f.f_lineno,
@@ -283,35 +376,48 @@ class Failure:
                 globalz,
                 ))
             f = f.f_back
+        stack.reverse()
+        self.stack = stack
 
-        while tb is not None:
-            f = tb.tb_frame
-            if captureVars:
-                localz = f.f_locals.copy()
-                if f.f_locals is f.f_globals:
-                    globalz = {}
-                else:
-                    globalz = f.f_globals.copy()
-                for d in globalz, localz:
-                    if "__builtins__" in d:
-                        del d["__builtins__"]
-                localz = list(localz.items())
-                globalz = list(globalz.items())
-            else:
-                localz = globalz = ()
-            frames.append((
-                f.f_code.co_name,
-                f.f_code.co_filename,
-                tb.tb_lineno,
-                localz,
-                globalz,
-                ))
-            tb = tb.tb_next
+        if tb is None:
+            self.frames = []
+        elif captureVars:
+            # Locals and globals may change, so capture them now.
+            self.frames = _framesFromTraceback(tb, captureVars)
+        else:
+            # Tracebacks do not change, so the frames can be extracted later
+            # if they are needed.
+            self._framesTraceback = tb
+
+
+    def _computeFrames(self):
+        """
+        Extract C{frames} from the traceback this failure was created with,
+        or from what L{cleanFailure} kept of it.
+        """
+        lines = self.__dict__.pop('_framesLines', None)
+        if lines is not None:
+            # In the form cleanFailure would have given the frames.
+            return [
+                [code.co_name, code.co_filename, lineNumber, [], []]
+                for (code, lineNumber) in lines]
+        return _framesFromTraceback(
+            self.__dict__.pop('_framesTraceback', None), False)
+
+    frames = _LazyAttribute('frames', _computeFrames)
+
+
+    def _computeParents(self):
+        """
+        Compute C{parents} from C{type}.
+        """
         if inspect.isclass(self.type) and issubclass(self.type, Exception):
             parentCs = getmro(self.type)
-            self.parents = list(map(reflect.qual, parentCs))
+            return list(map(reflect.qual, parentCs))
         else:
-            self.parents = [self.type]
+            return [self.type]
+
+    parents = _LazyAttribute('parents', _computeParents)
 
     def trap(self, *errorTypes):
         """Trap this failure if its type is in a predetermined list.
@@ -351,6 +457,12 @@ class Failure:
                           fully-qualified class names.
         @returns: the matching L{Exception} type, or None if no match.
         """
+        if 'parents' not in self.__dict__ and inspect.isclass(self.type):
+            # Avoid computing parents when the type matches outright.
+            for error in errorTypes:
+                if (inspect.isclass(error) and issubclass(error, Exception)
+                        and issubclass(self.type, error)):
+                    return error
         for error in errorTypes:
             err = error
             if inspect.isclass(error) and issubclass(error, Exception):
@@ -456,17 +568,35 @@ class Failure:
     def __getstate__(self):
         """Avoid pickling objects in the traceback.
         """
+        # Neither can be computed once the failure has been unpickled.
+        self.frames
+        self.parents
+        return self._cleanState()
+
+
+    def _cleanState(self):
+        """
+        Get the state of this failure without references to the objects in
+        its traceback, leaving C{frames} and C{parents} to be computed later
+        if they have not been yet.
+
+        @return: A L{dict} to use as C{__dict__}.
+        """
         if self.pickled:
             return self.__dict__
         c = self.__dict__.copy()
+        tb = c.pop('_framesTraceback', None)
+        if tb is not None:
+            c['_framesLines'] = _linesFromTraceback(tb)
 
-        c['frames'] = [
-            [
-                v[0], v[1], v[2],
-                _safeReprVars(v[3]),
-                _safeReprVars(v[4]),
-            ] for v in self.frames
-        ]
+        if 'frames' in c:
+            c['frames'] = [
+                [
+                    v[0], v[1], v[2],
+                    _safeReprVars(v[3]),
+                    _safeReprVars(v[4]),
+                ] for v in c['frames']
+            ]
 
         # added 2003-06-23. See comment above in __init__
         c['tb'] = None
@@ -490,10 +620,14 @@ class Failure:
         """
         Remove references to other objects, replacing them with strings.
 
+        C{frames} and C{parents} are not computed by this if they have not
+        been yet; only the code object and line number of each frame of the
+        traceback are kept to compute C{frames} from.
+
         On Python 3, this will also set the C{__traceback__} attribute of the
         exception instance to C{None}.
         """
-        self.__dict__ = self.__getstate__()
+        self.__dict__ = self._cleanState()
         if _PY3:
             self.value.__traceback__ = None
 
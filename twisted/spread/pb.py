@@ -413,6 +413,9 @@ class CopyableFailure(failure.Failure, Copyable):
         state which cannot reasonably be serialized.
         """
         state = self.__dict__.copy()
+        state.pop('_framesTraceback', None)
+        state.pop('_framesLines', None)
+        state['parents'] = self.parents
         state['tb'] = None
         state['frames'] = []
         state['stack'] = []
@@ -3078,6 +3078,386 @@ class DescriptorTests(unittest.TestCase):
 
 
 
+class StreamUpload(amp.Command):
+    """
+    A command with a L{amp.Stream} argument.
+    """
+    arguments = [('contents', amp.Stream())]
+    response = [('length', amp.Integer())]
+
+
+
+class StreamRejected(amp.Command):
+    """
+    A command with a L{amp.Stream} argument which L{StreamingProtocol} does
+    not respond to.
+    """
+    arguments = [('contents', amp.Stream())]
+
+
+
+class StreamFailed(amp.Command):
+    """
+    A command with a L{amp.Stream} argument which L{StreamingProtocol}
+    takes delivery of and then fails.
+    """
+    arguments = [('contents', amp.Stream())]
+    errors = {ZeroDivisionError: 'ZERO'}
+
+
+
+class StreamIgnored(amp.Command):
+    """
+    A command with a L{amp.Stream} argument which L{StreamingProtocol}
+    ignores.
+    """
+    arguments = [('contents', amp.Stream())]
+    response = []
+
+
+
+class StreamDownload(amp.Command):
+    """
+    A command with a L{amp.Stream} response.
+    """
+    arguments = []
+    response = [('contents', amp.Stream(window=2 ** 16))]
+
+
+
+class StreamSource(object):
+    """
+    A source for an L{amp.Stream} argument which records what is done to it.
+
+    @ivar consumer: the consumer passed to C{startProducing}, or C{None}.
+    @ivar finished: the L{Deferred} returned by C{startProducing}.
+    @ivar paused: whether the source is currently paused.
+    @ivar stopped: whether the source has been stopped.
+    """
+    consumer = None
+    finished = None
+    paused = False
+    stopped = False
+
+    def startProducing(self, consumer):
+        self.consumer = consumer
+        self.finished = defer.Deferred()
+        return self.finished
+
+
+    def pauseProducing(self):
+        self.paused = True
+
+
+    def resumeProducing(self):
+        self.paused = False
+
+
+    def stopProducing(self):
+        self.stopped = True
+
+
+
+class StreamingProtocol(amp.AMP):
+    """
+    A protocol which collects uploaded streams and serves a stream for
+    download.
+
+    @ivar streams: the receiving ends of the streams uploaded to this
+        protocol.
+    @ivar source: the L{StreamSource} served by L{StreamDownload}.
+    """
+    def __init__(self):
+        amp.AMP.__init__(self)
+        self.streams = []
+        self.source = StreamSource()
+
+
+    def upload(self, contents):
+        self.streams.append(contents)
+        self.consumer = StringTransport()
+        d = contents.deliverTo(self.consumer)
+        return d.addCallback(
+            lambda ignored: {'length': len(self.consumer.value())})
+    StreamUpload.responder(upload)
+
+
+    def download(self):
+        return {'contents': self.source}
+    StreamDownload.responder(download)
+
+
+    def fail(self, contents):
+        self.streams.append(contents)
+        self.consumer = StringTransport()
+        self.delivered = contents.deliverTo(self.consumer)
+        raise ZeroDivisionError()
+    StreamFailed.responder(fail)
+
+
+    def ignore(self, contents):
+        self.streams.append(contents)
+        return {}
+    StreamIgnored.responder(ignore)
+
+
+
+class StreamTests(unittest.TestCase):
+    """
+    Tests for L{amp.Stream}.
+    """
+    def setUp(self):
+        self.client, self.server, self.pump = connectedServerAndClient(
+            ServerClass=StreamingProtocol, ClientClass=StreamingProtocol)
+
+
+    def upload(self):
+        """
+        Start uploading a stream from the client to the server.
+
+        @return: a two-tuple of the L{StreamSource} and a list which will
+            receive the result of the command.
+        """
+        source = StreamSource()
+        results = []
+        self.client.callRemote(StreamUpload, contents=source).addBoth(
+            results.append)
+        self.pump.flush()
+        return source, results
+
+
+    def test_roundTrip(self):
+        """
+        Data written by the source of a stream is delivered to the consumer
+        on the other side, and the L{Deferred} returned by C{deliverTo} fires
+        once the source finishes.
+        """
+        source, results = self.upload()
+        source.consumer.write('hello, ')
+        source.consumer.write('world')
+        self.pump.flush()
+        self.assertEqual(self.server.consumer.value(), 'hello, world')
+        self.assertEqual(results, [])
+        source.finished.callback(None)
+        self.pump.flush()
+        self.assertEqual(results, [{'length': 12}])
+        self.assertIdentical(self.server.consumer.producer, None)
+
+
+    def test_largeWrite(self):
+        """
+        A write larger than L{amp.MAX_VALUE_LENGTH} is split into several
+        frames.
+        """
+        source, results = self.upload()
+        data = 'x' * (amp.MAX_VALUE_LENGTH * 3 + 7)
+        source.consumer.write(data)
+        source.finished.callback(None)
+        self.pump.flush()
+        self.assertEqual(self.server.consumer.value(), data)
+        self.assertEqual(results, [{'length': len(data)}])
+
+
+    def test_interleaved(self):
+        """
+        Other commands can be issued and answered while a stream is in
+        progress.
+        """
+        source, results = self.upload()
+        source.consumer.write('a' * 100)
+        answers = []
+        self.client.callRemote(StreamDownload).addCallback(answers.append)
+        source.consumer.write('b' * 100)
+        self.pump.flush()
+        self.assertEqual(len(answers), 1)
+        self.assertEqual(self.server.consumer.value(), 'a' * 100 + 'b' * 100)
+
+
+    def test_startsWhenConsumerAttached(self):
+        """
+        The source is not started until the receiver attaches a consumer.
+        """
+        answers = []
+        self.client.callRemote(StreamDownload).addCallback(answers.append)
+        self.pump.flush()
+        self.assertIdentical(self.server.source.consumer, None)
+        consumer = StringTransport()
+        done = answers[0]['contents'].deliverTo(consumer)
+        self.pump.flush()
+        self.server.source.consumer.write('data')
+        self.server.source.finished.callback(None)
+        self.pump.flush()
+        self.assertEqual(consumer.value(), 'data')
+        self.assertEqual(self.successResultOf(done), None)
+
+
+    def test_flowControl(self):
+        """
+        The source is paused once it has written a window's worth of data the
+        consumer has not accepted, and resumed when the consumer resumes the
+        receiving end of the stream.
+        """
+        source, results = self.upload()
+        stream = self.server.streams[0]
+        stream.pauseProducing()
+        source.consumer.write('x' * stream.window)
+        self.pump.flush()
+        self.assertTrue(source.paused)
+        stream.resumeProducing()
+        self.pump.flush()
+        self.assertFalse(source.paused)
+
+
+    def test_creditGrantedAsConsumed(self):
+        """
+        The source is never paused if the consumer keeps up with it.
+        """
+        source, results = self.upload()
+        window = self.server.streams[0].window
+        for i in range(4):
+            source.consumer.write('x' * (window // 2))
+            self.pump.flush()
+            self.assertFalse(source.paused)
+
+
+    def test_pullProducer(self):
+        """
+        A non-streaming producer registered by the source is asked for data
+        for as long as the receiver has granted credit.
+        """
+        from twisted.protocols.basic import FileSender
+        from StringIO import StringIO
+        data = 'y' * (2 ** 20)
+
+        class FileSource(object):
+            def startProducing(self, consumer):
+                return FileSender().beginFileTransfer(StringIO(data), consumer)
+
+        results = []
+        self.client.callRemote(StreamUpload, contents=FileSource()).addBoth(
+            results.append)
+        self.pump.flush()
+        self.assertEqual(results, [{'length': len(data)}])
+        self.assertEqual(self.server.consumer.value(), data)
+
+
+    def test_stopProducing(self):
+        """
+        Stopping the receiving end of a stream stops the source and fails the
+        L{Deferred} returned by C{deliverTo}.
+        """
+        source, results = self.upload()
+        self.server.streams[0].stopProducing()
+        self.pump.flush()
+        self.assertTrue(source.stopped)
+        self.assertEqual(len(results), 1)
+        results[0].trap(amp.UnknownRemoteError)
+        self.flushLoggedErrors()
+
+
+    def test_sourceFailed(self):
+        """
+        If the source fails, the failure is logged and the L{Deferred}
+        returned by C{deliverTo} fails with L{amp.UnknownRemoteError}.
+        """
+        answers = []
+        self.client.callRemote(StreamDownload).addCallback(answers.append)
+        self.pump.flush()
+        done = answers[0]['contents'].deliverTo(StringTransport())
+        self.pump.flush()
+        self.server.source.finished.errback(RuntimeError("broken"))
+        self.pump.flush()
+        self.failureResultOf(done, amp.UnknownRemoteError)
+        self.assertEqual(len(self.flushLoggedErrors(RuntimeError)), 1)
+
+
+    def test_connectionLost(self):
+        """
+        If the connection is lost, the source is stopped and the L{Deferred}
+        returned by C{deliverTo} fails.
+        """
+        source, results = self.upload()
+        self.client.transport.loseConnection()
+        self.pump.flush()
+        self.assertTrue(source.stopped)
+        self.assertIsInstance(results[0], Failure)
+        # The responder's failure is logged by the server.
+        self.assertEqual(len(self.flushLoggedErrors(error.ConnectionDone)), 1)
+
+
+    def test_commandRejected(self):
+        """
+        The sending end of a stream is forgotten if the command it is an
+        argument of fails, because the stream will never be read.
+        """
+        source = StreamSource()
+        failures = []
+        self.client.callRemote(StreamRejected, contents=source).addErrback(
+            failures.append)
+        self.assertEqual(len(self.client._outgoingStreams), 1)
+        self.pump.flush()
+        failures[0].trap(amp.UnhandledCommand)
+        self.assertEqual(self.client._outgoingStreams, {})
+        self.assertIdentical(source.consumer, None)
+
+
+    def test_commandFailed(self):
+        """
+        If a command fails after the responder has taken delivery of a
+        stream among its arguments, the sender ends the stream with an
+        error, so the L{Deferred} returned by C{deliverTo} fails.
+        """
+        source = StreamSource()
+        failures = []
+        self.client.callRemote(StreamFailed, contents=source).addErrback(
+            failures.append)
+        self.pump.flush()
+        failures[0].trap(ZeroDivisionError)
+        self.assertEqual(self.client._outgoingStreams, {})
+        self.assertEqual(self.server._incomingStreams, {})
+        self.failureResultOf(self.server.delivered, amp.UnknownRemoteError)
+        self.assertTrue(source.stopped)
+
+
+    def test_streamNotDelivered(self):
+        """
+        Once the response to a command has been sent, a stream among its
+        arguments which the responder did not take delivery of is stopped
+        and forgotten on both sides, and a later C{deliverTo} fails.
+        """
+        source = StreamSource()
+        results = []
+        self.client.callRemote(StreamIgnored, contents=source).addCallback(
+            results.append)
+        self.pump.flush()
+        self.assertEqual(results, [{}])
+        self.assertEqual(self.server._incomingStreams, {})
+        self.assertEqual(self.client._outgoingStreams, {})
+        self.assertIdentical(source.consumer, None)
+        self.failureResultOf(
+            self.server.streams[0].deliverTo(StringTransport()))
+
+
+    def test_deliverTwice(self):
+        """
+        C{deliverTo} raises L{RuntimeError} if a consumer is already attached.
+        """
+        self.upload()
+        self.assertRaises(
+            RuntimeError, self.server.streams[0].deliverTo, StringTransport())
+
+
+    def test_interfaces(self):
+        """
+        The receiving end of a stream provides L{interfaces.IPushProducer} and
+        the consumer given to the source provides L{interfaces.IConsumer}.
+        """
+        source, results = self.upload()
+        verifyObject(interfaces.IPushProducer, self.server.streams[0])
+        verifyObject(interfaces.IConsumer, source.consumer)
+
+
+
 class DateTimeTests(unittest.TestCase):
     """
     Tests for L{amp.DateTime}, L{amp._FixedOffsetTZInfo}, and L{amp.utc}.
@@ -16,6 +16,7 @@ import linecache
 from twisted.python.compat import NativeStringIO, _PY3
 from twisted.python import reflect
 from twisted.python import failure
+from twisted.internet import defer
 
 from twisted.trial.unittest import SynchronousTestCase
 
@@ -551,6 +552,139 @@ class FailureTests(SynchronousTestCase):
 
 
 
+    def test_framesComputedLazily(self):
+        """
+        The C{frames} of a L{failure.Failure} are only extracted from its
+        traceback when they are first used, and are the same as they would
+        have been if extracted straight away.
+        """
+        f = getDivisionFailure()
+        self.assertNotIn('frames', f.__dict__)
+        expected = [
+            (tb.tb_frame.f_code.co_name, tb.tb_frame.f_code.co_filename,
+             tb.tb_lineno) for tb in _walkTraceback(f.tb)]
+        self.assertEqual([frame[:3] for frame in f.frames], expected)
+        self.assertIn('frames', f.__dict__)
+
+
+    def test_framesCapturedVars(self):
+        """
+        If C{captureVars} is set, the C{frames} of a L{failure.Failure} are
+        extracted straight away, since the variables may change.
+        """
+        f = getDivisionFailure(captureVars=True)
+        self.assertIn('frames', f.__dict__)
+
+
+    def test_framesAssigned(self):
+        """
+        The C{frames} of a L{failure.Failure} may be assigned.
+        """
+        f = getDivisionFailure()
+        f.frames = []
+        self.assertEqual(f.frames, [])
+
+
+    def test_parentsComputedLazily(self):
+        """
+        The C{parents} of a L{failure.Failure} are only computed when they are
+        first used.  L{failure.Failure.check} does not need them if the type
+        of the failure matches.
+        """
+        f = failure.Failure(ZeroDivisionError())
+        self.assertIdentical(f.check(ArithmeticError), ArithmeticError)
+        self.assertNotIn('parents', f.__dict__)
+        self.assertEqual(
+            f.check(reflect.qual(ZeroDivisionError)),
+            reflect.qual(ZeroDivisionError))
+        self.assertIn(reflect.qual(ArithmeticError), f.parents)
+
+
+    def test_checkMiss(self):
+        """
+        L{failure.Failure.check} returns C{None} if the type of the failure
+        does not match, without matching by identity first.
+        """
+        f = failure.Failure(ZeroDivisionError())
+        self.assertIdentical(f.check(KeyError), None)
+
+
+    def test_stateIncludesLazyAttributes(self):
+        """
+        The state of a L{failure.Failure}, used when it is pickled, includes
+        its C{frames} and C{parents} but not the traceback they were
+        computed from.
+        """
+        f = getDivisionFailure()
+        state = f.__getstate__()
+        self.assertNotIn('_framesTraceback', state)
+        self.assertEqual(len(state['frames']), len(f.frames))
+        self.assertEqual(state['parents'], f.parents)
+
+
+    def test_cleanFailureIsLazy(self):
+        """
+        L{failure.Failure.cleanFailure} does not compute C{frames} or
+        C{parents}, but they can still be computed afterwards, and are then
+        the same as they would have been before.
+        """
+        f = getDivisionFailure()
+        frames = getDivisionFailure().frames
+        f.cleanFailure()
+        self.assertNotIn('frames', f.__dict__)
+        self.assertNotIn('parents', f.__dict__)
+        self.assertIdentical(f.tb, None)
+        self.assertEqual(
+            [tuple(frame[:3]) for frame in f.frames],
+            [frame[:3] for frame in frames])
+        self.assertIn(reflect.qual(ZeroDivisionError), f.parents)
+
+
+    def test_stateAfterCleanFailure(self):
+        """
+        The state of a cleaned L{failure.Failure} includes its C{frames} and
+        C{parents}, which cannot be computed once it has been unpickled.
+        """
+        f = getDivisionFailure()
+        f.cleanFailure()
+        state = f.__getstate__()
+        self.assertNotIn('_framesLines', state)
+        self.assertNotEqual(state['frames'], [])
+        self.assertIn(reflect.qual(ZeroDivisionError), state['parents'])
+
+
+    def test_trappedInErrbackBuildsNoFrames(self):
+        """
+        A L{failure.Failure} which a L{defer.Deferred} cleans before passing
+        it to an errback which traps it never has its C{frames} built.
+        """
+        built = []
+        def framesFromTraceback(tb, captureVars):
+            built.append(tb)
+            return []
+        self.patch(failure, '_framesFromTraceback', framesFromTraceback)
+
+        def divide(result):
+            1 / 0
+        trapped = []
+        d = defer.succeed(None)
+        d.addCallback(divide)
+        d.addErrback(lambda f: trapped.append(f.trap(ZeroDivisionError)))
+        self.assertEqual(trapped, [ZeroDivisionError])
+        self.assertEqual(built, [])
+
+
+
+def _walkTraceback(tb):
+    """
+    Yield each traceback entry in the chain starting at C{tb}.
+    """
+    while tb is not None:
+        yield tb
+        tb = tb.tb_next
+
+
+
 class BrokenStr(Exception):
     """
     An exception class the instances of which cannot be presented as strings via
@@ -7,6 +7,8 @@ Test code for policies.
 
 from __future__ import division, absolute_import
 
+import socket
+
 from zope.interface import Interface, implementer, implementedBy
 
 from twisted.python.compat import NativeStringIO
@@ -121,6 +123,29 @@ class TestableTimeoutFactory(policies.TimeoutFactory):
 
 
 
+class TestableCoalescingFactory(policies.CoalescingFactory):
+    """
+    L{policies.CoalescingFactory} using a L{task.Clock} for tests.
+    """
+
+    def __init__(self, clock, *args, **kwargs):
+        """
+        @param clock: object providing a callLater method that can be used
+            for tests.
+        @type clock: C{task.Clock} or alike.
+        """
+        policies.CoalescingFactory.__init__(self, *args, **kwargs)
+        self.clock = clock
+
+
+    def callLater(self, period, func):
+        """
+        Forward to the testable clock.
+        """
+        return self.clock.callLater(period, func)
+
+
+
 class WrapperTests(unittest.TestCase):
     """
     Tests for L{WrappingFactory} and L{ProtocolWrapper}.
@@ -585,6 +610,174 @@ class TimeoutFactoryTests(unittest.TestCase):
 
 
 
+class CorkRecordingSocket(object):
+    """
+    A fake socket which records the C{TCP_CORK} options set on it.
+
+    @ivar corks: The values the option was set to, in order.
+    """
+
+    def __init__(self):
+        self.corks = []
+
+
+    def setsockopt(self, level, option, value):
+        if (level, option) == (socket.IPPROTO_TCP,
+                               getattr(socket, 'TCP_CORK', None)):
+            self.corks.append(value)
+
+
+
+class CorkableTransport(StringTransportWithDisconnection):
+    """
+    A transport with a fake socket.
+
+    @ivar socket: The L{CorkRecordingSocket} returned by L{getHandle}.
+    """
+
+    def __init__(self):
+        StringTransportWithDisconnection.__init__(self)
+        self.socket = CorkRecordingSocket()
+
+
+    def getHandle(self):
+        return self.socket
+
+
+
+class CoalescingFactoryTests(unittest.TestCase):
+    """
+    Tests for L{policies.CoalescingFactory}.
+    """
+
+    def setUp(self):
+        """
+        Create a testable, deterministic clock, and a set of
+        server factory/protocol/transport.
+        """
+        self.clock = task.Clock()
+        wrappedFactory = protocol.ServerFactory()
+        wrappedFactory.protocol = SimpleProtocol
+        self.factory = TestableCoalescingFactory(
+            self.clock, wrappedFactory, threshold=10)
+
+
+    def connect(self, transport=None):
+        """
+        Connect a protocol from the factory to a transport.
+
+        @param transport: The transport, or C{None} for a new
+            L{StringTransportWithDisconnection}.
+
+        @return: The wrapping protocol.
+        """
+        if transport is None:
+            transport = StringTransportWithDisconnection()
+        proto = self.factory.buildProtocol(
+            address.IPv4Address('TCP', '127.0.0.1', 12345))
+        transport.protocol = proto
+        proto.makeConnection(transport)
+        return proto
+
+
+    def test_writesHeld(self):
+        """
+        Writes are passed to the transport at the end of the reactor
+        iteration, all at once.
+        """
+        proto = self.connect()
+        proto.wrappedProtocol.transport.write(b'foo')
+        proto.wrappedProtocol.transport.writeSequence([b'ba', b'r'])
+        self.assertEqual(proto.transport.value(), b'')
+        self.clock.advance(0)
+        self.assertEqual(proto.transport.value(), b'foobar')
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+    def test_threshold(self):
+        """
+        Writes are passed to the transport as soon as the factory's
+        threshold of bytes is held.
+        """
+        proto = self.connect()
+        proto.write(b'12345')
+        proto.write(b'67890')
+        self.assertEqual(proto.transport.value(), b'1234567890')
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+        proto.writeSequence([b'abcdefghij', b'k'])
+        self.assertEqual(proto.transport.value(), b'1234567890abcdefghijk')
+
+
+    def test_flush(self):
+        """
+        The wrapped protocol can pass held writes to the transport early by
+        calling C{flush}.
+        """
+        proto = self.connect()
+        proto.wrappedProtocol.transport.write(b'foo')
+        proto.wrappedProtocol.transport.flush()
+        self.assertEqual(proto.transport.value(), b'foo')
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+    def test_loseConnection(self):
+        """
+        Held writes are passed to the transport before the connection is
+        closed.
+        """
+        proto = self.connect()
+        proto.write(b'foo')
+        proto.loseConnection()
+        self.assertEqual(proto.transport.value(), b'foo')
+        self.assertTrue(proto.wrappedProtocol.disconnected)
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+    def test_connectionLost(self):
+        """
+        Held writes are dropped if the connection is lost.
+        """
+        proto = self.connect()
+        proto.write(b'foo')
+        proto.connectionLost(None)
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+        self.assertEqual(proto.transport.value(), b'')
+
+
+    def test_cork(self):
+        """
+        If the factory's C{cork} option is set, the socket is corked while
+        held writes are passed to the transport, and uncorked on the next
+        reactor iteration.
+        """
+        self.factory.cork = True
+        transport = CorkableTransport()
+        proto = self.connect(transport)
+        proto.write(b'1234567890')
+        self.assertEqual(transport.socket.corks, [1])
+        self.assertEqual(transport.value(), b'1234567890')
+        self.clock.advance(0)
+        self.assertEqual(transport.socket.corks, [1, 0])
+
+    if not hasattr(socket, 'TCP_CORK'):
+        test_cork.skip = "TCP_CORK is not available on this platform."
+
+
+    def test_corkWithoutSocket(self):
+        """
+        The C{cork} option is ignored for transports without a socket.
+        """
+        self.factory.cork = True
+        proto = self.connect()
+        proto.write(b'foo')
+        self.clock.advance(0)
+        proto.write(b'bar')
+        self.clock.advance(0)
+        self.assertEqual(proto.transport.value(), b'foobar')
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+
 class TimeoutTester(protocol.Protocol, policies.TimeoutMixin):
     """
     A testable protocol with timeout facility.
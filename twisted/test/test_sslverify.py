@@ -8,10 +8,13 @@ Tests for L{twisted.internet._sslverify}.
 
 from __future__ import division, absolute_import
 
+import os
+import stat
 import sys
 import itertools
 
 from zope.interface import implementer
+from zope.interface.verify import verifyObject
 
 skipSSL = None
 skipSNI = None
@@ -34,9 +37,11 @@ from twisted.internet.error import ConnectionClosed
 from twisted.python.compat import nativeString, _PY3
 from twisted.python.constants import NamedConstant, Names
 from twisted.python.filepath import FilePath
+from twisted.python.runtime import platform
 
 from twisted.trial import unittest, util
 from twisted.internet import protocol, defer, reactor
+from twisted.internet.task import Clock
 
 from twisted.internet.error import CertificateError, ConnectionLost
 from twisted.internet import interfaces
@@ -419,6 +424,407 @@ class ClientOptionsTests(unittest.SynchronousTestCase):
         self.assertEqual(str(error), expectedText)
 
 
+    def test_providesClientConnectionCreator(self):
+        """
+        L{sslverify.optionsForClientTLS} returns a provider of
+        L{interfaces.IOpenSSLClientConnectionCreator}, whether or not it
+        resumes sessions, so that L{TLSMemoryBIOFactory} creates connections
+        which verify the hostname with it.
+        """
+        for options in [
+                sslverify.optionsForClientTLS(u'example.com'),
+                sslverify.optionsForClientTLS(u'example.com',
+                                              sessionCache=None)]:
+            self.assertTrue(
+                interfaces.IOpenSSLClientConnectionCreator.providedBy(
+                    options))
+        self.assertFalse(
+            interfaces.IOpenSSLClientConnectionCreator.providedBy(
+                sslverify.ClientTLSSessionCache()))
+
+
+    def test_defaultSessionCache(self):
+        """
+        By default, L{sslverify.optionsForClientTLS} uses a shared session
+        cache, and keys the sessions with the hostname and port.
+        """
+        options = sslverify.optionsForClientTLS(u'example.com', port=443)
+        if not sslverify._canResumeSessions:
+            raise unittest.SkipTest("pyOpenSSL cannot resume sessions.")
+        self.assertIs(options._sessionCache,
+                      sslverify._defaultClientSessionCache)
+        self.assertEqual(options._sessionKey[:2], (b'example.com', 443))
+
+
+    def test_extraOptionsNoSessionCache(self):
+        """
+        When passed C{extraCertificateOptions}, L{sslverify.optionsForClientTLS}
+        does not resume sessions unless it is also passed a session cache.
+        """
+        options = sslverify.optionsForClientTLS(
+            u'example.com', extraCertificateOptions={'verifyDepth': 3})
+        self.assertIs(options._sessionCache, None)
+
+
+    def test_noSessionCache(self):
+        """
+        Passing C{sessionCache=None} to L{sslverify.optionsForClientTLS}
+        disables session resumption.
+        """
+        options = sslverify.optionsForClientTLS(
+            u'example.com', sessionCache=None)
+        self.assertIs(options._sessionCache, None)
+
+
+    def test_trustScope(self):
+        """
+        Sessions negotiated with different trust roots or client certificates
+        have different keys; the same certificate authorities give the same
+        key.
+        """
+        ca, server = certificatesForAuthorityAndServer()
+        otherCA, otherServer = certificatesForAuthorityAndServer()
+        self.assertEqual(
+            sslverify._trustScope(ca, None), sslverify._trustScope(ca, None))
+        self.assertEqual(
+            sslverify._trustScope(sslverify.platformTrust(), None),
+            sslverify._trustScope(sslverify.platformTrust(), None))
+        self.assertNotEqual(
+            sslverify._trustScope(ca, None),
+            sslverify._trustScope(otherCA, None))
+        self.assertNotEqual(
+            sslverify._trustScope(ca, None),
+            sslverify._trustScope(ca, server))
+
+
+    def test_forPort(self):
+        """
+        L{sslverify.ClientTLSOptions._forPort} makes a creator which keys the
+        sessions of the connections it makes with the port, unless the
+        options were already given one.
+        """
+        options = sslverify.optionsForClientTLS(u'example.com')
+        creator = options._forPort(443)
+        self.assertTrue(
+            interfaces.IOpenSSLClientConnectionCreator.providedBy(creator))
+        self.assertEqual(
+            creator._sessionKey,
+            (b'example.com', 443, options._sessionKey[2]))
+        withPort = sslverify.optionsForClientTLS(u'example.com', port=8443)
+        self.assertIs(withPort._forPort(443), withPort)
+
+
+
+class ClientTLSSessionCacheTests(unittest.SynchronousTestCase):
+    """
+    Tests for L{sslverify.ClientTLSSessionCache}.
+    """
+    if skipSSL:
+        skip = skipSSL
+
+    def setUp(self):
+        self.clock = Clock()
+        self.cache = sslverify.ClientTLSSessionCache(
+            maxSessions=2, lifetime=300, clock=self.clock)
+
+
+    def test_storeAndGet(self):
+        """
+        A stored session is found with its key, and other keys find nothing.
+        """
+        session = object()
+        self.cache.store((b'example.com', 443), session)
+        self.assertIs(self.cache.get((b'example.com', 443)), session)
+        self.assertIs(self.cache.get((b'example.com', 8443)), None)
+
+
+    def test_expiry(self):
+        """
+        A session is no longer found once its lifetime has passed.
+        """
+        self.cache.store(b'key', object())
+        self.clock.advance(300)
+        self.assertIs(self.cache.get(b'key'), None)
+        self.assertEqual(len(self.cache), 0)
+
+
+    def test_replace(self):
+        """
+        Storing a session with the key of another replaces it and restarts
+        its lifetime.
+        """
+        session = object()
+        self.cache.store(b'key', object())
+        self.clock.advance(200)
+        self.cache.store(b'key', session)
+        self.clock.advance(200)
+        self.assertIs(self.cache.get(b'key'), session)
+
+
+    def test_leastRecentlyUsedDiscarded(self):
+        """
+        Once C{maxSessions} are kept, storing another discards the least
+        recently used.
+        """
+        self.cache.store(b'a', 1)
+        self.cache.store(b'b', 2)
+        self.cache.get(b'a')
+        self.cache.store(b'c', 3)
+        self.assertEqual(
+            [self.cache.get(key) for key in [b'a', b'b', b'c']],
+            [1, None, 3])
+
+
+    def test_remove(self):
+        """
+        A removed session is no longer found.  Removing a key which has no
+        session does nothing.
+        """
+        self.cache.store(b'key', object())
+        self.cache.remove(b'key')
+        self.cache.remove(b'other')
+        self.assertIs(self.cache.get(b'key'), None)
+
+
+
+def sessionReused(connection):
+    """
+    Determine whether a TLS connection resumed a session.
+
+    @param connection: The connection, once its handshake is done.
+    @type connection: L{OpenSSL.SSL.Connection}
+
+    @rtype: L{bool}
+    """
+    from OpenSSL._util import lib
+    return bool(lib.SSL_session_reused(connection._ssl))
+
+
+
+class LoopbackSessionMixin(object):
+    """
+    Helpers for tests which connect a client to a real server over loopback
+    connections and check whether sessions are resumed.
+    """
+
+    def setUp(self):
+        pem = FilePath(__file__).sibling("server.pem").getContent()
+        self.serverCert = sslverify.PrivateCertificate.loadPEM(pem)
+        self.cache = sslverify.ClientTLSSessionCache()
+
+
+    def connect(self, serverOptions, creator):
+        """
+        Connect a client to a server over a loopback connection and complete
+        the TLS handshake.
+
+        @param serverOptions: The server's L{OpenSSLCertificateOptions}.
+
+        @param creator: The client's connection creator.
+
+        @return: The client's L{OpenSSL.SSL.Connection}.
+        """
+        class GreetingServer(protocol.Protocol):
+            def connectionMade(self):
+                self.transport.write(b"greetings!")
+
+        class ListeningClient(protocol.Protocol):
+            data = b''
+            def dataReceived(self, data):
+                self.data += data
+
+        clientFactory = TLSMemoryBIOFactory(
+            creator, isClient=True,
+            wrappedFactory=protocol.Factory.forProtocol(ListeningClient))
+        serverFactory = TLSMemoryBIOFactory(
+            serverOptions, isClient=False,
+            wrappedFactory=protocol.Factory.forProtocol(GreetingServer))
+        cProto, sProto, pump = connectedServerAndClient(
+            lambda: serverFactory.buildProtocol(None),
+            lambda: clientFactory.buildProtocol(None))
+        pump.flush()
+        self.assertEqual(cProto.wrappedProtocol.data, b"greetings!")
+        return cProto._tlsConnection
+
+
+    def serverOptions(self, **kw):
+        """
+        Make the server's options.
+
+        @param kw: Further arguments for L{OpenSSLCertificateOptions}.
+
+        @return: The L{OpenSSLCertificateOptions}.
+        """
+        return sslverify.OpenSSLCertificateOptions(
+            privateKey=self.serverCert.privateKey.original,
+            certificate=self.serverCert.original, **kw)
+
+
+    def clientOptions(self):
+        """
+        Make the client's options, which trust the server's certificate and
+        keep sessions in C{self.cache}.
+
+        @return: The L{sslverify.ClientTLSOptions}.
+        """
+        return sslverify.optionsForClientTLS(
+            u"localhost", trustRoot=self.serverCert, sessionCache=self.cache)
+
+
+
+class ClientSessionResumptionTests(LoopbackSessionMixin,
+                                   unittest.SynchronousTestCase):
+    """
+    Tests for the resumption of sessions by L{sslverify.ClientTLSOptions}
+    over loopback connections to a real server.
+    """
+    if skipSSL:
+        skip = skipSSL
+    elif not sslverify._canResumeSessions:
+        skip = "pyOpenSSL cannot resume sessions."
+
+    def test_resumed(self):
+        """
+        A second connection to a server resumes the session negotiated by the
+        first, whichever version of TLS they use.
+        """
+        serverOptions = self.serverOptions()
+        clientOptions = self.clientOptions()
+        self.assertFalse(sessionReused(
+            self.connect(serverOptions, clientOptions)))
+        self.assertEqual(len(self.cache), 1)
+        self.assertTrue(sessionReused(
+            self.connect(serverOptions, clientOptions)))
+
+
+    def test_resumedTLSv1_2(self):
+        """
+        A second connection to a server which only speaks TLS 1.2 resumes the
+        session negotiated by the first.
+        """
+        if getattr(SSL, "TLSv1_2_METHOD", None) is None:
+            raise unittest.SkipTest("TLS 1.2 is not available.")
+        serverOptions = self.serverOptions(method=SSL.TLSv1_2_METHOD)
+        clientOptions = self.clientOptions()
+        self.assertFalse(sessionReused(
+            self.connect(serverOptions, clientOptions)))
+        self.assertTrue(sessionReused(
+            self.connect(serverOptions, clientOptions)))
+
+
+    def test_otherPortNotResumed(self):
+        """
+        A session negotiated by a connection to one port is not offered to
+        another.
+        """
+        serverOptions = self.serverOptions()
+        clientOptions = self.clientOptions()
+        self.connect(serverOptions, clientOptions._forPort(443))
+        self.assertFalse(sessionReused(
+            self.connect(serverOptions, clientOptions._forPort(8443))))
+        self.assertTrue(sessionReused(
+            self.connect(serverOptions, clientOptions._forPort(443))))
+
+
+
+def _serverSessionSharingSkip():
+    """
+    Determine why sessions cannot be shared between servers here.
+
+    @return: A reason to skip L{ServerSessionResumptionTests}'s tests of
+        sharing sessions, for each of C{"sessionCache"} and
+        C{"sessionTicketKeys"}, or C{None} if it can be tested.
+    @rtype: L{dict}
+    """
+    skips = {"sessionCache": None, "sessionTicketKeys": None}
+    try:
+        sslverify._OpenSSLSessionCache(sslverify.MemoryTLSSessionCache())
+    except NotImplementedError as e:
+        skips["sessionCache"] = str(e)
+    try:
+        sslverify.SessionTicketKeys()._checkSupported()
+    except NotImplementedError as e:
+        skips["sessionTicketKeys"] = str(e)
+    return skips
+
+
+
+class ServerSessionResumptionTests(LoopbackSessionMixin,
+                                   unittest.SynchronousTestCase):
+    """
+    Tests for the resumption of sessions by servers using
+    L{sslverify.OpenSSLCertificateOptions}, over loopback connections from a
+    real client.
+
+    Each of the tests of sharing sessions uses two options objects, each of
+    which has its own context and its own OpenSSL session cache, like two
+    processes serving the same port.
+    """
+    if skipSSL:
+        skip = skipSSL
+    elif not sslverify._canResumeSessions:
+        skip = "pyOpenSSL cannot resume sessions."
+    else:
+        _skips = _serverSessionSharingSkip()
+
+    def test_resumed(self):
+        """
+        A server resumes the sessions it negotiated itself.
+        """
+        serverOptions = self.serverOptions()
+        clientOptions = self.clientOptions()
+        self.connect(serverOptions, clientOptions)
+        self.assertTrue(sessionReused(
+            self.connect(serverOptions, clientOptions)))
+
+
+    def test_notShared(self):
+        """
+        Without a session cache or session ticket keys, a server does not
+        resume the sessions negotiated by another.
+        """
+        clientOptions = self.clientOptions()
+        self.connect(self.serverOptions(), clientOptions)
+        self.assertFalse(sessionReused(
+            self.connect(self.serverOptions(), clientOptions)))
+
+
+    def test_sessionCacheShared(self):
+        """
+        Servers which share a session cache resume each other's sessions.
+        """
+        if self._skips["sessionCache"]:
+            raise unittest.SkipTest(self._skips["sessionCache"])
+        cache = sslverify.MemoryTLSSessionCache()
+        clientOptions = self.clientOptions()
+        self.connect(
+            self.serverOptions(sessionCache=cache,
+                               enableSessionTickets=False),
+            clientOptions)
+        self.assertEqual(len(cache), 1)
+        self.assertTrue(sessionReused(self.connect(
+            self.serverOptions(sessionCache=cache,
+                               enableSessionTickets=False),
+            clientOptions)))
+
+
+    def test_sessionTicketKeysShared(self):
+        """
+        Servers which share session ticket keys resume each other's sessions.
+        """
+        if self._skips["sessionTicketKeys"]:
+            raise unittest.SkipTest(self._skips["sessionTicketKeys"])
+        clientOptions = self.clientOptions()
+        self.connect(
+            self.serverOptions(
+                sessionTicketKeys=sslverify.SessionTicketKeys(b"secret")),
+            clientOptions)
+        self.assertTrue(sessionReused(self.connect(
+            self.serverOptions(
+                sessionTicketKeys=sslverify.SessionTicketKeys(b"secret")),
+            clientOptions)))
+
+
 
 class OpenSSLOptionsTests(unittest.TestCase):
     if skipSSL:
@@ -970,6 +1376,62 @@ class OpenSSLOptionsTests(unittest.TestCase):
         self.assertEqual(0x00004000, ctx.set_options(0) & 0x00004000)
 
 
+    def test_sessionTicketKeysEnableTickets(self):
+        """
+        Passing C{sessionTicketKeys} enables session tickets and gives the
+        context the current key.
+        """
+        keys = RecordingSessionTicketKeys(b"secret", clock=Clock())
+        opts = sslverify.OpenSSLCertificateOptions(sessionTicketKeys=keys)
+        opts._contextFactory = FakeContext
+        ctx = opts.getContext()
+        self.assertTrue(opts.enableSessionTickets)
+        self.assertEqual(0, ctx._options & 0x00004000)
+        self.assertEqual(keys.installed, [(ctx, keys.keyForPeriod(0))])
+
+
+    def test_sharedSessionIDContext(self):
+        """
+        When session ticket keys are used, contexts for the same certificate
+        get the same session ID context, so that processes serving the same
+        port can resume each other's sessions.
+        """
+        contexts = []
+        for i in range(2):
+            opts = sslverify.OpenSSLCertificateOptions(
+                privateKey=self.sKey, certificate=self.sCert,
+                sessionTicketKeys=RecordingSessionTicketKeys(
+                    b"secret", clock=Clock()))
+            opts._contextFactory = FakeContext
+            contexts.append(opts.getContext())
+        self.assertEqual(contexts[0]._sessionID, contexts[1]._sessionID)
+
+
+    def test_uniqueSessionIDContext(self):
+        """
+        Without a session cache or session ticket keys, each context gets a
+        different session ID context.
+        """
+        contexts = []
+        for i in range(2):
+            opts = sslverify.OpenSSLCertificateOptions(
+                privateKey=self.sKey, certificate=self.sCert)
+            opts._contextFactory = FakeContext
+            contexts.append(opts.getContext())
+        self.assertNotEqual(contexts[0]._sessionID, contexts[1]._sessionID)
+
+
+    def test_sessionCacheRequiresSessions(self):
+        """
+        Passing C{sessionCache} with C{enableSessions=False} raises
+        L{ValueError}.
+        """
+        self.assertRaises(
+            ValueError, sslverify.OpenSSLCertificateOptions,
+            enableSessions=False,
+            sessionCache=sslverify.MemoryTLSSessionCache())
+
+
     def test_allowedAnonymousClientConnection(self):
         """
         Check that anonymous connections are allowed when certificates aren't
@@ -1491,6 +1953,37 @@ class ServiceIdentityTests(unittest.SynchronousTestCase):
         self.assertIsInstance(sErr, ConnectionClosed)
 
 
+    def test_sessionStored(self):
+        """
+        Once the server's identity is verified, the session negotiated with it
+        is kept in the session cache.
+        """
+        cache = sslverify.ClientTLSSessionCache()
+        self.patch(sslverify, "_defaultClientSessionCache", cache)
+        cProto, sProto, pump = self.serviceIdentitySetup(
+            u"valid.example.com",
+            u"valid.example.com",
+        )
+        self.assertEqual(cProto.wrappedProtocol.data, b'greetings!')
+        if not sslverify._canResumeSessions:
+            raise unittest.SkipTest("pyOpenSSL cannot resume sessions.")
+        self.assertEqual(len(cache), 1)
+
+
+    def test_invalidHostnameSessionNotStored(self):
+        """
+        A session negotiated with a server whose identity could not be verified
+        is not kept in the session cache.
+        """
+        cache = sslverify.ClientTLSSessionCache()
+        self.patch(sslverify, "_defaultClientSessionCache", cache)
+        self.serviceIdentitySetup(
+            u"wrong-host.example.com",
+            u"correct-host.example.com",
+        )
+        self.assertEqual(len(cache), 0)
+
+
     def test_validHostname(self):
         """
         Whenever a valid certificate containing a valid hostname is received,
@@ -2241,6 +2734,413 @@ class ECCurveTests(unittest.TestCase):
 
 
 
+class MemoryTLSSessionCacheTests(unittest.TestCase):
+    """
+    Tests for L{sslverify.MemoryTLSSessionCache}.
+    """
+    if skipSSL:
+        skip = skipSSL
+
+    def test_interface(self):
+        """
+        L{sslverify.MemoryTLSSessionCache} provides
+        L{sslverify.ITLSSessionCache}.
+        """
+        self.assertTrue(verifyObject(
+            sslverify.ITLSSessionCache, sslverify.MemoryTLSSessionCache()))
+
+
+    def test_storeAndRetrieve(self):
+        """
+        A stored session can be retrieved with its identifier, and other
+        identifiers find nothing.
+        """
+        cache = sslverify.MemoryTLSSessionCache()
+        cache.store(b"id", b"session")
+        self.assertEqual(cache.retrieve(b"id"), b"session")
+        self.assertIs(cache.retrieve(b"other"), None)
+
+
+    def test_remove(self):
+        """
+        A removed session can no longer be retrieved.  Removing a session
+        which is not stored does nothing.
+        """
+        cache = sslverify.MemoryTLSSessionCache()
+        cache.store(b"id", b"session")
+        cache.remove(b"id")
+        cache.remove(b"other")
+        self.assertIs(cache.retrieve(b"id"), None)
+
+
+    def test_leastRecentlyUsedDiscarded(self):
+        """
+        Once C{maxSessions} are stored, storing another discards the session
+        which was least recently stored or retrieved.
+        """
+        cache = sslverify.MemoryTLSSessionCache(maxSessions=2)
+        cache.store(b"a", b"A")
+        cache.store(b"b", b"B")
+        cache.retrieve(b"a")
+        cache.store(b"c", b"C")
+        self.assertEqual(len(cache), 2)
+        self.assertIs(cache.retrieve(b"b"), None)
+        self.assertEqual(cache.retrieve(b"a"), b"A")
+        self.assertEqual(cache.retrieve(b"c"), b"C")
+
+
+
+class DirectoryTLSSessionCacheTests(unittest.TestCase):
+    """
+    Tests for L{sslverify.DirectoryTLSSessionCache}.
+    """
+    if skipSSL:
+        skip = skipSSL
+
+    def setUp(self):
+        self.directory = FilePath(self.mktemp())
+        self.clock = Clock()
+        self.clock.advance(1000000)
+        self.cache = sslverify.DirectoryTLSSessionCache(
+            self.directory, timeout=300, clock=self.clock)
+
+
+    def age(self, sessionID, seconds):
+        """
+        Make a stored session appear to have been stored some time ago.
+        """
+        path = self.cache._path(sessionID)
+        when = self.clock.seconds() - seconds
+        os.utime(path.path, (when, when))
+
+
+    def test_interface(self):
+        """
+        L{sslverify.DirectoryTLSSessionCache} provides
+        L{sslverify.ITLSSessionCache}.
+        """
+        self.assertTrue(verifyObject(sslverify.ITLSSessionCache, self.cache))
+
+
+    def test_createsDirectory(self):
+        """
+        The directory is created if it does not exist.
+        """
+        self.assertTrue(self.directory.isdir())
+
+
+    def test_shared(self):
+        """
+        A session stored by one cache can be retrieved by another using the
+        same directory.
+        """
+        self.cache.store(b"\x00\xff", b"session")
+        self.age(b"\x00\xff", 10)
+        other = sslverify.DirectoryTLSSessionCache(
+            self.directory, clock=self.clock)
+        self.assertEqual(other.retrieve(b"\x00\xff"), b"session")
+        self.assertIs(other.retrieve(b"other"), None)
+
+
+    def test_remove(self):
+        """
+        A removed session can no longer be retrieved.  Removing a session
+        which is not stored does nothing.
+        """
+        self.cache.store(b"id", b"session")
+        self.cache.remove(b"id")
+        self.cache.remove(b"other")
+        self.assertIs(self.cache.retrieve(b"id"), None)
+        self.assertEqual(self.directory.children(), [])
+
+
+    def test_expired(self):
+        """
+        A session stored longer ago than the timeout is not retrieved, and is
+        removed.
+        """
+        self.cache.store(b"id", b"session")
+        self.age(b"id", 301)
+        self.assertIs(self.cache.retrieve(b"id"), None)
+        self.assertEqual(self.directory.children(), [])
+
+
+    def test_removeExpired(self):
+        """
+        L{sslverify.DirectoryTLSSessionCache.removeExpired} removes only the
+        sessions stored longer ago than the timeout.
+        """
+        self.cache.store(b"old", b"session")
+        self.age(b"old", 301)
+        self.cache.store(b"new", b"session")
+        self.age(b"new", 10)
+        self.cache.removeExpired()
+        self.assertEqual(self.directory.children(),
+                         [self.cache._path(b"new")])
+
+
+    def test_permissions(self):
+        """
+        The directory is created accessible only by its owner, and sessions
+        are written to files only the owner can read and write, whatever the
+        umask.
+        """
+        directory = FilePath(self.mktemp())
+        oldUmask = os.umask(0)
+        try:
+            cache = sslverify.DirectoryTLSSessionCache(
+                directory, clock=self.clock)
+            cache.store(b"id", b"session")
+        finally:
+            os.umask(oldUmask)
+        self.assertEqual(stat.S_IMODE(os.stat(directory.path).st_mode),
+                         0o700)
+        self.assertEqual(
+            stat.S_IMODE(os.stat(cache._path(b"id").path).st_mode), 0o600)
+        self.assertEqual(cache.retrieve(b"id"), b"session")
+        self.assertEqual(directory.children(), [cache._path(b"id")])
+
+    if platform.getType() != "posix":
+        test_permissions.skip = "Permissions are only checked on POSIX."
+
+
+    def test_accessibleDirectoryRefused(self):
+        """
+        L{sslverify.DirectoryTLSSessionCache} raises L{ValueError} if the
+        directory exists and its group or other users can access it.
+        """
+        for mode in [0o750, 0o701]:
+            self.directory.chmod(mode)
+            self.assertRaises(
+                ValueError, sslverify.DirectoryTLSSessionCache,
+                self.directory, clock=self.clock)
+
+    if platform.getType() != "posix":
+        test_accessibleDirectoryRefused.skip = (
+            "Permissions are only checked on POSIX.")
+
+
+
+class FakeSessionLib(object):
+    """
+    A fake of cryptography's lib object with the session cache functions.
+
+    @ivar installed: The callbacks installed, keyed by the name of the
+        function which installed them.
+    """
+
+    def __init__(self):
+        self.installed = {}
+
+
+    def SSL_CTX_sess_set_new_cb(self, context, callback):
+        self.installed["new"] = callback
+
+
+    def SSL_CTX_sess_set_get_cb(self, context, callback):
+        self.installed["get"] = callback
+
+
+    def SSL_CTX_sess_set_remove_cb(self, context, callback):
+        self.installed["remove"] = callback
+
+
+    def SSL_SESSION_get_id(self, session, length):
+        pass
+
+
+    def i2d_SSL_SESSION(self, session, pointer):
+        pass
+
+
+    def d2i_SSL_SESSION(self, reuse, pointer, length):
+        pass
+
+
+
+class FakeSessionFFI(FakeFFI):
+    """
+    A fake of cryptography's ffi object which makes callbacks out of the
+    functions themselves.
+    """
+
+    def typeof(self, function):
+        return FakeFunctionType()
+
+
+    def callback(self, ctype, function):
+        return function
+
+
+
+class FakeFunctionType(object):
+    """
+    A fake of a CFFI function type.
+    """
+    args = (None, None)
+
+
+
+class OpenSSLSessionCacheTests(unittest.TestCase):
+    """
+    Tests for L{sslverify._OpenSSLSessionCache}.
+    """
+    if skipSSL:
+        skip = skipSSL
+
+    def test_missingFunctions(self):
+        """
+        L{NotImplementedError} is raised if the bindings lack the functions
+        needed for an external session cache.
+        """
+        self.patch(sslverify._OpenSSLSessionCache, "_getBinding",
+                   lambda self: FakeBinding(ffi=FakeSessionFFI()))
+        self.assertRaises(
+            NotImplementedError, sslverify._OpenSSLSessionCache,
+            sslverify.MemoryTLSSessionCache())
+
+
+    def test_addToContext(self):
+        """
+        L{sslverify._OpenSSLSessionCache.addToContext} enables server session
+        caching on the context and installs its callbacks.
+        """
+        lib = FakeSessionLib()
+        self.patch(sslverify._OpenSSLSessionCache, "_getBinding",
+                   lambda self: FakeBinding(lib=lib, ffi=FakeSessionFFI()))
+        sessionCache = sslverify._OpenSSLSessionCache(
+            sslverify.MemoryTLSSessionCache())
+        modes = []
+        context = FakeContext(None)
+        context._context = None
+        context.set_session_cache_mode = modes.append
+        sessionCache.addToContext(context)
+        self.assertEqual(modes, [SSL.SESS_CACHE_SERVER])
+        self.assertEqual(lib.installed, {
+            "new": sessionCache._newSession,
+            "get": sessionCache._getSession,
+            "remove": sessionCache._removeSession})
+
+
+
+class RecordingSessionTicketKeys(sslverify.SessionTicketKeys
+                                 if not skipSSL else object):
+    """
+    A L{sslverify.SessionTicketKeys} which records the keys it gives to
+    contexts instead of giving them to OpenSSL.
+
+    @ivar installed: A L{list} of 2-tuples of a context and the key given to
+        it.
+    """
+
+    def __init__(self, *args, **kwargs):
+        sslverify.SessionTicketKeys.__init__(self, *args, **kwargs)
+        self.installed = []
+
+
+    def _checkSupported(self):
+        pass
+
+
+    def _setKey(self, context, key):
+        self.installed.append((context, key))
+
+
+
+class SessionTicketKeysTests(unittest.TestCase):
+    """
+    Tests for L{sslverify.SessionTicketKeys}.
+    """
+    if skipSSL:
+        skip = skipSSL
+
+    def test_keySize(self):
+        """
+        Keys are 48 bytes long for OpenSSL before 1.1.0, and 80 bytes long for
+        later versions, whose HMAC and AES keys are longer.  The size used is
+        the one for the OpenSSL in use.
+        """
+        self.assertEqual(sslverify._ticketKeySize(0x1000207f), 48)
+        self.assertEqual(sslverify._ticketKeySize(0x1010109f), 80)
+        self.assertEqual(
+            sslverify.SessionTicketKeys.keySize,
+            sslverify._ticketKeySize(SSL.OPENSSL_VERSION_NUMBER))
+
+
+    def test_keyForPeriod(self):
+        """
+        Keys are L{sslverify.SessionTicketKeys.keySize} bytes long, the same
+        for the same secret and period, and different for different secrets
+        or periods.
+        """
+        keys = sslverify.SessionTicketKeys(b"secret")
+        self.assertEqual(len(keys.keyForPeriod(1)), keys.keySize)
+        self.assertEqual(
+            keys.keyForPeriod(1),
+            sslverify.SessionTicketKeys(b"secret").keyForPeriod(1))
+        self.assertNotEqual(keys.keyForPeriod(1), keys.keyForPeriod(2))
+        self.assertNotEqual(
+            keys.keyForPeriod(1),
+            sslverify.SessionTicketKeys(b"other").keyForPeriod(1))
+
+
+    def test_randomSecret(self):
+        """
+        Without a secret, a random one is used.
+        """
+        self.assertNotEqual(
+            sslverify.SessionTicketKeys().keyForPeriod(1),
+            sslverify.SessionTicketKeys().keyForPeriod(1))
+
+
+    def test_currentKey(self):
+        """
+        The current key is the key for the number of rotation intervals since
+        the epoch.
+        """
+        clock = Clock()
+        keys = sslverify.SessionTicketKeys(
+            b"secret", rotationInterval=10, clock=clock)
+        clock.advance(25)
+        self.assertEqual(keys.currentKey(), keys.keyForPeriod(2))
+
+
+    def test_rotation(self):
+        """
+        Once started, the contexts using the keys get the new key at the start
+        of each interval, until rotation is stopped.
+        """
+        clock = Clock()
+        keys = RecordingSessionTicketKeys(
+            b"secret", rotationInterval=10, clock=clock)
+        context = FakeContext(None)
+        keys.addToContext(context)
+        clock.advance(5)
+        keys.start()
+        clock.advance(4)
+        self.assertEqual(keys.installed, [(context, keys.keyForPeriod(0))])
+        clock.advance(1)
+        clock.advance(10)
+        self.assertEqual(keys.installed, [
+            (context, keys.keyForPeriod(0)),
+            (context, keys.keyForPeriod(1)),
+            (context, keys.keyForPeriod(2))])
+        keys.stop()
+        self.assertEqual(clock.getDelayedCalls(), [])
+
+
+    def test_unsupported(self):
+        """
+        L{sslverify.OpenSSLCertificateOptions} raises L{NotImplementedError}
+        when given session ticket keys if the bindings cannot set them.
+        """
+        self.patch(sslverify, "_getBinding", lambda: FakeBinding())
+        self.assertRaises(
+            NotImplementedError, sslverify.OpenSSLCertificateOptions,
+            sessionTicketKeys=sslverify.SessionTicketKeys(b"secret"))
+
+
+
 class KeyPairTests(unittest.TestCase):
     """
     Tests for L{sslverify.KeyPair}.
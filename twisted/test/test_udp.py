@@ -451,6 +451,129 @@ class UDPTests(unittest.TestCase):
 
 
 
+class BatchServer(Server):
+    """
+    A L{Server} which receives datagrams in batches.
+
+    @ivar batches: The number of batches received.
+    """
+    batches = 0
+
+    def datagramsReceived(self, datagrams):
+        self.batches += 1
+        for data, addr in datagrams:
+            self.datagramReceived(data, addr)
+
+
+
+class BatchTests(unittest.TestCase):
+    """
+    Tests for sending and receiving several datagrams at once.
+    """
+
+    def setUp(self):
+        """
+        Listen on two ports, one which receives datagrams in batches.
+        """
+        self.server = BatchServer()
+        self.client = Server()
+        self.serverPort = reactor.listenUDP(
+            0, self.server, interface="127.0.0.1")
+        self.addCleanup(self.serverPort.stopListening)
+        self.clientPort = reactor.listenUDP(
+            0, self.client, interface="127.0.0.1")
+        self.addCleanup(self.clientPort.stopListening)
+        if getattr(self.clientPort, 'writeDatagrams', None) is None:
+            raise unittest.SkipTest(
+                "%r cannot send datagrams in batches." % (self.clientPort,))
+        self.serverAddress = ("127.0.0.1", self.serverPort.getHost().port)
+
+
+    def waitFor(self, protocol, count):
+        """
+        Wait until a protocol has received some number of datagrams.
+        """
+        d = Deferred()
+        def check():
+            if len(protocol.packets) >= count:
+                d.callback(None)
+            else:
+                protocol.packetReceived = Deferred().addCallback(
+                    lambda ignored: check())
+        check()
+        return d
+
+
+    def test_writeDatagrams(self):
+        """
+        L{udp.Port.writeDatagrams} sends each datagram, and they are
+        delivered to C{datagramsReceived} in fewer calls than there are
+        datagrams.
+        """
+        datagrams = [(intToBytes(i), self.serverAddress) for i in range(200)]
+        self.clientPort.writeDatagrams(datagrams)
+        d = self.waitFor(self.server, 200)
+        def received(ignored):
+            clientAddress = ("127.0.0.1", self.clientPort.getHost().port)
+            self.assertEqual(
+                self.server.packets,
+                [(data, clientAddress) for (data, addr) in datagrams])
+            self.assertTrue(self.server.batches < 200)
+        return d.addCallback(received)
+
+
+    def test_writeDatagramsTooLong(self):
+        """
+        L{udp.Port.writeDatagrams} logs L{error.MessageLengthError} for a
+        datagram which is too long to send, and sends the others.
+        """
+        self.clientPort.writeDatagrams(
+            [(b"a", self.serverAddress), (b"x" * 70000, self.serverAddress),
+             (b"b", self.serverAddress)])
+        self.assertEqual(
+            len(self.flushLoggedErrors(error.MessageLengthError)), 1)
+        d = self.waitFor(self.server, 2)
+        def received(ignored):
+            self.assertEqual([data for (data, addr) in self.server.packets],
+                             [b"a", b"b"])
+        return d.addCallback(received)
+
+
+    def test_writeDatagramsHostname(self):
+        """
+        L{udp.Port.writeDatagrams} logs L{error.InvalidAddressError} for a
+        datagram addressed to a hostname, and sends the others.
+        """
+        self.clientPort.writeDatagrams(
+            [(b"a", self.serverAddress), (b"b", self.serverAddress),
+             (b"c", ("localhost", 1234)), (b"d", self.serverAddress)])
+        self.assertEqual(
+            len(self.flushLoggedErrors(error.InvalidAddressError)), 1)
+        d = self.waitFor(self.server, 3)
+        def received(ignored):
+            self.assertEqual([data for (data, addr) in self.server.packets],
+                             [b"a", b"b", b"d"])
+        return d.addCallback(received)
+
+
+    def test_writeDatagramsBroadcast(self):
+        """
+        L{udp.Port.writeDatagrams} sends datagrams to C{"<broadcast>"} as
+        L{udp.Port.write} does.
+        """
+        sent = []
+        self.clientPort.write = lambda data, addr: sent.append((data, addr))
+        self.clientPort.writeDatagrams([(b"a", ("<broadcast>", 1234)),
+                                        (b"b", self.serverAddress),
+                                        (b"c", self.serverAddress)])
+        self.assertEqual(sent, [(b"a", ("<broadcast>", 1234))])
+        d = self.waitFor(self.server, 2)
+        def received(ignored):
+            self.assertEqual([data for (data, addr) in self.server.packets],
+                             [b"b", b"c"])
+        return d.addCallback(received)
+
+
 class ReactorShutdownInteractionTests(unittest.TestCase):
     """Test reactor shutdown interaction"""
 
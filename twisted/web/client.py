@@ -873,7 +873,7 @@ class BrowserLikePolicyForHTTPS(object):
             <twisted.internet.interfaces.IOpenSSLClientConnectionCreator>}
         """
         return optionsForClientTLS(hostname.decode("ascii"),
-                                   trustRoot=self._trustRoot)
+                                   trustRoot=self._trustRoot, port=port)
 
 
 